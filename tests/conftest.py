@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+تُحمّل Regestary.py بمجلد منزل مؤقت (APP_DIR يُنشأ عند الاستيراد) وواجهة Qt بلا شاشة.
+خارج ويندوز يحل MemoryRegistry محل winreg، والمُثبّت reg يستبدله بسجل فارغ لكل اختبار حتى على ويندوز.
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+_HOME = tempfile.mkdtemp(prefix="ntre_tests_")
+os.environ["HOME"] = _HOME
+os.environ["USERPROFILE"] = _HOME
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pytest  # noqa: E402
+
+import Regestary as R  # noqa: E402
+
+
+@pytest.fixture
+def reg(tmp_path, monkeypatch):
+    """سجل في الذاكرة مكان winreg، مع ذاكرة وصول ونقطة حفظ معزولتين عن الاختبارات الأخرى."""
+    mem = R.MemoryRegistry()
+    monkeypatch.setattr(R, "winreg", mem)
+    monkeypatch.setattr(R, "ACCESS_MEMO", R.AccessMemo())
+    monkeypatch.setattr(R, "CHECKPOINT_FILE", tmp_path / "scan_checkpoint.json")
+    monkeypatch.setattr(R, "CHECKPOINT_RESULTS_FILE", tmp_path / "scan_checkpoint_results.jsonl")
+    return mem
+
+
+def run_scan(crit, rules=None, **kwargs):
+    """يشغّل RegistryScannerThread.run في الخيط الحالي ويُعيد (النتائج، عدد القيم، الخيط)."""
+    th = R.RegistryScannerThread(crit, rules, **kwargs)
+    out, errors = {}, []
+    th.finished.connect(lambda res, count: out.update(res=res, count=count))
+    th.error.connect(errors.append)
+    th.run()
+    assert not errors, errors
+    return out.get("res"), out.get("count", 0), th
+
+
+@pytest.fixture
+def scan(reg):
+    return run_scan
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+import threading
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+import Regestary as R
+from test_regf import sample_tree, write_regf
+
+
+@pytest.fixture
+def queue(tmp_path):
+    q = R.BatchQueue(tmp_path / "jobs.sqlite")
+    yield q
+    q.close()
+
+
+def test_queue_claim_fail_retry_and_give_up(queue):
+    assert queue.add_hosts({"b": ["b.reg"], "a": ["a.reg"]}) == 2
+    (job,) = queue.claim(1)
+    assert job == (1, "b", ["b.reg"])
+    for _ in range(1, R.BATCH_MAX_ATTEMPTS):
+        assert queue.fail(job[0], "boom") == "pending"
+        assert queue.claim(1, ids=[job[0]])[0][0] == job[0]
+    assert queue.fail(job[0], "boom") == "failed"
+    assert queue.claim(5, ids=[job[0]]) == []
+    (other,) = queue.claim(5)
+    queue.finish(other[0], run_id=7, total=10, matched=2, duration=0.5)
+    jobs = {j["host"]: j for j in queue.jobs()}
+    assert (jobs["b"]["state"], jobs["b"]["attempts"], jobs["b"]["error"]) == ("failed", R.BATCH_MAX_ATTEMPTS, "boom")
+    assert (jobs["a"]["state"], jobs["a"]["run_id"], jobs["a"]["matched"]) == ("done", 7, 2)
+    assert queue.counts() == {"failed": 1, "done": 1}
+
+
+def test_queue_release_recover_and_add_hosts(queue):
+    queue.add_hosts({"a": ["1.reg"], "b": ["1.reg"]})
+    a, b = queue.claim(2)
+    queue.release(a[0])
+    assert {j["host"]: (j["state"], j["attempts"]) for j in queue.jobs()} == {"a": ("pending", 0), "b": ("running", 1)}
+    assert queue.recover() == 1
+    queue.claim(1)
+    queue.finish(a[0], 1, 0, 0, 0.0)
+    # الأجهزة الجديدة تُضاف، وملفات المهام غير المنتهية فقط تُحدّث
+    assert queue.add_hosts({"a": ["2.reg"], "b": ["2.reg"], "c": ["2.reg"]}) == 1
+    files = {h: f for _, h, f in queue.claim(5)}
+    assert files == {"b": ["2.reg"], "c": ["2.reg"]}
+
+
+def test_discover_host_hives(tmp_path):
+    config = tmp_path / "host1" / "C" / "Windows" / "System32" / "config"
+    (config / "RegBack").mkdir(parents=True)
+    write_regf(config / "SOFTWARE", sample_tree())
+    write_regf(config / "RegBack" / "SOFTWARE", sample_tree())
+    (config / "SOFTWARE.LOG1").write_bytes(b"regf")
+    (tmp_path / "host2").mkdir()
+    (tmp_path / "host2" / "export.reg").write_text("Windows Registry Editor Version 5.00\n", encoding="utf-16")
+    (tmp_path / "host2" / "notes.txt").write_text("x")
+    (tmp_path / "empty").mkdir()
+    hosts = R.discover_host_hives(str(tmp_path))
+    assert sorted(hosts) == ["host1", "host2"]
+    assert hosts["host1"] == [str(config / "SOFTWARE")]
+    assert hosts["host2"][0].endswith("export.reg")
+    # مجلد جهاز واحد بلا مجلدات فرعية فيها خلايا
+    assert list(R.discover_host_hives(str(tmp_path / "host2"))) == ["host2"]
+
+
+class FakePool:
+    """
+    بديل ProcessPoolExecutor: المهام المُرسلة تُنفّذ معاً بعد مهلة قصيرة، وإن كان بينها الجهاز poison
+    "ينهار العامل" فتفشل كلها بـ BrokenProcessPool كما يحدث في المجمع الحقيقي.
+    """
+    def __init__(self, *args, **kwargs):
+        self._batch = []
+        self._timer = None
+
+    def submit(self, fn, host, files, settings):
+        fut = Future()
+        self._batch.append((fut, fn, host, files, settings))
+        if self._timer is None:
+            self._timer = threading.Timer(0.05, self._run)
+            self._timer.start()
+        return fut
+
+    def _run(self):
+        batch, self._batch, self._timer = self._batch, [], None
+        if any(host == "poison" for _, _, host, _, _ in batch):
+            for fut, *_ in batch:
+                fut.set_exception(BrokenProcessPool("worker died"))
+            return
+        for fut, fn, host, files, settings in batch:
+            fut.set_result(fn(host, files, settings))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if self._timer is not None:
+            self._timer.join()
+        return False
+
+
+def _fake_scan(host, files, settings):
+    return {"host": host, "rows": [], "total": len(files), "started": "2026-10-19 00:00:00", "duration": 0.0, "stats": {}}
+
+
+def test_run_batch_charges_only_the_host_that_kills_the_pool(tmp_path, monkeypatch):
+    root = tmp_path / "collection"
+    for host in ("a", "b", "poison", "c", "d", "e"):
+        (root / host).mkdir(parents=True)
+        (root / host / "export.reg").write_text("Windows Registry Editor Version 5.00\n", encoding="utf-16")
+    monkeypatch.setattr(R, "ProcessPoolExecutor", FakePool)
+    monkeypatch.setattr(R, "batch_scan_host", _fake_scan)
+    out = R.run_batch(str(root), out_dir=str(tmp_path / "out"), workers=2, settings={"keywords": ["x"]},
+                      history_path=tmp_path / "hist.sqlite", log=lambda *a: None)
+    assert out["counts"] == {"done": 5, "failed": 1}
+    q = R.BatchQueue(tmp_path / "out" / "jobs.sqlite")
+    try:
+        jobs = {j["host"]: (j["state"], j["attempts"]) for j in q.jobs()}
+    finally:
+        q.close()
+    assert jobs.pop("poison") == ("failed", R.BATCH_MAX_ATTEMPTS)
+    assert jobs == {h: ("done", 1) for h in ("a", "b", "c", "d", "e")}
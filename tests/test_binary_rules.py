@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+import re
+
+import Regestary as R
+
+
+def _rule(i, rx):
+    return R.RuleSpec(path=f"r{i}.yml", title=f"rule {i}", level="high", enabled=True,
+                      predicates=[{"type": "re", "value": rx, "compiled": re.compile(rx, re.IGNORECASE)}])
+
+
+def test_binary_value_is_decoded_once_for_all_regex_rules(reg, scan, monkeypatch):
+    decodes = []
+
+    class CountingViews(R.Utf16Views):
+        def texts(self):
+            if self._texts is None:
+                decodes.append(1)
+            return super().texts()
+    monkeypatch.setattr(R, "Utf16Views", CountingViews)
+
+    node = reg.add_key(reg.HKEY_LOCAL_MACHINE, r"SOFTWARE\Vendor")
+    reg.put(node, "Wide", b"\x07" + "run mshta.exe now".encode("utf-16-le"), reg.REG_BINARY)
+    reg.put(node, "Other", b"\x00\x01\x02\x03", reg.REG_BINARY)
+    rules = [_rule(i, rf"nomatch{i}\d+") for i in range(20)] + [_rule(99, r"mshta\.exe")]
+    crit = R.Criteria(keys=[r"HKEY_LOCAL_MACHINE\SOFTWARE\Vendor"], mode_rules=True)
+    rows, _, _ = scan(crit, rules)
+    assert [(r["value_name"], r["matched_rule"]) for r in rows] == [("Wide", "rule 99")]
+    assert len(decodes) == 2   # قيمة واحدة لكل فك، مهما كان عدد القواعد
+
+
+def test_regex_search_bytes_matches_both_alignments():
+    pred = {"value": "evil", "compiled": re.compile("evil")}
+    assert R.regex_search_bytes(pred, "xxevil".encode("utf-16-le"))
+    assert R.regex_search_bytes(pred, b"\x01" + "evil".encode("utf-16-le"))
+    assert not R.regex_search_bytes(pred, b"e\x00v\x00i\x00")
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+import pytest
+
+import Regestary as R
+from conftest import run_scan
+
+USERS = [f"S-1-5-21-{1000 + u}" for u in range(4)]
+
+
+def _user_hives(reg, width=5, depth=3):
+    def build(path, level):
+        node = reg.add_key(reg.HKEY_USERS, path)
+        reg.put(node, "cmd", f"powershell -nop {path}", reg.REG_SZ)
+        reg.put(node, "note", "plain", reg.REG_SZ)
+        for c in range(width if level else 0):
+            build(f"{path}\\k{c}", level - 1)
+    for sid in USERS:
+        build(sid, depth)
+
+
+def _trip_after(reg, monkeypatch, opens, action):
+    """يستدعي action مرة واحدة بعد عدد من استدعاءات OpenKey (من أي عامل)."""
+    orig, seen, lock = reg.OpenKey, [0], threading.Lock()
+
+    def open_key(*args, **kwargs):
+        with lock:
+            seen[0] += 1
+            if seen[0] == opens:
+                action()
+        return orig(*args, **kwargs)
+    monkeypatch.setattr(reg, "OpenKey", open_key)
+    return lambda: monkeypatch.setattr(reg, "OpenKey", orig)
+
+
+def _resume(crit):
+    loaded = R.load_scan_checkpoint()
+    assert loaded is not None
+    state, count = loaded
+    return run_scan(R.criteria_from_dict(state["criteria"]), resume=(state, count), meta=state.get("meta"))
+
+
+def _keys(rows):
+    return sorted((r["key"], r["value_name"]) for r in rows)
+
+
+@pytest.fixture
+def users(reg):
+    _user_hives(reg)
+    return R.Criteria(keys=["HKEY_USERS"], keywords=["powershell"])
+
+
+def test_stop_during_user_hive_fan_out_keeps_worker_progress(reg, users, monkeypatch):
+    full, full_count, _ = run_scan(users)
+    assert len(full) == len(USERS) * (1 + 5 + 25 + 125)
+
+    holder = {}
+    restore = _trip_after(reg, monkeypatch, 300, lambda: holder["th"].stop())
+    th = R.RegistryScannerThread(users)
+    holder["th"] = th
+    th.run()
+    restore()
+    state, count = R.load_scan_checkpoint()
+    assert state["unit_frontiers"] and state["counter"] > 0 and count
+    assert count == state["results_flushed"] == len(list(R.iter_checkpoint_rows(count)))
+
+    resumed, count, _ = _resume(users)
+    assert _keys(resumed) == _keys(full)
+    assert count == full_count
+    assert R.load_scan_checkpoint() is None
+
+
+def test_pause_checkpoint_includes_running_units(reg, users, monkeypatch, tmp_path):
+    full, full_count, _ = run_scan(users)
+    saved = {}
+
+    def stop_when_saved(th):
+        # نقطة حفظ الإيقاف المؤقت تُنسخ كما هي (كأن التطبيق أُغلق أثناء التوقف) ثم يُوقف الفحص
+        deadline = time.monotonic() + 20
+        while time.monotonic() < deadline and not saved:
+            if R.CHECKPOINT_FILE.exists():
+                saved["state"] = R.CHECKPOINT_FILE.read_bytes()
+                saved["rows"] = R.CHECKPOINT_RESULTS_FILE.read_bytes() if R.CHECKPOINT_RESULTS_FILE.exists() else b""
+            time.sleep(0.01)
+        th.stop()
+
+    th = R.RegistryScannerThread(users)
+    helper = threading.Thread(target=stop_when_saved, args=(th,))
+
+    def pause():
+        th.pause()
+        helper.start()
+    restore = _trip_after(reg, monkeypatch, 300, pause)
+    th.run()
+    helper.join()
+    restore()
+
+    R.CHECKPOINT_FILE.write_bytes(saved["state"])
+    R.CHECKPOINT_RESULTS_FILE.write_bytes(saved["rows"])
+    state, count = R.load_scan_checkpoint()
+    assert state["unit_frontiers"] and count
+    resumed, count, _ = _resume(users)
+    assert _keys(resumed) == _keys(full)
+    assert count == full_count
+
+
+def _rows(res):
+    return [dict(res[i]) for i in range(len(res))]
+
+
+@pytest.mark.parametrize("display", ["matched", "all"])
+def test_resume_after_stop_equals_full_scan(reg, monkeypatch, display):
+    R.generate_synthetic_hive(reg, 2000, seed=3)
+    crit = R.Criteria(keys=["HKEY_LOCAL_MACHINE"], keywords=["powershell", "mshta", "rundll32", "Microsoft"],
+                      display_mode=display)
+    full, full_count, _ = run_scan(crit)
+    want = [(r["key"], r["value_name"]) for r in _rows(full)]
+    assert len(want) > 20
+
+    holder = {}
+    restore = _trip_after(reg, monkeypatch, 400, lambda: holder["th"].stop())
+    holder["th"] = th = R.RegistryScannerThread(crit)
+    th.run()
+    restore()
+    state, _ = R.load_scan_checkpoint()
+    assert state["frontier"] and 0 < state["counter"] < full_count
+
+    resumed, count, _ = _resume(crit)
+    # عرض "الكل" يُبث من ملف النقطة إلى المخزن على القرص
+    assert isinstance(resumed, R.ResultStore) == (display == "all")
+    assert [(r["key"], r["value_name"]) for r in _rows(resumed)] == want
+    assert count == full_count
+
+
+def _write_checkpoint_files(rows, flushed):
+    R.save_scan_checkpoint({"version": 1, "results_flushed": flushed, "counter": 9}, [{"key": f"k{i}"} for i in range(rows)])
+
+
+def test_checkpoint_with_missing_rows_is_discarded(reg):
+    _write_checkpoint_files(rows=2, flushed=3)
+    assert R.load_scan_checkpoint() is None
+    assert not R.CHECKPOINT_FILE.exists() and not R.CHECKPOINT_RESULTS_FILE.exists()
+
+
+def test_checkpoint_rows_past_the_state_are_truncated(reg):
+    _write_checkpoint_files(rows=5, flushed=3)
+    state, count = R.load_scan_checkpoint()
+    assert count == 3
+    assert [r["key"] for r in R.iter_checkpoint_rows(count)] == ["k0", "k1", "k2"]
+    assert len(R.CHECKPOINT_RESULTS_FILE.read_text(encoding="utf-8").splitlines()) == 3
+    with open(R.CHECKPOINT_RESULTS_FILE, "a", encoding="utf-8") as f:
+        f.write("{not json\n")
+    assert R.load_scan_checkpoint()[1] == 3
+    assert len(R.CHECKPOINT_RESULTS_FILE.read_text(encoding="utf-8").splitlines()) == 3
+    R.CHECKPOINT_RESULTS_FILE.write_text('{"key": "k0"}\n{broken\n', encoding="utf-8")
+    assert R.load_scan_checkpoint() is None
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+import Regestary as R
+
+pytestmark = pytest.mark.skipif(R.openpyxl is None, reason="Excel export needs openpyxl")
+
+HEADER = {"title": "Report", "time_label": "Time", "time": "2026-10-19 00:00:00", "criteria_label": "Criteria",
+          "criteria": {"Keys": "HKLM", "Keywords": "powershell"}}
+
+
+def test_excel_report_streams_rows_and_splits_sheets(tmp_path, monkeypatch):
+    monkeypatch.setattr(R, "EXCEL_MAX_ROWS", 10)
+    monkeypatch.setattr(R, "EXCEL_WIDTH_SAMPLE", 4)
+    path = tmp_path / "out.xlsx"
+    rows = ([f"HKLM\\k{i}", i, None] for i in range(25))
+    R.write_excel_report(str(path), HEADER, ["Key", "N", "Score"], rows)
+
+    wb = R.openpyxl.load_workbook(str(path))
+    assert wb.sheetnames == ["RegistryScan", "RegistryScan (2)", "RegistryScan (3)", "RegistryScan (4)"]
+    first = [list(r) for r in wb["RegistryScan"].iter_rows(values_only=True)]
+    assert first[0][0] == "Report" and first[3][0] == "Keys: HKLM"
+    assert first[6] == ["Key", "N", "Score"]
+    assert wb["RegistryScan"]["A7"].font.bold
+    data = [r for ws in wb.worksheets for r in ws.iter_rows(values_only=True) if r[0] and r[0].startswith("HKLM\\")]
+    assert [r[1] for r in data] == list(range(25))
+    assert all(ws.max_row <= 10 for ws in wb.worksheets)
+    assert all(list(next(ws.iter_rows(values_only=True))) == ["Key", "N", "Score"] for ws in wb.worksheets[1:])
+    assert wb["RegistryScan"].column_dimensions["A"].width == len("HKLM\\k0") + 4
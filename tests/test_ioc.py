@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+import struct
+
+import pytest
+
+import Regestary as R
+
+
+@pytest.fixture
+def feed(tmp_path):
+    src = tmp_path / "feed.txt"
+    src.write_text("evil.example.com\n203.0.113.7\nC:\\Users\\Public\\drop.exe\n", encoding="utf-8")
+    path = str(tmp_path / "feed.ntreioc")
+    counts = R.build_ioc_feed([str(src)], path, "test")
+    assert counts["domain"] == 1 and counts["ipv4"] == 1
+    return path
+
+
+def test_match_text_and_binary(feed):
+    m = R.IocMatcher([feed])
+    assert m.match("http://cdn.evil.example.com/a")[:2] == ("domain", "evil.example.com")
+    assert m.match("nothing here") is None
+    assert m.match_bytes(b"\x01\x02connect 203.0.113.7:443\x00")[:2] == ("ipv4", "203.0.113.7")
+    wide = "run C:\\Users\\Public\\drop.exe /s".encode("utf-16-le")
+    assert m.match_bytes(wide)[0] in ("path", "filename")
+    assert m.match_bytes(b"\x00" + "evil.example.com".encode("utf-16-le"))[1] == "evil.example.com"
+    assert m.match_bytes(b"\x00\x01\x02\x03") is None
+
+
+def test_feed_only_scan_matches_binary_values(reg, scan, feed):
+    node = reg.add_key(reg.HKEY_LOCAL_MACHINE, r"SOFTWARE\Vendor")
+    reg.put(node, "Blob", "https://evil.example.com/x".encode("utf-16-le"), reg.REG_BINARY)
+    reg.put(node, "Text", "ping 203.0.113.7", reg.REG_SZ)
+    reg.put(node, "Clean", b"\x00\x01\x02", reg.REG_BINARY)
+    rows, _, _ = scan(R.Criteria(keys=[r"HKEY_LOCAL_MACHINE\SOFTWARE\Vendor"], ioc_feeds=[feed]))
+    assert sorted((r["value_name"], r["matched_kw"]) for r in rows) == [
+        ("Blob", "evil.example.com"), ("Text", "203.0.113.7")]
+
+
+def _tables_bytes(path):
+    data = path.read_bytes()
+    (mlen,) = struct.unpack_from("<I", data, 8)
+    return data[12 + mlen + (-(12 + mlen)) % 8:]
+
+
+def test_external_sort_import_matches_in_memory_import(tmp_path, monkeypatch):
+    src = tmp_path / "big.txt"
+    lines = [f"h{i % 97}.bad{i % 13}.example.net" for i in range(400)]
+    lines += [f"{i % 150:064x}" for i in range(400)] + [f"10.0.{i % 7}.{i % 11}" for i in range(300)]
+    lines += [f"C:\\Temp\\drop{i % 40}.exe" for i in range(200)]
+    src.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    whole = R.build_ioc_feed([str(src)], str(tmp_path / "whole.ntreioc"))
+    monkeypatch.setattr(R, "IOC_SORT_CHUNK", 17)   # دفعات كثيرة تُدمج مع حذف المكرر عبرها
+    runs = R.build_ioc_feed([str(src)], str(tmp_path / "runs.ntreioc"))
+    assert runs == whole
+    assert whole["domain"] == len({f"h{i % 97}.bad{i % 13}" for i in range(400)}) and whole["sha256"] == 150
+    a, b = R.IocFeed(tmp_path / "whole.ntreioc"), R.IocFeed(tmp_path / "runs.ntreioc")
+    try:
+        assert a.meta["tables"] == b.meta["tables"]
+    finally:
+        a.close()
+        b.close()
+    assert _tables_bytes(tmp_path / "whole.ntreioc") == _tables_bytes(tmp_path / "runs.ntreioc")
+    m = R.IocMatcher([str(tmp_path / "runs.ntreioc")])
+    assert m.match("see h5.bad5.example.net")[1] == "h5.bad5.example.net"
+    assert m.match("hash " + f"{149:064x}")[0] == "sha256"
+    assert m.match("C:\\Temp\\drop39.exe")
+    assert m.match("h5.bad6.example.net") is None
+    assert not list(R.IOC_DIR.glob("ioc_*"))
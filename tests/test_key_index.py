@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+import Regestary as R
+
+
+def _tree(reg, path="SOFTWARE", width=3, depth=3):
+    reg.add_key(reg.HKEY_LOCAL_MACHINE, path)
+    for c in range(width if depth else 0):
+        _tree(reg, f"{path}\\k{c}", width, depth - 1)
+
+
+@pytest.fixture
+def index(reg, tmp_path):
+    idx = R.KeyPathIndex(tmp_path / "keyindex.sqlite")
+    yield idx
+    idx.close()
+
+
+def _paths(idx):
+    return {p for (p,) in idx._db.execute("SELECT path FROM keys")}
+
+
+def test_interrupted_refresh_is_completed_by_the_next_one(reg, index, tmp_path):
+    _tree(reg)
+    calls = [0]
+
+    def stop_early():
+        calls[0] += 1
+        return calls[0] > 40
+    index.refresh(stop_early)
+    partial = _paths(index)
+    assert partial and index.is_stale()
+
+    stats = index.refresh()
+    fresh = R.KeyPathIndex(tmp_path / "fresh.sqlite")
+    try:
+        fresh.refresh()
+        assert _paths(index) == _paths(fresh)
+    finally:
+        fresh.close()
+    # الأشجار المكتملة قبل الانقطاع لا تُعدَّد من جديد
+    assert stats["reused"] > 0 and stats["added"] == len(_paths(index)) - len(partial)
+    assert not index.is_stale()
+    assert index.complete(r"HKLM\SOFTWARE\k2\k") == [rf"HKLM\SOFTWARE\k2\k{i}" for i in range(3)]
+
+
+def test_refresh_reuses_unchanged_keys(reg, index):
+    _tree(reg, width=2, depth=2)
+    assert index.refresh()["added"] == index.info()[0]
+    reg.add_key(reg.HKEY_LOCAL_MACHINE, r"SOFTWARE\k1\new", mtime=5)
+    stats = index.refresh()
+    assert stats["added"] == 1
+    assert r"HKLM\SOFTWARE\k1\new" in _paths(index)
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+import Regestary as R
+
+
+def test_open_enum_query_case_insensitive(reg):
+    node = reg.add_key(reg.HKEY_LOCAL_MACHINE, r"SOFTWARE\Vendor\App", mtime=123)
+    reg.put(node, "Path", r"C:\app.exe", reg.REG_SZ)
+    reg.put(node, "Count", 7, reg.REG_DWORD)
+    with reg.OpenKey(reg.HKEY_LOCAL_MACHINE, r"software\VENDOR") as k:
+        assert reg.QueryInfoKey(k)[:2] == (1, 0)
+        assert reg.EnumKey(k, 0) == "App"
+        with pytest.raises(OSError):
+            reg.EnumKey(k, 1)
+    k = reg.OpenKey(reg.HKEY_LOCAL_MACHINE, r"SOFTWARE\Vendor\App")
+    assert reg.QueryInfoKey(k) == (0, 2, 123)
+    assert reg.EnumValue(k, 1) == ("Count", 7, reg.REG_DWORD)
+    assert reg.QueryValueEx(k, "path") == (r"C:\app.exe", reg.REG_SZ)
+    reg.CloseKey(k)
+    with pytest.raises(OSError):
+        reg.EnumValue(k, 0)
+
+
+def test_missing_and_denied_keys(reg):
+    reg.add_key(reg.HKEY_LOCAL_MACHINE, r"SAM\SAM", denied=True)
+    with pytest.raises(FileNotFoundError):
+        reg.OpenKey(reg.HKEY_LOCAL_MACHINE, r"SOFTWARE\Nope")
+    with pytest.raises(PermissionError):
+        reg.OpenKey(reg.HKEY_LOCAL_MACHINE, r"SAM\SAM")
+    # الرفض على المفتاح نفسه فقط كما في ACL السجل
+    reg.OpenKey(reg.HKEY_LOCAL_MACHINE, "SAM").Close()
+
+
+def test_set_delete_value_and_alias(reg):
+    reg.add_key(reg.HKEY_USERS, r"S-1-5-21-1\Software")
+    reg.alias(reg.HKEY_CURRENT_USER, reg.HKEY_USERS, "S-1-5-21-1")
+    with reg.OpenKey(reg.HKEY_CURRENT_USER, "Software", 0, reg.KEY_SET_VALUE) as k:
+        reg.SetValueEx(k, "A", 0, reg.REG_SZ, "1")
+        reg.SetValueEx(k, "B", 0, reg.REG_SZ, "2")
+        reg.DeleteValue(k, "a")
+        assert reg.QueryValueEx(k, "B") == ("2", reg.REG_SZ)
+        with pytest.raises(FileNotFoundError):
+            reg.DeleteValue(k, "A")
+    with reg.OpenKey(reg.HKEY_USERS, r"S-1-5-21-1\Software") as k:
+        assert reg.QueryInfoKey(k)[1] == 1
+
+
+def test_access_memo_remembers_only_denied_keys(reg, scan):
+    crit = R.Criteria(keys=[r"HKEY_LOCAL_MACHINE\SOFTWARE\Later", r"HKEY_LOCAL_MACHINE\SOFTWARE\Locked"],
+                      keywords=["powershell"])
+    locked = reg.add_key(reg.HKEY_LOCAL_MACHINE, r"SOFTWARE\Locked", denied=True)
+    reg.put(locked, "cmd", "powershell -nop", reg.REG_SZ)
+    assert scan(crit)[0] == []
+    assert not R.ACCESS_MEMO.is_denied(reg.HKEY_LOCAL_MACHINE, r"SOFTWARE\Later")
+    assert R.ACCESS_MEMO.is_denied(reg.HKEY_LOCAL_MACHINE, r"SOFTWARE\Locked")
+    # المفتاح الذي أُنشئ بعد الفحص يُرى في الفحص التالي، والمرفوض يُتخطى حتى تُمسح الذاكرة
+    reg.put(reg.add_key(reg.HKEY_LOCAL_MACHINE, r"SOFTWARE\Later"), "cmd", "powershell -w hidden", reg.REG_SZ)
+    locked.denied = False
+    assert [r["key"] for r in scan(crit)[0]] == [r"HKLM\SOFTWARE\Later"]
+    R.ACCESS_MEMO.clear()
+    assert sorted(r["key"] for r in scan(crit)[0]) == [r"HKLM\SOFTWARE\Later", r"HKLM\SOFTWARE\Locked"]
+
+
+def test_synthetic_hive_is_deterministic():
+    a, b = R.MemoryRegistry(), R.MemoryRegistry()
+    shape = R.generate_synthetic_hive(a, 3000, seed=5)
+    assert shape == R.generate_synthetic_hive(b, 3000, seed=5)
+    assert shape["keys"] >= 3000 and shape["denied"] > 0 and shape["depth"] >= 6
+    assert shape != R.generate_synthetic_hive(R.MemoryRegistry(), 3000, seed=6)
+
+
+def test_scanner_end_to_end_on_synthetic_hive(reg, scan):
+    R.generate_synthetic_hive(reg, 3000)
+    rows, count, th = scan(R.Criteria(keys=list(R.BENCH_ROOTS), keywords=["powershell", "mshta"]))
+    assert count > 1000
+    assert rows and all(r["matched_any"] for r in rows)
+    assert any("Run" in r["key"] for r in rows)
+    assert th.stats["open_failed"] > 0
+
+
+def test_benchmark_restores_globals():
+    before = (R.winreg, R.CHECKPOINT_FILE, R.ACCESS_MEMO)
+    out = R.run_benchmarks(sizes=(500,), keyword_counts=(2,), rule_counts=(4,), repeat=1, log=lambda line: None)
+    assert [r["mode"] for r in out] == ["keywords", "rules"]
+    assert all(r["scanned"] > 0 for r in out)
+    assert (R.winreg, R.CHECKPOINT_FILE, R.ACCESS_MEMO) == before
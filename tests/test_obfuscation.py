@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+import base64
+import random
+
+import pytest
+
+import Regestary as R
+
+pytestmark = pytest.mark.skipif(not R.HAVE_NUMPY, reason="obfuscation stage needs NumPy")
+
+PAYLOAD = base64.b64encode(bytes(random.Random(1).randrange(256) for _ in range(600))).decode()
+PLAIN = r"C:\Program Files\Vendor\app.exe --start-minimized"
+
+
+def test_scores_separate_payload_from_plain_text():
+    high, low = R.obfuscation_scores([PAYLOAD.encode(), PLAIN.encode()], [False, False])
+    assert high > 40 > low
+
+
+def test_obfuscation_only_scan(reg, scan):
+    node = reg.add_key(reg.HKEY_CURRENT_USER, r"Software\Microsoft\Windows\CurrentVersion\Run")
+    reg.put(node, "Updater", PAYLOAD, reg.REG_SZ)
+    reg.put(node, "Vendor", PLAIN, reg.REG_SZ)
+    crit = R.Criteria(keys=[r"HKEY_CURRENT_USER\Software"], obfuscation=True, obf_threshold=40)
+    rows, _, _ = scan(crit)
+    assert [r["value_name"] for r in rows] == ["Updater"]
+    assert rows[0]["obf_score"] >= 40
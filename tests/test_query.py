@@ -0,0 +1,54 @@
+import pytest
+
+import Regestary as R
+
+
+def _row(**kw):
+    row = {"key": r"HKEY_LOCAL_MACHINE\Software\Run", "value_name": "x", "value_type": "REG_SZ",
+           "value_str": "", "matched_kw": "", "matched_rule": "", "owner": "", "last_mod": "2026-10-01 12:00:00",
+           "run_id": 1, "matched_any": False}
+    row.update(kw)
+    return row
+
+
+ROWS = [
+    _row(value_name="Updater", value_str=r"powershell -enc AAAA", matched_kw="powershell", matched_any=True, obf_score=80),
+    _row(key=r"HKEY_CURRENT_USER\Software\Foo", value_name="load", value_str="c:\\tools\\a.exe", run_id=2, obf_score=5),
+    _row(value_name="run", value_type="REG_BINARY", value_str="de ad be ef", last_mod="2026-09-01 00:00:00"),
+    _row(key=r"HKEY_USERS\S-1-5-21\Env", value_name="Path", value_str="%SystemRoot%", run_id=3),
+]
+
+
+@pytest.mark.parametrize("text", [
+    "run:>x", "obf:>=abc", "score:<1.5", "run:<=", "run:a..b", "obf:abc",
+    "name:", "name:/(/", "run:..", "(name:x", "name:x)", "NOT", 'value:"open',
+])
+def test_malformed_queries_raise_query_error(text):
+    with pytest.raises(R.QueryError):
+        R.parse_query(text)
+
+
+def test_parse_trees():
+    assert R.parse_query("run:>2") == ("cmp", "run_id", "gt", 2)
+    assert R.parse_query("obf:>=50") == ("cmp", "obf_score", "ge", 50)
+    assert R.parse_query("run:1..3") == ("and", ("cmp", "run_id", "ge", 1), ("cmp", "run_id", "le", 3))
+    assert R.parse_query("type:binary") == ("cmp", "value_type", "eq", "REG_binary")
+    assert R.parse_query("name:Up*") == ("cmp", "value_name", "prefix", "Up")
+    assert R.parse_query("-name:run || foo") == ("or", ("not", ("cmp", "value_name", "eq", "run")), ("text", "foo"))
+    assert R.parse_query("modified:..2026-09-15") == ("cmp", "last_mod", "le", "2026-09-15 23:59:59")
+
+
+@pytest.mark.parametrize("text", [
+    "powershell", "name:run", "name:/^(run|load)$/", "obf:>=50", "obf:<50", "obf:5..79", "matched:true",
+    "key:*Software*", "type:binary OR name:path", "NOT matched:true", "modified:<2026-09-15", "value:%SystemRoot%",
+])
+def test_sql_and_python_agree(text):
+    node = R.parse_query(text)
+    want = [i for i, r in enumerate(ROWS) if R.compile_query_py(node)(r)]
+    store = R.ResultStore()
+    try:
+        store.extend(ROWS)
+        view = store.query_view(node)
+        assert [view[i] for i in range(len(view))] == want
+    finally:
+        store.close()
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+import Regestary as R
+
+RUN = r"HKEY_LOCAL_MACHINE\SOFTWARE\Microsoft\Windows\CurrentVersion\Run"
+
+EXPORT = "\r\n".join([
+    "Windows Registry Editor Version 5.00",
+    "",
+    r"[HKEY_LOCAL_MACHINE\SOFTWARE\Vendor]",
+    '"Notes"="first line',
+    r"[HKEY_LOCAL_MACHINE\\SOFTWARE\\Fake]",
+    '\\"quoted\\" tail"',
+    '"Path"="C:\\\\Program Files\\\\Vendor\\\\app.exe"',
+    '"Blob"=hex:01,02,03,\\',
+    "  04,05",
+    '"Count"=dword:0000002a',
+    "",
+    f"[{RUN}]",
+    '"Updater"="powershell -enc AAAA"',
+    '@="default"',
+    "",
+    "[-HKEY_LOCAL_MACHINE\\SOFTWARE\\Gone]",
+    "",
+])
+
+
+def _write(tmp_path, text, name="export.reg", encoding="utf-16"):
+    path = tmp_path / name
+    path.write_text(text, encoding=encoding)
+    return str(path)
+
+
+def _values(items):
+    return {(hive, subkey): {n: (d, t) for n, d, t in values} for hive, subkey, _, values in items}
+
+
+def test_iter_reg_file_parses_regedit_export(tmp_path):
+    keys = _values(R.iter_reg_file(_write(tmp_path, EXPORT)))
+    hklm = R.winreg.HKEY_LOCAL_MACHINE
+    assert list(keys) == [(hklm, r"SOFTWARE\Vendor"), (hklm, RUN.partition("\\")[2])]
+    vendor = keys[(hklm, r"SOFTWARE\Vendor")]
+    assert vendor["Notes"] == ('first line\n[HKEY_LOCAL_MACHINE\\SOFTWARE\\Fake]\n"quoted" tail', R.winreg.REG_SZ)
+    assert vendor["Path"] == (r"C:\Program Files\Vendor\app.exe", R.winreg.REG_SZ)
+    assert vendor["Blob"] == (b"\x01\x02\x03\x04\x05", R.winreg.REG_BINARY)
+    assert vendor["Count"] == (42, R.winreg.REG_DWORD)
+    assert keys[(hklm, RUN.partition("\\")[2])][""] == ("default", R.winreg.REG_SZ)
+
+
+def test_skipped_key_does_not_split_on_multiline_string(tmp_path):
+    path = _write(tmp_path, EXPORT)
+    seen = []
+
+    def want(hive, subkey):
+        seen.append(subkey)
+        return subkey.endswith("Run")
+    keys = _values(R.iter_reg_file(path, want))
+    # السطر "[...Fake]" داخل نص Notes، فلا يُعدّ مفتاحاً ولا تُنسب Path/Blob/Count إلى مفتاح وهمي
+    assert seen == [r"SOFTWARE\Vendor", RUN.partition("\\")[2]]
+    assert list(keys) == [(R.winreg.HKEY_LOCAL_MACHINE, RUN.partition("\\")[2])]
+    assert set(keys[(R.winreg.HKEY_LOCAL_MACHINE, RUN.partition("\\")[2])]) == {"Updater", ""}
+
+
+def test_string_open_state():
+    assert not R._reg_string_open('"a"="b"\r\n')
+    assert not R._reg_string_open('"a"=hex:01,\\\r\n')
+    assert R._reg_string_open('"a"="b\\"\r\n')
+    assert not R._reg_string_open('"a"="b\\\\" ;\r\n')
+    assert R._reg_string_open('"a"="b\\\\\\"c\r\n')
+    assert R._reg_string_open("[HKEY_X]\r\n", inside=True)
+    assert not R._reg_string_open('end"\r\n', inside=True)
+
+
+def test_iter_reg_file_wine(tmp_path):
+    text = "\n".join([
+        "WINE REGISTRY Version 2",
+        ";; All keys relative to \\\\User\\\\S-1-5-21-1",
+        "",
+        "[Software\\\\Wine] 1700000000",
+        "#time=1d9a1b2c3d4e5f6",
+        '"Multi"=str(7):"a\\0b\\0"',
+        '"Line"="x\\ny"',
+        "",
+    ])
+    ((hive, subkey, ft, values),) = list(R.iter_reg_file(_write(tmp_path, text, "user.reg", "utf-8")))
+    assert (hive, subkey) == (R.winreg.HKEY_CURRENT_USER, r"Software\Wine")
+    assert ft == 0x1d9a1b2c3d4e5f6
+    assert dict((n, d) for n, d, _ in values) == {"Multi": ["a", "b"], "Line": "x\ny"}
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+import struct
+
+import Regestary as R
+
+FT = 132000000000000000
+
+
+def write_regf(path, tree):
+    """
+    يكتب خلية regf صغيرة: tree = {"v": [(اسم، بايتات، نوع)...], "k": {اسم: tree}, "ft": FILETIME}.
+    الأبناء الأكثر من 3 تُكتب في قائمة ri من lh وli، والقيم الأكبر من مقطع db تُقسّم.
+    """
+    buf = bytearray(32)   # رأس hbin؛ إزاحات الخلايا نسبةً لبدايته (0x1000 في الملف)
+
+    def cell(data):
+        size = (len(data) + 4 + 7) & ~7
+        off = len(buf)
+        buf.extend(struct.pack("<i", -size) + data + b"\0" * (size - 4 - len(data)))
+        return off
+
+    def encode(name):
+        ascii_ = all(ord(c) < 128 for c in name)
+        return ascii_, name.encode("latin-1" if ascii_ else "utf-16-le")
+
+    def nk(node, name, root=False):
+        kids = [nk(c, n) for n, c in sorted(node.get("k", {}).items(), key=lambda x: x[0].lower())]
+        sub = R.REGF_NONE
+        if len(kids) > 3:
+            half = len(kids) // 2
+            lh = cell(b"lh" + struct.pack("<H", half) + b"".join(struct.pack("<II", o, 0) for o in kids[:half]))
+            li = cell(b"li" + struct.pack("<H", len(kids) - half) + b"".join(struct.pack("<I", o) for o in kids[half:]))
+            sub = cell(b"ri" + struct.pack("<HII", 2, lh, li))
+        elif kids:
+            sub = cell(b"lf" + struct.pack("<H", len(kids)) + b"".join(struct.pack("<I4s", o, b"hash") for o in kids))
+        vals = []
+        for vname, data, vtype in node.get("v", []):
+            if len(data) <= 4:
+                dsize, doff = len(data) | 0x80000000, struct.unpack("<I", data.ljust(4, b"\0"))[0]
+            elif len(data) > R.REGF_BIG_DATA_SEG:
+                segs = [cell(data[i:i + R.REGF_BIG_DATA_SEG]) for i in range(0, len(data), R.REGF_BIG_DATA_SEG)]
+                seglist = cell(struct.pack(f"<{len(segs)}I", *segs))
+                dsize, doff = len(data), cell(b"db" + struct.pack("<HI", len(segs), seglist))
+            else:
+                dsize, doff = len(data), cell(data)
+            ascii_, raw = encode(vname)
+            vals.append(cell(b"vk" + struct.pack("<HIIIHH", len(raw), dsize, doff, vtype, 1 if ascii_ else 0, 0) + raw))
+        vlist = cell(struct.pack(f"<{len(vals)}I", *vals)) if vals else R.REGF_NONE
+        ascii_, raw = encode(name)
+        flags = (R.REGF_NK_ASCII if ascii_ else 0) | (4 if root else 0)
+        body = b"nk" + struct.pack("<HQIIIIIIIIIIIIIIIHH", flags, node.get("ft", FT), 0, 0, len(kids), 0, sub,
+                                   R.REGF_NONE, len(vals), vlist, R.REGF_NONE, R.REGF_NONE, 0, 0, 0, 0, 0, len(raw), 0) + raw
+        return cell(body)
+
+    root = nk(tree, "ROOT", root=True)
+    hbin_len = (len(buf) + 4095) & ~4095
+    buf[0:32] = b"hbin" + struct.pack("<III", 0, hbin_len, 0) + b"\0" * 16
+    buf.extend(b"\0" * (hbin_len - len(buf)))
+    base = bytearray(R.REGF_HBIN_START)
+    base[0:4] = R.REGF_MAGIC
+    struct.pack_into("<IIQIIIII", base, 4, 1, 1, 0, 1, 5, 0, 1, root)
+    struct.pack_into("<I", base, 0x28, hbin_len)
+    path.write_bytes(bytes(base) + bytes(buf))
+    return path
+
+
+def sz(text):
+    return (text + "\0").encode("utf-16-le")
+
+
+def sample_tree():
+    big = bytes(range(256)) * 80   # أكبر من مقطع db واحد
+    return {"v": [("RootVal", sz("root"), R.winreg.REG_SZ)], "k": {
+        "Microsoft": {"k": {f"K{i}": {"v": [("n", struct.pack("<I", i), R.winreg.REG_DWORD)]} for i in range(5)}},
+        "Run": {"ft": FT + 1, "v": [
+            ("Updater", sz("powershell -enc AAAA"), R.winreg.REG_SZ),
+            ("Blob", big, R.winreg.REG_BINARY),
+            ("Tiny", b"\x01\x02", R.winreg.REG_BINARY),
+            ("Ünï", sz("wide"), R.winreg.REG_SZ),
+        ]},
+    }}
+
+
+def test_iter_regf_file_walks_keys_and_values(tmp_path):
+    path = write_regf(tmp_path / "SOFTWARE", sample_tree())
+    assert R.is_regf_file(str(path))
+    keys = {subkey: (ft, values) for hive, subkey, ft, values in R.iter_regf_file(str(path))}
+    assert list(keys)[:3] == ["SOFTWARE", r"SOFTWARE\Microsoft", r"SOFTWARE\Microsoft\K0"]
+    assert [k for k in keys if k.startswith(r"SOFTWARE\Microsoft\K")] == [rf"SOFTWARE\Microsoft\K{i}" for i in range(5)]
+    ft, values = keys[r"SOFTWARE\Run"]
+    assert ft == FT + 1
+    vals = {n: (d, t) for n, d, t in values}
+    assert vals["Updater"] == ("powershell -enc AAAA", R.winreg.REG_SZ)
+    assert vals["Blob"][0] == bytes(range(256)) * 80
+    assert vals["Tiny"][0] == b"\x01\x02"
+    assert vals["Ünï"][0] == "wide"
+    assert keys[r"SOFTWARE\Microsoft\K3"][1] == [("n", 3, R.winreg.REG_DWORD)]
+
+
+def test_iter_regf_file_want_filter_and_mount(tmp_path):
+    user_dir = tmp_path / "Users" / "alice"
+    user_dir.mkdir(parents=True)
+    path = write_regf(user_dir / "NTUSER.DAT", sample_tree())
+    seen = list(R.iter_regf_file(str(path), want=lambda hive, subkey: subkey.endswith("Run")))
+    assert {hive for hive, *_ in seen} == {R.winreg.HKEY_USERS}
+    assert seen[0][1] == "alice"
+    assert [s for _, s, _, v in seen if v] == [r"alice\Run"]
+
+
+def test_iter_regf_file_survives_corrupt_cells(tmp_path):
+    path = write_regf(tmp_path / "SYSTEM", sample_tree())
+    data = bytearray(path.read_bytes())
+    pos = data.find(b"nk", data.find(b"Microsoft") - 80)
+    data[pos:pos + 2] = b"XX"   # مفتاح Microsoft تالف: يُتخطى مع فروعه
+    path.write_bytes(bytes(data))
+    keys = [s for _, s, _, _ in R.iter_regf_file(str(path))]
+    assert "SYSTEM" in keys and r"SYSTEM\Run" in keys
+    assert not any("Microsoft" in k for k in keys)
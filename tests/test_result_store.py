@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+import Regestary as R
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(R, "SPILL_DIR", tmp_path / "spill")
+    s = R.ResultStore()
+    yield s
+    s.close()
+
+
+def _row(key, matched=True, value="same"):
+    return {"key": key, "value_name": "Run", "value_type": "REG_SZ", "value_str": value, "matched_any": matched}
+
+
+def _groups(store):
+    view = store.group_view()
+    try:
+        return {g["value_str"]: g for g in (view[i] for i in range(len(view)))}
+    finally:
+        view.drop()
+
+
+def test_mark_deleted_updates_counters_and_samples(store):
+    store.extend([_row("k0"), _row("k1", matched=False), _row("k2"), _row("k3"), _row("other", value="x")])
+    assert R.count_matched(store) == 4
+    store.mark_deleted(0)
+    store.mark_deleted(1)
+    store.mark_deleted(1)   # حذف مكرر لا يُنقص العدادات مرتين
+    assert R.count_matched(store) == 3
+    g = _groups(store)["same"]
+    assert (g["count"], g["matched"], g["samples"]) == (2, 2, ["k2"])
+    # المجموعة تستعيد نماذجها من الصفوف اللاحقة بعد أن نقصت
+    store.extend([_row("k4"), _row("k5")])
+    store.flush()
+    g = _groups(store)["same"]
+    assert (g["count"], g["samples"]) == (4, ["k2", "k4", "k5"])
+    assert [r["key"] for r in store] == ["k2", "k3", "other", "k4", "k5"]
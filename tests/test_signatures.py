@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+import random
+import re
+
+import pytest
+
+import Regestary as R
+
+
+def _random_signature(rng):
+    parts = []
+    for _ in range(rng.randint(1, 4)):
+        kind = rng.random()
+        if kind < 0.6:
+            parts.append(" ".join(f"{rng.randrange(256):02X}" for _ in range(rng.randint(1, 5))))
+        elif kind < 0.75:
+            parts.append("??")
+        elif kind < 0.9:
+            parts.append(rng.choice(("4?", "?D", "0?")))
+        else:
+            parts.append(f"[{rng.randint(0, 3)}-{rng.randint(3, 8)}]")
+    return R.parse_hex_signature(" ".join(parts) + f" {rng.randrange(256):02X}")
+
+
+def _brute_force(signatures, data):
+    hits = {}
+    for owner, items in signatures:
+        m = re.compile(b"".join(R._hex_item_regex(it) for it in items), re.DOTALL).search(data)
+        if m and (owner not in hits or m.start() < hits[owner]):
+            hits[owner] = m.start()
+    return hits
+
+
+@pytest.mark.parametrize("mode", ["re", "numpy", "aho"])
+def test_strategies_agree_with_brute_force(monkeypatch, mode):
+    if mode == "numpy" and not R.HAVE_NUMPY:
+        pytest.skip("NumPy not installed")
+    monkeypatch.setattr(R, "HEX_SIG_RE_ATOMS", 10 ** 6 if mode == "re" else 0)
+    monkeypatch.setattr(R, "HAVE_NUMPY", R.HAVE_NUMPY and mode == "numpy")
+    rng = random.Random(11)
+    # عدة تواقيع لكل مالك (كشروط قاعدة واحدة)، وذرات متداخلة وبادئات لبعضها
+    signatures = [(i % 40, _random_signature(rng)) for i in range(120)]
+    signatures += [(900, R.parse_hex_signature("4D 5A 90")), (901, R.parse_hex_signature("4D 5A")),
+                   (902, R.parse_hex_signature("5A 90 00")), (903, R.parse_hex_signature("?? [1-2] 4?"))]
+    matcher = R.SignatureMatcher(signatures)
+    for size in (0, 1, 2, 7, 300, 5000):
+        for _ in range(5):
+            data = bytearray(rng.randrange(256) for _ in range(size))
+            for _ in range(3 if size > 20 else 0):
+                pos = rng.randrange(size - 10)
+                data[pos:pos + 3] = rng.choice((b"MZ\x90", b"\x5a\x90\x00", bytes(rng.randrange(256) for _ in range(3))))
+            data = bytes(data)
+            assert matcher.scan(data) == _brute_force(signatures, data)